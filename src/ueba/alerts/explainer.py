@@ -9,10 +9,15 @@ in analyst-facing risk alerts.
 Also exports `save_table()` for persisting explanation DataFrames as Parquet.
 """
 import os
+from typing import TYPE_CHECKING
 
 import numpy as np
 import pandas as pd
-import tensorflow as tf
+
+from ueba.models.dense import ArrayScaler, NumpyDenseModel
+
+if TYPE_CHECKING:
+    import tensorflow as tf
 
 
 class ReconstructionErrorExplainer:
@@ -55,6 +60,47 @@ class ReconstructionErrorExplainer:
         )
 
 
+    def compute_scaled_feature_error(
+        self,
+        raw_data: np.ndarray,
+        scaler,
+        model: "tf.keras.Model | NumpyDenseModel | None"=None,
+        reconstruction: np.ndarray | None=None,
+        batch_size: int=4096
+    ) -> np.ndarray:
+        """
+        Computes squared reconstruction error per feature for unscaled input, scaling it
+        chunk by chunk instead of materializing the full scaled matrix.
+
+        Args:
+            raw_data: The unscaled features (`to_model_matrix` output) of shape: (n_samples, n_features)
+            scaler: The model's fitted StandardScaler
+            model: The autoencoder, called per chunk when no reconstruction is given; a
+                scaler-folded NumpyDenseModel gets the raw chunk, any other model the scaled one
+            reconstruction: The (scaled-space) reconstruction of raw_data, if already computed
+            batch_size: Rows per chunk
+
+        Returns:
+            np.ndarray: The squared error per feature of shape: (n_samples, n_features)
+        """
+        if reconstruction is not None and reconstruction.shape != raw_data.shape:
+            raise ValueError(f"Reconstruction shape {reconstruction.shape} does not match input shape {raw_data.shape}")
+        array_scaler = ArrayScaler.from_standard_scaler(scaler)
+        folded = getattr(model, "scaler_folded", False)
+
+        feature_error = np.empty(raw_data.shape, dtype=np.float32)
+        for start in range(0, len(raw_data), batch_size):
+            stop = start + batch_size
+            chunk = np.asarray(raw_data[start:stop], dtype=np.float32)
+            scaled = array_scaler.transform(chunk)
+            if reconstruction is not None:
+                x_pred = reconstruction[start:stop]
+            else:
+                x_pred = model.predict(chunk if folded else scaled, verbose=0, batch_size=batch_size)
+            feature_error[start:stop] = self.compute_feature_error(scaled, x_pred)
+        return feature_error
+
+
     def compute_total_error(self, feature_error: np.ndarray) -> np.ndarray:
         """
         Computes the total reconstruction error per sample.
@@ -68,6 +114,40 @@ class ReconstructionErrorExplainer:
         return np.sum(feature_error, axis=1)
 
 
+    def compute_reconstruction_error(
+        self,
+        input_data: np.ndarray,
+        reconstruction: np.ndarray,
+        scaler=None,
+        batch_size: int=4096
+    ) -> np.ndarray:
+        """
+        Computes the total squared reconstruction error per sample, chunk by chunk, without
+        keeping the per-feature errors.
+
+        Args:
+            input_data: The scaled input data, or the unscaled features when scaler is given
+            reconstruction: The (scaled-space) reconstruction of input_data
+            scaler: The model's StandardScaler when input_data is unscaled
+            batch_size: Rows per chunk
+
+        Returns:
+            np.ndarray: The total reconstruction error per sample
+        """
+        if reconstruction.shape != input_data.shape:
+            raise ValueError(f"Reconstruction shape {reconstruction.shape} does not match input shape {input_data.shape}")
+        array_scaler = ArrayScaler.from_standard_scaler(scaler) if scaler is not None else None
+
+        total_error = np.empty(len(input_data), dtype=np.float32)
+        for start in range(0, len(input_data), batch_size):
+            stop = start + batch_size
+            chunk = np.asarray(input_data[start:stop], dtype=np.float32)
+            if array_scaler is not None:
+                chunk = array_scaler.transform(chunk)
+            total_error[start:stop] = self.compute_total_error(self.compute_feature_error(chunk, reconstruction[start:stop]))
+        return total_error
+
+
     def compute_contribution_ratio(self, feature_error: np.ndarray, total_error: np.ndarray) -> np.ndarray:
         """
         Computes the percentage contribution of each feature to the total error.
@@ -167,22 +247,43 @@ class ReconstructionErrorExplainer:
         return np.vstack(group_errors).T
 
 
-    def explain(self, input_data: np.ndarray, model: tf.keras.Model, batch_size: int=4096) -> dict:
+    def explain(
+        self,
+        input_data: np.ndarray,
+        model: "tf.keras.Model | NumpyDenseModel | None",
+        batch_size: int=4096,
+        reconstruction: np.ndarray | None=None,
+        scaler=None
+    ) -> dict:
         """
         Generates a full reconstruction explanation.
 
         Args:
             input_data: The input data
-            model: A trained autoencoder model
+            model: A trained autoencoder model (Keras, or its exported NumpyDenseModel)
             batch_size: Batch size for model predictions
+            reconstruction: The model's reconstruction of input_data, if already computed
+                (e.g. by `autoencoder_forward`); model is then not called
+            scaler: The model's StandardScaler when input_data is unscaled; the input is then
+                scaled chunk by chunk (see `compute_scaled_feature_error`)
 
         Returns:
             dict: A dictionary containing feature error, total error, contribution ratio, and group error
         """
-        input_data = np.asarray(input_data, dtype=np.float32)
-        x_pred = model.predict(input_data, verbose=0, batch_size=batch_size)
+        if scaler is not None:
+            feature_error = self.compute_scaled_feature_error(
+                input_data, scaler, model=model, reconstruction=reconstruction, batch_size=batch_size
+            )
+        else:
+            input_data = np.asarray(input_data, dtype=np.float32)
+            if reconstruction is None:
+                x_pred = model.predict(input_data, verbose=0, batch_size=batch_size)
+            elif reconstruction.shape != input_data.shape:
+                raise ValueError(f"Reconstruction shape {reconstruction.shape} does not match input shape {input_data.shape}")
+            else:
+                x_pred = reconstruction
+            feature_error = self.compute_feature_error(input_data, x_pred)
 
-        feature_error = self.compute_feature_error(input_data, x_pred)
         total_error = self.compute_total_error(feature_error)
         contribution_ratio = self.compute_contribution_ratio(feature_error, total_error)
         group_error = self.compute_group_error(feature_error)
@@ -200,27 +301,31 @@ class ReconstructionErrorExplainer:
     def explain_to_df(
         self,
         input_data: np.ndarray,
-        model: tf.keras.Model,
+        model: "tf.keras.Model | NumpyDenseModel | None",
         metadata: pd.DataFrame | None=None,
         include_feat_err: bool=True,
         include_contributions: bool=True,
-        batch_size: int=4096
+        batch_size: int=4096,
+        reconstruction: np.ndarray | None=None,
+        scaler=None
     ) -> pd.DataFrame:
         """
         Generates a structured Pandas DataFrame containing reconstruction explanations.
 
         Args:
-            input_data: The scaled input data
-            model: A trained autoencoder model
+            input_data: The scaled input data (unscaled when scaler is given)
+            model: A trained autoencoder model (Keras, or its exported NumpyDenseModel)
             metadata: Optional metadata columns
             include_feat_err: Includes raw per-feature reconstruction errors
             include_contributions: Includes per-feature contribution ratios
             batch_size: Batch size for model predictions
+            reconstruction: The model's reconstruction of input_data, if already computed
+            scaler: The model's StandardScaler when input_data is unscaled
 
         Returns:
             pd.DataFrame: A structured DataFrame containing metadata, total error, group-level errors, and optional feature-level details
         """
-        results = self.explain(input_data, model, batch_size=batch_size)
+        results = self.explain(input_data, model, batch_size=batch_size, reconstruction=reconstruction, scaler=scaler)
 
         feature_error = results["feature_error"]
         total_error = results["total_error"]
@@ -198,6 +198,13 @@ IF_BASELINE_PATH = _local_or(
     os.path.join(BASE_DIR, "isolation_forests", f"iforest_model_{V}", "if_baseline_clean.npy"),
 )
 
+# Scoring bundle — memory-mapped scaler / encoder / forest / baseline / thresholds
+# for the live scorer, written by `python -m ueba.pipeline build-bundle`
+SCORING_BUNDLE_DIR = _local_or(
+    "SCORING_BUNDLE_DIR",
+    os.path.join(BASE_DIR, "scoring_bundles", f"scoring_bundle_{V}"),
+)
+
 
 # Explainability Outputs
 RECON_TABLE_PATH = _local_or(
@@ -250,6 +257,10 @@ LIVE_CALIBRATION_THRESHOLD_PATH = _local_or(
     "LIVE_CALIBRATION_THRESHOLD_PATH",
     os.path.join(BASE_DIR, "encoders", f"encoder_model_{LV}", "calibration_thresholds.json"),
 )
+LIVE_SCORING_BUNDLE_DIR = _local_or(
+    "LIVE_SCORING_BUNDLE_DIR",
+    os.path.join(BASE_DIR, "scoring_bundles", f"scoring_bundle_{LV}"),
+)
 LIVE_AE_PATH = _local_or(
     "LIVE_AE_PATH",
     os.path.join(BASE_DIR, "encoders", f"encoder_model_{LV}", "autoencoder_model.keras"),
@@ -304,6 +315,16 @@ TEST_STREAM_PATH = os.path.join(DATASET_DIR, f"ueba_dataset_{V}_test_stream.parq
 USER_WORK_HOURS_PATH = os.path.join(DATASET_DIR, "user_work_hours.parquet")
 DASHBOARD_PARQUET = os.path.join(DATASET_DIR, f"ueba_dataset_{V}_dashboard.parquet")
 PIPELINE_MANIFEST_PATH = os.path.join(DATASET_DIR, "pipeline_manifest.json")
+# Carried state for `preprocess --incremental` (PC-history counts, Layer B rolling tail, watermark)
+INCREMENTAL_STATE_DIR = os.path.join(DATASET_DIR, "incremental_state")
+# Per-channel Layer A checkpoints; a full `preprocess` re-extracts only the changed channels
+CHANNEL_CHECKPOINT_DIR = os.path.join(SAFEPOINT_DIR, "channels")
+# Per-user-shard Layer B outputs of `preprocess --shards N`
+LAYER_B_SHARD_DIR = os.path.join(DATASET_DIR, "layer_b_shards")
+
+# Columnar ingest of the raw CERT logs (day-partitioned Parquet, one dataset per
+# source). Derived from the raw data only, so it is shared across model versions.
+INGEST_DIR = _local_or("INGEST_DIR", os.path.join(BASE_DIR, "processed_datasets", "cert_ingest"))
 
 ALERT_TABLE_DIR = os.path.join(BASE_DIR, "explainability", "alert_table", f"alert_table_{V}")
 CASES_PARQUET = os.path.join(ALERT_TABLE_DIR, f"cases_{V}.parquet")
@@ -315,6 +336,12 @@ RECON_TEST_TABLE_PATH = os.path.join(
     BASE_DIR, "explainability", "reconstruction_error",
     f"reconstruction_error_table_{V}_test.parquet",
 )
+# Latent embeddings of the test stream, keyed by (user, day), written by the same
+# forward pass as the test reconstruction table and scored by build-alerts --split test
+RECON_TEST_EMBEDDINGS_PATH = os.path.join(
+    BASE_DIR, "explainability", "reconstruction_error",
+    f"reconstruction_error_embeddings_{V}_test.parquet",
+)
 TEST_IF_SCORES_PATH = os.path.join(BASE_DIR, "isolation_forests", f"iforest_model_{V}", "test_anomaly_scores.npy")
 
 
@@ -0,0 +1,257 @@
+"""Per-channel Layer A checkpoints.
+
+`build_layer_a` used to recompute all five channel extractors on every run,
+so tuning one channel (e.g. HTTP) cost a full preprocess. With a checkpoint
+directory, each extractor's output (features plus identity frame) is written
+to <checkpoint_dir>/<channel>/ next to a `checkpoint.json` recording a key
+built from everything the output depends on:
+
+- the raw source: the CSV's size, mtime and a hash of its first and last MiB
+  (or the ingest sidecar when only the ingested dataset exists),
+- the per-user work-hour envelopes (`WorkHourIndex.fingerprint`),
+- the extractor parameters (fallback work hours, watermark, distinct mode,
+  whether an identity frame is returned),
+- the code the extraction runs (`extraction_code_hash`): the channel's
+  extractor and every function, class and module-level constant of the
+  package it references, followed transitively (the chunk normalization,
+  URL and domain dictionaries, histograms, identity sets, partial
+  aggregators... it actually calls), plus the helpers `build_layer_a` runs
+  around every extractor.
+
+A re-run reuses every channel whose key is unchanged: editing one extractor
+re-extracts only its channel, editing a helper re-extracts the channels that
+call it, and editing code no extractor reaches (Layer B, rolling windows,
+peer groups...) re-extracts none.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+from collections.abc import Callable, Iterable
+
+import pandas as pd
+
+from ueba.features.ingest import read_ingest_meta
+
+CHECKPOINT_FORMAT_VERSION = 1
+CHECKPOINT_META_FILE = "checkpoint.json"
+
+# Bytes hashed at each end of a source file
+_SAMPLE_BYTES = 1 << 20
+
+
+def source_signature(path: str) -> dict:
+    """
+    Cheap content signature of a raw log: size, mtime and a hash of its first and
+    last MiB. An ingested dataset directory is signed by its ingest sidecar.
+    """
+    if os.path.isdir(path):
+        meta = read_ingest_meta(path) or {}
+        return {key: meta.get(key) for key in ("size", "mtime_ns", "rows", "format_version")}
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(_SAMPLE_BYTES))
+        if stat.st_size > 2 * _SAMPLE_BYTES:
+            f.seek(-_SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read(_SAMPLE_BYTES))
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sample_hash": digest.hexdigest()}
+
+
+def _code_names(code) -> set[str]:
+    """Global and attribute names a code object and its nested code objects load."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def _value_fingerprint(value) -> str:
+    """Deterministic rendering of a referenced constant (no memory addresses)."""
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return repr(value)
+    if isinstance(value, (tuple, list)):
+        return f"{type(value).__name__}({', '.join(map(_value_fingerprint, value))})"
+    if isinstance(value, (set, frozenset)):
+        return f"{type(value).__name__}({', '.join(sorted(map(_value_fingerprint, value)))})"
+    if isinstance(value, dict):
+        items = sorted(f"{_value_fingerprint(k)}: {_value_fingerprint(v)}" for k, v in value.items())
+        return "{" + ", ".join(items) + "}"
+    if callable(value) and hasattr(value, "__qualname__"):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    return type(value).__qualname__
+
+
+def _class_functions(cls: type) -> list[Callable]:
+    """The functions a class body defines (methods, static/class methods, properties)."""
+    functions = []
+    for member in vars(cls).values():
+        if isinstance(member, (staticmethod, classmethod)):
+            member = member.__func__
+        if isinstance(member, property):
+            functions.extend(f for f in (member.fget, member.fset, member.fdel) if f is not None)
+        elif inspect.isfunction(member):
+            functions.append(member)
+    return functions
+
+
+def extraction_code_hash(extractor: Callable, helpers: Iterable[Callable]=()) -> str:
+    """
+    Hash of the code one channel extraction runs: the source of `extractor` and
+    `helpers`, and of every function and class of their package they reference,
+    followed transitively through the global names their code loads, together
+    with the module-level constants (and default argument values) they read.
+    Other packages (numpy, pandas...) are not followed; code the extraction does
+    not reach does not affect the hash.
+
+    Args:
+        extractor: The channel's extractor function
+        helpers: Further entry points run around the extractor (objects passed to
+            it as arguments are not reached through its code)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    package = extractor.__module__.split(".")[0]
+    parts = {}
+    pending = [extractor, *helpers]
+    seen = set()
+
+    def in_package(obj) -> bool:
+        return (getattr(obj, "__module__", None) or "").split(".")[0] == package
+
+    def reference(value, label: str) -> None:
+        if inspect.ismodule(value):
+            return
+        if inspect.isfunction(value) or inspect.isclass(value) or inspect.ismethod(value) \
+                or isinstance(value, functools.partial):
+            pending.append(value)
+        elif not callable(value):
+            parts[label] = _value_fingerprint(value)
+
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, functools.partial):
+            reference(obj.args, f"{_value_fingerprint(obj.func)}.partial_args")
+            reference(obj.keywords, f"{_value_fingerprint(obj.func)}.partial_keywords")
+            obj = obj.func
+        if inspect.ismethod(obj):
+            obj = obj.__func__
+        if id(obj) in seen or not in_package(obj):
+            continue
+        seen.add(id(obj))
+        parts[f"{obj.__module__}.{obj.__qualname__}"] = inspect.getsource(obj)
+
+        if inspect.isclass(obj):
+            pending.extend(base for base in obj.__mro__[1:] if in_package(base))
+            functions = _class_functions(obj)
+        else:
+            functions = [obj]
+            if hasattr(obj, "__wrapped__"):
+                pending.append(obj.__wrapped__)
+        for func in functions:
+            label = f"{func.__module__}.{func.__qualname__}"
+            reference(func.__defaults__, f"{label}.__defaults__")
+            reference(func.__kwdefaults__, f"{label}.__kwdefaults__")
+            names = _code_names(func.__code__)
+            for name in names:
+                if name not in func.__globals__:
+                    continue
+                value = func.__globals__[name]
+                if inspect.ismodule(value) and in_package(value):
+                    # Attributes read off a package module (`hll.merge`...)
+                    for attr in names:
+                        if hasattr(value, attr):
+                            reference(getattr(value, attr), f"{value.__name__}.{attr}")
+                else:
+                    reference(value, f"{func.__module__}.{name}")
+
+    digest = hashlib.sha256()
+    for label in sorted(parts):
+        digest.update(f"{label}\0{parts[label]}\0".encode())
+    return digest.hexdigest()
+
+
+def channel_checkpoint_key(
+    channel: str,
+    source_path: str,
+    extractor: Callable,
+    params: dict,
+    work_hours_fingerprint: str | None,
+    helpers: Iterable[Callable]=(),
+) -> tuple[str, dict]:
+    """
+    Checkpoint key of one channel extraction.
+
+    Args:
+        channel: Channel name (a key of LAYER_A_CHANNELS)
+        source_path: Raw CSV of the channel, or its ingested dataset directory
+        extractor: The channel's extractor function (see `extraction_code_hash`)
+        params: JSON-serializable extractor parameters that affect the output
+        work_hours_fingerprint: `WorkHourIndex.fingerprint()` of the schedules used, or None
+        helpers: Entry points run around every extractor (see `extraction_code_hash`)
+
+    Returns:
+        tuple: (hex key, the keyed components as recorded in checkpoint.json)
+    """
+    components = {
+        "format_version": CHECKPOINT_FORMAT_VERSION,
+        "channel": channel,
+        "source": source_signature(source_path),
+        "work_hours": work_hours_fingerprint,
+        "params": params,
+        "code": extraction_code_hash(extractor, helpers),
+    }
+    key = hashlib.sha256(json.dumps(components, sort_keys=True, default=str).encode()).hexdigest()
+    return key, components
+
+
+def load_channel_checkpoint(checkpoint_dir: str, channel: str, key: str) -> tuple[pd.DataFrame, pd.DataFrame | None] | None:
+    """
+    The checkpointed (features, identity_frame) of a channel; None when there is no
+    checkpoint or it was written under a different key.
+    """
+    channel_dir = os.path.join(checkpoint_dir, channel)
+    meta_path = os.path.join(channel_dir, CHECKPOINT_META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("key") != key:
+        return None
+    features = pd.read_parquet(os.path.join(channel_dir, meta["features"]))
+    identity = pd.read_parquet(os.path.join(channel_dir, meta["identity"])) if meta.get("identity") else None
+    return features, identity
+
+
+def save_channel_checkpoint(
+    checkpoint_dir: str,
+    channel: str,
+    key: str,
+    components: dict,
+    features: pd.DataFrame,
+    identity: pd.DataFrame | None,
+) -> None:
+    """
+    Writes a channel's extraction output under its key. The metadata file is removed
+    first and written last, so an interrupted save leaves no valid checkpoint behind.
+    """
+    channel_dir = os.path.join(checkpoint_dir, channel)
+    os.makedirs(channel_dir, exist_ok=True)
+    meta_path = os.path.join(channel_dir, CHECKPOINT_META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    meta = {"key": key, **components, "features": "features.parquet", "identity": None}
+    features.to_parquet(os.path.join(channel_dir, meta["features"]), index=False)
+    if identity is not None:
+        meta["identity"] = "identity.parquet"
+        identity.to_parquet(os.path.join(channel_dir, meta["identity"]), index=False)
+
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(tmp_path, meta_path)
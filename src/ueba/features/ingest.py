@@ -0,0 +1,416 @@
+"""One-time columnar ingest of the raw CERT activity logs.
+
+Every preprocess run used to re-parse the multi-GB CERT CSVs through pandas
+`read_csv`, which dominates the fixed cost of each feature-engineering
+iteration. `ingest_cert_logs` converts each log once into a day-partitioned
+Parquet dataset under INGEST_DIR/<source>/:
+
+- user / pc / activity are stored as dictionary columns,
+- the event time is stored as int64 nanoseconds since the epoch ("timestamp"),
+- rows are hive-partitioned by calendar day (day=YYYY-MM-DD/),
+- a `_ingest.json` sidecar records the source CSV's size and mtime so a re-run
+  skips sources that have not changed.
+
+Ingest is append-only. The sidecar also records the byte offset up to which
+the CSV was parsed (the end of its last complete line), a hash of the bytes
+before it and the last ingested day. When a CSV has only grown since (a daily
+batch appends its day of events), `append_ingest` parses the bytes after the
+offset and adds their rows as new files in the day partitions, so a re-run
+costs the new events rather than the whole log. A CSV whose ingested prefix
+changed is re-ingested in full.
+
+`iter_ingested_chunks` streams a dataset back as pandas chunks shaped like the
+`load_log_in_chunks` ones, so the chunked extractors in
+ueba.features.preprocessing accept either a CSV path or an ingested directory.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Iterator
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+from ueba.constants import DTYPE_MAP, TIMESTAMP_FORMAT, USECOLS_MAP
+
+INGEST_SOURCES = ("logon", "file", "device", "email", "http")
+INGEST_META_FILE = "_ingest.json"
+INGEST_FORMAT_VERSION = 2
+
+_DAY_PARTITIONING = ds.partitioning(pa.schema([("day", pa.date32())]), flavor="hive")
+
+# Bytes hashed at each end of the ingested CSV prefix
+_PREFIX_SAMPLE_BYTES = 1 << 20
+
+# Resolution pandas assigns to parsed CSV timestamps (ns on pandas 2, us on
+# pandas 3). Ingested timestamps are read back at the same resolution so CSV
+# and Parquet sources yield identical frames.
+_PANDAS_TS_UNIT = np.datetime_data(
+    pd.to_datetime(pd.Series(["01/01/2010 00:00:00"]), format=TIMESTAMP_FORMAT).dtype
+)[0]
+
+
+def ingest_meta_path(ingest_dir: str, source: str) -> str:
+    """Path of the `_ingest.json` sidecar for one ingested source."""
+    return os.path.join(ingest_dir, source, INGEST_META_FILE)
+
+
+def _csv_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _complete_lines_end(csv_path: str) -> int:
+    """Byte offset just past the CSV's last newline (a trailing partial line is left for later)."""
+    with open(csv_path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - (64 << 10))
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def _prefix_hash(csv_path: str, offset: int) -> str:
+    """Hash of the first and last MiB of the CSV's first `offset` bytes."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(csv_path, "rb") as f:
+        digest.update(f.read(min(offset, _PREFIX_SAMPLE_BYTES)))
+        if offset > 2 * _PREFIX_SAMPLE_BYTES:
+            f.seek(offset - _PREFIX_SAMPLE_BYTES)
+            digest.update(f.read(_PREFIX_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def read_ingest_meta(dataset_dir: str) -> dict | None:
+    """The sidecar metadata of an ingested dataset; None when not ingested."""
+    path = os.path.join(dataset_dir, INGEST_META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _meta_matches(meta: dict | None, source: str) -> bool:
+    return (
+        meta is not None
+        and meta.get("format_version") == INGEST_FORMAT_VERSION
+        and meta.get("columns") == USECOLS_MAP[source]
+    )
+
+
+def is_ingest_current(csv_path: str, dataset_dir: str, source: str) -> bool:
+    """
+    Whether `dataset_dir` holds an ingest of `csv_path` that is still valid.
+
+    A dataset is current when its sidecar matches the ingest format version and
+    column set, and the source CSV still has the recorded size and mtime. If the
+    CSV has been removed after ingest, the dataset is trusted as-is.
+    """
+    meta = read_ingest_meta(dataset_dir)
+    if not _meta_matches(meta, source):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    sig = _csv_signature(csv_path)
+    return meta.get("size") == sig["size"] and meta.get("mtime_ns") == sig["mtime_ns"]
+
+
+def is_ingest_appendable(csv_path: str, dataset_dir: str, source: str) -> bool:
+    """
+    Whether `csv_path` has only grown since `dataset_dir` was ingested: the CSV is at
+    least as long as the recorded offset and the bytes before it still hash the same,
+    so `append_ingest` can add the rest.
+    """
+    meta = read_ingest_meta(dataset_dir)
+    if not _meta_matches(meta, source) or not os.path.exists(csv_path):
+        return False
+    offset = meta["offset"]
+    return os.path.getsize(csv_path) >= offset and _prefix_hash(csv_path, offset) == meta["prefix_hash"]
+
+
+def _convert_batch(batch: pa.RecordBatch, usecols: list) -> pa.Table:
+    """Raw CSV string batch -> typed, day-keyed table (invalid timestamps dropped)."""
+    ts = pc.strptime(batch.column("date"), format=TIMESTAMP_FORMAT, unit="s", error_is_null=True)
+    valid = pc.is_valid(ts)
+    columns = {"timestamp": pc.cast(pc.cast(ts, pa.timestamp("ns")), pa.int64())}
+    for col in usecols:
+        if col == "date":
+            continue
+        arr = batch.column(col)
+        columns[col] = pc.dictionary_encode(arr) if col in DTYPE_MAP else arr
+    columns["day"] = pc.cast(ts, pa.date32())
+    return pa.table(columns).filter(valid)
+
+
+def _write_day_partitions(
+    csv_path: str,
+    start: int,
+    end: int,
+    out_dir: str,
+    source: str,
+    header: list | None,
+    block_size: int,
+) -> tuple[int, set]:
+    """
+    Parses bytes [start, end) of a CERT CSV into day partitions under `out_dir`.
+
+    The range is read through a memory map, so only the requested bytes are parsed.
+    `header` names the columns of a range that starts past the CSV's header line.
+    Files are named by `start`, so an appended range adds files next to the
+    existing ones instead of replacing them.
+
+    Returns:
+        tuple: (rows written, set of their days)
+    """
+    usecols = USECOLS_MAP[source]
+    with pa.memory_map(csv_path) as source_file:
+        source_file.seek(start)
+        reader = pacsv.open_csv(
+            pa.BufferReader(source_file.read_buffer(end - start)),
+            read_options=pacsv.ReadOptions(block_size=block_size, column_names=header),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=usecols,
+                column_types={col: pa.string() for col in usecols},
+                strings_can_be_null=True,
+            ),
+        )
+
+        n_rows = 0
+        days = set()
+
+        def _batches():
+            nonlocal n_rows
+            for batch in reader:
+                table = _convert_batch(batch, usecols)
+                n_rows += table.num_rows
+                days.update(pc.unique(table.column("day")).to_pylist())
+                yield from table.to_batches()
+
+        schema = pa.schema(
+            [("timestamp", pa.int64())]
+            + [
+                (col, pa.dictionary(pa.int32(), pa.string()) if col in DTYPE_MAP else pa.string())
+                for col in usecols if col != "date"
+            ]
+            + [("day", pa.date32())]
+        )
+        ds.write_dataset(
+            _batches(),
+            out_dir,
+            schema=schema,
+            format="parquet",
+            partitioning=_DAY_PARTITIONING,
+            basename_template=f"part-{start:016d}-{{i}}.parquet",
+            max_rows_per_group=1 << 20,
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    return n_rows, days
+
+
+def _write_ingest_meta(dataset_dir: str, csv_path: str, source: str, header: list, offset: int, rows: int) -> dict:
+    """Writes the `_ingest.json` sidecar of a dataset whose CSV is ingested up to `offset`."""
+    days = sorted(name[len("day="):] for name in os.listdir(dataset_dir) if name.startswith("day="))
+    meta = {
+        "source": source,
+        "csv": os.path.abspath(csv_path),
+        **_csv_signature(csv_path),
+        "columns": USECOLS_MAP[source],
+        "header": header,
+        "offset": offset,
+        "prefix_hash": _prefix_hash(csv_path, offset),
+        "rows": rows,
+        "days": len(days),
+        "last_day": days[-1] if days else None,
+        "format_version": INGEST_FORMAT_VERSION,
+        "ingested_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    tmp_path = os.path.join(dataset_dir, INGEST_META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(dataset_dir, INGEST_META_FILE))
+    return meta
+
+
+def ingest_log(csv_path: str, dataset_dir: str, source: str, block_size: int=64 << 20) -> dict:
+    """
+    Converts one CERT CSV into a day-partitioned Parquet dataset.
+
+    The CSV is streamed in `block_size` byte blocks, so memory stays bounded by a
+    few blocks regardless of file size. The dataset is written to a temporary
+    sibling directory and swapped in only once complete. A trailing line without
+    its newline (an event still being written) is left for the next append.
+
+    Args:
+        csv_path: Absolute path to the raw CERT CSV
+        dataset_dir: Output dataset directory (replaced if it exists)
+        source: CERT source name (a key of USECOLS_MAP)
+        block_size: CSV read block size in bytes
+
+    Returns:
+        dict: The sidecar metadata written to `_ingest.json`
+    """
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        header = next(csv.reader([f.readline()]), [])
+
+    tmp_dir = dataset_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    end = _complete_lines_end(csv_path)
+    n_rows, _ = _write_day_partitions(csv_path, 0, end, tmp_dir, source, None, block_size)
+    meta = _write_ingest_meta(tmp_dir, csv_path, source, header, end, n_rows)
+
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    os.replace(tmp_dir, dataset_dir)
+    return meta
+
+
+def append_ingest(csv_path: str, dataset_dir: str, source: str, block_size: int=64 << 20) -> dict:
+    """
+    Adds the events appended to a CERT CSV since its last ingest (see `is_ingest_appendable`).
+
+    Only the bytes after the recorded offset are parsed. Their rows are written as
+    new files in their day partitions: new days get new partitions, and events of
+    an already ingested day (the rest of a partial last day) join its partition.
+    The sidecar is removed first and written last, so an interrupted append leaves
+    no valid ingest behind and the next run re-ingests the CSV in full.
+
+    Args:
+        csv_path: Absolute path to the raw CERT CSV
+        dataset_dir: The source's ingested dataset directory
+        source: CERT source name (a key of USECOLS_MAP)
+        block_size: CSV read block size in bytes
+
+    Returns:
+        dict: The sidecar metadata written to `_ingest.json`, with "appended_rows"
+            and "appended_days" (the days the new rows fall on)
+    """
+    meta = read_ingest_meta(dataset_dir)
+    os.remove(os.path.join(dataset_dir, INGEST_META_FILE))
+    end = _complete_lines_end(csv_path)
+    n_rows, days = 0, set()
+    if end > meta["offset"]:
+        n_rows, days = _write_day_partitions(
+            csv_path, meta["offset"], end, dataset_dir, source, meta["header"], block_size,
+        )
+    new_meta = _write_ingest_meta(dataset_dir, csv_path, source, meta["header"], end, meta["rows"] + n_rows)
+    return {**new_meta, "appended_rows": n_rows, "appended_days": len(days)}
+
+
+def ingest_cert_logs(
+    cert_path: str,
+    ingest_dir: str,
+    sources: tuple=INGEST_SOURCES,
+    force: bool=False,
+) -> dict[str, str]:
+    """
+    Ingests the CERT activity logs into per-source Parquet datasets under `ingest_dir`.
+
+    Unchanged sources are skipped and sources whose CSV has only grown get the
+    new events appended (`append_ingest`); the others are ingested in full.
+
+    Args:
+        cert_path: The base path containing the CERT dataset
+        ingest_dir: Root directory for the ingested datasets
+        sources: CERT sources to ingest
+        force: Re-ingest every source in full, even when its dataset is current
+
+    Returns:
+        dict: {source: dataset_dir}
+    """
+    os.makedirs(ingest_dir, exist_ok=True)
+    datasets = {}
+    for source in sources:
+        csv_path = os.path.join(cert_path, f"{source}.csv")
+        dataset_dir = os.path.join(ingest_dir, source)
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Missing required CERT file: {csv_path}")
+        if not force and is_ingest_current(csv_path, dataset_dir, source):
+            print(f"  {source}.csv: up to date, skipped")
+        elif not force and is_ingest_appendable(csv_path, dataset_dir, source):
+            meta = append_ingest(csv_path, dataset_dir, source)
+            print(f"  {source}.csv: appended {meta['appended_rows']:,} rows across {meta['appended_days']} day(s)")
+        else:
+            print(f"  Ingesting {source}.csv...")
+            meta = ingest_log(csv_path, dataset_dir, source)
+            print(f"    {meta['rows']:,} rows across {meta['days']} day partitions")
+        datasets[source] = dataset_dir
+    return datasets
+
+
+def _table_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Ingested table -> pandas, casting the int64 timestamp back to datetime."""
+    idx = table.schema.get_field_index("timestamp")
+    ts = table.column(idx).cast(pa.timestamp("ns")).cast(pa.timestamp(_PANDAS_TS_UNIT))
+    df = table.set_column(idx, "timestamp", ts).to_pandas()
+    # Dictionary order follows first appearance; read_csv sorts its categories and
+    # downstream sorts on user/pc follow category order, so match it here.
+    for col in DTYPE_MAP:
+        if col in df.columns:
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
+
+
+def _day_filter(after_day: pd.Timestamp | None) -> ds.Expression | None:
+    """Partition filter keeping only days after the watermark (None = everything)."""
+    if after_day is None:
+        return None
+    return ds.field("day") > pa.scalar(pd.Timestamp(after_day).date(), type=pa.date32())
+
+
+def iter_ingested_chunks(
+    dataset_dir: str,
+    usecols: list,
+    chunksize: int=50_000,
+    after_day: pd.Timestamp | None=None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams an ingested dataset as pandas chunks of at least `chunksize` rows (the
+    last chunk may be smaller). A dataset with no matching rows yields a single
+    empty chunk, so consumers always see the column layout.
+
+    Chunks carry a datetime "timestamp" column in place of the raw "date" string
+    and categorical user/pc/activity columns, so they feed
+    `normalize_shared_columns` exactly like `load_log_in_chunks` output.
+
+    Args:
+        dataset_dir: An ingested dataset directory
+        usecols: The raw CSV columns to load (see USECOLS_MAP)
+        chunksize: Minimum number of rows per yielded chunk
+        after_day: Optional watermark; day partitions up to and including it are skipped
+
+    Returns:
+        Iterator[pd.DataFrame]: One DataFrame per chunk
+    """
+    columns = ["timestamp" if col == "date" else col for col in usecols]
+    dataset = ds.dataset(dataset_dir, format="parquet", partitioning=_DAY_PARTITIONING)
+
+    pending, n_pending, yielded = [], 0, False
+    for batch in dataset.to_batches(columns=columns, filter=_day_filter(after_day), batch_size=chunksize):
+        if batch.num_rows == 0:
+            continue
+        pending.append(batch)
+        n_pending += batch.num_rows
+        if n_pending >= chunksize:
+            yield _table_to_pandas(pa.Table.from_batches(pending))
+            pending, n_pending, yielded = [], 0, True
+    if pending or not yielded:
+        yield _table_to_pandas(pa.Table.from_batches(pending, schema=pa.schema([dataset.schema.field(col) for col in columns])))
+
+
+def read_ingested(dataset_dir: str, usecols: list, after_day: pd.Timestamp | None=None) -> pd.DataFrame:
+    """Loads a whole ingested dataset (used for the small logon/device sources)."""
+    columns = ["timestamp" if col == "date" else col for col in usecols]
+    dataset = ds.dataset(dataset_dir, format="parquet", partitioning=_DAY_PARTITIONING)
+    return _table_to_pandas(dataset.to_table(columns=columns, filter=_day_filter(after_day)))
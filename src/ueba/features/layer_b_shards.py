@@ -0,0 +1,262 @@
+"""User-sharded, out-of-core Layer B construction.
+
+`build_layer_b` holds the whole (user, day) matrix together with its
+full-width intermediates (multi-horizon sums, 30 / 90-day z-scores, rolling
+deltas) at once. Every one of those stages is per-user, so
+`build_layer_b_sharded` partitions Layer A and the identity frames by a
+stable hash of the user into N Parquet shards and runs
+`collapse_layer` -> `_add_multihorizon_features` -> `apply_ueba_enhancements`
+-> peer z-scores -> `join_user_profiles` one shard at a time, optionally in a
+process pool. Each shard writes its own layer_b.parquet.
+
+The peer-group z-scores are the only cross-user stage. Their cohort sums are
+gathered in a pre-pass: the collapse step of every shard returns its
+per-(peer_group, day) totals (`peer_cohort_totals`), which are small. Their
+sum is passed to each shard's `apply_peer_group_enhancements`. Peak memory of
+these stages therefore follows the shard size rather than the user population.
+
+`partition_layer_a` and `build_partitioned_layer_b` are the two halves of
+`build_layer_b_sharded`, so a caller can release Layer A in between. The
+preprocess stage then keeps the shards on disk: it writes the Layer B dataset,
+the chronological splits and the rolling state from `iter_layer_b_shards`, one
+shard at a time.
+
+The shards concatenated by `read_layer_b_shards` match `build_layer_b` on the
+same input, up to float summation order in the peer-group cohort sums.
+"""
+
+import os
+import shutil
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ueba.features.preprocessing import (
+    _add_multihorizon_features,
+    apply_peer_group_enhancements,
+    apply_ueba_enhancements,
+    collapse_layer,
+    get_layer_b_features,
+    join_user_profiles,
+    peer_cohort_totals,
+)
+from ueba.features.schema import enforce_schema
+
+LAYER_A_SHARD_FILE = "layer_a.parquet"
+COLLAPSED_SHARD_FILE = "collapsed.parquet"
+LAYER_B_SHARD_FILE = "layer_b.parquet"
+
+
+def user_shard_ids(users: pd.Series, n_shards: int) -> np.ndarray:
+    """
+    Shard of each row's user: a fixed-key 64-bit hash of the user id modulo n_shards.
+    The hash is the same for string and categorical columns and across runs.
+    """
+    hashes = pd.util.hash_pandas_object(users, index=False).to_numpy(np.uint64)
+    return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+
+def _write_partitions(df: pd.DataFrame, n_shards: int, shard_dirs: list, filename: str) -> np.ndarray:
+    """Writes the rows of each user shard to shard_dirs[shard]/filename; returns the per-shard row counts."""
+    shard_ids = user_shard_ids(df["user"], n_shards)
+    order = np.argsort(shard_ids, kind="stable")
+    bounds = np.searchsorted(shard_ids[order], np.arange(n_shards + 1))
+    for shard in range(n_shards):
+        rows = order[bounds[shard]:bounds[shard + 1]]
+        df.iloc[rows].reset_index(drop=True).to_parquet(os.path.join(shard_dirs[shard], filename), index=False)
+    return np.diff(bounds)
+
+
+def _collapse_shard(
+    shard_dir: str,
+    nunique_value_cols: dict,
+    ldap_df: pd.DataFrame | None,
+    peer_col: str,
+) -> tuple[list, pd.DataFrame | None]:
+    """
+    Collapses one shard's Layer A rows to (user, day) and writes them to collapsed.parquet.
+
+    Returns:
+        tuple: (Layer B base feature columns, the shard's peer cohort totals or None without LDAP)
+    """
+    nunique_frames = {
+        col: (pd.read_parquet(os.path.join(shard_dir, f"nunique_{col}.parquet")), value_col)
+        for col, value_col in nunique_value_cols.items()
+    }
+    collapsed = collapse_layer(pd.read_parquet(os.path.join(shard_dir, LAYER_A_SHARD_FILE)), nunique_frames=nunique_frames)
+    collapsed.to_parquet(os.path.join(shard_dir, COLLAPSED_SHARD_FILE), index=False)
+    feature_cols = get_layer_b_features(collapsed)
+    totals = peer_cohort_totals(collapsed, feature_cols, ldap_df, peer_col) if ldap_df is not None else None
+    return feature_cols, totals
+
+
+def _enhance_shard(
+    shard_dir: str,
+    feature_cols: list,
+    rolling_window: int,
+    ldap_df: pd.DataFrame | None,
+    peer_col: str,
+    cohort_totals: pd.DataFrame | None,
+) -> str:
+    """Runs the per-user Layer B stages on one collapsed shard; returns its layer_b.parquet path."""
+    layer_b_df = pd.read_parquet(os.path.join(shard_dir, COLLAPSED_SHARD_FILE))
+    layer_b_df = _add_multihorizon_features(layer_b_df, feature_cols)
+    layer_b_df = apply_ueba_enhancements(layer_b_df, feature_cols=feature_cols, rolling_window=rolling_window)
+    if ldap_df is not None:
+        layer_b_df = apply_peer_group_enhancements(
+            layer_b_df, feature_cols=feature_cols, ldap_df=ldap_df, peer_col=peer_col, cohort_totals=cohort_totals,
+        )
+        layer_b_df = join_user_profiles(layer_b_df, ldap_df)
+    layer_b_df = enforce_schema(layer_b_df)
+    path = os.path.join(shard_dir, LAYER_B_SHARD_FILE)
+    layer_b_df.to_parquet(path, index=False)
+    os.remove(os.path.join(shard_dir, COLLAPSED_SHARD_FILE))
+    return path
+
+
+def _map_shards(func, shard_args: list, workers: int) -> list:
+    """Runs func over the per-shard argument tuples, in a process pool when workers > 1."""
+    if workers > 1 and len(shard_args) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shard_args))) as pool:
+            return list(pool.map(func, *zip(*shard_args)))
+    return [func(*args) for args in shard_args]
+
+
+def partition_layer_a(
+    layer_a_df: pd.DataFrame,
+    shard_dir: str,
+    n_shards: int,
+    nunique_frames: dict[str, tuple[pd.DataFrame, str]] | None = None,
+) -> tuple[list[str], dict]:
+    """
+    Writes Layer A and the identity frames to N user-hash shards, so the caller can
+    release the in-memory frames before the per-shard Layer B stages run.
+
+    Args:
+        layer_a_df: The behavioral matrix produced in layer A
+        shard_dir: Directory for the shards; its previous contents are replaced
+        n_shards: Number of user-hash shards
+        nunique_frames: Identity frames passed through to collapse_layer(), sharded alongside Layer A
+
+    Returns:
+        tuple: (directories of the non-empty shards, {nunique_frames key: identity value column})
+
+    Raises:
+        ValueError: If n_shards is smaller than 1
+    """
+    if n_shards < 1:
+        raise ValueError(f"n_shards must be >= 1, got {n_shards}")
+    if os.path.isdir(shard_dir):
+        shutil.rmtree(shard_dir)
+    shard_dirs = [os.path.join(shard_dir, f"shard={shard:04d}") for shard in range(n_shards)]
+    for path in shard_dirs:
+        os.makedirs(path)
+
+    print(f"Partitioning Layer A into {n_shards} user shards...")
+    shard_rows = _write_partitions(layer_a_df, n_shards, shard_dirs, LAYER_A_SHARD_FILE)
+    nunique_value_cols = {}
+    for col, (source_df, value_col) in (nunique_frames or {}).items():
+        _write_partitions(source_df, n_shards, shard_dirs, f"nunique_{col}.parquet")
+        nunique_value_cols[col] = value_col
+    return [path for path, rows in zip(shard_dirs, shard_rows) if rows > 0], nunique_value_cols
+
+
+def build_partitioned_layer_b(
+    shard_dirs: list[str],
+    nunique_value_cols: dict,
+    rolling_window: int = 5,
+    ldap_df: pd.DataFrame | None = None,
+    peer_col: str = "role",
+    workers: int = 1,
+) -> list[str]:
+    """
+    Builds the Layer B of every shard written by `partition_layer_a`.
+
+    Args:
+        shard_dirs: Shard directories returned by `partition_layer_a`
+        nunique_value_cols: Identity value columns returned by `partition_layer_a`
+        rolling_window: The window size in days to compute the rolling delta
+        ldap_df: Optional LDAP metadata from load_ldap() for the peer-group z-scores and profiles
+        peer_col: Peer-group column in ldap_df to use (default "role")
+        workers: Worker processes running the shards (1 = serial, in-process)
+
+    Returns:
+        list[str]: Paths of the per-shard layer_b.parquet files
+    """
+    print(f"Collapsing {len(shard_dirs)} shards to (user, day) granularity...")
+    collapsed = _map_shards(_collapse_shard, [(path, nunique_value_cols, ldap_df, peer_col) for path in shard_dirs], workers)
+    feature_cols = collapsed[0][0] if collapsed else []
+    cohort_totals = None
+    if ldap_df is not None and collapsed:
+        # Pre-pass result: cross-user (peer_group, day) sums for the peer z-scores
+        cohort_totals = pd.concat([totals for _, totals in collapsed]).groupby(level=[0, 1], sort=False).sum()
+
+    print("Applying per-user Layer B stages shard by shard...")
+    paths = _map_shards(
+        _enhance_shard,
+        [(path, feature_cols, rolling_window, ldap_df, peer_col, cohort_totals) for path in shard_dirs],
+        workers,
+    )
+    print(f"Layer B shards complete — {len(paths)} shards.")
+    return paths
+
+
+def build_layer_b_sharded(
+    layer_a_df: pd.DataFrame,
+    shard_dir: str,
+    n_shards: int,
+    rolling_window: int = 5,
+    nunique_frames: dict[str, tuple[pd.DataFrame, str]] | None = None,
+    ldap_df: pd.DataFrame | None = None,
+    peer_col: str = "role",
+    workers: int = 1,
+) -> list[str]:
+    """
+    Builds Layer B shard by shard (see the module docstring); same inputs as `build_layer_b`.
+
+    Args:
+        layer_a_df: The behavioral matrix produced in layer A
+        shard_dir: Directory for the shards; its previous contents are replaced
+        n_shards: Number of user-hash shards
+        rolling_window: The window size in days to compute the rolling delta
+        nunique_frames: Identity frames passed through to collapse_layer(), sharded alongside Layer A
+        ldap_df: Optional LDAP metadata from load_ldap() for the peer-group z-scores and profiles
+        peer_col: Peer-group column in ldap_df to use (default "role")
+        workers: Worker processes running the shards (1 = serial, in-process)
+
+    Returns:
+        list[str]: Paths of the per-shard layer_b.parquet files (empty shards are skipped)
+    """
+    shard_dirs, nunique_value_cols = partition_layer_a(layer_a_df, shard_dir, n_shards, nunique_frames)
+    return build_partitioned_layer_b(shard_dirs, nunique_value_cols, rolling_window, ldap_df, peer_col, workers)
+
+
+def iter_layer_b_shards(paths: list[str], columns: list | None = None) -> Iterator[pd.DataFrame]:
+    """
+    Reads Layer B shards back one at a time.
+
+    Args:
+        paths: Paths of the per-shard layer_b.parquet files
+        columns: Optional subset of columns to read
+
+    Yields:
+        pd.DataFrame: The rows of one shard, in (user, day) order
+    """
+    for path in paths:
+        yield pd.read_parquet(path, columns=columns)
+
+
+def read_layer_b_shards(paths: list[str]) -> pd.DataFrame:
+    """
+    Concatenates Layer B shards into one frame in `build_layer_b` row order (user, day),
+    with the user column categorical again when the shards stored it so. Holds the
+    whole Layer B; the preprocess stage streams the shards with `iter_layer_b_shards`.
+    """
+    shards = list(iter_layer_b_shards(paths))
+    categorical = any(isinstance(shard["user"].dtype, pd.CategoricalDtype) for shard in shards)
+    layer_b_df = pd.concat(shards, ignore_index=True)
+    if categorical:
+        layer_b_df["user"] = layer_b_df["user"].astype(str).astype("category")
+    return layer_b_df.sort_values(["user", "day"]).reset_index(drop=True)
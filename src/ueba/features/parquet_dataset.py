@@ -0,0 +1,237 @@
+"""Parquet datasets stored as a directory of part files.
+
+Layer A, Layer B and the test stream used to be single Parquet files, so
+`preprocess --incremental` read each whole file, appended the new rows and
+rewrote it: O(history) I/O for every new day. A dataset directory instead
+holds one `part-*.parquet` file per write. `pd.read_parquet` and pyarrow read
+the directory as one table, and an incremental run only adds a file.
+
+Every part is written with the same Arrow types for the same columns:
+categorical columns are stored as dictionary<int32, string> whatever their
+category count (pandas picks int8 / int16 codes by cardinality and pyarrow
+refuses to read parts whose dictionary index widths differ), and an appended
+part is cast to the schema of the parts already on disk. A part is written
+under a temporary name and renamed into place, so a crashed run never leaves
+a half-written part behind.
+"""
+
+import os
+import shutil
+from collections.abc import Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PART_PREFIX = "part-"
+PART_SUFFIX = ".parquet"
+
+
+def dataset_parts(path: str) -> list[str]:
+    """
+    The part files of a dataset, in name order.
+
+    Args:
+        path: A dataset directory, or a single Parquet file (a dataset of one part)
+
+    Returns:
+        list[str]: Paths of the part files (empty when path does not exist)
+    """
+    if os.path.isfile(path):
+        return [path]
+    if not os.path.isdir(path):
+        return []
+    return [
+        os.path.join(path, name)
+        for name in sorted(os.listdir(path))
+        if name.startswith(PART_PREFIX) and name.endswith(PART_SUFFIX)
+    ]
+
+
+def _to_arrow(df: pd.DataFrame, schema: pa.Schema | None=None) -> pa.Table:
+    """A frame as an Arrow table with int32 dictionary indices, cast to schema when given."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is None:
+        fields = [
+            field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            if pa.types.is_dictionary(field.type) else field
+            for field in table.schema
+        ]
+        return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+    if set(table.column_names) != set(schema.names):
+        raise ValueError(
+            "Rows do not have the dataset's columns: "
+            f"{sorted(set(table.column_names).symmetric_difference(schema.names))}"
+        )
+    return table.select(schema.names).cast(schema)
+
+
+def _write_part(table: pa.Table, path: str) -> str:
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class DatasetWriter:
+    """
+    Writes a dataset directory one part at a time, replacing whatever is at path on `close`.
+
+    Parts go to a sibling temporary directory, which is renamed into place only
+    once every part is written. Every part is cast to the Arrow schema of the
+    first one, so several datasets can be filled side by side from one pass over
+    their source rows.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the writer.
+
+        Args:
+            path: Destination dataset directory
+
+        Returns:
+            None:
+        """
+        self.path = path
+        self.tmp_dir = path + ".tmp"
+        self.schema = None
+        self.names: list[str] = []
+        self.rows = 0
+        self._empty = None
+        _remove(self.tmp_dir)
+        os.makedirs(self.tmp_dir)
+
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Adds the rows of df as the next part (an empty frame adds nothing)."""
+        if df.empty:
+            self._empty = df if self._empty is None else self._empty
+            return
+        table = _to_arrow(df, self.schema)
+        self.schema = table.schema
+        name = f"{PART_PREFIX}{len(self.names):05d}{PART_SUFFIX}"
+        _write_part(table, os.path.join(self.tmp_dir, name))
+        self.names.append(name)
+        self.rows += len(df)
+
+
+    def close(self) -> list[str]:
+        """Moves the dataset into place; returns the paths of its parts."""
+        if not self.names and self._empty is not None:
+            # No rows at all: one empty part keeps the columns readable
+            name = f"{PART_PREFIX}00000{PART_SUFFIX}"
+            _write_part(_to_arrow(self._empty), os.path.join(self.tmp_dir, name))
+            self.names.append(name)
+        _remove(self.path)
+        os.replace(self.tmp_dir, self.path)
+        return [os.path.join(self.path, name) for name in self.names]
+
+
+def write_dataset(path: str, frames: Iterable[pd.DataFrame]) -> list[str]:
+    """
+    Writes a dataset directory with one part per frame, replacing whatever is at path.
+
+    Frames are consumed one at a time, so a caller can stream shards from disk
+    without holding the whole dataset. Every part is cast to the Arrow schema of
+    the first one.
+
+    Args:
+        path: Destination dataset directory
+        frames: The parts' rows (empty frames are skipped unless every frame is empty)
+
+    Returns:
+        list[str]: Paths of the written parts
+    """
+    writer = DatasetWriter(path)
+    for df in frames:
+        writer.write(df)
+    return writer.close()
+
+
+def append_part(path: str, df: pd.DataFrame, name: str) -> str:
+    """
+    Adds rows to a dataset as a new part, cast to the schema of its existing parts.
+
+    A single-file dataset (the layout before dataset directories) is first moved
+    into a directory as its first part. Writing the same name again replaces the
+    part, so a retried append does not duplicate rows.
+
+    Args:
+        path: The dataset directory
+        df: Rows to add
+        name: Part name (without prefix and suffix), unique within the dataset
+
+    Returns:
+        str: Path of the written part
+
+    Raises:
+        ValueError: If the rows do not have the dataset's columns
+    """
+    if os.path.isfile(path):
+        tmp_dir = path + ".tmp"
+        _remove(tmp_dir)
+        os.makedirs(tmp_dir)
+        os.replace(path, os.path.join(tmp_dir, f"{PART_PREFIX}00000{PART_SUFFIX}"))
+        os.replace(tmp_dir, path)
+    os.makedirs(path, exist_ok=True)
+    part_path = os.path.join(path, f"{PART_PREFIX}{name}{PART_SUFFIX}")
+    existing = [part for part in dataset_parts(path) if part != part_path]
+    schema = pq.read_schema(existing[0]) if existing else None
+    return _write_part(_to_arrow(df, schema), part_path)
+
+
+def _part_day_range(part: str, day_col: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    """(min, max) of a part's day column from its row-group statistics; None for an empty part."""
+    metadata = pq.ParquetFile(part).metadata
+    col = metadata.schema.names.index(day_col)
+    lows, highs = [], []
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(col).statistics
+        if stats is None or not stats.has_min_max:
+            days = pd.read_parquet(part, columns=[day_col])[day_col]
+            return (days.min(), days.max()) if len(days) else None
+        lows.append(pd.Timestamp(stats.min))
+        highs.append(pd.Timestamp(stats.max))
+    return (min(lows), max(highs)) if lows else None
+
+
+def drop_rows_after(path: str, day: pd.Timestamp, day_col: str="day") -> int:
+    """
+    Removes the rows dated after `day` from a dataset, e.g. the parts an
+    interrupted incremental run appended before it could save its watermark.
+
+    Parts entirely after `day` are deleted, parts straddling it are rewritten
+    without the later rows, and the other parts are left untouched (their row-group
+    statistics are enough to tell).
+
+    Args:
+        path: The dataset directory (or single Parquet file)
+        day: Last day to keep
+        day_col: Name of the day column
+
+    Returns:
+        int: Number of parts deleted or rewritten
+    """
+    day = pd.Timestamp(day)
+    changed = 0
+    for part in dataset_parts(path):
+        day_range = _part_day_range(part, day_col)
+        if day_range is None or day_range[1] <= day:
+            continue
+        if day_range[0] > day and part != path:
+            os.remove(part)
+        else:
+            table = pq.read_table(part)
+            kept = table.to_pandas()
+            kept = kept[kept[day_col] <= day]
+            _write_part(_to_arrow(kept, table.schema), part)
+        changed += 1
+    return changed
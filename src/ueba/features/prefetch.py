@@ -0,0 +1,133 @@
+"""Bounded background prefetch for the chunked log extractors.
+
+The chunked extractors used to alternate strictly between decoding a chunk
+(CSV / Parquet parsing plus `normalize_shared_columns`) and aggregating it, so
+the parser sat idle during every groupby and vice versa. `prefetch_chunks`
+moves decoding to a reader thread that fills a small buffer while the caller
+aggregates the previous chunk. CSV tokenizing, Arrow decoding and most numpy
+kernels release the GIL, so the two stages overlap.
+
+The buffer is bounded twice: by a number of chunks (`depth`) and optionally by
+the in-memory size of the buffered chunks (`max_bytes`), so prefetching never
+holds more than a fixed amount of decoded data beyond the chunk being
+aggregated. A chunk larger than the whole budget is still admitted when the
+buffer is empty, so an undersized budget degrades to depth 1 instead of
+stalling.
+"""
+
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+
+import pandas as pd
+
+DEFAULT_PREFETCH_DEPTH = 2
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """In-memory size of a DataFrame, including the index and string payloads."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class _ChunkBuffer:
+    """FIFO of decoded chunks shared by the reader thread and the consumer."""
+
+    _DONE = object()
+
+    def __init__(self, depth: int, max_bytes: int | None):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.items = deque()
+        self.nbytes = 0
+        self.closed = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def _has_room(self, size: int) -> bool:
+        if not self.items:
+            return True
+        if len(self.items) >= self.depth:
+            return False
+        return self.max_bytes is None or self.nbytes + size <= self.max_bytes
+
+    def fill(self, chunks: Iterable, prepare: Callable | None) -> None:
+        """Reader thread body: decodes chunks until exhausted, failed or closed."""
+        try:
+            for chunk in chunks:
+                if prepare is not None:
+                    chunk = prepare(chunk)
+                size = frame_nbytes(chunk) if self.max_bytes is not None else 0
+                with self.cond:
+                    self.cond.wait_for(lambda: self.closed or self._has_room(size))
+                    if self.closed:
+                        return
+                    self.items.append((chunk, size))
+                    self.nbytes += size
+                    self.cond.notify_all()
+                del chunk
+        except BaseException as exc:
+            self.error = exc
+        with self.cond:
+            self.items.append((self._DONE, 0))
+            self.cond.notify_all()
+
+    def get(self):
+        with self.cond:
+            self.cond.wait_for(lambda: self.items)
+            chunk, size = self.items.popleft()
+            self.nbytes -= size
+            self.cond.notify_all()
+        if chunk is self._DONE and self.error is not None:
+            raise self.error
+        return chunk
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.items.clear()
+            self.nbytes = 0
+            self.cond.notify_all()
+
+
+def prefetch_chunks(
+    chunks: Iterable,
+    depth: int=DEFAULT_PREFETCH_DEPTH,
+    max_bytes: int | None=None,
+    prepare: Callable[[pd.DataFrame], pd.DataFrame] | None=None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Iterates `chunks` with decoding running ahead in a background reader thread.
+
+    Chunks are yielded in their original order. Errors raised while reading or
+    preparing a chunk are re-raised in the consumer at the position of that chunk.
+
+    Args:
+        chunks: Iterable of DataFrames (e.g. `iter_log_chunks`); it is consumed by the reader thread
+        depth: Maximum number of decoded chunks buffered ahead of the consumer. 0 disables
+            prefetching and runs `prepare` inline.
+        max_bytes: Optional cap on the total in-memory size of the buffered chunks
+        prepare: Optional per-chunk transform run in the reader thread (e.g. normalization)
+
+    Returns:
+        Iterator[pd.DataFrame]: The (prepared) chunks
+    """
+    if depth < 0:
+        raise ValueError(f"prefetch depth must be >= 0, got {depth}")
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError(f"prefetch max_bytes must be positive, got {max_bytes}")
+
+    if depth == 0:
+        for chunk in chunks:
+            yield prepare(chunk) if prepare is not None else chunk
+        return
+
+    buffer = _ChunkBuffer(depth, max_bytes)
+    reader = threading.Thread(target=buffer.fill, args=(chunks, prepare), name="chunk-prefetch", daemon=True)
+    reader.start()
+    try:
+        while (chunk := buffer.get()) is not _ChunkBuffer._DONE:
+            yield chunk
+            del chunk
+    finally:
+        buffer.close()
+        reader.join()
@@ -1,10 +1,18 @@
 import gc
 import json
 import os
+import shutil
+import tempfile
+import weakref
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from urllib.parse import urlparse
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 # -------------------------------------------------------------
 # Layer A
@@ -24,10 +32,22 @@ from ueba.constants import (  # noqa: F401
     USECOLS_MAP,
     WORK_HOURS,
 )
+from ueba.features.checkpoint import channel_checkpoint_key, load_channel_checkpoint, save_channel_checkpoint
+from ueba.features.hll import (
+    DEFAULT_HLL_PRECISION,
+    HLL_ESTIMATE_SUFFIX,
+    hll_estimate,
+    hll_register_updates,
+)
+from ueba.features.ingest import is_ingest_current, iter_ingested_chunks, read_ingested
+from ueba.features.prefetch import DEFAULT_PREFETCH_DEPTH, frame_nbytes, prefetch_chunks
+from ueba.features.rolling import causal_window_moments, causal_window_sums, user_segment_starts
+from ueba.features.schema import enforce_schema
+from ueba.features.work_hours import WorkHourIndex
 
 
 # Functions
-def load_raw_logs(cert_path: str) -> dict:
+def load_raw_logs(cert_path: str, ingest_dir: str | None=None, after_day: pd.Timestamp | None=None) -> dict:
     """
     Loads the raw CERT log files needed for preprocessing. Small files are loaded eagerly
     whereas large files are represented as {path: chunked=True} for downstream chunked
@@ -35,6 +55,14 @@ def load_raw_logs(cert_path: str) -> dict:
 
     Args:
         cert_path: The base path containing the CERT dataset
+        ingest_dir: Optional root of the Parquet datasets written by `ingest_cert_logs`.
+            Sources with a current ingest are read from Parquet instead of CSV; for
+            large sources the returned path is then the dataset directory.
+        after_day: Optional watermark; small sources are read only for days after it.
+            Ingested sources skip the earlier day partitions. A CSV source has no index
+            to skip by, so it is still parsed in full (chunk by chunk for small sources,
+            keeping only the later rows); an incremental build's cost therefore follows
+            the new days only for ingested sources.
 
     Returns:
         dict: {file_name: DataFrame | {"path": str, "chunked": True}}
@@ -52,21 +80,39 @@ def load_raw_logs(cert_path: str) -> dict:
 
     for source_name, filename in file_map.items():
         full_path = os.path.join(cert_path, filename)
+        # Prefers a current columnar ingest of the source when one exists
+        if ingest_dir is not None:
+            dataset_dir = os.path.join(ingest_dir, source_name)
+            if is_ingest_current(full_path, dataset_dir, source_name):
+                print(f"  {filename}: reading ingested Parquet dataset")
+                if source_name in LARGE_FILE_SOURCES:
+                    logs[source_name] = {"path": dataset_dir, "chunked": True}
+                else:
+                    logs[source_name] = read_ingested(dataset_dir, USECOLS_MAP[source_name], after_day=after_day)
+                continue
         # Takes note of missing file paths
         if not os.path.exists(full_path):
             missing_files.append(filename)
             continue
+        if after_day is not None:
+            print(f"  {filename}: no current ingest; parsing the full CSV for the days after {after_day:%Y-%m-%d}")
         # Defers large files for later chunked loading
         if source_name in LARGE_FILE_SOURCES:
             logs[source_name] = {"path": full_path, "chunked": True}
         # Loads small files with optimized dtypes
-        else:
+        elif after_day is None:
             applicable_dtype = {col: DTYPE_MAP[col] for col in USECOLS_MAP[source_name] if col in DTYPE_MAP}
             logs[source_name] = pd.read_csv(
                 full_path,
                 usecols=USECOLS_MAP[source_name],
                 dtype=applicable_dtype,
             )
+        # Keeps only the rows after the watermark while reading, so memory follows the new days
+        else:
+            chunks = load_log_in_chunks(full_path, USECOLS_MAP[source_name], DTYPE_MAP, chunksize=500_000)
+            logs[source_name] = pd.concat(
+                [chunk[_event_days(chunk) > after_day] for chunk in chunks], ignore_index=True,
+            )
 
     if missing_files:
         raise FileNotFoundError("Missing required CERT files: " + ", ".join(missing_files))
@@ -74,6 +120,11 @@ def load_raw_logs(cert_path: str) -> dict:
     return logs
 
 
+def _event_days(chunk: pd.DataFrame) -> pd.Series:
+    """Calendar day of each raw event, as `normalize_shared_columns` derives it (NaT when unparseable)."""
+    return pd.to_datetime(chunk["date"], format=TIMESTAMP_FORMAT, errors="coerce").dt.floor("D")
+
+
 def load_ldap(cert_path: str) -> pd.DataFrame:
     """
     Loads per-user identity metadata from the CERT LDAP monthly snapshot files.
@@ -351,6 +402,99 @@ def extract_domain(url: str) -> str:
         return ""
 
 
+# Per-domain category bitflags held by DomainDictionary.flags
+DOMAIN_JOB_SITE = 1
+DOMAIN_CLOUD_STORAGE = 2
+DOMAIN_SUSPICIOUS = 4
+
+
+def normalize_urls(urls: pd.Series) -> tuple[np.ndarray, pa.Array]:
+    """
+    Normalizes a chunk of URLs on Arrow string arrays: missing values become "", then
+    whitespace is stripped and the text lowercased. The host is the part before the
+    first "/" once a leading http:// or https:// is removed.
+
+    Args:
+        urls: Raw url column of one chunk
+
+    Returns:
+        tuple: (normalized url length per row as int64, host per row as an Arrow string array)
+    """
+    arr = pa.array(urls, from_pandas=True)
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    url = pc.utf8_lower(pc.utf8_trim_whitespace(pc.fill_null(arr, "")))
+    length = pc.utf8_length(url).to_numpy(zero_copy_only=False).astype(np.int64)
+    rest = pc.replace_substring_regex(url, r"^https?://", "", max_replacements=1)
+    host = pc.list_element(pc.split_pattern(rest, "/", max_splits=1), 0)
+    return length, host
+
+
+class DomainDictionary:
+    """
+    Interns domains to int32 codes that stay stable as the dictionary grows, so the
+    per-row string work of the HTTP extractor shrinks to one dictionary-encode per
+    chunk. The job-site / cloud-storage / suspicious category bitflags and the
+    identity hash of each domain are computed once, when it is first seen.
+
+    Attributes:
+        domains: Interned domains, in code order
+        flags: uint8 array of DOMAIN_* bitflags per code
+        hashes: uint64 array of `hash_identity_values` per code
+    """
+
+    def __init__(self, domains: list | tuple=()):
+        self.domains: list[str] = []
+        self._codes: dict[str, int] = {}
+        self.flags = np.zeros(0, dtype=np.uint8)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self._intern(list(dict.fromkeys(domains)))
+
+    def __len__(self) -> int:
+        return len(self.domains)
+
+    def _intern(self, new_domains: list) -> None:
+        if not new_domains:
+            return
+        for domain in new_domains:
+            self._codes[domain] = len(self.domains)
+            self.domains.append(domain)
+        values = pd.Series(new_domains, dtype=object)
+        flags = (
+            values.isin(JOB_DOMAINS).to_numpy() * DOMAIN_JOB_SITE
+            | values.isin(CLOUD_STORAGE_DOMAINS).to_numpy() * DOMAIN_CLOUD_STORAGE
+            | values.isin(SUSPICIOUS_DOMAINS).to_numpy() * DOMAIN_SUSPICIOUS
+        )
+        self.flags = np.concatenate([self.flags, flags.astype(np.uint8)])
+        self.hashes = np.concatenate([self.hashes, hash_identity_values(values)])
+
+    def encode(self, hosts: pa.Array) -> np.ndarray:
+        """
+        Codes of a chunk of hosts (e.g. from `normalize_urls`), interning unseen ones.
+        Only the chunk's distinct hosts are looked up in Python.
+
+        Returns:
+            np.ndarray: int32 code per row
+        """
+        if isinstance(hosts, pa.ChunkedArray):
+            hosts = hosts.combine_chunks()
+        encoded = pc.dictionary_encode(hosts)
+        chunk_domains = encoded.dictionary.to_pylist()
+        self._intern([domain for domain in chunk_domains if domain not in self._codes])
+        lookup = np.fromiter((self._codes[domain] for domain in chunk_domains), dtype=np.int32, count=len(chunk_domains))
+        return lookup[encoded.indices.to_numpy(zero_copy_only=False)]
+
+    def save(self, path: str) -> None:
+        """Writes the domains in code order to a Parquet file."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        pd.DataFrame({"domain": pd.Series(self.domains, dtype=object)}).to_parquet(path, index=False)
+
+    @classmethod
+    def load(cls, path: str) -> "DomainDictionary":
+        """Reads a dictionary written by `save`; flags and hashes are recomputed."""
+        return cls(pd.read_parquet(path)["domain"].tolist())
+
+
 def load_log_in_chunks(filepath: str, usecols: list, dtype: dict, chunksize: int=50_000) -> pd.io.parsers.readers.TextFileReader:
     """
     Returns an iterator consisting of DataFrames for processing large CSV files in fixed-size chunks.
@@ -368,6 +512,71 @@ def load_log_in_chunks(filepath: str, usecols: list, dtype: dict, chunksize: int
     return pd.read_csv(filepath, usecols=usecols, dtype=applicable_dtype, chunksize=chunksize)
 
 
+def iter_log_chunks(
+    source: str,
+    log_name: str,
+    chunksize: int=50_000,
+    after_day: pd.Timestamp | None=None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Iterates a large CERT log in chunks from either its raw CSV or its ingested Parquet dataset.
+
+    Args:
+        source: Path to the raw CSV file or to an ingested dataset directory
+        log_name: CERT source name (a key of USECOLS_MAP)
+        chunksize: Number of rows per chunk
+        after_day: Optional watermark. Ingested datasets skip the day partitions up to it;
+            CSV chunks are returned unfiltered and must be filtered after normalization.
+
+    Returns:
+        Iterator[pd.DataFrame]: Chunks ready for `normalize_shared_columns`
+    """
+    if os.path.isdir(source):
+        return iter_ingested_chunks(source, USECOLS_MAP[log_name], chunksize, after_day=after_day)
+    return load_log_in_chunks(source, USECOLS_MAP[log_name], DTYPE_MAP, chunksize)
+
+
+def _normalize_chunk(chunk: pd.DataFrame, after_day: pd.Timestamp | None=None) -> pd.DataFrame:
+    """Normalizes one raw chunk and drops the events up to the `after_day` watermark."""
+    chunk = normalize_shared_columns(chunk, sort=False)
+    if after_day is not None:
+        chunk = chunk[chunk["day"] > after_day].copy()
+    return chunk
+
+
+def iter_normalized_chunks(
+    source: str,
+    log_name: str,
+    chunksize: int=50_000,
+    after_day: pd.Timestamp | None=None,
+    prefetch: int=DEFAULT_PREFETCH_DEPTH,
+    prefetch_max_bytes: int | None=None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Iterates a large CERT log as normalized chunks, decoded ahead of the consumer.
+
+    Reading and `normalize_shared_columns` run in a background reader thread (see
+    ueba.features.prefetch) so they overlap with the caller's per-chunk aggregation.
+
+    Args:
+        source: Path to the raw CSV file or to an ingested dataset directory
+        log_name: CERT source name (a key of USECOLS_MAP)
+        chunksize: Number of rows per chunk
+        after_day: Optional watermark; only events on later days are kept
+        prefetch: Number of decoded chunks buffered ahead of the consumer (0 decodes inline)
+        prefetch_max_bytes: Optional cap on the in-memory size of the buffered chunks
+
+    Returns:
+        Iterator[pd.DataFrame]: Normalized chunks
+    """
+    return prefetch_chunks(
+        iter_log_chunks(source, log_name, chunksize, after_day=after_day),
+        depth=prefetch,
+        max_bytes=prefetch_max_bytes,
+        prepare=partial(_normalize_chunk, after_day=after_day),
+    )
+
+
 def combine_partial_aggregations(partial_list: list, merge_cols: list) -> pd.DataFrame:
     """
     Concatenates a list of per-chunk aggregated DataFrames and sums all count columns across groups.
@@ -383,78 +592,495 @@ def combine_partial_aggregations(partial_list: list, merge_cols: list) -> pd.Dat
     return combined.groupby(merge_cols, as_index=False, observed=True, sort=False).sum()
 
 
-def build_unique_count(identity_frames: list, merge_cols: list, value_col: str, output_col: str, batch_size: int=20) -> pd.DataFrame:
-    """
-    Computes an exact per-group nunique count from accumulated per-chunk DataFrames.
+# Partial frames merged per level by the chunked extractors' PartialAggregator
+DEFAULT_REDUCE_FAN_IN = 8
+
+
+class PartialAggregator:
+    """
+    Streaming tree reduction of per-chunk partial frames.
+
+    Partials are merged `fan_in` at a time by `combine` (by default the groupby-sum
+    of `combine_partial_aggregations`) as soon as `fan_in` frames of the same level
+    are pending, like the digits of a base-`fan_in` counter. At most `fan_in - 1`
+    frames per level are held, so memory follows the number of distinct groups
+    rather than the number of chunks. Only consecutive frames are merged, so the
+    result keeps the first-appearance group order of a single end-of-pass combine.
+
+    With a `memory_budget`, the largest held frames are spilled to Parquet files
+    whenever the frames in memory exceed it, and read back when they are merged.
+    """
+
+    def __init__(
+        self,
+        merge_cols: list,
+        combine: Callable[[list], pd.DataFrame] | None=None,
+        fan_in: int=DEFAULT_REDUCE_FAN_IN,
+        memory_budget: int | None=None,
+        spill_dir: str | None=None,
+    ):
+        if fan_in < 2:
+            raise ValueError(f"fan_in must be >= 2, got {fan_in}")
+        self.merge_cols = list(merge_cols)
+        self.combine = combine if combine is not None else partial(combine_partial_aggregations, merge_cols=self.merge_cols)
+        self.fan_in = fan_in
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.n_partials = 0
+        self.n_spilled = 0
+        self.nbytes = 0
+        self.peak_bytes = 0
+        # [level, frame or spill path, in-memory size (0 once spilled)], oldest first
+        self._entries: list[list] = []
+        self._spill_root: str | None = None
+        self._remove_spill_root: weakref.finalize | None = None
+
+    def add(self, frame: pd.DataFrame) -> None:
+        """Adds one chunk's partial frame, merging full levels as it goes."""
+        self.n_partials += 1
+        self._push(0, frame)
+        while len(self._entries) >= self.fan_in:
+            level = self._entries[-1][0]
+            tail = self._entries[-self.fan_in:]
+            if any(entry[0] != level for entry in tail):
+                break
+            del self._entries[-self.fan_in:]
+            self.nbytes -= sum(entry[2] for entry in tail)
+            self._push(level + 1, self.combine([self._load(entry) for entry in tail]))
+
+    def result(self) -> pd.DataFrame:
+        """Combines everything added so far into one frame and releases the spill files."""
+        if not self._entries:
+            raise ValueError("No partial frames were added.")
+        # Folded in order, reading back one spilled frame at a time
+        combined, batch = [], []
+        for entry in self._entries:
+            spilled = isinstance(entry[1], str)
+            batch.append(self._load(entry))
+            if spilled:
+                combined, batch = [self.combine(combined + batch)], []
+        combined = self.combine(combined + batch) if batch else combined[0]
+        self._entries, self.nbytes = [], 0
+        if self._remove_spill_root is not None:
+            self._remove_spill_root()
+            self._spill_root = self._remove_spill_root = None
+        return combined
+
+    def _push(self, level: int, frame: pd.DataFrame) -> None:
+        size = frame_nbytes(frame)
+        self._entries.append([level, frame, size])
+        self.nbytes += size
+        self.peak_bytes = max(self.peak_bytes, self.nbytes)
+        if self.memory_budget is not None and self.nbytes > self.memory_budget:
+            self._spill()
+
+    def _spill(self) -> None:
+        """Writes the largest in-memory frames to disk until the rest fit the budget."""
+        if self._spill_root is None:
+            self._spill_root = tempfile.mkdtemp(prefix="ueba-partials-", dir=self.spill_dir)
+            self._remove_spill_root = weakref.finalize(self, shutil.rmtree, self._spill_root, True)
+        for entry in sorted(self._entries, key=lambda entry: entry[2], reverse=True):
+            if self.nbytes <= self.memory_budget or entry[2] == 0:
+                break
+            path = os.path.join(self._spill_root, f"partial_{self.n_spilled:05d}.parquet")
+            entry[1].to_parquet(path, index=False)
+            self.nbytes -= entry[2]
+            entry[1], entry[2] = path, 0
+            self.n_spilled += 1
+
+    def _load(self, entry: list) -> pd.DataFrame:
+        if not isinstance(entry[1], str):
+            return entry[1]
+        frame = pd.read_parquet(entry[1])
+        os.remove(entry[1])
+        return frame
+
+
+def hourly_count_matrix(group_codes: np.ndarray, hour: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Builds a dense (n_groups, 24) event-count matrix from per-event group codes and hours.
 
     Args:
-        identity_frames: Per-chunk deduplicated DataFrames
-        merge_cols: The groupby key columns (user, pc, day)
-        value_col: The column whose distinct values are being counted
-        output_col: Name for the resulting count column
-        batch_size: Number of identity frames to concat per batch before deduplication
+        group_codes: Group code per event in [0, n_groups) (e.g. a groupby's `ngroup()`);
+            events with a negative or NaN code (a missing group key) are not counted
+        hour: Hour of day (0-23) per event
+        n_groups: Number of groups
 
     Returns:
-        pd.DataFrame: (merge_cols + output_col) with exact nunique counts
+        np.ndarray: uint32 matrix whose row g holds the hourly event counts of group g
     """
-    deduped_batches = []
-    for i in range(0, len(identity_frames), batch_size):
-        batch = pd.concat(identity_frames[i:i + batch_size], ignore_index=True).drop_duplicates()
-        deduped_batches.append(batch)
-    combined = pd.concat(deduped_batches, ignore_index=True).drop_duplicates()
-    return (
-        combined.groupby(merge_cols, observed=True, sort=False)[value_col]
-        .nunique()
-        .reset_index()
-        .rename(columns={value_col: output_col})
+    group_codes = np.asarray(group_codes)
+    valid = group_codes >= 0
+    flat = np.bincount(
+        group_codes[valid].astype(np.int64) * 24 + np.asarray(hour)[valid].astype(np.int64),
+        minlength=n_groups * 24,
     )
+    return flat.reshape(n_groups, 24).astype(np.uint32)
 
 
-def _compute_hourly_subday(
-    hourly_counts: pd.DataFrame,
-    keys: list,
-    prefix: str,
-    include_peak: bool=True,
-) -> pd.DataFrame:
+def _hourly_subday_columns(counts: np.ndarray, prefix: str, include_peak: bool=True) -> dict:
     """
-    Compute per-group Shannon entropy and peak-hour count from a hourly count frame.
+    Computes per-group Shannon entropy and peak-hour count from a dense hourly count matrix.
+
+    Empty hour bins contribute 0 to the entropy, so the dense pass matches summing over the
+    non-zero (group, hour) rows only.
 
     Args:
-        hourly_counts: DataFrame with columns keys + ["hour", "count"].
-        keys: Group-by keys (e.g. ["user", "pc", "day"]).
+        counts: (n_groups, 24) hourly count matrix (see `hourly_count_matrix`)
         prefix: Column name prefix for output columns.
         include_peak: When True, returns peak hour count (useful for low-volume channels).
 
     Returns:
-        pd.DataFrame: DataFrame with entropy and peak-hour count data
-    """
-    # Summing total activity count on (user, pc, day, hour) granularity
-    totals = hourly_counts.groupby(keys, observed=True)["count"].transform("sum")
-
-    # Computing probability for each hour slot
-    p = hourly_counts["count"] / totals.clip(lower=1)
-
-    # Assigning entropy scores
-    hourly_counts = hourly_counts.copy()
-    hourly_counts["_p_log_p"] = p * np.log(p + 1e-10)
-    entropy = (
-        hourly_counts.groupby(keys, observed=True)["_p_log_p"]
-        .sum()
-        .mul(-1)
-        .rename(f"{prefix}_hourly_entropy")
-        .reset_index()
-    )
+        dict: {f"{prefix}_hourly_entropy": ..., f"{prefix}_peak_hour_count": ...} arrays aligned with counts
+    """
+    totals = counts.sum(axis=1, dtype=np.int64)
+    p = counts / np.maximum(totals, 1)[:, None]
+    columns = {f"{prefix}_hourly_entropy": -(p * np.log(p + 1e-10)).sum(axis=1)}
+    if include_peak:
+        columns[f"{prefix}_peak_hour_count"] = counts.max(axis=1).astype(np.int64)
+    return columns
+
+
+class GroupIndex:
+    """
+    Stable integer codes for key tuples (e.g. (user, pc, day)) seen across chunks.
+
+    Each distinct key tuple gets the next code on first sight, so per-chunk
+    groupby results can be accumulated into dense arrays indexed by code. The
+    key rows are kept in code order for building the final keyed frame.
+    """
+
+    def __init__(self, keys: list):
+        self.keys = list(keys)
+        self._codes: dict[tuple, int] = {}
+        self._key_frames: list[pd.DataFrame] = []
+        self._empty_keys: pd.DataFrame | None = None
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def encode(self, df: pd.DataFrame) -> tuple[pd.core.groupby.DataFrameGroupBy, np.ndarray]:
+        """
+        Groups one chunk by the keys and assigns global codes to its groups.
+
+        Args:
+            df: Chunk holding the key columns
+
+        Returns:
+            tuple: (the chunk's groupby, global code per local group number)
+        """
+        if df.empty and self._empty_keys is None:
+            # Keeps the key dtypes so an all-empty index still merges cleanly
+            self._empty_keys = df[self.keys].iloc[:0].reset_index(drop=True)
+        grouped = df.groupby(self.keys, observed=True, sort=False)
+        group_keys = grouped.size().index.to_frame(index=False)
+
+        n_before = len(self._codes)
+        codes = np.array(
+            [self._codes.setdefault(key, len(self._codes)) for key in group_keys.itertuples(index=False, name=None)],
+            dtype=np.int64,
+        )
+        if len(self._codes) > n_before:
+            self._key_frames.append(group_keys[codes >= n_before])
+        return grouped, codes
+
+    def key_frame(self) -> pd.DataFrame:
+        """The key columns, one row per code in code order."""
+        if self._key_frames:
+            return pd.concat(self._key_frames, ignore_index=True)
+        if self._empty_keys is not None:
+            return self._empty_keys
+        return pd.DataFrame(columns=self.keys)
+
+
+class HourlyHistogram:
+    """
+    Dense per-group hourly event counts accumulated across chunks.
+
+    Each distinct key tuple (e.g. (user, pc, day)) gets a stable row in a
+    (n_groups, 24) uint32 matrix on first sight; later chunks add their counts
+    to the same rows in place, so no long-form (keys, hour, count) frames are
+    kept between chunks.
+    """
+
+    def __init__(self, keys: list):
+        self.groups = GroupIndex(keys)
+        self.counts = np.zeros((0, 24), dtype=np.uint32)
+
+    def update(self, df: pd.DataFrame, hour: pd.Series) -> None:
+        """Adds the events of one chunk (keys columns in df, aligned hour-of-day Series)."""
+        grouped, codes = self.groups.encode(df)
+        if len(self.groups) > len(self.counts):
+            grow = np.zeros((len(self.groups) - len(self.counts), 24), dtype=np.uint32)
+            self.counts = np.concatenate([self.counts, grow])
+        if len(codes):
+            self.counts[codes] += hourly_count_matrix(grouped.ngroup().to_numpy(), hour.to_numpy(), len(codes))
+
+    def to_frame(self, prefix: str, include_peak: bool=True) -> pd.DataFrame:
+        """
+        Per-group sub-day features of everything accumulated so far.
+
+        Args:
+            prefix: Column name prefix for output columns.
+            include_peak: When True, includes the peak hour count.
+
+        Returns:
+            pd.DataFrame: keys + entropy (and peak-hour count) columns
+        """
+        return self.groups.key_frame().assign(**_hourly_subday_columns(self.counts, prefix, include_peak))
+
+
+IDENTITY_PAIR_DTYPE = np.dtype([("group", np.int64), ("value", np.uint64)])
+
+
+def hash_identity_values(values: pd.Series) -> np.ndarray:
+    """
+    64-bit hashes of identity values (filenames, recipients, domains).
+
+    Uses pandas' fixed-key hash, so hashes are stable across processes and runs and
+    can be persisted. Equal strings always share a hash; distinct strings collide
+    with probability ~n^2 / 2^65.
+    """
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(np.uint64)
+
+
+def _unique_pairs(groups: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    """Sort-unique of (group code, value hash) pairs as an IDENTITY_PAIR_DTYPE array."""
+    pairs = np.empty(len(groups), dtype=IDENTITY_PAIR_DTYPE)
+    pairs["group"] = groups
+    pairs["value"] = hashes
+    return np.unique(pairs)
+
+
+def hashed_identity_frame(df: pd.DataFrame, value_col: str) -> pd.DataFrame:
+    """
+    Compact (user, day, <value_col>_hash) identity frame with one row per distinct
+    non-null value per (user, day) — the form `collapse_layer` consumes.
+    """
+    valid = df[value_col].notna()
+    frame = df.loc[valid, ["user", "day"]].reset_index(drop=True)
+    frame[f"{value_col}_hash"] = hash_identity_values(df.loc[valid, value_col])
+    return frame.drop_duplicates(ignore_index=True)
+
+
+class IdentitySet:
+    """
+    Exact distinct (group, value) pairs accumulated across chunks, stored as
+    (int64 group code, uint64 value hash) instead of string frames.
+
+    Pairs are deduplicated per chunk and compacted with a sort-unique every
+    `compact_every` chunks, so memory stays at 16 bytes per distinct pair.
+    Null values are not counted (as `nunique`), but their groups still get a 0.
+    """
+
+    def __init__(self, keys: list, value_col: str, compact_every: int=20):
+        self.groups = GroupIndex(keys)
+        self.value_col = value_col
+        self.compact_every = compact_every
+        self._pairs = np.empty(0, dtype=IDENTITY_PAIR_DTYPE)
+        self._pending: list[np.ndarray] = []
+
+    def update(self, df: pd.DataFrame, hashes: np.ndarray | None=None) -> None:
+        """
+        Adds the identity values of one chunk (key columns + value_col). Rows with
+        a missing key are skipped, as in a groupby.
+
+        Args:
+            df: Chunk with the key columns and value_col
+            hashes: Optional precomputed value hashes aligned with df's rows (e.g. from
+                a DomainDictionary); df then only needs the key columns
+        """
+        grouped, codes = self.groups.encode(df)
+        if not len(codes):
+            return
+        if hashes is None:
+            valid = df[self.value_col].notna().to_numpy()
+            hashes = hash_identity_values(df.loc[valid, self.value_col])
+        else:
+            valid = np.ones(len(df), dtype=bool)
+        # Rows with a missing key get a NaN group number and belong to no group
+        row_groups = grouped.ngroup().to_numpy()[valid]
+        keyed = row_groups >= 0
+        group_codes = codes[row_groups[keyed].astype(np.int64)]
+        hashes = np.asarray(hashes)[keyed]
+        self._pending.append(_unique_pairs(group_codes, hashes))
+        if len(self._pending) >= self.compact_every:
+            self._compact()
+
+    def _compact(self) -> np.ndarray:
+        if self._pending:
+            self._pairs = np.unique(np.concatenate([self._pairs] + self._pending))
+            self._pending = []
+        return self._pairs
+
+    def counts(self, output_col: str) -> pd.DataFrame:
+        """
+        Exact distinct-value count per group.
+
+        Args:
+            output_col: Name for the resulting count column
+
+        Returns:
+            pd.DataFrame: keys + output_col (int64)
+        """
+        pairs = self._compact()
+        return self.groups.key_frame().assign(
+            **{output_col: np.bincount(pairs["group"], minlength=len(self.groups)).astype(np.int64)}
+        )
+
+    def identity_frame(self) -> pd.DataFrame:
+        """
+        Distinct values per (user, day) across all PCs, in the `hashed_identity_frame` form.
+
+        Returns:
+            pd.DataFrame: [user, day, <value_col>_hash] with one row per distinct pair
+        """
+        pairs = self._compact()
+        key_frame = self.groups.key_frame()
+        user_day = key_frame.groupby(["user", "day"], observed=True, sort=False)
+        user_day_pairs = _unique_pairs(user_day.ngroup().to_numpy()[pairs["group"]], pairs["value"])
+        frame = user_day.size().index.to_frame(index=False).iloc[user_day_pairs["group"]].reset_index(drop=True)
+        frame[f"{self.value_col}_hash"] = user_day_pairs["value"]
+        return frame
+
+
+class HLLSketchSet:
+    """
+    One HyperLogLog sketch per key group (e.g. (user, pc, day)), accumulated across
+    chunks (see ueba.features.hll). Drop-in for `IdentitySet` in the chunked
+    extractors when `distinct="hll"`.
+
+    Attributes:
+        registers: uint8 array (n_groups, 2**precision)
+    """
+
+    def __init__(self, keys: list, value_col: str, precision: int=DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HLL precision must be between 4 and 16, got {precision}")
+        self.groups = GroupIndex(keys)
+        self.value_col = value_col
+        self.precision = precision
+        self.registers = np.zeros((0, 1 << precision), dtype=np.uint8)
+
+    def update(self, df: pd.DataFrame, hashes: np.ndarray | None=None) -> None:
+        """Adds the identity values of one chunk (see `IdentitySet.update`)."""
+        grouped, codes = self.groups.encode(df)
+        if len(self.groups) > len(self.registers):
+            grow = np.zeros((len(self.groups) - len(self.registers), self.registers.shape[1]), dtype=np.uint8)
+            self.registers = np.concatenate([self.registers, grow])
+        if not len(codes):
+            return
+        if hashes is None:
+            valid = df[self.value_col].notna().to_numpy()
+            hashes = hash_identity_values(df.loc[valid, self.value_col])
+        else:
+            valid = np.ones(len(df), dtype=bool)
+        row_groups = grouped.ngroup().to_numpy()[valid]
+        keyed = row_groups >= 0
+        group_codes = codes[row_groups[keyed].astype(np.int64)]
+        hashes = np.asarray(hashes)[keyed]
+        index, rank = hll_register_updates(hashes, self.precision)
+        np.maximum.at(self.registers, (group_codes, index), rank)
+
+    def counts(self, output_col: str) -> pd.DataFrame:
+        """
+        Estimated distinct-value count per group.
+
+        Args:
+            output_col: Name for the resulting count column
+
+        Returns:
+            pd.DataFrame: keys + output_col (int64, rounded estimates)
+        """
+        estimates = np.rint(hll_estimate(self.registers)).astype(np.int64)
+        return self.groups.key_frame().assign(**{output_col: estimates})
+
+    def identity_frame(self) -> pd.DataFrame:
+        """
+        Per-(user, day) estimates from the merged per-PC sketches.
+
+        Returns:
+            pd.DataFrame: [user, day, <value_col>_hll] estimated distinct counts, the
+                precomputed form `collapse_layer` accepts in nunique_frames
+        """
+        user_day = self.groups.key_frame().groupby(["user", "day"], observed=True, sort=False)
+        merged = np.zeros((user_day.ngroups, self.registers.shape[1]), dtype=np.uint8)
+        np.maximum.at(merged, user_day.ngroup().to_numpy(), self.registers)
+        frame = user_day.size().index.to_frame(index=False)
+        frame[f"{self.value_col}{HLL_ESTIMATE_SUFFIX}"] = np.rint(hll_estimate(merged)).astype(np.int64)
+        return frame
+
+
+DISTINCT_MODES = ("exact", "hll")
+
+
+def _accumulator_summary(*aggregators: PartialAggregator) -> str:
+    """Peak held size (and spill count) of chunked-extractor accumulators, for progress logs."""
+    peak_mb = sum(agg.peak_bytes for agg in aggregators) / 2**20
+    n_spilled = sum(agg.n_spilled for agg in aggregators)
+    return f"(peak partials {peak_mb:.1f} MB" + (f", {n_spilled} spilled)" if n_spilled else ")")
+
+
+def _distinct_accumulator(keys: list, value_col: str, distinct: str) -> "IdentitySet | HLLSketchSet":
+    """The unique-count accumulator for a `distinct` mode ("exact" or "hll")."""
+    if distinct == "exact":
+        return IdentitySet(keys, value_col)
+    if distinct == "hll":
+        return HLLSketchSet(keys, value_col)
+    raise ValueError(f"distinct must be one of {DISTINCT_MODES}, got {distinct!r}")
+
+
+def _longest_runs(
+    group_codes: np.ndarray,
+    start_ns: np.ndarray,
+    end_ns: np.ndarray | None,
+    n_groups: int,
+    gap_minutes: int=30,
+) -> np.ndarray:
+    """
+    Longest contiguous activity run per group, in minutes, from int64 nanosecond times.
+
+    Inputs are either single events (`end_ns` None) or activity intervals whose
+    events were already merged into runs (e.g. per chunk). A new run begins when the
+    next event / interval starts more than `gap_minutes` after everything before it
+    in the group has ended.
+
+    Args:
+        group_codes: Integer group code per event or interval in [0, n_groups)
+        start_ns: Event times (or interval starts) as int64 nanoseconds
+        end_ns: Interval ends as int64 nanoseconds, or None for single events
+        n_groups: Number of groups; every group must have at least one entry
+        gap_minutes: Gap threshold in minutes that defines a run boundary.
+
+    Returns:
+        np.ndarray: float64 longest run duration (minutes) per group code
+    """
+    longest = np.full(n_groups, np.nan)
+    if len(group_codes) == 0:
+        return longest
+    order = np.lexsort((start_ns, group_codes))
+    codes = group_codes[order]
+    start = start_ns[order]
+    end = start if end_ns is None else end_ns[order]
+    # Latest end seen so far within the group (events are sorted, so it is the event itself)
+    reach = end if end_ns is None else pd.Series(end).groupby(codes).cummax().to_numpy()
+
+    new_group = np.ones(len(codes), dtype=bool)
+    new_group[1:] = codes[1:] != codes[:-1]
+    new_run = new_group.copy()
+    new_run[1:] |= (start[1:] - reach[:-1]) > gap_minutes * 60 * 10**9
+
+    run_starts = np.flatnonzero(new_run)
+    run_dur_ns = np.maximum.reduceat(end, run_starts) - np.minimum.reduceat(start, run_starts)
+    # Runs are ordered by group, so a reduceat over each group's first run takes the max per group
+    group_first_run = np.flatnonzero(new_group[run_starts])
+    longest[codes[run_starts[group_first_run]]] = np.maximum.reduceat(run_dur_ns, group_first_run) / 1e9 / 60
+    return longest
+
+
+def _timestamps_ns(ts: pd.Series) -> np.ndarray:
+    return ts.to_numpy("datetime64[ns]").view(np.int64)
 
-    # Returns peak hour count if specified
-    if not include_peak:
-        return entropy
-    peak = (
-        hourly_counts.groupby(keys, observed=True)["count"]
-        .max()
-        .rename(f"{prefix}_peak_hour_count")
-        .reset_index()
-    )
-    return entropy.merge(peak, on=keys)
 
 def _compute_longest_run(
     df: pd.DataFrame,
@@ -479,33 +1105,127 @@ def _compute_longest_run(
     Returns:
         DataFrame with keys + [f"{prefix}_longest_active_run_minutes"].
     """
-    df_s = df.sort_values(keys + [timestamp_col]).copy()
-    prev_ts = df_s.groupby(keys, observed=True, sort=False)[timestamp_col].shift(1)
+    grouped = df.groupby(keys, observed=True, sort=False)
+    codes = grouped.ngroup().to_numpy()
+    valid = codes >= 0  # rows with a missing key belong to no group
+    result = grouped.size().index.to_frame(index=False)
+    result[f"{prefix}_longest_active_run_minutes"] = _longest_runs(
+        codes[valid], _timestamps_ns(df[timestamp_col])[valid], None, grouped.ngroups, gap_minutes,
+    )
+    return result
+
+
+def _run_intervals(
+    df: pd.DataFrame,
+    keys: list,
+    timestamp_col: str="timestamp",
+    gap_minutes: int=30,
+) -> pd.DataFrame:
+    """
+    Collapses events into their activity runs: keys + [run_start, run_end] (int64 ns).
 
-    # Computing inter-event gap in minutes to identify run boundaries
-    gap_min = (df_s[timestamp_col] - prev_ts).dt.total_seconds() / 60
+    Runs computed per chunk are a lossless summary for `_longest_run_from_intervals`,
+    so chunked extractors keep one row per run instead of every event timestamp.
+    """
+    grouped = df.groupby(keys, observed=True, sort=False)
+    codes = grouped.ngroup().to_numpy()
+    valid = codes >= 0  # rows with a missing key belong to no group
+    codes, ts = codes[valid], _timestamps_ns(df[timestamp_col])[valid]
 
-    # Assigning a run ID per group — each gap exceeding gap_minutes starts a new run
-    df_s["_new_run"] = (gap_min.isna() | (gap_min > gap_minutes)).astype(int)
-    df_s["_run_id"] = df_s.groupby(keys, observed=True, sort=False)["_new_run"].cumsum()
+    order = np.lexsort((ts, codes))
+    codes, ts = codes[order], ts[order]
+    new_run = np.ones(len(codes), dtype=bool)
+    new_run[1:] = (codes[1:] != codes[:-1]) | ((ts[1:] - ts[:-1]) > gap_minutes * 60 * 10**9)
+    run_starts = np.flatnonzero(new_run)
 
-    # Computing duration of each run as (last_event − first_event) in minutes
-    run_dur = (
-        df_s.groupby(keys + ["_run_id"], observed=True)[timestamp_col]
-        .agg(run_dur=lambda x: (x.max() - x.min()).total_seconds() / 60)
-        .reset_index()
-    )
+    group_keys = grouped.size().index.to_frame(index=False)
+    runs = group_keys.iloc[codes[run_starts]].reset_index(drop=True)
+    runs["run_start"] = ts[run_starts]
+    runs["run_end"] = np.maximum.reduceat(ts, run_starts) if len(ts) else ts[:0]
+    return runs
 
-    # Taking the maximum run duration per group as the session length
-    result = (
-        run_dur.groupby(keys, observed=True)["run_dur"]
-        .max()
-        .rename(f"{prefix}_longest_active_run_minutes")
-        .reset_index()
+
+def _merge_run_intervals(run_frames: list, keys: list, gap_minutes: int=30) -> pd.DataFrame:
+    """
+    Merges `_run_intervals` frames into one frame of activity runs per key group.
+
+    Intervals of a group that overlap or lie within `gap_minutes` of each other become
+    one run, so the result is again a lossless summary for `_longest_run_from_intervals`
+    and frames can be merged in any grouping of consecutive chunks.
+    """
+    runs = pd.concat(run_frames, ignore_index=True)
+    grouped = runs.groupby(keys, observed=True, sort=False)
+    codes = grouped.ngroup().to_numpy()
+    valid = codes >= 0
+    codes = codes[valid]
+    start = runs["run_start"].to_numpy()[valid]
+    end = runs["run_end"].to_numpy()[valid]
+
+    order = np.lexsort((start, codes))
+    codes, start, end = codes[order], start[order], end[order]
+    reach = pd.Series(end).groupby(codes).cummax().to_numpy()
+    new_run = np.ones(len(codes), dtype=bool)
+    new_run[1:] = (codes[1:] != codes[:-1]) | ((start[1:] - reach[:-1]) > gap_minutes * 60 * 10**9)
+    run_starts = np.flatnonzero(new_run)
+
+    group_keys = grouped.size().index.to_frame(index=False)
+    merged = group_keys.iloc[codes[run_starts]].reset_index(drop=True)
+    merged["run_start"] = start[run_starts]
+    merged["run_end"] = np.maximum.reduceat(end, run_starts) if len(end) else end[:0]
+    return merged
+
+
+def _longest_run_from_intervals(run_frames: list, keys: list, gap_minutes: int=30, prefix: str="") -> pd.DataFrame:
+    """
+    Longest contiguous activity run per key group from accumulated `_run_intervals` frames.
+
+    Args:
+        run_frames: Per-chunk outputs of `_run_intervals`
+        keys: Group-by keys (e.g. ["user", "pc", "day"]).
+        gap_minutes: Gap threshold in minutes that defines a run boundary.
+        prefix: Column name prefix for the output column.
+
+    Returns:
+        DataFrame with keys + [f"{prefix}_longest_active_run_minutes"].
+    """
+    runs = pd.concat(run_frames, ignore_index=True)
+    grouped = runs.groupby(keys, observed=True, sort=False)
+    result = grouped.size().index.to_frame(index=False)
+    result[f"{prefix}_longest_active_run_minutes"] = _longest_runs(
+        grouped.ngroup().to_numpy(),
+        runs["run_start"].to_numpy(),
+        runs["run_end"].to_numpy(),
+        grouped.ngroups,
+        gap_minutes,
     )
     return result
 
 
+def _work_hours_table(
+    users: pd.Index,
+    p10: np.ndarray,
+    p90: np.ndarray,
+    n_days: np.ndarray,
+    min_history: int,
+) -> pd.DataFrame:
+    """
+    Applies the envelope rules to per-user logon-hour quantiles and day counts.
+
+    Users with fewer than `min_history` logon-days, or whose truncated p10 is not
+    below their p90, fall back to the population default (9, 17).
+    """
+    start = np.clip(np.floor(p10), 0, 23).astype(int)
+    end = np.clip(np.floor(p90), 0, 23).astype(int)
+    complete = (np.asarray(n_days) >= min_history) & (start < end)
+    return pd.DataFrame({
+        # Categorical over exactly the table's users, whichever path built it
+        "user": pd.Categorical(pd.Index(users).astype(str)),
+        "start_hour": np.where(complete, start, 9),
+        "end_hour": np.where(complete, end, 17),
+        "schedule_complete": complete,
+    })
+
+
 def compute_user_work_hours(logon_df: pd.DataFrame, min_history: int=30) -> pd.DataFrame:
     """
     Derives a per-user business-hour envelope from historical logon patterns.
@@ -521,39 +1241,120 @@ def compute_user_work_hours(logon_df: pd.DataFrame, min_history: int=30) -> pd.D
     Returns:
         pd.DataFrame: DataFrame with columns [user, start_hour, end_hour, schedule_complete].
     """
-    logon_events = logon_df[logon_df["activity"] == "Logon"].copy()
-    logon_events["hour"] = logon_events["timestamp"].dt.hour
-
-    def _envelope(group: pd.DataFrame):
-        # Validating the minimum number of days
-        n_days = group["day"].nunique()
-        if n_days < min_history:
-            return pd.Series({"start_hour": 9, "end_hour": 17, "schedule_complete": False})
-        # Computing the 10th and 90th percentiles
-        p10 = int(group["hour"].quantile(0.10))
-        p90 = int(group["hour"].quantile(0.90))
-        p10 = max(0, min(23, p10))
-        p90 = max(0, min(23, p90))
-        if p10 >= p90:
-            return pd.Series({"start_hour": 9, "end_hour": 17, "schedule_complete": False})
-
-        return pd.Series({"start_hour": p10, "end_hour": p90, "schedule_complete": True})
-
-    # Applying envelope helper function
-    result = (
-        logon_events.groupby("user", observed=True, sort=False)
-        .apply(_envelope)
-        .reset_index()
+    logon_events = logon_df.loc[logon_df["activity"] == "Logon", ["user", "day"]]
+    hour = logon_df.loc[logon_events.index, "timestamp"].dt.hour
+
+    # One grouped pass for both quantiles and one for the distinct logon-days
+    quantiles = (
+        hour.groupby(logon_events["user"], observed=True, sort=False)
+        .quantile([0.10, 0.90])
+        .unstack()
     )
-    result["start_hour"] = result["start_hour"].astype(int)
-    result["end_hour"] = result["end_hour"].astype(int)
-    return result
+    n_days = logon_events.groupby("user", observed=True, sort=False)["day"].nunique()
+    return _work_hours_table(
+        quantiles.index,
+        quantiles[0.10].to_numpy(),
+        quantiles[0.90].to_numpy(),
+        n_days.reindex(quantiles.index).to_numpy(),
+        min_history,
+    )
+
+
+class LogonHourHistogram:
+    """
+    Per-user logon-hour histogram accumulated chunk by chunk, so the per-user
+    work-hour envelopes can be derived without materializing the full logon log.
+
+    The 24 hour bins carry everything the 10th / 90th percentiles need (linear
+    interpolation between order statistics), and the distinct (user, day) pairs
+    carry the `min_history` day count, so `to_work_hours` matches
+    `compute_user_work_hours` on the concatenated chunks.
+    """
+
+    def __init__(self):
+        self.users = pd.Index([], dtype=object)
+        self.counts = np.zeros((0, 24), dtype=np.int64)
+        self._user_days: list[pd.DataFrame] = []
+
+    def update(self, logon_chunk: pd.DataFrame) -> None:
+        """Adds the Logon events of one normalized logon chunk (events without a user are skipped)."""
+        events = logon_chunk.loc[logon_chunk["activity"] == "Logon", ["user", "day", "timestamp"]]
+        user = events["user"].astype("category")
+        codes = user.cat.codes.to_numpy()
+        valid = codes >= 0
+        if not valid.any():
+            return
+        # Users are mapped per category, then gathered by the chunk's codes
+        categories = user.cat.categories.astype(str)
+        observed = categories[np.unique(codes[valid])]
+        new_users = observed[self.users.get_indexer(observed) < 0]
+        if len(new_users):
+            self.users = self.users.append(pd.Index(new_users, dtype=object))
+            grow = np.zeros((len(new_users), 24), dtype=np.int64)
+            self.counts = np.concatenate([self.counts, grow])
+
+        idx = self.users.get_indexer(categories)[codes[valid]]
+        hour = events["timestamp"].dt.hour.to_numpy()[valid]
+        np.add.at(self.counts, (idx, hour), 1)
+        self._user_days.append(
+            pd.DataFrame({"user": idx, "day": events["day"].to_numpy()[valid]}).drop_duplicates()
+        )
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Per-user hour quantile with linear interpolation, as pandas' groupby quantile."""
+        n = self.counts.sum(axis=1)
+        cum = np.cumsum(self.counts, axis=1)
+        pos = q * (n - 1)
+        lo_rank = np.floor(pos)
+        hi_rank = np.minimum(lo_rank + 1, n - 1)
+        # The value at (0-based) rank r is the first hour bin whose cumulative count exceeds r
+        lo = (cum <= lo_rank[:, None]).sum(axis=1)
+        hi = (cum <= hi_rank[:, None]).sum(axis=1)
+        return lo + (pos - lo_rank) * (hi - lo)
+
+    def to_work_hours(self, min_history: int=30) -> pd.DataFrame:
+        """
+        Derives the per-user envelopes from the accumulated histogram.
+
+        Args:
+            min_history: Minimum number of distinct logon-days required.
+
+        Returns:
+            pd.DataFrame: DataFrame with columns [user, start_hour, end_hour, schedule_complete].
+        """
+        if self._user_days:
+            user_days = pd.concat(self._user_days, ignore_index=True).drop_duplicates()
+            n_days = np.bincount(user_days["user"].to_numpy(), minlength=len(self.users))
+        else:
+            n_days = np.zeros(0, dtype=np.int64)
+        return _work_hours_table(
+            self.users, self.quantile(0.10), self.quantile(0.90), n_days, min_history,
+        )
+
+
+def compute_user_work_hours_chunked(source: str, min_history: int=30, chunksize: int=500_000) -> pd.DataFrame:
+    """
+    Derives the per-user work-hour envelopes by streaming the logon log through a
+    `LogonHourHistogram` instead of loading it whole.
+
+    Args:
+        source: Path to logon.csv or to the ingested logon dataset directory
+        min_history: Minimum number of distinct logon-days required.
+        chunksize: Number of rows per chunk
+
+    Returns:
+        pd.DataFrame: DataFrame with columns [user, start_hour, end_hour, schedule_complete].
+    """
+    histogram = LogonHourHistogram()
+    for chunk in iter_normalized_chunks(source, "logon", chunksize):
+        histogram.update(chunk)
+    return histogram.to_work_hours(min_history)
 
 
 def _compute_off_hours(
     hour: pd.Series,
     user: pd.Series,
-    user_work_hours: pd.DataFrame | None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None",
     default_hours: tuple = (9, 17),
 ) -> pd.Series:
     """
@@ -566,8 +1367,9 @@ def _compute_off_hours(
     Args:
         hour: Integer hour-of-day Series extracted from the event timestamps.
         user: Categorical user identifier Series aligned with hour.
-        user_work_hours: Per-user schedule table from compute_user_work_hours(), or None
-            to apply default_hours uniformly.
+        user_work_hours: Per-user schedule table from compute_user_work_hours(), a
+            WorkHourIndex built from it once per run (one array gather per call), or
+            None to apply default_hours uniformly.
         default_hours: Fallback (start_hour, end_hour) tuple used when user_work_hours
             is None or a user has no derived schedule.
 
@@ -576,18 +1378,13 @@ def _compute_off_hours(
     """
     if user_work_hours is None:
         return (hour < default_hours[0]) | (hour > default_hours[1])
-
-    start_map = user_work_hours.set_index("user")["start_hour"].to_dict()
-    end_map = user_work_hours.set_index("user")["end_hour"].to_dict()
-    start = user.map(start_map).fillna(default_hours[0]).astype(int)
-    end = user.map(end_map).fillna(default_hours[1]).astype(int)
-    return (hour < start) | (hour > end)
+    return WorkHourIndex.from_table(user_work_hours, default_hours).off_hours(hour, user)
 
 
 def extract_logon_features(
     norm_df: pd.DataFrame,
     work_hours: tuple=(9, 17),
-    user_work_hours: pd.DataFrame | None=None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None"=None,
 ) -> pd.DataFrame:
     """
     Extracts daily authentication behavior features from logon events to create an aggregated feature table.
@@ -595,7 +1392,7 @@ def extract_logon_features(
     Args:
         norm_df: The normalized logon dataframe
         work_hours: Fallback population work-hour window
-        user_work_hours: Per-user schedule table from `compute_user_work_hours`
+        user_work_hours: Per-user schedule table from `compute_user_work_hours`, or its WorkHourIndex
 
     Returns:
         pd.DataFrame: Aggregated logon behavior features per (user, pc, day)
@@ -617,8 +1414,9 @@ def extract_logon_features(
 
     # Grouping data on (user, pc, day) level
     KEYS = ["user", "pc", "day"]
+    grouped = df.groupby(KEYS, observed=True, sort=False)
     features = (
-        df.groupby(KEYS, observed=True, sort=False)
+        grouped
           .agg(
               logon_count=("is_logon", "sum"),
               logoff_count=("is_logoff", "sum"),
@@ -628,14 +1426,11 @@ def extract_logon_features(
           .reset_index()
     )
 
-    hourly_counts = (
-        df.groupby(KEYS + ["hour"], observed=True, sort=False)
-        .size().rename("count").reset_index()
-    )
-    # Computing subday features
-    subday = _compute_hourly_subday(hourly_counts, KEYS, prefix="logon")
+    # Computing subday features (rows of the hourly matrix follow the group order of features)
+    hourly = hourly_count_matrix(grouped.ngroup().to_numpy(), hour.to_numpy(), grouped.ngroups)
+    features = features.assign(**_hourly_subday_columns(hourly, prefix="logon"))
     subday_run = _compute_longest_run(df, KEYS, prefix="logon")
-    features = features.merge(subday, on=KEYS, how="left").merge(subday_run, on=KEYS, how="left")
+    features = features.merge(subday_run, on=KEYS, how="left")
 
     return features
 
@@ -644,7 +1439,7 @@ def extract_file_features(
     norm_df: pd.DataFrame,
     work_hours: tuple = (9, 17),
     return_identity_frame: bool = False,
-    user_work_hours: pd.DataFrame | None = None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None" = None,
 ) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
     """
     Extracts daily file access behavior features to create an aggregated feature table.
@@ -652,8 +1447,8 @@ def extract_file_features(
     Args:
         norm_df: Normalized file activity dataframe
         work_hours: Fallback population work-hour window used when user_work_hours is None
-        return_identity_frame: When True, returns a deduplicated (user, day, filename) DataFrame
-        user_work_hours: Per-user schedule table from compute_user_work_hours()
+        return_identity_frame: When True, returns a hashed (user, day, filename_hash) identity DataFrame
+        user_work_hours: Per-user schedule table from compute_user_work_hours(), or its WorkHourIndex
 
     Returns:
         pd.DataFrame: Aggregated file behavior features per (user, pc, day).
@@ -675,8 +1470,9 @@ def extract_file_features(
     )
 
     KEYS = ["user", "pc", "day"]
+    grouped = df.groupby(KEYS, observed=True, sort=False)
     features = (
-        df.groupby(KEYS, observed=True, sort=False)
+        grouped
           .agg(
               file_open_count=("is_open", "sum"),
               file_write_count=("is_write", "sum"),
@@ -689,18 +1485,14 @@ def extract_file_features(
           .reset_index()
     )
 
-    hourly_counts = (
-        df.groupby(KEYS + ["hour"], observed=True, sort=False)
-        .size().rename("count").reset_index()
-    )
-    subday = _compute_hourly_subday(hourly_counts, KEYS, prefix="file")
+    hourly = hourly_count_matrix(grouped.ngroup().to_numpy(), hour.to_numpy(), grouped.ngroups)
+    features = features.assign(**_hourly_subday_columns(hourly, prefix="file"))
     subday_run = _compute_longest_run(df, KEYS, prefix="file")
-    features = features.merge(subday, on=KEYS, how="left").merge(subday_run, on=KEYS, how="left")
+    features = features.merge(subday_run, on=KEYS, how="left")
 
-    # Returns an additional frame consisting (user, day, filename) granularity
+    # Returns an additional frame at hashed (user, day, filename) granularity
     if return_identity_frame:
-        identity_frame = df[["user", "day", "filename"]].drop_duplicates()
-        return features, identity_frame
+        return features, hashed_identity_frame(df, "filename")
 
     return features
 
@@ -710,48 +1502,67 @@ def extract_file_features_chunked(
     work_hours: tuple = (9, 17),
     chunksize: int = 50_000,
     return_identity_frame: bool = False,
-    user_work_hours: pd.DataFrame | None = None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None" = None,
+    after_day: pd.Timestamp | None = None,
+    distinct: str = "exact",
+    prefetch: int = DEFAULT_PREFETCH_DEPTH,
+    prefetch_max_bytes: int | None = None,
+    reduce_fan_in: int = DEFAULT_REDUCE_FAN_IN,
+    partial_memory_budget: int | None = None,
 ) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
     """
     Memory-efficient file feature extraction via chunked CSV reading.
 
     Mirrors extract_email_features_chunked: additive counts accumulate per chunk;
-    unique_files_accessed is computed via build_unique_count over deduplicated
-    (user, pc, day, filename) tuples; longest active run is computed from the
-    accumulated minimal (user, pc, day, timestamp) frame.
+    unique_files_accessed is computed from an IdentitySet of hashed
+    (user, pc, day, filename) pairs; longest active run is computed from the
+    per-chunk activity runs (one row per run rather than per event), merged as
+    chunks arrive.
 
     Args:
-        filepath: Absolute path to file.csv
+        filepath: Absolute path to file.csv or its ingested Parquet dataset directory
         work_hours: Fallback population work-hour window used when user_work_hours is None
         chunksize: Number of rows per chunk
-        return_identity_frame: When True, returns a deduplicated (user, day, filename) DataFrame
-        user_work_hours: Per-user schedule table from compute_user_work_hours()
+        return_identity_frame: When True, returns a hashed (user, day, filename_hash) identity DataFrame
+        user_work_hours: Per-user schedule table from compute_user_work_hours(), or its WorkHourIndex
+        after_day: Optional watermark; only events on later days are aggregated (incremental builds)
+        distinct: "exact" hashed distinct counts, or "hll" HyperLogLog estimates (constant memory per group)
+        prefetch: Number of decoded chunks the background reader keeps ahead of aggregation (0 disables it)
+        prefetch_max_bytes: Optional cap on the in-memory size of the prefetched chunks
+        reduce_fan_in: Number of partial frames merged at a time by the `PartialAggregator`
+        partial_memory_budget: Optional size in bytes above which merged partials are spilled to disk
 
     Returns:
         pd.DataFrame: Aggregated file behavior features per (user, pc, day).
         If return_identity_frame is True, returns a (features, identity_frame) tuple.
     """
     MERGE_COLS = ["user", "pc", "day"]
-    partial_aggs = []
-    identity_frames = []
-    hourly_frames = []
-    ts_frames = []  # minimal (user, pc, day, timestamp) for longest-run computation
+    partial_aggs = PartialAggregator(MERGE_COLS, fan_in=reduce_fan_in, memory_budget=partial_memory_budget)
+    identities = _distinct_accumulator(MERGE_COLS, "filename", distinct)
+    hourly = HourlyHistogram(MERGE_COLS)
+    # Activity runs (user, pc, day, run_start, run_end) for longest-run computation, merged as chunks arrive
+    run_frames = PartialAggregator(
+        MERGE_COLS, combine=partial(_merge_run_intervals, keys=MERGE_COLS),
+        fan_in=reduce_fan_in, memory_budget=partial_memory_budget,
+    )
+    hours_index = WorkHourIndex.from_table(user_work_hours, work_hours) if user_work_hours is not None else None
 
-    for i, chunk in enumerate(load_log_in_chunks(filepath, USECOLS_MAP["file"], DTYPE_MAP, chunksize), start=1):
+    chunks = iter_normalized_chunks(
+        filepath, "file", chunksize, after_day=after_day, prefetch=prefetch, prefetch_max_bytes=prefetch_max_bytes,
+    )
+    for i, chunk in enumerate(chunks, start=1):
         print(f"  File chunk {i}...")
-        chunk = normalize_shared_columns(chunk, sort=False)
 
         hour = chunk["timestamp"].dt.hour
         activity = chunk["activity"]
-        chunk["off_hours"] = _compute_off_hours(hour, chunk["user"], user_work_hours, work_hours)
+        chunk["off_hours"] = _compute_off_hours(hour, chunk["user"], hours_index, work_hours)
         chunk["is_late_night"] = (hour >= 22) | (hour < 5)
-        chunk["hour"] = hour
         chunk["is_open"]   = (activity == "File Open")
         chunk["is_write"]  = (activity == "File Write")
         chunk["is_copy"]   = (activity == "File Copy")
         chunk["is_delete"] = (activity == "File Delete")
 
-        partial = chunk.groupby(MERGE_COLS, observed=True, sort=False).agg(
+        agg_chunk = chunk.groupby(MERGE_COLS, observed=True, sort=False).agg(
             file_open_count=("is_open", "sum"),
             file_write_count=("is_write", "sum"),
             file_copy_count=("is_copy", "sum"),
@@ -760,35 +1571,26 @@ def extract_file_features_chunked(
             file_late_night_count=("is_late_night", "sum"),
         ).reset_index()
 
-        hourly_frames.append(
-            chunk.groupby(MERGE_COLS + ["hour"], observed=True, sort=False)
-            .size().rename("count").reset_index()
-        )
+        hourly.update(chunk, hour)
 
-        identity_frames.append(chunk[MERGE_COLS + ["filename"]].drop_duplicates())
-        ts_frames.append(chunk[MERGE_COLS + ["timestamp"]].copy())
-        partial_aggs.append(partial)
-        del chunk, partial
+        identities.update(chunk[MERGE_COLS + ["filename"]])
+        run_frames.add(_run_intervals(chunk, MERGE_COLS))
+        partial_aggs.add(agg_chunk)
+        del chunk, agg_chunk
         gc.collect()
 
-    print(f"  Combining {len(partial_aggs)} file chunks...")
-    combined = combine_partial_aggregations(partial_aggs, MERGE_COLS)
-    unique_files = build_unique_count(identity_frames, MERGE_COLS, "filename", "unique_files_accessed")
+    print(f"  Combining {partial_aggs.n_partials} file chunks {_accumulator_summary(partial_aggs, run_frames)}...")
+    combined = partial_aggs.result()
+    unique_files = identities.counts("unique_files_accessed")
     features = combined.merge(unique_files, on=MERGE_COLS, how="left")
 
-    all_hour_counts = combine_partial_aggregations(hourly_frames, MERGE_COLS + ["hour"])
-    subday = _compute_hourly_subday(all_hour_counts, MERGE_COLS, prefix="file")
-    all_ts = pd.concat(ts_frames, ignore_index=True)
-    subday_run = _compute_longest_run(all_ts, MERGE_COLS, prefix="file")
-    del all_ts
+    subday = hourly.to_frame(prefix="file")
+    subday_run = _longest_run_from_intervals([run_frames.result()], MERGE_COLS, prefix="file")
+    del run_frames
     features = features.merge(subday, on=MERGE_COLS, how="left").merge(subday_run, on=MERGE_COLS, how="left")
 
     if return_identity_frame:
-        file_identity = (
-            pd.concat(identity_frames, ignore_index=True)[["user", "day", "filename"]]
-            .drop_duplicates()
-        )
-        return features, file_identity
+        return features, identities.identity_frame()
 
     return features
 
@@ -796,7 +1598,7 @@ def extract_file_features_chunked(
 def extract_device_features(
     norm_df: pd.DataFrame,
     work_hours: tuple = (9, 17),
-    user_work_hours: pd.DataFrame | None = None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None" = None,
 ) -> pd.DataFrame:
     """
     Extracts daily removable media (USB) behavior features to create an aggregated feature table.
@@ -804,7 +1606,7 @@ def extract_device_features(
     Args:
         norm_df: Normalized device activity dataframe
         work_hours: Fallback population work-hour window used when user_work_hours is None
-        user_work_hours: Per-user schedule table from compute_user_work_hours()
+        user_work_hours: Per-user schedule table from compute_user_work_hours(), or its WorkHourIndex
 
     Returns:
         pd.DataFrame: Aggregated removable media behavior features per (user, pc, day)
@@ -823,8 +1625,9 @@ def extract_device_features(
     )
 
     KEYS = ["user", "pc", "day"]
+    grouped = df.groupby(KEYS, observed=True, sort=False)
     features = (
-        df.groupby(KEYS, observed=True, sort=False)
+        grouped
           .agg(
               usb_insert_count=("is_connect", "sum"),
               usb_remove_count=("is_disconnect", "sum"),
@@ -834,14 +1637,11 @@ def extract_device_features(
           .reset_index()
     )
 
-    hourly_counts = (
-        df.groupby(KEYS + ["hour"], observed=True, sort=False)
-        .size().rename("count").reset_index()
-    )
     # peak_hour_count skipped for device channel (low event volume per audit recommendation)
-    subday = _compute_hourly_subday(hourly_counts, KEYS, prefix="device", include_peak=False)
+    hourly = hourly_count_matrix(grouped.ngroup().to_numpy(), hour.to_numpy(), grouped.ngroups)
+    features = features.assign(**_hourly_subday_columns(hourly, prefix="device", include_peak=False))
     subday_run = _compute_longest_run(df, KEYS, prefix="device")
-    features = features.merge(subday, on=KEYS, how="left").merge(subday_run, on=KEYS, how="left")
+    features = features.merge(subday_run, on=KEYS, how="left")
 
     return features
 
@@ -851,38 +1651,53 @@ def extract_email_features_chunked(
     work_hours: tuple = (9, 17),
     chunksize: int = 50_000,
     return_identity_frame: bool = False,
-    user_work_hours: pd.DataFrame | None = None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None" = None,
+    after_day: pd.Timestamp | None = None,
+    distinct: str = "exact",
+    prefetch: int = DEFAULT_PREFETCH_DEPTH,
+    prefetch_max_bytes: int | None = None,
+    reduce_fan_in: int = DEFAULT_REDUCE_FAN_IN,
+    partial_memory_budget: int | None = None,
 ) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
     """
     Memory-efficient email feature extraction via chunked CSV reading.
 
-    Additive counts are accumulated per chunk then combined via `combine_partial_aggregations`.
-    Unique recipients are tracked via `build_unique_count`.
+    Additive counts are aggregated per chunk and tree-reduced as chunks arrive by a
+    `PartialAggregator`, so memory follows the number of groups rather than of chunks.
+    Unique recipients are tracked as hashed (group, recipient) pairs in an `IdentitySet`.
 
     Args:
-        filepath: Absolute path to email.csv
+        filepath: Absolute path to email.csv or its ingested Parquet dataset directory
         work_hours: Fallback population work-hour window used when user_work_hours is None
         chunksize: Number of rows per chunk
-        return_identity_frame: When True, returns a deduplicated (user, day, to) DataFrame
-        user_work_hours: Per-user schedule table from compute_user_work_hours()
+        return_identity_frame: When True, returns a hashed (user, day, to_hash) identity DataFrame
+        user_work_hours: Per-user schedule table from compute_user_work_hours(), or its WorkHourIndex
+        after_day: Optional watermark; only events on later days are aggregated (incremental builds)
+        distinct: "exact" hashed distinct counts, or "hll" HyperLogLog estimates (constant memory per group)
+        prefetch: Number of decoded chunks the background reader keeps ahead of aggregation (0 disables it)
+        prefetch_max_bytes: Optional cap on the in-memory size of the prefetched chunks
+        reduce_fan_in: Number of partial frames merged at a time by the `PartialAggregator`
+        partial_memory_budget: Optional size in bytes above which merged partials are spilled to disk
 
     Returns:
         pd.DataFrame: Aggregated email behavior features per (user, pc, day).
         If return_identity_frame is True, returns a (features, identity_frame) tuple.
     """
     MERGE_COLS = ["user", "pc", "day"]
-    partial_aggs = []
-    identity_frames = []
-    hourly_frames = []
+    partial_aggs = PartialAggregator(MERGE_COLS, fan_in=reduce_fan_in, memory_budget=partial_memory_budget)
+    identities = _distinct_accumulator(MERGE_COLS, "to", distinct)
+    hourly = HourlyHistogram(MERGE_COLS)
+    hours_index = WorkHourIndex.from_table(user_work_hours, work_hours) if user_work_hours is not None else None
 
-    for i, chunk in enumerate(load_log_in_chunks(filepath, USECOLS_MAP["email"], DTYPE_MAP, chunksize), start=1):
+    chunks = iter_normalized_chunks(
+        filepath, "email", chunksize, after_day=after_day, prefetch=prefetch, prefetch_max_bytes=prefetch_max_bytes,
+    )
+    for i, chunk in enumerate(chunks, start=1):
         print(f"  Email chunk {i}...")
-        chunk = normalize_shared_columns(chunk, sort=False)
 
         hour = chunk["timestamp"].dt.hour
-        chunk["off_hours"] = _compute_off_hours(hour, chunk["user"], user_work_hours, work_hours)
+        chunk["off_hours"] = _compute_off_hours(hour, chunk["user"], hours_index, work_hours)
         chunk["is_late_night"] = (hour >= 22) | (hour < 5)
-        chunk["hour"] = hour
 
         # External email heuristic
         chunk["external_emails_sent"] = ~chunk["to"].str.contains(INTERNAL_EMAIL_DOMAIN, na=False)
@@ -891,7 +1706,7 @@ def extract_email_features_chunked(
         chunk["has_attachment"] = chunk["attachments"].notnull()
 
         # Deriving email-related features per chunk
-        partial = chunk.groupby(MERGE_COLS, observed=True, sort=False).agg(
+        agg_chunk = chunk.groupby(MERGE_COLS, observed=True, sort=False).agg(
             emails_sent=("to", "count"),
             external_emails_sent=("external_emails_sent", "sum"),
             attachments_sent=("has_attachment", "sum"),
@@ -899,35 +1714,27 @@ def extract_email_features_chunked(
             email_late_night_count=("is_late_night", "sum"),
         ).reset_index()
 
-        # Per-chunk hourly counts (summable across chunks for entropy/peak computation)
-        hourly_frames.append(
-            chunk.groupby(MERGE_COLS + ["hour"], observed=True, sort=False)
-            .size().rename("count").reset_index()
-        )
+        # Per-chunk hourly counts, summed in place into the dense (group, hour) matrix
+        hourly.update(chunk, hour)
 
-        # Accumulating deduplicated tuples (user, pc, day, to) for unique recipient counting
-        identity_frames.append(chunk[MERGE_COLS + ["to"]].drop_duplicates())
-        partial_aggs.append(partial)
-        del chunk, partial
+        # Accumulating hashed (user, pc, day, to) pairs for unique recipient counting
+        identities.update(chunk[MERGE_COLS + ["to"]])
+        partial_aggs.add(agg_chunk)
+        del chunk, agg_chunk
 
     # Computes aggregation and unique count operations across all chunks
-    print(f"  Combining {len(partial_aggs)} email chunks...")
-    combined = combine_partial_aggregations(partial_aggs, MERGE_COLS)
-    unique_recipients = build_unique_count(identity_frames, MERGE_COLS, "to", "unique_recipients")
+    print(f"  Combining {partial_aggs.n_partials} email chunks {_accumulator_summary(partial_aggs)}...")
+    combined = partial_aggs.result()
+    unique_recipients = identities.counts("unique_recipients")
     features = combined.merge(unique_recipients, on=MERGE_COLS, how="left")
 
-    # Sub-day intensity features derived from combined hourly count frame
-    all_hour_counts = combine_partial_aggregations(hourly_frames, MERGE_COLS + ["hour"])
-    subday = _compute_hourly_subday(all_hour_counts, MERGE_COLS, prefix="email")
+    # Sub-day intensity features derived from the accumulated hourly count matrix
+    subday = hourly.to_frame(prefix="email")
     features = features.merge(subday, on=MERGE_COLS, how="left")
 
-    # Returns an additional frame consisting of (user, day, to) granularity
+    # Returns an additional frame at hashed (user, day, to) granularity
     if return_identity_frame:
-        email_identity = (
-            pd.concat(identity_frames, ignore_index=True)[["user", "day", "to"]]
-            .drop_duplicates()
-        )
-        return features, email_identity
+        return features, identities.identity_frame()
 
     return features
 
@@ -937,47 +1744,66 @@ def extract_http_features_chunked(
     work_hours: tuple = (9, 17),
     chunksize: int = 50_000,
     return_identity_frame: bool = False,
-    user_work_hours: pd.DataFrame | None = None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None" = None,
+    after_day: pd.Timestamp | None = None,
+    distinct: str = "exact",
+    domain_dictionary: "DomainDictionary | None" = None,
+    prefetch: int = DEFAULT_PREFETCH_DEPTH,
+    prefetch_max_bytes: int | None = None,
+    reduce_fan_in: int = DEFAULT_REDUCE_FAN_IN,
+    partial_memory_budget: int | None = None,
 ) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
     """
     Memory-efficient HTTP feature extraction via chunked CSV reading.
 
-    Additive counts are accumulated per chunk then combined via `combine_partial_aggregations`.
-    Unique domains visited are tracked via `build_unique_count`.
+    Additive counts are aggregated per chunk and tree-reduced as chunks arrive by a
+    `PartialAggregator`, so memory follows the number of groups rather than of chunks.
+    Hosts are extracted on Arrow string arrays and interned in a `DomainDictionary`, so the
+    domain category flags and identity hashes are array gathers on the domain codes.
+    Unique domains visited are tracked as hashed (group, domain) pairs in an `IdentitySet`.
 
     Args:
-        filepath: Absolute path to http.csv
+        filepath: Absolute path to http.csv or its ingested Parquet dataset directory
         work_hours: Fallback population work-hour window used when user_work_hours is None
         chunksize: Number of rows per chunk
-        return_identity_frame: When True, also returns a deduplicated (user, day, domain) DataFrame
-        user_work_hours: Per-user schedule table from compute_user_work_hours()
+        return_identity_frame: When True, also returns a hashed (user, day, domain_hash) identity DataFrame
+        user_work_hours: Per-user schedule table from compute_user_work_hours(), or its WorkHourIndex
+        after_day: Optional watermark; only events on later days are aggregated (incremental builds)
+        distinct: "exact" hashed distinct counts, or "hll" HyperLogLog estimates (constant memory per group)
+        domain_dictionary: Optional dictionary to intern domains into (e.g. one loaded with
+            `DomainDictionary.load`, to keep codes stable across runs); a fresh one otherwise
+        prefetch: Number of decoded chunks the background reader keeps ahead of aggregation (0 disables it)
+        prefetch_max_bytes: Optional cap on the in-memory size of the prefetched chunks
+        reduce_fan_in: Number of partial frames merged at a time by the `PartialAggregator`
+        partial_memory_budget: Optional size in bytes above which merged partials are spilled to disk
 
     Returns:
         pd.DataFrame: Aggregated web browsing features per (user, pc, day).
         If return_identity_frame is True, returns a (features, identity_frame) tuple.
     """
     MERGE_COLS = ["user", "pc", "day"]
-    partial_aggs = []
-    identity_frames = []
-    hourly_frames = []
-
-    for i, chunk in enumerate(load_log_in_chunks(filepath, USECOLS_MAP["http"], DTYPE_MAP, chunksize), start=1):
+    partial_aggs = PartialAggregator(MERGE_COLS, fan_in=reduce_fan_in, memory_budget=partial_memory_budget)
+    identities = _distinct_accumulator(MERGE_COLS, "domain", distinct)
+    domains = domain_dictionary if domain_dictionary is not None else DomainDictionary()
+    hourly = HourlyHistogram(MERGE_COLS)
+    hours_index = WorkHourIndex.from_table(user_work_hours, work_hours) if user_work_hours is not None else None
+
+    chunks = iter_normalized_chunks(
+        filepath, "http", chunksize, after_day=after_day, prefetch=prefetch, prefetch_max_bytes=prefetch_max_bytes,
+    )
+    for i, chunk in enumerate(chunks, start=1):
         print(f"  HTTP chunk {i}...")
-        chunk = normalize_shared_columns(chunk, sort=False)
 
         hour = chunk["timestamp"].dt.hour
-        chunk["off_hours"] = _compute_off_hours(hour, chunk["user"], user_work_hours, work_hours)
+        chunk["off_hours"] = _compute_off_hours(hour, chunk["user"], hours_index, work_hours)
         chunk["is_late_night"] = (hour >= 22) | (hour < 5)
-        chunk["hour"] = hour
-
-        # Vectorized URL normalization and domain extraction
-        url = chunk["url"].fillna("").astype(str).str.strip().str.lower()
-        chunk["url"] = url
-        chunk["url_length"] = url.str.len()
-        chunk["domain"] = (
-            url.str.replace(r"^https?://", "", regex=True)
-               .str.split("/", n=1).str[0]
-        )
+
+        # URL normalization and host extraction on Arrow strings; hosts are then
+        # interned so category flags and identity hashes are per-domain gathers
+        url_length, hosts = normalize_urls(chunk["url"])
+        domain_codes = domains.encode(hosts)
+        domain_flags = domains.flags[domain_codes]
+        chunk["url_length"] = url_length
 
         # Boolean flags
         activity = chunk["activity"]
@@ -985,15 +1811,14 @@ def extract_http_features_chunked(
         chunk["is_www_download"] = (activity == "WWW Download")
         chunk["is_www_upload"] = (activity == "WWW Upload")
 
-        domain = chunk["domain"]
-        chunk["is_job_site"] = domain.isin(JOB_DOMAINS)
-        chunk["is_cloud_storage"] = domain.isin(CLOUD_STORAGE_DOMAINS)
-        chunk["is_suspicious_domain"] = domain.isin(SUSPICIOUS_DOMAINS)
+        chunk["is_job_site"] = (domain_flags & DOMAIN_JOB_SITE) > 0
+        chunk["is_cloud_storage"] = (domain_flags & DOMAIN_CLOUD_STORAGE) > 0
+        chunk["is_suspicious_domain"] = (domain_flags & DOMAIN_SUSPICIOUS) > 0
         chunk["is_long_url"] = (chunk["url_length"] >= LONG_URL_THRESHOLD)
 
         # Grouping chunk and aggregating features
         agg_chunk = chunk.groupby(MERGE_COLS, observed=True, sort=False, dropna=False).agg(
-            http_total_requests=("url", "count"),
+            http_total_requests=("url_length", "count"),
             http_visit_count=("is_www_visit", "sum"),
             http_download_count=("is_www_download", "sum"),
             http_upload_count=("is_www_upload", "sum"),
@@ -1005,36 +1830,28 @@ def extract_http_features_chunked(
             http_late_night_count=("is_late_night", "sum"),
         ).reset_index()
 
-        # Per-chunk hourly counts (summable across chunks for entropy/peak computation)
-        hourly_frames.append(
-            chunk.groupby(MERGE_COLS + ["hour"], observed=True, sort=False)
-            .size().rename("count").reset_index()
-        )
+        # Per-chunk hourly counts, summed in place into the dense (group, hour) matrix
+        hourly.update(chunk, hour)
 
-        # Accumulating deduplicated tuples (user, pc, day, domain) for unique domain counting
-        identity_frames.append(chunk[MERGE_COLS + ["domain"]].drop_duplicates())
-        partial_aggs.append(agg_chunk)
+        # Accumulating hashed (user, pc, day, domain) pairs for unique domain counting
+        identities.update(chunk[MERGE_COLS], hashes=domains.hashes[domain_codes])
+        partial_aggs.add(agg_chunk)
         del chunk, agg_chunk
 
     # Computes aggregation and unique count operations across all chunks
-    print(f"  Combining {len(partial_aggs)} HTTP chunks...")
-    combined = combine_partial_aggregations(partial_aggs, MERGE_COLS)
+    print(f"  Combining {partial_aggs.n_partials} HTTP chunks {_accumulator_summary(partial_aggs)}...")
+    combined = partial_aggs.result()
     print("  Building unique count domains...")
-    unique_domains = build_unique_count(identity_frames, MERGE_COLS, "domain", "unique_domains_visited")
+    unique_domains = identities.counts("unique_domains_visited")
     features = combined.merge(unique_domains, on=MERGE_COLS, how="left")
 
-    # Sub-day intensity features derived from combined hourly count frame
-    all_hour_counts = combine_partial_aggregations(hourly_frames, MERGE_COLS + ["hour"])
-    subday = _compute_hourly_subday(all_hour_counts, MERGE_COLS, prefix="http")
+    # Sub-day intensity features derived from the accumulated hourly count matrix
+    subday = hourly.to_frame(prefix="http")
     features = features.merge(subday, on=MERGE_COLS, how="left")
 
-    # Returns an additional frame consisting of (user, day, domain) granularity
+    # Returns an additional frame at hashed (user, day, domain) granularity
     if return_identity_frame:
-        http_identity = (
-            pd.concat(identity_frames, ignore_index=True)[["user", "day", "domain"]]
-            .drop_duplicates()
-        )
-        return features, http_identity
+        return features, identities.identity_frame()
 
     return features
 
@@ -1063,8 +1880,10 @@ def merge_behavioral_features(feature_tables: list[pd.DataFrame], merge_cols: li
     # Identifying feature columns, excluding identifiers
     feature_cols = [col for col in merged_df.columns if col not in merge_cols]
 
-    # Filling missing feature values with zero
+    # Filling missing feature values with zero; the int32 step keeps the historical
+    # whole-number entropies before the compact schema dtypes are applied
     merged_df[feature_cols] = merged_df[feature_cols].fillna(0).astype("int32")
+    merged_df = enforce_schema(merged_df, feature_cols)
 
     # Sorting dataframe for consistency
     merged_df.sort_values(by=merge_cols, inplace=True)
@@ -1077,13 +1896,16 @@ def merge_behavioral_features(feature_tables: list[pd.DataFrame], merge_cols: li
     return merged_df
 
 
-def add_pc_features(df: pd.DataFrame, min_history: int=10) -> pd.DataFrame:
+def add_pc_features(df: pd.DataFrame, min_history: int=10, pc_history: pd.DataFrame | None=None) -> pd.DataFrame:
     """
     Adds PC-derived behavioral history to an aggregated behavioral matrix.
 
     Args:
         df: The behavioral matrix
         min_history: Minimum prior observations required before flagging new PC usage as abnormal activity
+        pc_history: Optional (user, pc, prior_use_count) table of Layer A row counts from earlier days
+            (see `build_pc_history`). When given, df is treated as the continuation of that history and
+            all counters resume from it instead of starting at zero.
 
     Returns:
         pd.DataFrame: A behavioral matrix with added user-to-PC behavioral history
@@ -1092,9 +1914,19 @@ def add_pc_features(df: pd.DataFrame, min_history: int=10) -> pd.DataFrame:
     df.sort_values(by=["user", "day", "pc"], inplace=True)
     df.reset_index(drop=True, inplace=True)
 
+    # Prior per-(user, pc) and per-user counts carried over from earlier builds
+    pair_offset, user_offset, distinct_offset = 0, 0, 0
+    if pc_history is not None:
+        history = pc_history.assign(user=pc_history["user"].astype(str), pc=pc_history["pc"].astype(str))
+        user_key, pc_key = df["user"].astype(str), df["pc"].astype(str)
+        pair_counts = history.set_index(["user", "pc"])["prior_use_count"]
+        pair_offset = pair_counts.reindex(pd.MultiIndex.from_arrays([user_key, pc_key])).fillna(0).to_numpy("int64")
+        user_offset = user_key.map(history.groupby("user")["prior_use_count"].sum()).fillna(0).to_numpy("int64")
+        distinct_offset = user_key.map(history.groupby("user").size()).fillna(0).to_numpy("int64")
+
     # Tracking historical PC usage counts
-    df["pc_prior_use_count"] = df.groupby(["user", "pc"], observed=True, sort=False).cumcount()
-    df["user_total_prior_days"] = df.groupby("user", observed=True, sort=False).cumcount()
+    df["pc_prior_use_count"] = df.groupby(["user", "pc"], observed=True, sort=False).cumcount() + pair_offset
+    df["user_total_prior_days"] = df.groupby("user", observed=True, sort=False).cumcount() + user_offset
     df["pc_seen_before"]  = (df["pc_prior_use_count"] > 0).astype(int)
 
     df["pc_prior_use_ratio"] = np.where(
@@ -1104,22 +1936,34 @@ def add_pc_features(df: pd.DataFrame, min_history: int=10) -> pd.DataFrame:
     )
 
     # Identifying a user's primary PC (i.e., most-used PC)
+    pc_counts = df.groupby(["user", "pc"], observed=True, sort=False).size().reset_index(name="count")
+    if pc_history is not None:
+        pc_counts = (
+            pd.concat([
+                pc_counts.astype({"user": str, "pc": str}),
+                history.rename(columns={"prior_use_count": "count"}),
+            ], ignore_index=True)
+            .groupby(["user", "pc"], as_index=False)["count"].sum()
+        )
     primary_pc_map = (
-        df.groupby(["user", "pc"], observed=True, sort=False)
-        .size()
-        .reset_index(name="count")
+        pc_counts
         .sort_values(["user", "count", "pc"], ascending=[True, False, True])
         .drop_duplicates(subset=["user"])
         .set_index("user")["pc"]
         .to_dict()
     )
 
-    df["pc_is_primary"] = (df["pc"] == df["user"].map(primary_pc_map).astype(df["pc"].dtype)).astype(int)
+    if pc_history is not None:
+        df["pc_is_primary"] = (df["pc"].astype(str) == df["user"].astype(str).map(primary_pc_map)).astype(int)
+    else:
+        df["pc_is_primary"] = (df["pc"] == df["user"].map(primary_pc_map).astype(df["pc"].dtype)).astype(int)
 
     # Tracking the number of distinct PCs previously used
     first_seen = ~df.duplicated(subset=["user", "pc"], keep="first")
+    if pc_history is not None:
+        first_seen &= pair_offset == 0
     df["distinct_pcs_used_prior"] = (
-        first_seen.groupby(df["user"], observed=True).cumsum() - first_seen.astype(int)
+        first_seen.groupby(df["user"], observed=True).cumsum() - first_seen.astype(int) + distinct_offset
     )
 
     # Tracking the number of unique PCs used on a given day
@@ -1141,6 +1985,114 @@ def add_pc_features(df: pd.DataFrame, min_history: int=10) -> pd.DataFrame:
     return df
 
 
+def build_pc_history(layer_a_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarizes a Layer A matrix into the per-(user, pc) row counts `add_pc_features` resumes from.
+
+    Args:
+        layer_a_df: Layer A dataset at the (user, pc, day) level
+
+    Returns:
+        pd.DataFrame: Columns [user, pc, prior_use_count] with string identifiers
+    """
+    return (
+        layer_a_df.groupby(["user", "pc"], observed=True)
+        .size()
+        .reset_index(name="prior_use_count")
+        .astype({"user": str, "pc": str, "prior_use_count": "int64"})
+    )
+
+
+# Channel extractors run by `build_layer_a`, in merge order. Logon and device take
+# a normalized DataFrame; the large sources take their CSV path and chunk internally.
+LAYER_A_CHANNELS = {
+    "logon":  extract_logon_features,
+    "file":   extract_file_features_chunked,
+    "device": extract_device_features,
+    "email":  extract_email_features_chunked,
+    "http":   extract_http_features_chunked,
+}
+
+# (nunique_frames key, identity value column) for channels that emit identity frames.
+# The frames carry the 64-bit hash of the value column as "<value column>_hash".
+LAYER_A_IDENTITY_COLS = {
+    "file":  ("unique_files_accessed", "filename"),
+    "email": ("unique_recipients", "to"),
+    "http":  ("unique_domains_visited", "domain"),
+}
+
+
+def _channel_source_path(cert_path: str, ingest_dir: str | None, name: str) -> str:
+    """The raw CSV of a channel, or its ingested dataset when only that exists."""
+    csv_path = os.path.join(cert_path, f"{name}.csv")
+    if ingest_dir is not None and not os.path.exists(csv_path):
+        return os.path.join(ingest_dir, name)
+    return csv_path
+
+
+def _channel_params(
+    name: str,
+    work_hours: tuple,
+    return_identity_frame: bool,
+    after_day: pd.Timestamp | None,
+    distinct: str,
+) -> dict:
+    """The `_extract_channel` parameters that affect a channel's output (its checkpoint key)."""
+    params = {"work_hours": list(work_hours), "after_day": None if after_day is None else str(after_day)}
+    if name in LARGE_FILE_SOURCES:
+        params["distinct"] = distinct
+    if name in LAYER_A_IDENTITY_COLS:
+        params["identity_frame"] = bool(return_identity_frame)
+    return params
+
+
+def _extract_channel(
+    name: str,
+    source: pd.DataFrame | str,
+    work_hours: tuple,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None",
+    return_identity_frame: bool,
+    after_day: pd.Timestamp | None=None,
+    distinct: str="exact",
+    prefetch: int=DEFAULT_PREFETCH_DEPTH,
+    prefetch_max_bytes: int | None=None,
+    partial_memory_budget: int | None=None,
+) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    """
+    Runs a single Layer A channel extractor. Kept at module level so it can be
+    dispatched to a worker process by `build_layer_a`.
+
+    Args:
+        name: Channel name (a key of LAYER_A_CHANNELS)
+        source: Normalized DataFrame (logon, device) or CSV path (chunked sources)
+        work_hours: Fallback population work-hour window
+        user_work_hours: Per-user schedule table from `compute_user_work_hours`, or the
+            WorkHourIndex built from it
+        return_identity_frame: Whether identity frames are requested for this run
+        after_day: Optional watermark passed to the chunked extractors (small sources
+            arrive already filtered)
+        distinct: Unique-count mode passed to the chunked extractors ("exact" or "hll")
+        prefetch: Chunk prefetch depth passed to the chunked extractors
+        prefetch_max_bytes: Prefetch memory cap passed to the chunked extractors
+        partial_memory_budget: Partial-aggregation spill threshold passed to the chunked extractors
+
+    Returns:
+        tuple: (features, identity_frame). identity_frame is None for channels without one
+            or when return_identity_frame is False.
+    """
+    extractor = LAYER_A_CHANNELS[name]
+    kwargs = {"user_work_hours": user_work_hours}
+    if name in LARGE_FILE_SOURCES:
+        kwargs["after_day"] = after_day
+        kwargs["distinct"] = distinct
+        kwargs["prefetch"] = prefetch
+        kwargs["prefetch_max_bytes"] = prefetch_max_bytes
+        kwargs["partial_memory_budget"] = partial_memory_budget
+    if name in LAYER_A_IDENTITY_COLS and return_identity_frame:
+        return extractor(source, work_hours, return_identity_frame=True, **kwargs)
+    return extractor(source, work_hours, **kwargs), None
+
+
 def build_layer_a(
     cert_path: str,
     work_hours: tuple=(9, 17),
@@ -1148,6 +2100,16 @@ def build_layer_a(
     compute_schedules: bool=True,
     schedule_min_history: int=30,
     save_schedule_to: str | None=None,
+    workers: int=1,
+    ingest_dir: str | None=None,
+    user_work_hours: pd.DataFrame | None=None,
+    after_day: pd.Timestamp | None=None,
+    pc_history: pd.DataFrame | None=None,
+    distinct: str="exact",
+    prefetch: int=DEFAULT_PREFETCH_DEPTH,
+    prefetch_max_bytes: int | None=None,
+    partial_memory_budget: int | None=None,
+    checkpoint_dir: str | None=None,
 ) -> pd.DataFrame | tuple[pd.DataFrame, dict]:
     """
     Builds the complete layer A drill-down-ready dataset at the (user, pc, day) level.
@@ -1157,19 +2119,46 @@ def build_layer_a(
         work_hours: Fallback population work-hour window
         return_nunique_frames: Returns a dict of identity frames needed
             by `collapse_layer()` to compute true (user, day) unique values at Layer B.
+            Frames hold (user, day, <value>_hash) rows with uint64 value hashes, or
+            (user, day, <value>_hll) estimated counts when distinct="hll".
         compute_schedules: Derives per-user work-hour envelopes from logon history
             and passes them to every extract function.
         schedule_min_history: Minimum prior logon-days required before a personal schedule is used.
         save_schedule_to: Optional file path (.parquet) to persist the per-user work-hour schedule
             table for use by live_simulation.py and offline retraining.
+        workers: Number of worker processes for channel extraction. 1 (default) runs the
+            channels serially in-process; N > 1 runs each channel extractor in its own
+            process, so wall-clock time approaches that of the slowest channel (HTTP).
+        ingest_dir: Optional root of the ingested Parquet datasets (see `ueba.features.ingest`);
+            sources with a current ingest skip CSV parsing.
+        user_work_hours: Optional precomputed per-user schedule table (e.g. the persisted
+            user_work_hours.parquet). When given, schedules are not re-derived from logon history.
+        after_day: Optional watermark day. Only events on later days are extracted, so an
+            incremental build costs time proportional to the new days (see ueba.features.incremental).
+        pc_history: Optional prior (user, pc) row counts passed to `add_pc_features` so PC history
+            counters continue from an earlier build.
+        distinct: "exact" (default) computes unique_files_accessed / unique_recipients /
+            unique_domains_visited exactly; "hll" uses per-group HyperLogLog sketches
+            (see ueba.features.hll) whose memory does not grow with the distinct values.
+        prefetch: Number of decoded chunks a background reader thread keeps ahead of the
+            chunked extractors' aggregation, so parsing overlaps with it (0 disables prefetching).
+        prefetch_max_bytes: Optional cap on the in-memory size of each extractor's prefetched chunks.
+        partial_memory_budget: Optional size in bytes of the merged per-chunk partials each chunked
+            extractor keeps in memory; beyond it, partials are spilled to temporary Parquet files.
+        checkpoint_dir: Optional directory of per-channel checkpoints (see ueba.features.checkpoint).
+            Each channel's output is saved there, and a re-run reuses the channels whose raw
+            source, work-hour schedules, parameters and extractor code are unchanged.
 
     Returns:
         pd.DataFrame: Layer A dataset at the (user, pc, day) level.
         If return_nunique_frames is True, returns a (layer_a_df, nunique_frames) tuple.
     """
+    if distinct not in DISTINCT_MODES:
+        raise ValueError(f"distinct must be one of {DISTINCT_MODES}, got {distinct!r}")
+
     # Loading the raw log files from the CERT dataset
     print("Loading raw CERT logs...")
-    raw_logs = load_raw_logs(cert_path)
+    raw_logs = load_raw_logs(cert_path, ingest_dir=ingest_dir, after_day=after_day)
 
     # Normalizing and validating files
     normalized_logs = {}
@@ -1181,51 +2170,87 @@ def build_layer_a(
             normalized_logs[name] = df["path"]
         else:
             print(f"  Normalizing {name}.csv...")
-            normalized_logs[name] = normalize_shared_columns(df)
+            normalized = normalize_shared_columns(df)
+            if after_day is not None:
+                normalized = normalized[normalized["day"] > after_day].reset_index(drop=True)
+            normalized_logs[name] = normalized
             gc.collect()
 
     # Deriving per-user work-hours
-    if compute_schedules:
+    if after_day is not None and user_work_hours is None and compute_schedules:
+        raise ValueError(
+            "Incremental builds (after_day) need the persisted user_work_hours table; "
+            "schedules cannot be derived from the new days alone."
+        )
+    if user_work_hours is None and compute_schedules:
         print("Deriving per-user work-hour schedules from logon history...")
         user_work_hours = compute_user_work_hours(normalized_logs["logon"], min_history=schedule_min_history)
         complete = user_work_hours["schedule_complete"].sum()
         print(f"  {complete}/{len(user_work_hours)} users have a personal schedule, the rest fall back to {work_hours}.")
+    # Indexed once; every channel and chunk then flags off-hours with one array gather
+    hours_index = WorkHourIndex.from_table(user_work_hours, work_hours) if user_work_hours is not None else None
+
+    # Reusing the channel checkpoints whose sources, schedules, parameters and code are unchanged
+    results, checkpoint_keys = {}, {}
+    if checkpoint_dir is not None:
+        fingerprint = hours_index.fingerprint() if hours_index is not None else None
+        for name in LAYER_A_CHANNELS:
+            checkpoint_keys[name] = channel_checkpoint_key(
+                name,
+                _channel_source_path(cert_path, ingest_dir, name),
+                LAYER_A_CHANNELS[name],
+                _channel_params(name, work_hours, return_nunique_frames, after_day, distinct),
+                fingerprint,
+                (_extract_channel, load_raw_logs, normalize_shared_columns),
+            )
+            cached = load_channel_checkpoint(checkpoint_dir, name, checkpoint_keys[name][0])
+            if cached is not None:
+                print(f"  {name} features: reusing checkpoint")
+                results[name] = cached
+    pending = [name for name in LAYER_A_CHANNELS if name not in results]
 
     # Extracting behavioral features per channel
-    if return_nunique_frames:
-        print("Extracting logon features...")
-        logon_ft = extract_logon_features(normalized_logs["logon"], work_hours, user_work_hours=user_work_hours)
-        print("Extracting file features (chunked)...")
-        file_features, file_id = extract_file_features_chunked(normalized_logs["file"], work_hours, return_identity_frame=True, user_work_hours=user_work_hours)
-        print("Extracting device (USB) features...")
-        device_ft = extract_device_features(normalized_logs["device"], work_hours, user_work_hours=user_work_hours)
-        print("Extracting email features (chunked)...")
-        email_features, email_id = extract_email_features_chunked(normalized_logs["email"], work_hours, return_identity_frame=True, user_work_hours=user_work_hours)
-        print("Extracting HTTP features (chunked)...")
-        http_features, http_id = extract_http_features_chunked(normalized_logs["http"], work_hours, return_identity_frame=True, user_work_hours=user_work_hours)
-
-        feature_tables = [logon_ft, file_features, device_ft, email_features, http_features]
+    if workers > 1 and len(pending) > 1:
+        print(f"Extracting channel features with {min(workers, len(pending))} worker processes...")
+        # HTTP dominates wall-clock, so it is submitted first to start immediately
+        order = sorted(pending, key=lambda name: name != "http")
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {
+                name: pool.submit(
+                    _extract_channel, name, normalized_logs[name],
+                    work_hours, hours_index, return_nunique_frames, after_day, distinct,
+                    prefetch, prefetch_max_bytes, partial_memory_budget,
+                )
+                for name in order
+            }
+            for name, future in futures.items():
+                results[name] = future.result()
+                if checkpoint_dir is not None:
+                    save_channel_checkpoint(checkpoint_dir, name, *checkpoint_keys[name], *results[name])
+                print(f"  {name} features done.")
     else:
-        print("Extracting logon features...")
-        logon_ft = extract_logon_features(normalized_logs["logon"], work_hours, user_work_hours=user_work_hours)
-        print("Extracting file features (chunked)...")
-        file_ft = extract_file_features_chunked(normalized_logs["file"], work_hours, user_work_hours=user_work_hours)
-        print("Extracting device (USB) features...")
-        device_ft = extract_device_features(normalized_logs["device"], work_hours, user_work_hours=user_work_hours)
-        print("Extracting email features (chunked)...")
-        email_ft = extract_email_features_chunked(normalized_logs["email"], work_hours, user_work_hours=user_work_hours)
-        print("Extracting HTTP features (chunked)...")
-        http_ft = extract_http_features_chunked(normalized_logs["http"], work_hours, user_work_hours=user_work_hours)
-
-        feature_tables = [logon_ft, file_ft, device_ft, email_ft, http_ft]
+        for name in pending:
+            print(f"Extracting {name} features...")
+            results[name] = _extract_channel(
+                name, normalized_logs[name], work_hours, hours_index, return_nunique_frames, after_day, distinct,
+                prefetch, prefetch_max_bytes, partial_memory_budget,
+            )
+            if checkpoint_dir is not None:
+                save_channel_checkpoint(checkpoint_dir, name, *checkpoint_keys[name], *results[name])
 
     # Merging the feature tables
+    feature_tables = [results[name][0] for name in LAYER_A_CHANNELS]
+    if after_day is not None and all(table.empty for table in feature_tables):
+        print(f"No events after {after_day:%Y-%m-%d}.")
+        empty = pd.DataFrame(columns=["user", "pc", "day"])
+        return (empty, {}) if return_nunique_frames else empty
+
     print("Merging behavioral feature tables...")
     behavioral_matrix = merge_behavioral_features(feature_tables)
 
     # Adding pc behavioral features
     print("Adding PC behavioral features...")
-    layer_a_matrix = add_pc_features(behavioral_matrix)
+    layer_a_matrix = enforce_schema(add_pc_features(behavioral_matrix, pc_history=pc_history))
     print(f"Layer A complete — {len(layer_a_matrix):,} rows, {len(layer_a_matrix.columns)} features.")
 
     # Saving work hours if specified
@@ -1235,10 +2260,10 @@ def build_layer_a(
         print(f"Per-user work-hour schedule saved to: {save_schedule_to}")
 
     if return_nunique_frames:
+        suffix = HLL_ESTIMATE_SUFFIX if distinct == "hll" else "_hash"
         nunique_frames = {
-            "unique_files_accessed": (file_id,  "filename"),
-            "unique_recipients": (email_id, "to"),
-            "unique_domains_visited": (http_id,  "domain"),
+            output_col: (results[name][1], f"{value_col}{suffix}")
+            for name, (output_col, value_col) in LAYER_A_IDENTITY_COLS.items()
         }
         return layer_a_matrix, nunique_frames
 
@@ -1247,7 +2272,8 @@ def build_layer_a(
 
 def save_dataset(dataset: pd.DataFrame, filename: str, output_dir: str=DEFAULT_OUTPUT_DIR) -> str:
     """
-    Saves the UEBA-enhanced dataset to the specified path as a CSV or Parquet file.
+    Saves the UEBA-enhanced dataset to the specified path as a CSV or Parquet file,
+    with its feature columns cast to the compact schema dtypes (ueba.features.schema).
 
     Args:
         dataset: The UEBA-enhanced dataset
@@ -1268,6 +2294,9 @@ def save_dataset(dataset: pd.DataFrame, filename: str, output_dir: str=DEFAULT_O
     # Creates full file path
     file_path = os.path.join(save_path, filename)
 
+    # Storing the feature columns with their compact schema dtypes
+    dataset = enforce_schema(dataset)
+
     # Saving the dataset
     if fmt == "csv":
         dataset.to_csv(file_path)
@@ -1284,7 +2313,9 @@ def save_nunique_frames(nunique_frames: dict, safepoint_dir: str) -> None:
 
     Saves each DataFrame in nunique_frames as a parquet file and writes a
     nunique_manifest.json recording the value_col string for each entry.
-    Use load_nunique_frames() to reconstruct the dict on restart.
+    Frames from build_layer_a() hold uint64 value hashes rather than strings,
+    so the safepoint stays compact. Use load_nunique_frames() to reconstruct
+    the dict on restart.
 
     Args:
         nunique_frames: Mapping of output column name → (source_df, value_col),
@@ -1333,6 +2364,22 @@ def load_nunique_frames(safepoint_dir: str) -> dict:
     return nunique_frames
 
 
+def split_cutoff_day(days: np.ndarray, split_ratio: float) -> pd.Timestamp:
+    """
+    Last training day of a chronological split: the day at position
+    int(n_days * split_ratio) of the sorted distinct days.
+
+    Args:
+        days: Distinct days of the dataset, in any order
+        split_ratio: The ratio to dedicate to model training
+
+    Returns:
+        pd.Timestamp: The cutoff day (rows on or before it are training rows)
+    """
+    unique_days = np.sort(np.asarray(days))
+    return pd.Timestamp(unique_days[int(len(unique_days) * split_ratio)])
+
+
 def chronological_split(
     csv_path: str | None=None,
     df: pd.DataFrame | None=None,
@@ -1365,9 +2412,7 @@ def chronological_split(
     df = df.sort_values("day")
 
     # Specifying cutoff day
-    unique_days = np.sort(df["day"].unique())
-    cutoff_index = int(len(unique_days) * split_ratio)
-    cutoff_day = unique_days[cutoff_index]
+    cutoff_day = split_cutoff_day(df["day"].unique(), split_ratio)
 
     train_df = df[df["day"] <= cutoff_day]
     test_df  = df[df["day"] > cutoff_day]
@@ -1514,7 +2559,8 @@ def collapse_layer(
         nunique_frames: Optional mapping of output column name → (source_df, value_col).
             For each entry, computes the true per-(user, day) nunique of value_col from
             the raw event DataFrame rather than summing per-PC nunique values, which would
-            overcount items appearing on multiple PCs.
+            overcount items appearing on multiple PCs. A value_col ending in "_hll" holds
+            precomputed per-(user, day) HyperLogLog estimates and is used as-is.
 
     Returns:
         pd.DataFrame: Layer B dataframe at the (user, day) level
@@ -1587,11 +2633,15 @@ def collapse_layer(
     if nunique_frames:
         print("  Recomputing true nunique counts from raw event frames...")
         for col_name, (source_df, value_col) in nunique_frames.items():
-            true_nunique = (
-                source_df.groupby(["user", "day"], observed=True, sort=False)[value_col]
-                .nunique()
-                .reset_index(name=col_name)
-            )
+            if value_col.endswith(HLL_ESTIMATE_SUFFIX):
+                # Already per-(user, day) counts (HyperLogLog estimates merged across PCs)
+                true_nunique = source_df[["user", "day", value_col]].rename(columns={value_col: col_name})
+            else:
+                true_nunique = (
+                    source_df.groupby(["user", "day"], observed=True, sort=False)[value_col]
+                    .nunique()
+                    .reset_index(name=col_name)
+                )
             layer_b_df = layer_b_df.merge(true_nunique, on=["user", "day"], how="left")
 
     # Renaming primary PC column
@@ -1655,56 +2705,36 @@ def apply_ueba_enhancements(
     df.sort_values(by=["user", "day"], inplace=True)
     df.reset_index(drop=True, inplace=True)
 
-    # Shifting all feature columns within each user group in one pass
-    print("  Computing per-user causal z-score deviations...")
-    shifted = df.groupby("user", observed=True, sort=False)[feature_cols].shift(1)
-    user_shifted = shifted.groupby(df["user"], observed=True, sort=False)
-
-    # Bounded trailing window for the primary z-score. Earlier insiders with sustained
-    # drift (e.g. CDE1846) were absorbed into an unbounded expanding mean within ~10 days;
-    # a 30-day window keeps the baseline stationary enough for sustained shifts to trip it.
-    prior_mean = (
-        user_shifted.rolling(window=zscore_window, min_periods=zscore_min_history).mean()
-        .reset_index(level=0, drop=True)
-    )
-    prior_std = (
-        user_shifted.rolling(window=zscore_window, min_periods=zscore_min_history).std()
-        .reset_index(level=0, drop=True)
-        .replace(0, np.nan)
-    )
-    z_scores = ((df[feature_cols] - prior_mean) / prior_std).fillna(0.0)
-    z_scores = z_scores.clip(-10, 10).astype("float32")
-    z_scores.columns = [f"{col}_zscore" for col in feature_cols]
-    df[z_scores.columns] = z_scores
-    del prior_mean, prior_std, z_scores
-
-    # Long-horizon z-score: 90-day window catches gradual shifts that outrun the 30-day window.
-    print("  Computing per-user long-horizon (90d) z-score deviations...")
-    prior_mean_90 = (
-        user_shifted.rolling(window=longhorizon_window, min_periods=longhorizon_min_history).mean()
-        .reset_index(level=0, drop=True)
-    )
-    prior_std_90 = (
-        user_shifted.rolling(window=longhorizon_window, min_periods=longhorizon_min_history).std()
-        .reset_index(level=0, drop=True)
-        .replace(0, np.nan)
-    )
-    z_scores_90 = ((df[feature_cols] - prior_mean_90) / prior_std_90).fillna(0.0)
-    z_scores_90 = z_scores_90.clip(-10, 10).astype("float32")
-    z_scores_90.columns = [f"{col}_zscore_90d" for col in feature_cols]
-    df[z_scores_90.columns] = z_scores_90
-    del prior_mean_90, prior_std_90, z_scores_90
-
-    # Computing temporal rolling deltas (legacy short window; retained for back-compat)
-    print("  Computing causal rolling mean deltas...")
-    prior_rolling = (
-        user_shifted.rolling(window=rolling_window, min_periods=1).mean()
-        .reset_index(level=0, drop=True)
-    )
-    rolling_deltas = (df[feature_cols] - prior_rolling).fillna(0.0).astype("float32")
-    rolling_deltas.columns = [f"{col}_rolling_delta" for col in feature_cols]
-    df[rolling_deltas.columns] = rolling_deltas
-    del prior_rolling, rolling_deltas, shifted, user_shifted
+    # All three families come from one pass of the batched rolling engine over the
+    # user-sorted feature block (ueba.features.rolling), one feature slice at a time.
+    # The 30-day window is bounded: earlier insiders with sustained drift (e.g. CDE1846)
+    # were absorbed into an unbounded expanding mean within ~10 days; a 30-day window
+    # keeps the baseline stationary enough for sustained shifts to trip it. The 90-day
+    # window catches gradual shifts that outrun the 30-day one; the short rolling delta
+    # is the legacy family retained for back-compat.
+    print("  Computing per-user causal z-scores (30d, 90d) and rolling mean deltas...")
+    values = df[feature_cols].to_numpy(dtype=np.float64)
+    n_rows, n_features = values.shape
+    z_scores = np.empty((n_rows, n_features), dtype=np.float32)
+    z_scores_90 = np.empty((n_rows, n_features), dtype=np.float32)
+    rolling_deltas = np.empty((n_rows, n_features), dtype=np.float32)
+    windows = [
+        (zscore_window, zscore_min_history),
+        (longhorizon_window, longhorizon_min_history),
+        (rolling_window, 1),
+    ]
+    for cols, (short, long, recent) in causal_window_moments(values, user_segment_starts(df["user"]), windows):
+        x = values[:, cols]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for out, moments in ((z_scores, short), (z_scores_90, long)):
+                std = np.where(moments.std == 0, np.nan, moments.std)
+                out[:, cols] = np.clip(np.nan_to_num((x - moments.mean) / std, nan=0.0), -10, 10)
+        rolling_deltas[:, cols] = np.nan_to_num(x - recent.mean, nan=0.0)
+    del values
+
+    for suffix, block in (("zscore", z_scores), ("zscore_90d", z_scores_90), ("rolling_delta", rolling_deltas)):
+        df[[f"{col}_{suffix}" for col in feature_cols]] = block
+    del z_scores, z_scores_90, rolling_deltas
 
     # Per-user history gate: true only once we have enough prior observations for a stable baseline.
     # Downstream risk banding must not promote to CRITICAL where baseline_complete is False.
@@ -1716,6 +2746,21 @@ def apply_ueba_enhancements(
 
     # Extracting off-hour columns
     print("  Adding cross-channel risk flags...")
+    return add_risk_flags(df, feature_cols)
+
+
+def add_risk_flags(df: pd.DataFrame, feature_cols: list) -> pd.DataFrame:
+    """
+    Adds the same-day cross-channel risk flags (off-hours activity, USB + file writes,
+    external email, job-site + USB, suspicious / cloud uploads, non-primary PC risk).
+
+    Args:
+        df: A layer B dataset at the (user, day) granularity
+        feature_cols: Base feature columns; the off-hours flag covers those starting with "off_hours"
+
+    Returns:
+        pd.DataFrame: df with the flag columns added in place
+    """
     off_hours_cols = [col for col in feature_cols if col.startswith("off_hours")]
 
     if off_hours_cols:
@@ -1750,7 +2795,9 @@ def _add_multihorizon_features(df: pd.DataFrame, feature_cols: list) -> pd.DataF
 
     All windows are shifted by 1 day to exclude the current day (no leakage).
     The ratio captures burst intensity: a value of 10 means the user did 10× their
-    monthly average on that single day.
+    monthly average on that single day. The sums for all features come from one
+    prefix-sum pass over the user-sorted feature block (`causal_window_sums`) and
+    are written into a single preallocated float32 block.
 
     Args:
         df: Layer B DataFrame sorted by (user, day).
@@ -1760,26 +2807,68 @@ def _add_multihorizon_features(df: pd.DataFrame, feature_cols: list) -> pd.DataF
         DataFrame with additional {col}_7d_sum, {col}_30d_sum, {col}_1d_over_30d_ratio columns.
     """
     df = df.sort_values(["user", "day"]).copy()
-    user_grp = df.groupby("user", observed=True, sort=False)
+    valid_cols = [c for c in feature_cols if c in df.columns]
+    x = df[valid_cols].to_numpy(dtype=np.float64)
+    starts = user_segment_starts(df["user"])
 
-    new_cols = {}
-    for col in feature_cols:
-        if col not in df.columns:
-            continue
-        shifted = user_grp[col].shift(1)
-        shifted_grp = shifted.groupby(df["user"], observed=True, sort=False)
+    # (rows, features, [7d sum, 30d sum, ratio]) flattens to the per-feature column order
+    block = np.empty((len(df), len(valid_cols), 3), dtype=np.float32)
+    sum_7d, sum_30d = causal_window_sums(x, starts, (7, 30))
+    block[:, :, 0] = sum_7d
+    block[:, :, 1] = sum_30d
+
+    # ε = 0.5 suppresses noise on near-zero baselines; clip bounds AE input magnitude
+    block[:, :, 2] = np.clip(x / (sum_30d / 30 + 0.5), 0, 50)
+
+    columns = [f"{col}_{suffix}" for col in valid_cols for suffix in ("7d_sum", "30d_sum", "1d_over_30d_ratio")]
+    new_cols = pd.DataFrame(block.reshape(len(df), -1), index=df.index, columns=columns)
+    return pd.concat([df, new_cols], axis=1)
+
+
+def _peer_groups(df: pd.DataFrame, ldap_df: pd.DataFrame, peer_col: str) -> pd.Series:
+    """Peer group of each row's user ("Unknown" for users missing from LDAP)."""
+    # load_ldap() now retains all snapshot rows so that build_user_profiles can compute
+    # is_active. Collapse to one row per user (latest snapshot wins) before mapping.
+    ldap_latest = ldap_df.sort_values("_snapshot").drop_duplicates(subset=["user"], keep="last") \
+        if "_snapshot" in ldap_df.columns \
+        else ldap_df.drop_duplicates(subset=["user"], keep="last")
+    role_map = ldap_latest.set_index("user")[peer_col].to_dict()
+    return df["user"].map(role_map).fillna("Unknown")
 
-        sum_7d = shifted_grp.rolling(window=7, min_periods=1).sum().reset_index(level=0, drop=True)
-        sum_30d = shifted_grp.rolling(window=30, min_periods=1).sum().reset_index(level=0, drop=True)
 
-        new_cols[f"{col}_7d_sum"] = sum_7d.astype("float32")
-        new_cols[f"{col}_30d_sum"] = sum_30d.astype("float32")
+def peer_cohort_totals(
+    df: pd.DataFrame,
+    feature_cols: list,
+    ldap_df: pd.DataFrame,
+    peer_col: str = "role",
+) -> pd.DataFrame:
+    """
+    Per-(peer_group, day) cohort totals of the features, the only cross-user input of
+    `apply_peer_group_enhancements`.
 
-        # ε = 0.5 suppresses noise on near-zero baselines; clip bounds AE input magnitude
-        daily_avg_30d = sum_30d / 30
-        new_cols[f"{col}_1d_over_30d_ratio"] = (df[col] / (daily_avg_30d + 0.5)).clip(0, 50).astype("float32")
+    Totals of disjoint user subsets (e.g. user shards) add up to the totals of their
+    union, so they can be computed shard by shard and summed with
+    `pd.concat(parts).groupby(level=[0, 1]).sum()`.
 
-    return pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
+    Args:
+        df: Layer B dataset at (user, day) granularity
+        feature_cols: Base feature columns to peer-baseline
+        ldap_df: Output of load_ldap(); must contain columns ["user", peer_col]
+        peer_col: Column in ldap_df that defines peer groups (default "role")
+
+    Returns:
+        pd.DataFrame: (peer_group, day)-indexed frame with ("sum" | "sq_sum" | "count", feature) columns
+    """
+    valid_cols = [c for c in feature_cols if c in df.columns]
+    x = df[valid_cols].to_numpy(dtype=np.float64)
+    present = ~np.isnan(x)
+    x0 = np.where(present, x, 0.0)
+    parts = {"sum": x0, "sq_sum": x0 ** 2, "count": present.astype(np.int64)}
+    frame = pd.concat(
+        {name: pd.DataFrame(block, columns=valid_cols, index=df.index) for name, block in parts.items()}, axis=1,
+    )
+    keys = [_peer_groups(df, ldap_df, peer_col).rename("peer_group"), df["day"]]
+    return frame.groupby(keys, observed=True, sort=False).sum()
 
 
 def apply_peer_group_enhancements(
@@ -1787,6 +2876,7 @@ def apply_peer_group_enhancements(
     feature_cols: list,
     ldap_df: pd.DataFrame,
     peer_col: str = "role",
+    cohort_totals: pd.DataFrame | None = None,
 ) -> pd.DataFrame:
     """
     Adds leave-one-out peer-group z-scores to a (user, day) behavioral matrix.
@@ -1796,60 +2886,99 @@ def apply_peer_group_enhancements(
     peer baseline. Columns are named ``{feature}_peer_zscore`` and clipped to [-10, 10]
     to match the convention used for per-user z-scores.
 
+    All features are handled in one pass: a single grouping of the rows by
+    (peer_group, day) yields per-cohort sum, sum-of-squares and count matrices, and
+    the leave-one-out arithmetic runs over the whole (rows, features) block.
+
     Args:
         df: Layer B dataset at (user, day) granularity with per-user z-scores already applied.
         feature_cols: Base feature columns to peer-baseline (the same list passed to
             apply_ueba_enhancements — excludes derived z-score / delta columns).
         ldap_df: Output of load_ldap(); must contain columns ["user", peer_col].
         peer_col: Column in ldap_df that defines peer groups (default "role").
+        cohort_totals: Optional `peer_cohort_totals` of the whole population. When df holds
+            only part of the users (a user shard), the cohorts are taken from these totals
+            instead of from df itself.
 
     Returns:
         pd.DataFrame: df with additional ``{feature}_peer_zscore`` columns appended.
     """
     df = df.copy()
-
-    # load_ldap() now retains all snapshot rows so that build_user_profiles can compute
-    # is_active. Collapse to one row per user (latest snapshot wins) before mapping.
-    ldap_latest = ldap_df.sort_values("_snapshot").drop_duplicates(subset=["user"], keep="last") \
-        if "_snapshot" in ldap_df.columns \
-        else ldap_df.drop_duplicates(subset=["user"], keep="last")
-    role_map = ldap_latest.set_index("user")[peer_col].to_dict()
-    df["_peer_group"] = df["user"].map(role_map).fillna("Unknown")
+    peer_group = _peer_groups(df, ldap_df, peer_col)
 
     valid_cols = [c for c in feature_cols if c in df.columns]
-
-    for col in valid_cols:
-        grp = df.groupby(["_peer_group", "day"], observed=True, sort=False)[col]
-
-        group_sum = grp.transform("sum")
-        group_count = grp.transform("count")
-
-        # Leave-one-out mean: exclude the current user's value
-        loo_count = (group_count - 1).clip(lower=0)
-        loo_sum = group_sum - df[col].fillna(0)
+    if not valid_cols or df.empty:
+        for col in valid_cols:
+            df[f"{col}_peer_zscore"] = np.zeros(len(df))
+        return df
+
+    x = df[valid_cols].to_numpy(dtype=np.float64)
+    present = ~np.isnan(x)
+    x0 = np.where(present, x, 0.0)
+
+    if cohort_totals is None:
+        codes = df.groupby([peer_group, df["day"]], observed=True, sort=False).ngroup().to_numpy()
+        # Per-cohort totals over the rows sorted by cohort code (every code in
+        # [0, n_cohorts) occurs, so row k of each reduceat is cohort k), broadcast back
+        order = np.argsort(codes, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+        group_sum = np.add.reduceat(x0[order], starts, axis=0)[codes]
+        group_sq_sum = np.add.reduceat(x0[order] ** 2, starts, axis=0)[codes]
+        group_count = np.add.reduceat(present[order].astype(np.int64), starts, axis=0)[codes]
+    else:
+        rows = cohort_totals.index.get_indexer(pd.MultiIndex.from_arrays([peer_group, df["day"]]))
+        if (rows < 0).any():
+            raise ValueError("cohort_totals has no entry for some (peer_group, day) cohorts of df")
+        group_sum = cohort_totals["sum"][valid_cols].to_numpy()[rows]
+        group_sq_sum = cohort_totals["sq_sum"][valid_cols].to_numpy()[rows]
+        group_count = cohort_totals["count"][valid_cols].to_numpy()[rows]
+
+    # Leave-one-out mean: exclude the current user's value
+    loo_count = np.maximum(group_count - 1, 0)
+    loo_sum = group_sum - x0
+    with np.errstate(invalid="ignore", divide="ignore"):
         loo_mean = np.where(loo_count > 0, loo_sum / loo_count, np.nan)
 
         # Leave-one-out std via variance decomposition
-        group_sq_sum = grp.transform(lambda x: (x ** 2).sum())
-        loo_sq_sum = group_sq_sum - df[col].fillna(0) ** 2
+        loo_sq_sum = group_sq_sum - x0 ** 2
         loo_var = np.where(
             loo_count > 1,
-            (loo_sq_sum - (loo_sum ** 2) / loo_count.clip(lower=1)) / (loo_count - 1).clip(lower=1),
+            (loo_sq_sum - (loo_sum ** 2) / np.maximum(loo_count, 1)) / np.maximum(loo_count - 1, 1),
             np.nan,
         )
         loo_std = np.sqrt(np.maximum(loo_var, 0))
+        zscore = np.where(loo_std > 0, (x - loo_mean) / loo_std, 0.0)
 
-        zscore = np.where(
-            loo_std > 0,
-            (df[col].values - loo_mean) / loo_std,
-            0.0,
-        )
-        df[f"{col}_peer_zscore"] = np.clip(zscore, -10, 10)
-
-    df.drop(columns=["_peer_group"], inplace=True)
+    df[[f"{col}_peer_zscore" for col in valid_cols]] = np.clip(zscore, -10, 10)
     return df
 
 
+def join_user_profiles(layer_b_df: pd.DataFrame, ldap_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Joins the LDAP profile columns (employee_name, department, role, supervisor,
+    functional_unit, role_sensitivity, is_active) onto a (user, day) matrix.
+
+    Args:
+        layer_b_df: Layer B dataset at (user, day) granularity
+        ldap_df: Output of load_ldap()
+
+    Returns:
+        pd.DataFrame: layer_b_df with the profile columns appended and defaults filled
+    """
+    user_profiles = build_user_profiles(ldap_df)
+    user_profiles["role_sensitivity"] = compute_role_sensitivity(
+        user_profiles["role"], user_profiles["department"]
+    )
+    layer_b_df = layer_b_df.merge(user_profiles, on="user", how="left")
+    layer_b_df["employee_name"] = layer_b_df["employee_name"].fillna(layer_b_df["user"])
+    for col in ["department", "role", "functional_unit"]:
+        layer_b_df[col] = layer_b_df[col].fillna("Unknown")
+    layer_b_df["supervisor"] = layer_b_df["supervisor"].where(layer_b_df["supervisor"].notna(), None)
+    layer_b_df["role_sensitivity"] = layer_b_df["role_sensitivity"].fillna(0.5).astype("float32")
+    layer_b_df["is_active"] = layer_b_df["is_active"].fillna(False).astype(bool)
+    return layer_b_df
+
+
 def build_layer_b(
     layer_a_df: pd.DataFrame,
     rolling_window: int = 5,
@@ -1886,18 +3015,9 @@ def build_layer_b(
 
         print("Joining LDAP user profiles (employee_name, department, role, supervisor, "
               "functional_unit, role_sensitivity, is_active)...")
-        user_profiles = build_user_profiles(ldap_df)
-        user_profiles["role_sensitivity"] = compute_role_sensitivity(
-            user_profiles["role"], user_profiles["department"]
-        )
-        layer_b_df = layer_b_df.merge(user_profiles, on="user", how="left")
-        layer_b_df["employee_name"] = layer_b_df["employee_name"].fillna(layer_b_df["user"])
-        for col in ["department", "role", "functional_unit"]:
-            layer_b_df[col] = layer_b_df[col].fillna("Unknown")
-        layer_b_df["supervisor"] = layer_b_df["supervisor"].where(layer_b_df["supervisor"].notna(), None)
-        layer_b_df["role_sensitivity"] = layer_b_df["role_sensitivity"].fillna(0.5).astype("float32")
-        layer_b_df["is_active"] = layer_b_df["is_active"].fillna(False).astype(bool)
+        layer_b_df = join_user_profiles(layer_b_df, ldap_df)
 
+    layer_b_df = enforce_schema(layer_b_df)
     print(f"Layer B complete — {len(layer_b_df):,} rows, {len(layer_b_df.columns)} features.")
     return layer_b_df
 
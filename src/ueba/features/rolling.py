@@ -0,0 +1,217 @@
+"""Batched causal rolling-window kernels for the Layer B derived features.
+
+The per-user windows of `apply_ueba_enhancements` (30 / 90-day z-scores, short
+rolling deltas) and `_add_multihorizon_features` (7 / 30-day sums) all look at
+the `window` rows *before* the current one within the same user. On a
+user-sorted (rows, features) block every such window is a row range
+[max(i - window, segment start), i), so windowed counts, sums and sums of
+squares are differences of column-wise prefix sums: one cumulative pass per
+feature block serves every window length at once, instead of a pandas
+`groupby().rolling()` pass per statistic and window.
+
+Variances use the shifted-data form: values are centred on their user's mean
+before the prefix sums, so sum-of-squares differences do not cancel
+catastrophically for large-valued features. Windows whose present values are
+all equal get their exact value as mean and a std of 0, as pandas' rolling
+kernels do (z-scores treat that std as undefined). Feature blocks are processed
+`block_cols` columns at a time to bound the size of the prefix arrays.
+"""
+
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BLOCK_COLS = 16
+
+
+class WindowMoments(NamedTuple):
+    """
+    Causal window statistics for a (rows, features) block; NaN where the window
+    holds fewer than `min_periods` present values.
+
+    Attributes:
+        count: int64 number of present values in the window (a read-only broadcast
+            view when the block has no NaNs)
+        total: float64 sum of the window
+        mean: float64 mean of the window
+        std: float64 sample std (ddof=1) of the window, NaN for a single value
+    """
+
+    count: np.ndarray
+    total: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+
+
+def user_segment_starts(users: pd.Series) -> np.ndarray:
+    """Start row of each run of equal users in a user-sorted column."""
+    values = users.to_numpy()
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+
+
+def _segment_ids(segment_starts: np.ndarray, n: int) -> np.ndarray:
+    """Segment number of each of the n rows."""
+    return np.repeat(np.arange(len(segment_starts)), np.diff(np.r_[segment_starts, n]))
+
+
+def _prefix(block: np.ndarray, order: str="F") -> np.ndarray:
+    """
+    Cumulative sum over rows with a leading zero row (prefix[i] = sum of rows < i).
+    Column-major makes the cumulative pass faster, row-major the row gathers.
+    """
+    prefix = np.zeros((len(block) + 1, block.shape[1]), dtype=block.dtype, order=order)
+    np.cumsum(block, axis=0, out=prefix[1:])
+    return prefix
+
+
+def _runs(block: np.ndarray, segment_start: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Runs of equal present values within each segment (NaN cells are skipped, so a
+    run continues across them).
+
+    Returns:
+        tuple: (first row of the run holding the latest present value at or before
+            each cell, that latest present value; NaN before the segment's first value)
+    """
+    n, width = block.shape
+    rows = np.arange(n)[:, None]
+    present = ~np.isnan(block)
+    if present.all():
+        starts_run = np.ones((n, width), dtype=bool)
+        starts_run[1:] = (block[1:] != block[:-1]) | (segment_start[1:, None] == rows[1:])
+        return np.maximum.accumulate(np.where(starts_run, rows, 0), axis=0), block
+
+    # Row of the latest present value at or before each row, within the segment
+    last_present = np.maximum.accumulate(np.where(present, rows, -1), axis=0)
+    last_present[last_present < segment_start[:, None]] = -1
+    prev_present = np.full((n, width), -1, dtype=np.int64)
+    prev_present[1:] = last_present[:-1]
+    prev_present[prev_present < segment_start[:, None]] = -1
+
+    prev_value = np.take_along_axis(block, np.maximum(prev_present, 0), axis=0)
+    starts_run = present & ((prev_present < 0) | (block != prev_value))
+    run_start = np.maximum.accumulate(np.where(starts_run, rows, 0), axis=0)
+    last_value = np.where(last_present >= 0, np.take_along_axis(block, np.maximum(last_present, 0), axis=0), np.nan)
+    return run_start, last_value
+
+
+def causal_window_sums(values: np.ndarray, segment_starts: np.ndarray, windows: tuple) -> list:
+    """
+    Sums of the previous `window` rows within each segment, excluding the current row
+    (the shift(1) + rolling(window, min_periods=1).sum() of the batch code).
+
+    Args:
+        values: float (rows, features) block sorted by segment
+        segment_starts: First row of each segment, ascending, starting at 0
+        windows: Window lengths (number of preceding rows) to sum over
+
+    Returns:
+        list: One float64 (rows, features) array of window sums per window length,
+            NaN where the window holds no values
+    """
+    n = len(values)
+    present = ~np.isnan(values)
+    has_nan = not present.all()
+    prefix = _prefix(np.where(present, values, 0.0) if has_nan else values.astype(np.float64))
+    if has_nan:
+        count = _prefix(present.astype(np.int64))
+
+    rows = np.arange(n)
+    segment_start = segment_starts[_segment_ids(segment_starts, n)]
+    sums = []
+    for window in windows:
+        lo = np.maximum(rows - window, segment_start)
+        window_sum = prefix[:n] - prefix[lo]
+        # Without NaNs only a segment's first row has an empty window
+        window_sum[count[:n] == count[lo] if has_nan else lo == rows] = np.nan
+        sums.append(window_sum)
+    return sums
+
+
+def causal_window_moments(
+    values: np.ndarray,
+    segment_starts: np.ndarray,
+    windows: list,
+    block_cols: int=DEFAULT_BLOCK_COLS,
+) -> Iterator[tuple[slice, list[WindowMoments]]]:
+    """
+    Causal windowed count / sum / mean / std for several window lengths in one pass
+    over a user-sorted feature block.
+
+    The window of row i covers the up to `window` rows before it in the same segment
+    (the shift(1) + rolling(window, min_periods) of the batch code).
+
+    Args:
+        values: float (rows, features) block sorted by segment
+        segment_starts: First row of each segment, ascending, starting at 0
+        windows: (window, min_periods) pairs
+        block_cols: Number of feature columns processed per slice
+
+    Yields:
+        tuple: (column slice of `values`, one WindowMoments per entry of `windows`)
+    """
+    n, width = values.shape
+    rows = np.arange(n)
+    segment_id = _segment_ids(segment_starts, n)
+    segment_start = segment_starts[segment_id]
+    bounds = [np.maximum(rows - window, segment_start) for window, _ in windows]
+    # Row holding the last value of each window (row 0's window is empty regardless)
+    last = np.maximum(rows - 1, 0)
+
+    for first in range(0, width, block_cols):
+        cols = slice(first, min(first + block_cols, width))
+        block = np.asarray(values[:, cols], dtype=np.float64)
+        present = ~np.isnan(block)
+        has_nan = not present.all()
+        filled = np.where(present, block, 0.0) if has_nan else block
+        count = _prefix(present.astype(np.int64), order="C") if has_nan else None
+
+        # Shifted data: centre each user's values on the user mean before accumulating
+        if n:
+            seg_total = np.add.reduceat(filled, segment_starts, axis=0)
+            seg_count = np.add.reduceat(present, segment_starts, axis=0, dtype=np.int64)
+            shift = (seg_total / np.maximum(seg_count, 1))[segment_id]
+        else:
+            shift = filled
+        centred = np.where(present, block - shift, 0.0)
+        total = _prefix(centred, order="C")
+        total_sq = _prefix(centred * centred, order="C")
+        del centred, filled, present
+        run_start, last_value = _runs(block, segment_start)
+        run_start, last_value = run_start[last], last_value[last]
+
+        moments = []
+        for (_, min_periods), lo in zip(windows, bounds):
+            lo_col = lo[:, None]
+            if has_nan:
+                count_lo = count[lo]
+                w_count = count[:n] - count_lo
+            else:
+                # Every row of the window is present, so one count serves all columns
+                w_count = (rows - lo)[:, None]
+            w_sum = total[:n] - total[lo]
+            w_sq = total_sq[:n] - total_sq[lo]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = w_sum / w_count
+                std = np.sqrt(np.maximum((w_sq - w_sum * mean) / (w_count - 1), 0.0))
+
+            # Constant window: no present value between the window start and the start
+            # of the run holding the window's last present value
+            if has_nan:
+                run_lo = np.maximum(run_start, lo_col)
+                constant = (w_count > 0) & (np.take_along_axis(count, run_lo, axis=0) == count_lo)
+            else:
+                constant = (w_count > 0) & (run_start <= lo_col)
+
+            enough = w_count >= min_periods
+            moments.append(WindowMoments(
+                count=np.broadcast_to(w_count, block.shape),
+                total=np.where(enough, w_sum + shift * w_count, np.nan),
+                mean=np.where(enough, np.where(constant, last_value, mean + shift), np.nan),
+                std=np.where(enough & (w_count > 1), np.where(constant, 0.0, std), np.nan),
+            ))
+        yield cols, moments
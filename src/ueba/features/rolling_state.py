@@ -0,0 +1,287 @@
+"""Per-user rolling-statistics state for the causal Layer B windows.
+
+`apply_ueba_enhancements` and `_add_multihorizon_features` derive their
+z-scores, rolling deltas and window sums from pandas `groupby().rolling()`
+passes over the whole (user, day) matrix. Every one of those windows is causal
+and looks back at most `longhorizon_window` (90) rows, so the state needed to
+featurize the *next* day is just the last 90 base-feature rows per user.
+
+`RollingFeatureState` keeps that state as one ring buffer of shape
+(users, capacity, features) plus a per-user row counter, persisted as `.npy`
+arrays next to a small JSON header. `zscore` / `window_sums` featurize one
+day's rows in O(users x capacity x features) without touching the history, and
+`update` pushes the rows in afterwards. The outputs reproduce the batch code:
+the same window lengths, min-period gates, ddof=1 standard deviation, zero-std
+handling, clipping and float32 casts.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+ROLLING_STATE_VERSION = 1
+ROLLING_STATE_META_FILE = "rolling_state.json"
+ROLLING_STATE_VALUES_FILE = "rolling_values.npy"
+ROLLING_STATE_COUNTS_FILE = "rolling_n_seen.npy"
+_WINDOW_PARAMS = (
+    "capacity", "rolling_window", "zscore_window", "zscore_min_history",
+    "longhorizon_window", "longhorizon_min_history",
+)
+
+
+def _window_stats(values: np.ndarray, min_periods: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and sample std (ddof=1) over axis 1 of a NaN-padded (rows, window, features)
+    block, NaN where fewer than `min_periods` values are present. Constant windows
+    get their exact value as mean and a std of 0, as pandas' rolling kernels do.
+    """
+    present = ~np.isnan(values)
+    count = present.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(values, axis=1) / count
+        sq_dev = np.nansum((values - mean[:, None, :]) ** 2, axis=1)
+        std = np.sqrt(sq_dev / (count - 1))
+
+    hi = np.where(present, values, -np.inf).max(axis=1)
+    lo = np.where(present, values, np.inf).min(axis=1)
+    constant = (count > 0) & (hi == lo)
+    mean = np.where(constant, hi, mean)
+    std = np.where(constant & (count > 1), 0.0, std)
+
+    enough = count >= min_periods
+    return np.where(enough, mean, np.nan), np.where(enough, std, np.nan)
+
+
+class RollingFeatureState:
+    """
+    Ring buffers of the last `capacity` Layer B rows per user for a fixed list of
+    base features.
+
+    Rows are pushed one day at a time with `update`; `zscore` and `window_sums`
+    read the buffered history to featurize a day's rows *before* they are pushed,
+    mirroring the shift(1) in the batch code.
+
+    Attributes:
+        feature_cols: Base feature columns, in buffer order
+        users: User ids, in buffer order
+        values: float64 array (users, capacity, features); row k of a user lives at k % capacity
+        n_seen: int64 array (users,) with the total rows pushed per user
+    """
+
+    def __init__(
+        self,
+        feature_cols: list,
+        capacity: int=90,
+        rolling_window: int=5,
+        zscore_window: int=30,
+        zscore_min_history: int=14,
+        longhorizon_window: int=90,
+        longhorizon_min_history: int=30,
+    ):
+        if max(rolling_window, zscore_window, longhorizon_window, 30) > capacity:
+            raise ValueError(f"capacity={capacity} is smaller than the longest rolling window")
+        self.feature_cols = list(feature_cols)
+        self.capacity = capacity
+        self.rolling_window = rolling_window
+        self.zscore_window = zscore_window
+        self.zscore_min_history = zscore_min_history
+        self.longhorizon_window = longhorizon_window
+        self.longhorizon_min_history = longhorizon_min_history
+
+        self.users: list[str] = []
+        self._user_index: dict[str, int] = {}
+        self.values = np.zeros((0, capacity, len(self.feature_cols)), dtype=np.float64)
+        self.n_seen = np.zeros(0, dtype=np.int64)
+
+    def _lookup(self, users: pd.Series, add: bool=False) -> np.ndarray:
+        """Buffer row of each user (-1 for unknown users unless `add` registers them)."""
+        keys = users.astype(str).to_numpy()
+        if add:
+            new_users = [u for u in pd.unique(keys) if u not in self._user_index]
+            if new_users:
+                for user in new_users:
+                    self._user_index[user] = len(self.users)
+                    self.users.append(user)
+                grow = len(new_users)
+                self.values = np.concatenate(
+                    [self.values, np.zeros((grow, self.capacity, len(self.feature_cols)))], axis=0
+                )
+                self.n_seen = np.concatenate([self.n_seen, np.zeros(grow, dtype=np.int64)])
+        return np.array([self._user_index.get(u, -1) for u in keys], dtype=np.int64)
+
+    def _day_matrix(self, day_rows: pd.DataFrame) -> np.ndarray:
+        missing = set(self.feature_cols).difference(day_rows.columns)
+        if missing:
+            raise ValueError(f"Day rows are missing feature column(s): {sorted(missing)}")
+        if day_rows["user"].duplicated().any():
+            raise ValueError("Day rows must hold at most one row per user")
+        return day_rows[self.feature_cols].to_numpy(dtype=np.float64)
+
+    def _seen(self, idx: np.ndarray) -> np.ndarray:
+        """Rows already pushed for each buffer row in idx (0 for -1)."""
+        if not self.users:
+            return np.zeros(len(idx), dtype=np.int64)
+        return np.where(idx >= 0, self.n_seen[np.maximum(idx, 0)], 0)
+
+    def _window(self, idx: np.ndarray, width: int) -> np.ndarray:
+        """The last `width` buffered rows for each user in idx, NaN-padded at the front."""
+        pos = self._seen(idx)[:, None] + np.arange(-width, 0)
+        if not self.users:
+            return np.full((len(idx), width, len(self.feature_cols)), np.nan)
+        block = self.values[np.maximum(idx, 0)[:, None], pos % self.capacity]
+        return np.where((pos >= 0)[:, :, None], block, np.nan)
+
+    def prior_rows(self, users: pd.Series) -> np.ndarray:
+        """Rows already pushed for each user (0 for unknown users)."""
+        return self._seen(self._lookup(users))
+
+    def zscore(self, day_rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Causal per-user deviations of one day's rows against the buffered history.
+
+        Args:
+            day_rows: At most one row per user with "user" and the base feature columns
+
+        Returns:
+            pd.DataFrame: {col}_zscore, {col}_zscore_90d and {col}_rolling_delta columns
+                (float32, in that block order) plus `baseline_complete`, indexed like day_rows
+        """
+        x = self._day_matrix(day_rows)
+        idx = self._lookup(day_rows["user"])
+        out = {}
+
+        for suffix, width, min_periods in (
+            ("zscore", self.zscore_window, self.zscore_min_history),
+            ("zscore_90d", self.longhorizon_window, self.longhorizon_min_history),
+        ):
+            mean, std = _window_stats(self._window(idx, width), min_periods)
+            std[std == 0] = np.nan
+            with np.errstate(invalid="ignore"):
+                z = np.clip(np.nan_to_num((x - mean) / std, nan=0.0), -10, 10)
+            z = z.astype(np.float32)
+            for j, col in enumerate(self.feature_cols):
+                out[f"{col}_{suffix}"] = z[:, j]
+
+        mean, _ = _window_stats(self._window(idx, self.rolling_window), 1)
+        delta = np.nan_to_num(x - mean, nan=0.0).astype(np.float32)
+        for j, col in enumerate(self.feature_cols):
+            out[f"{col}_rolling_delta"] = delta[:, j]
+
+        out["baseline_complete"] = self.prior_rows(day_rows["user"]) >= self.zscore_min_history
+        return pd.DataFrame(out, index=day_rows.index)
+
+    def window_sums(self, day_rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Causal 7-day / 30-day sums and the 1-day-over-30-day ratio of one day's rows
+        (see `_add_multihorizon_features`); NaN for users without history.
+
+        Args:
+            day_rows: At most one row per user with "user" and the base feature columns
+
+        Returns:
+            pd.DataFrame: {col}_7d_sum, {col}_30d_sum, {col}_1d_over_30d_ratio per feature
+                (float32), indexed like day_rows
+        """
+        x = self._day_matrix(day_rows)
+        idx = self._lookup(day_rows["user"])
+        sums = {}
+        for width in (7, 30):
+            block = self._window(idx, width)
+            total = np.nansum(block, axis=1)
+            sums[width] = np.where((~np.isnan(block)).any(axis=1), total, np.nan)
+        ratio = np.clip(x / (sums[30] / 30 + 0.5), 0, 50)
+
+        out = {}
+        for j, col in enumerate(self.feature_cols):
+            out[f"{col}_7d_sum"] = sums[7][:, j].astype(np.float32)
+            out[f"{col}_30d_sum"] = sums[30][:, j].astype(np.float32)
+            out[f"{col}_1d_over_30d_ratio"] = ratio[:, j].astype(np.float32)
+        return pd.DataFrame(out, index=day_rows.index)
+
+    def update(self, day_rows: pd.DataFrame) -> None:
+        """Pushes one day's rows (at most one per user) into the ring buffers."""
+        x = self._day_matrix(day_rows)
+        idx = self._lookup(day_rows["user"], add=True)
+        self.values[idx, self.n_seen[idx] % self.capacity] = x
+        self.n_seen[idx] += 1
+
+    @classmethod
+    def from_layer_b(cls, layer_b_df: pd.DataFrame, feature_cols: list, **params) -> "RollingFeatureState":
+        """
+        Bootstraps the state from a full Layer B build.
+
+        Args:
+            layer_b_df: Layer B dataset with "user", "day" and the base feature columns
+            feature_cols: Base feature columns to track
+            **params: Window parameters forwarded to the constructor
+
+        Returns:
+            RollingFeatureState: State positioned after each user's last row
+        """
+        state = cls(feature_cols, **params)
+        state.add_history(layer_b_df)
+        return state
+
+    def add_history(self, layer_b_df: pd.DataFrame) -> None:
+        """
+        Fills the buffers of new users from their full Layer B history, e.g. one
+        user shard of a sharded build at a time.
+
+        Args:
+            layer_b_df: Every Layer B row of its users, with "user", "day" and the base feature columns
+
+        Raises:
+            ValueError: If one of the users is already in the state
+        """
+        df = layer_b_df[["user", "day"] + self.feature_cols].astype({"user": str}).sort_values(["user", "day"])
+        known = [user for user in pd.unique(df["user"]) if user in self._user_index]
+        if known:
+            raise ValueError(f"Users already hold a history in the rolling state: {known[:5]}")
+        first = len(self.users)
+        idx = self._lookup(df["user"], add=True)
+        k = df.groupby("user", sort=False).cumcount().to_numpy()
+        n_rows = np.bincount(idx, minlength=len(self.users))
+        keep = k >= n_rows[idx] - self.capacity
+        self.values[idx[keep], k[keep] % self.capacity] = df[self.feature_cols].to_numpy(dtype=np.float64)[keep]
+        self.n_seen[first:] = n_rows[first:]
+
+    def save(self, state_dir: str) -> None:
+        """Writes the ring buffers and row counters as .npy plus a JSON header."""
+        os.makedirs(state_dir, exist_ok=True)
+        np.save(os.path.join(state_dir, ROLLING_STATE_VALUES_FILE), self.values)
+        np.save(os.path.join(state_dir, ROLLING_STATE_COUNTS_FILE), self.n_seen)
+        meta = {
+            "version": ROLLING_STATE_VERSION,
+            "feature_cols": self.feature_cols,
+            "users": self.users,
+            **{key: getattr(self, key) for key in _WINDOW_PARAMS},
+        }
+        with open(os.path.join(state_dir, ROLLING_STATE_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, state_dir: str, mmap: bool=False) -> "RollingFeatureState":
+        """
+        Reads a state written by `save`.
+
+        Args:
+            state_dir: Directory holding the state files
+            mmap: Memory-map the ring buffer read-only (for scoring without updates)
+
+        Returns:
+            RollingFeatureState: The restored state
+        """
+        with open(os.path.join(state_dir, ROLLING_STATE_META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != ROLLING_STATE_VERSION:
+            raise ValueError(
+                f"Rolling state at {state_dir} has version {meta.get('version')}, expected {ROLLING_STATE_VERSION}"
+            )
+        state = cls(meta["feature_cols"], **{key: meta[key] for key in _WINDOW_PARAMS})
+        state.users = list(meta["users"])
+        state._user_index = {user: i for i, user in enumerate(state.users)}
+        state.values = np.load(os.path.join(state_dir, ROLLING_STATE_VALUES_FILE), mmap_mode="r" if mmap else None)
+        state.n_seen = np.load(os.path.join(state_dir, ROLLING_STATE_COUNTS_FILE))
+        return state
@@ -0,0 +1,134 @@
+"""Compact dtype schema for the Layer A and Layer B matrices.
+
+`merge_behavioral_features` used to leave every channel feature as int32, the
+PC features as int64 / float64, the peer z-scores as float64 and the other
+derived families as float32, so the 414-column Layer B matrix was stored and
+loaded at up to 8 bytes per cell. The schema assigns each column family the
+narrowest dtype that holds its values:
+
+- counts (event counts, peak-hour counts, run minutes, PC counts): uint16
+- binary flags (PC history flags, same-day risk flags): uint8
+- scores (entropies, distinct-value estimates, ratios, window sums,
+  z-scores, rolling deltas): float32
+
+float32 rather than float16 is used for the scores: z-scores and deltas span
+several orders of magnitude and float16 keeps barely three significant digits.
+Identifier, LDAP profile and boolean gating columns are not part of the schema
+and keep their dtype.
+
+`enforce_schema` casts a frame to the schema and refuses casts that would lose
+values (NaN, fractional or out-of-range values in an integer family).
+`unregistered_feature_columns` lets the model matrix reject feature columns
+the schema does not know.
+"""
+
+import numpy as np
+import pandas as pd
+
+COUNT_DTYPE = np.dtype(np.uint16)
+FLAG_DTYPE = np.dtype(np.uint8)
+SCORE_DTYPE = np.dtype(np.float32)
+
+COUNT_COLS = frozenset({
+    # logon
+    "logon_count", "logoff_count", "off_hours_logon", "logon_late_night_count",
+    "logon_peak_hour_count", "logon_longest_active_run_minutes",
+    # file
+    "file_open_count", "file_write_count", "file_copy_count", "file_delete_count",
+    "off_hours_files_accessed", "file_late_night_count", "file_peak_hour_count",
+    "file_longest_active_run_minutes",
+    # device
+    "usb_insert_count", "usb_remove_count", "off_hours_usb_usage", "device_late_night_count",
+    "device_longest_active_run_minutes",
+    # email
+    "emails_sent", "external_emails_sent", "attachments_sent", "off_hours_emails",
+    "email_late_night_count", "email_peak_hour_count",
+    # http
+    "http_total_requests", "http_visit_count", "http_download_count", "http_upload_count",
+    "http_jobsite_visits", "http_cloud_storage_visits", "http_suspicious_site_visits",
+    "off_hours_http_requests", "http_long_url_count", "http_late_night_count", "http_peak_hour_count",
+    # PC context (Layer A) and cross-PC sums (Layer B; the *_flag names are per-day sums)
+    "pc_prior_use_count", "distinct_pcs_used_prior", "n_pcs_used_today", "pcs_used_count",
+    "non_primary_pc_used_flag", "non_primary_pc_http_requests_flag",
+    "non_primary_pc_usb_flag", "non_primary_pc_file_copy_flag",
+})
+
+FLAG_COLS = frozenset({
+    "pc_seen_before", "pc_is_primary", "new_pc_after_stable_history",
+    "off_hours_activity_flag", "usb_file_activity_flag", "external_comm_activity_flag",
+    "jobsite_usb_activity_flag", "suspicious_upload_flag", "cloud_upload_flag",
+    "non_primary_pc_risk_flag",
+})
+
+SCORE_COLS = frozenset({
+    "logon_hourly_entropy", "file_hourly_entropy", "device_hourly_entropy",
+    "email_hourly_entropy", "http_hourly_entropy",
+    # Exact counts in Layer A, distinct / HyperLogLog estimates in Layer B
+    "unique_files_accessed", "unique_recipients", "unique_domains_visited",
+    "pc_prior_use_ratio", "primary_pc_activity_ratio", "role_sensitivity",
+})
+
+# Derived Layer B families, keyed by the suffix appended to a base feature
+SCORE_SUFFIXES = (
+    "_7d_sum", "_30d_sum", "_1d_over_30d_ratio",
+    "_zscore", "_zscore_90d", "_peer_zscore", "_rolling_delta",
+)
+
+
+def column_dtype(col: str) -> np.dtype | None:
+    """Schema dtype of a Layer A / Layer B column; None for columns outside the schema."""
+    if col in COUNT_COLS:
+        return COUNT_DTYPE
+    if col in FLAG_COLS:
+        return FLAG_DTYPE
+    if col in SCORE_COLS or col.endswith(SCORE_SUFFIXES):
+        return SCORE_DTYPE
+    return None
+
+
+def _check_integer_cast(col: str, values: pd.Series, dtype: np.dtype) -> None:
+    """Raises ValueError when casting values to the integer dtype would change them."""
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        raise ValueError(f"Column '{col}' must be numeric for {dtype}, got {values.dtype}")
+    if pd.api.types.is_bool_dtype(values.dtype) or len(values) == 0:
+        return
+    array = values.to_numpy()
+    if np.issubdtype(array.dtype, np.floating):
+        if np.isnan(array).any():
+            raise ValueError(f"Column '{col}' holds NaN values and cannot be stored as {dtype}")
+        if (array != np.trunc(array)).any():
+            raise ValueError(f"Column '{col}' holds fractional values and cannot be stored as {dtype}")
+    info = np.iinfo(dtype)
+    low, high = array.min(), array.max()
+    if low < info.min or high > info.max:
+        raise ValueError(f"Column '{col}' ranges over [{low}, {high}], outside the {dtype} range [{info.min}, {info.max}]")
+
+
+def enforce_schema(df: pd.DataFrame, columns: list | None = None) -> pd.DataFrame:
+    """
+    Casts the schema columns of a Layer A / Layer B frame to their compact dtypes.
+
+    Args:
+        df: Frame to cast; columns outside the schema are left as they are
+        columns: Optional subset of columns to cast (default: all columns of df)
+
+    Returns:
+        pd.DataFrame: df with the schema dtypes (df itself when nothing needs casting)
+
+    Raises:
+        ValueError: If a count or flag column holds values its integer dtype cannot represent
+    """
+    casts = {}
+    for col in df.columns if columns is None else columns:
+        dtype = column_dtype(col)
+        if dtype is None or df[col].dtype == dtype:
+            continue
+        if dtype.kind == "u":
+            _check_integer_cast(col, df[col], dtype)
+        casts[col] = dtype
+    return df.astype(casts) if casts else df
+
+
+def unregistered_feature_columns(columns: list) -> list[str]:
+    """The columns of a model feature list that have no schema family."""
+    return [col for col in columns if column_dtype(col) is None]
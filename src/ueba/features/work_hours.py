@@ -6,21 +6,25 @@ user_work_hours.parquet. CLAUDE.md has always said the table "must be
 reapplied at inference time" — this module is that reapplication path
 (CLEANUP_REPORT gap 2):
 
+- WorkHourIndex holds the envelopes as int8 start/end arrays indexed by user
+  position and flags a whole chunk with one gather on its user codes. The
+  Layer A extractors build it once per run and reuse it for every chunk.
 - apply_off_hours_flags() flags raw events against the per-user envelope with
-  the population fallback for unknown users — the same `_compute_off_hours`
-  logic preprocessing uses, exposed for inference-side feature building.
+  the population fallback for unknown users — the same WorkHourIndex
+  preprocessing uses, exposed for inference-side feature building.
 - missing_users() lets a scorer detect cold-start users whose off-hours
   features were necessarily built with the population default, so the
   condition is logged instead of silent.
 """
 
+import hashlib
 import os
 
+import numpy as np
 import pandas as pd
 
 from ueba import config
 from ueba.constants import WORK_HOURS
-from ueba.features.preprocessing import _compute_off_hours
 
 
 def load_user_work_hours(path: str | None = None) -> pd.DataFrame | None:
@@ -34,9 +38,91 @@ def load_user_work_hours(path: str | None = None) -> pd.DataFrame | None:
     return pd.read_parquet(path)
 
 
+class WorkHourIndex:
+    """
+    Per-user work-hour envelopes as int8 arrays indexed by user position, with the
+    population default stored in one extra trailing slot for unknown users.
+
+    Attributes:
+        users: pd.Index of the users with a row in the schedule table
+        start: int8 array (len(users) + 1,) of inclusive start hours; the last entry is the default
+        end: int8 array (len(users) + 1,) of inclusive end hours; the last entry is the default
+    """
+
+    def __init__(self, users, start_hours, end_hours, default_hours: tuple = WORK_HOURS):
+        self.users = pd.Index(users)
+        if not self.users.is_unique:
+            raise ValueError("The work-hour schedule table must hold one row per user")
+        self.default_hours = tuple(default_hours)
+        self.start = np.append(np.asarray(start_hours, dtype=np.int8), np.int8(default_hours[0]))
+        self.end = np.append(np.asarray(end_hours, dtype=np.int8), np.int8(default_hours[1]))
+
+    @classmethod
+    def from_table(
+        cls,
+        user_work_hours: "pd.DataFrame | WorkHourIndex | None",
+        default_hours: tuple = WORK_HOURS,
+    ) -> "WorkHourIndex":
+        """
+        Builds the index from a schedule table (see load_user_work_hours); None gives
+        an empty index that applies default_hours everywhere, and an existing index is
+        returned as is. Missing hours in the table fall back to default_hours.
+        """
+        if isinstance(user_work_hours, cls):
+            return user_work_hours
+        if user_work_hours is None:
+            return cls([], [], [], default_hours)
+        return cls(
+            user_work_hours["user"],
+            user_work_hours["start_hour"].fillna(default_hours[0]),
+            user_work_hours["end_hour"].fillna(default_hours[1]),
+            default_hours,
+        )
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def fingerprint(self) -> str:
+        """Content hash of the users and envelopes (including the default slot)."""
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(pd.Series(self.users.astype(str)), index=False).to_numpy().tobytes())
+        digest.update(self.start.tobytes())
+        digest.update(self.end.tobytes())
+        return digest.hexdigest()
+
+    def _positions(self, users) -> np.ndarray:
+        """Slot of each user; unknown users map to the trailing default slot."""
+        positions = self.users.get_indexer(users) if len(self.users) else np.full(len(users), -1)
+        return np.where(positions >= 0, positions, len(self.users))
+
+    def lookup(self, user: pd.Series) -> np.ndarray:
+        """
+        Envelope slot for each row. A categorical column is resolved through its
+        categories (one lookup per distinct user) and gathered with the row codes.
+        """
+        if isinstance(user.dtype, pd.CategoricalDtype):
+            # One more slot for missing values (code -1)
+            per_category = np.append(self._positions(user.cat.categories), len(self.users))
+            return per_category[user.cat.codes.to_numpy()]
+        return self._positions(user)
+
+    def off_hours(self, hour: pd.Series, user: pd.Series) -> pd.Series:
+        """
+        Boolean Series, True where the hour falls outside the row user's inclusive
+        [start, end] envelope.
+
+        Args:
+            hour: Integer hour-of-day Series
+            user: User Series aligned with hour (categorical columns are fastest)
+        """
+        slots = self.lookup(user)
+        hours = hour.to_numpy()
+        return pd.Series((hours < self.start[slots]) | (hours > self.end[slots]), index=hour.index)
+
+
 def apply_off_hours_flags(
     events_df: pd.DataFrame,
-    user_work_hours: pd.DataFrame | None,
+    user_work_hours: "pd.DataFrame | WorkHourIndex | None",
     default_hours: tuple = WORK_HOURS,
 ) -> pd.Series:
     """Boolean Series — True where an event falls outside its user's envelope.
@@ -44,8 +130,8 @@ def apply_off_hours_flags(
     Args:
         events_df: Event-level frame with a "user" column and either an integer
             "hour" column or a datetime "timestamp" column to derive it from.
-        user_work_hours: Table from load_user_work_hours(); None applies the
-            population default to all rows.
+        user_work_hours: Table from load_user_work_hours() or a WorkHourIndex built
+            from it; None applies the population default to all rows.
         default_hours: Fallback (start_hour, end_hour) for unknown users.
     """
     if "hour" in events_df.columns:
@@ -54,7 +140,7 @@ def apply_off_hours_flags(
         hour = pd.to_datetime(events_df["timestamp"]).dt.hour
     else:
         raise ValueError("events_df needs an 'hour' or 'timestamp' column")
-    return _compute_off_hours(hour, events_df["user"], user_work_hours, default_hours)
+    return WorkHourIndex.from_table(user_work_hours, default_hours).off_hours(hour, events_df["user"])
 
 
 def missing_users(users, user_work_hours: pd.DataFrame | None) -> set:
@@ -9,6 +9,8 @@ from sklearn.metrics import average_precision_score, precision_recall_curve, roc
 from tensorflow.keras import layers, models
 from tensorflow.keras.callbacks import CSVLogger, EarlyStopping
 
+from ueba.models.dense import autoencoder_forward
+
 
 class Autoencoder:
     """
@@ -148,6 +150,20 @@ class Autoencoder:
         return self.encoder.predict(feature_matrix)
 
 
+    def forward(self, feature_matrix: np.ndarray, batch_size: int=4096) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Generates latent embeddings and reconstructions in one pass, running the encoder half once.
+
+        Args:
+            feature_matrix: The scaled UEBA feature matrix
+            batch_size: Batch size for the forward pass
+
+        Returns:
+            tuple: (latent embeddings, reconstruction)
+        """
+        return autoencoder_forward(self.autoencoder, feature_matrix, batch_size=batch_size)
+
+
     def load(self, load_path: str) -> None:
         """
         Loads previously trained autoencoder and encoder models.
@@ -0,0 +1,344 @@
+"""Array-backed Isolation Forest scoring.
+
+`IsolationForest.score_samples` validates its input, then walks each of the
+200 fitted trees through its own `tree.apply` call. For one live row that fixed
+per-call cost is far larger than the work itself. `export_isolation_forest`
+flattens a fitted forest into one set of contiguous node arrays in a `.npz`
+next to its `.pkl`:
+
+- feature, threshold, left, right: the split of every node, with the trees
+  stored one after the other and child indices global
+- missing_left: the side a NaN value takes at each split
+- leaf_value: the per-tree path length of a sample ending in each leaf (node
+  depth plus the average path length of the leaf's training samples, minus one)
+
+Leaves point to themselves, so `CompiledIsolationForest` descends every tree
+for a batch of rows in lockstep, one level per step, for a fixed max_depth
+steps. The per-tree path lengths are summed in tree order, in float64, with the
+same normalization as sklearn, so the scores match `score_samples` exactly.
+Batches are scored in chunks of rows to bound memory. `score_row` is the
+single-row path for the live scorer.
+
+`load_isolation_forest` resolves a `.pkl` path to the forest to score with.
+With `prefer_compiled=True` (the live scorer) it uses the exported arrays
+whenever they exist; otherwise it loads the pickled sklearn model.
+
+Export an existing model:
+    python -m ueba.models.compiled_forest isolation_forests/iforest_model_v6/iforest_model.pkl [...]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+FOREST_FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 512
+
+
+def forest_arrays_path(pkl_path: str) -> str:
+    """Path of the exported arrays of a pickled forest (same stem, `.npz`)."""
+    return os.path.splitext(pkl_path)[0] + ".npz"
+
+
+def _per_tree_path_lengths(model) -> tuple[list, list]:
+    """Node depths and leaf average path lengths of each fitted tree, as sklearn scores them."""
+    depths = getattr(model, "_decision_path_lengths", None)
+    average = getattr(model, "_average_path_length_per_tree", None)
+    if depths is not None and average is not None:
+        return list(depths), list(average)
+
+    # Fitted by an sklearn that did not cache them; rebuild them the same way
+    from sklearn.ensemble._iforest import _average_path_length
+
+    depths, average = [], []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        node_depth = np.zeros(tree.node_count, dtype=np.float64)
+        node_depth[0] = 1.0  # a sample at the root has a one-node decision path
+        for node in range(tree.node_count):  # children always follow their parent
+            if tree.children_left[node] != -1:
+                node_depth[tree.children_left[node]] = node_depth[node] + 1.0
+                node_depth[tree.children_right[node]] = node_depth[node] + 1.0
+        depths.append(node_depth)
+        average.append(_average_path_length(tree.n_node_samples))
+    return depths, average
+
+
+def export_isolation_forest(model, path: str) -> str:
+    """
+    Writes a fitted sklearn IsolationForest to a single `.npz` of node arrays.
+
+    Args:
+        model: A fitted `sklearn.ensemble.IsolationForest` (e.g. `UEBAIsolationForest.model`)
+        path: Destination `.npz` path
+
+    Returns:
+        str: The written path
+
+    Raises:
+        ValueError: If the model is not fitted
+    """
+    from sklearn.ensemble._iforest import _average_path_length
+
+    if not hasattr(model, "estimators_"):
+        raise ValueError("Cannot export an Isolation Forest that has not been fitted")
+
+    n_features = int(model.n_features_in_)
+    # Trees see every column directly unless the forest subsamples features
+    subsample_features = model._max_features != n_features
+    node_depths, average_lengths = _per_tree_path_lengths(model)
+
+    feature, threshold, left, right, missing_left, leaf_value, roots = [], [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator, features, depth, average in zip(model.estimators_, model.estimators_features_, node_depths, average_lengths):
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        tree_feature = np.where(is_leaf, 0, tree.feature)
+        if subsample_features:
+            tree_feature = np.asarray(features)[tree_feature]
+
+        feature.append(tree_feature.astype(np.int32))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+        left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+        right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+        go_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8))
+        missing_left.append(np.asarray(go_left, dtype=bool) & ~is_leaf)
+        # Same expression (and so the same rounding) as sklearn's per-tree depth update
+        leaf_value.append(np.asarray(depth)[nodes] + np.asarray(average)[nodes] - 1.0)
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, int(tree.max_depth))
+
+    denominator = len(model.estimators_) * _average_path_length([model._max_samples])[0]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(
+        path,
+        format_version=np.int64(FOREST_FORMAT_VERSION),
+        n_features=np.int64(n_features),
+        max_depth=np.int64(max_depth),
+        denominator=np.float64(denominator),
+        roots=np.array(roots, dtype=np.int32),
+        feature=np.concatenate(feature),
+        threshold=np.concatenate(threshold),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        missing_left=np.concatenate(missing_left),
+        leaf_value=np.concatenate(leaf_value),
+    )
+    return path
+
+
+class CompiledIsolationForest:
+    """
+    Isolation Forest scorer over flat node arrays, matching sklearn's `score_samples`.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        missing_left: np.ndarray,
+        leaf_value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        denominator: float,
+        n_features: int
+    ) -> None:
+        """
+        Initializes the scorer from the exported node arrays (see `export_isolation_forest`).
+
+        Args:
+            feature: Split feature per node (0 for leaves)
+            threshold: Split threshold per node; rows go left when value <= threshold
+            left: Global index of the left child per node (the node itself for leaves)
+            right: Global index of the right child per node (the node itself for leaves)
+            missing_left: Whether a NaN value goes left at each node
+            leaf_value: Per-tree path length of a row ending in each node
+            roots: Global index of each tree's root, in tree order
+            max_depth: Depth of the deepest tree
+            denominator: Number of trees times the average path length at max_samples
+            n_features: Number of input columns
+
+        Returns:
+            None:
+        """
+        n_nodes = len(feature)
+        if not all(len(a) == n_nodes for a in (threshold, left, right, missing_left, leaf_value)):
+            raise ValueError("All node arrays must have one entry per node")
+        if len(roots) == 0 or max(left.max(), right.max(), roots.max()) >= n_nodes:
+            raise ValueError("Child and root indices must point inside the node arrays")
+
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+        self.leaf_value = np.ascontiguousarray(leaf_value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.denominator = float(denominator)
+        self.n_features = int(n_features)
+        self.has_missing_splits = bool(self.missing_left.any())
+        # child[2 * node + went_left]: one gather per level instead of two plus a select
+        self.child = np.stack([self.right, self.left], axis=1).ravel()
+
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledIsolationForest":
+        """
+        Loads arrays written by `export_isolation_forest`.
+
+        Args:
+            path: The exported `.npz` file
+
+        Returns:
+            CompiledIsolationForest: The loaded scorer
+        """
+        with np.load(path) as data:
+            version = int(data["format_version"])
+            if version != FOREST_FORMAT_VERSION:
+                raise ValueError(f"{path} has forest format version {version}, expected {FOREST_FORMAT_VERSION}")
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                missing_left=data["missing_left"],
+                leaf_value=data["leaf_value"],
+                roots=data["roots"],
+                max_depth=int(data["max_depth"]),
+                denominator=float(data["denominator"]),
+                n_features=int(data["n_features"]),
+            )
+
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+
+    def _step(self, node: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Moves every node one level down, given the value of its split feature."""
+        go_left = values <= self.threshold[node]
+        if self.has_missing_splits:
+            go_left |= np.isnan(values) & self.missing_left[node]
+        return self.child[2 * node + go_left]
+
+
+    def _path_lengths(self, x: np.ndarray) -> np.ndarray:
+        """Summed path length of each row of a float32 chunk over all trees."""
+        n_rows = len(x)
+        flat = x.ravel()
+        row_start = (np.arange(n_rows, dtype=np.intp) * self.n_features)[None, :]
+        # (n_trees, n_rows) node index of every row in every tree; leaves loop onto themselves
+        node = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            node = self._step(node, flat[row_start + self.feature[node]])
+
+        lengths = self.leaf_value[node]
+        # Accumulated tree by tree, in tree order, exactly as sklearn adds them
+        depths = np.zeros(n_rows, dtype=np.float64)
+        for tree_lengths in lengths:
+            depths += tree_lengths
+        return depths
+
+
+    def _normalize(self, depths: np.ndarray) -> np.ndarray:
+        """Isolation Forest score 2 ** (-depth / denominator); higher is more anomalous."""
+        return 2 ** (-np.divide(depths, self.denominator, out=np.ones_like(depths), where=self.denominator != 0))
+
+
+    def _as_matrix(self, latent_embeddings: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(latent_embeddings, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {x.shape}")
+        return x
+
+
+    def anomaly_score(self, latent_embeddings: np.ndarray, chunk_size: int=DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """
+        Computes anomaly scores (`UEBAIsolationForest.anomaly_score`): higher is more anomalous.
+
+        Args:
+            latent_embeddings: The latent embeddings matrix of shape: (n_samples, latent_emb_dim)
+            chunk_size: Rows per descent; working memory is a few (n_trees, chunk_size) arrays
+
+        Returns:
+            np.ndarray: float64 anomaly scores
+        """
+        x = self._as_matrix(latent_embeddings)
+        scores = np.empty(len(x), dtype=np.float64)
+        for start in range(0, len(x), chunk_size):
+            scores[start:start + chunk_size] = self._normalize(self._path_lengths(x[start:start + chunk_size]))
+        return scores
+
+
+    def score_samples(self, latent_embeddings: np.ndarray, chunk_size: int=DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """sklearn's `IsolationForest.score_samples` (the negated anomaly score: lower is more anomalous)."""
+        return -self.anomaly_score(latent_embeddings, chunk_size=chunk_size)
+
+
+    def score_row(self, embedding: np.ndarray) -> float:
+        """
+        Anomaly score of a single embedding, without the batch bookkeeping.
+
+        Args:
+            embedding: One latent embedding, of shape (latent_emb_dim,) or (1, latent_emb_dim)
+
+        Returns:
+            float: The anomaly score
+        """
+        x = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if x.shape[0] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} values, got {x.shape[0]}")
+        node = self.roots
+        for _ in range(self.max_depth):
+            node = self._step(node, x[self.feature[node]])
+        depth = np.zeros(1, dtype=np.float64)
+        for length in self.leaf_value[node]:
+            depth += length
+        return float(self._normalize(depth)[0])
+
+
+def load_isolation_forest(pkl_path: str, prefer_compiled: bool=False):
+    """
+    Loads the Isolation Forest stored at a `.pkl` path for scoring.
+
+    Args:
+        pkl_path: Path of the pickled sklearn forest; its exported arrays sit next to it
+        prefer_compiled: Use the exported arrays whenever they exist
+
+    Returns:
+        A CompiledIsolationForest or a UEBAIsolationForest; both expose `anomaly_score(x)`
+    """
+    arrays_path = forest_arrays_path(pkl_path)
+    if prefer_compiled and os.path.exists(arrays_path):
+        return CompiledIsolationForest.load(arrays_path)
+
+    from ueba.models.isolation_forest import UEBAIsolationForest
+
+    iforest = UEBAIsolationForest()
+    iforest.load(pkl_path)
+    return iforest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export pickled Isolation Forests to flat .npz node arrays")
+    parser.add_argument("models", nargs="+", help=".pkl forest files; each .npz is written beside its model")
+    args = parser.parse_args()
+
+    import joblib
+
+    for pkl_path in args.models:
+        path = export_isolation_forest(joblib.load(pkl_path), forest_arrays_path(pkl_path))
+        print(f"Exported {pkl_path} -> {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 # Imports
 #
-# Heavy model dependencies (joblib, tensorflow, the IF wrapper) are imported
+# Heavy model dependencies (joblib, the encoder loader, the IF wrapper) are imported
 # lazily inside get_scores(): every other function here is pure pandas/numpy,
 # and the unit suite must be able to import this module in a tensorflow-free
 # environment (CI).
@@ -9,6 +9,7 @@ import pandas as pd
 
 from ueba import config
 from ueba.features.preprocessing import chronological_split  # re-export for backward compatibility
+from ueba.features.schema import unregistered_feature_columns
 
 __all__ = ["chronological_split", "get_insiders", "build_insider_mask", "prepare_ae_training_data", "to_model_matrix", "get_scores"]
 
@@ -54,10 +55,21 @@ def get_insiders(path: str, version: str | float, return_all: bool=False) -> pd.
         return insiders_df
 
 
+def _datetime_ns(values: pd.Series) -> np.ndarray:
+    """int64 nanosecond timestamps of a datetime column (NaT becomes the int64 minimum)."""
+    return pd.to_datetime(values).to_numpy("datetime64[ns]").view(np.int64)
+
+
 def build_insider_mask(df: pd.DataFrame, windows: pd.DataFrame) -> pd.Series:
     """
     Returns a boolean mask for any (user, day) pair that falls within a known threat window.
 
+    The windows are joined to the rows in one vectorized pass: windows are sorted by
+    (user code, start), and each row looks up the last window of its user starting
+    on or before its day with `searchsorted`. Overlapping windows of a user act as
+    their union because every window carries the running maximum end of its user's
+    earlier windows.
+
     Args:
         df: The UEBA dataset intended for model training
         windows: DataFrame holding the insider windows
@@ -65,14 +77,32 @@ def build_insider_mask(df: pd.DataFrame, windows: pd.DataFrame) -> pd.Series:
     Returns:
         pd.Series: A boolean mask where `False=normal` and `True=insider`
     """
-    mask = pd.Series(False, index=df.index)
-    for _, row in windows.iterrows():
-        mask |= (
-            (df["user"] == row["user"]) &
-            (df["day"] >= row["start_day"]) &
-            (df["day"] <= row["end_day"])
-        )
-    return mask
+    windows = windows.dropna(subset=["user", "start_day", "end_day"])
+    if windows.empty or df.empty:
+        return pd.Series(False, index=df.index)
+
+    # User codes over the insider users; rows of any other user get -1
+    insider_users = pd.Index(windows["user"].unique())
+    row_code = insider_users.get_indexer(df["user"])
+    window_code = insider_users.get_indexer(windows["user"])
+    day = _datetime_ns(df["day"])
+    start = _datetime_ns(windows["start_day"])
+    end = _datetime_ns(windows["end_day"])
+
+    order = np.lexsort((start, window_code))
+    window_code, start, end = window_code[order], start[order], end[order]
+    end = pd.Series(end).groupby(window_code).cummax().to_numpy()
+
+    # Sorted (user code, start rank) keys; a row's key counts the window starts on or before its day
+    starts = np.unique(start)
+    stride = len(starts) + 1
+    window_key = window_code * stride + np.searchsorted(starts, start) + 1
+    row_key = row_code * stride + np.searchsorted(starts, day, side="right")
+    last = np.maximum(np.searchsorted(window_key, row_key, side="right") - 1, 0)
+
+    mask = (row_code >= 0) & (window_code[last] == row_code) & (window_key[last] <= row_key) & (day <= end[last])
+    mask &= day != np.iinfo(np.int64).min
+    return pd.Series(mask, index=df.index)
 
 
 def prepare_ae_training_data(
@@ -116,6 +146,8 @@ def to_model_matrix(df: pd.DataFrame) -> tuple[np.ndarray, list[str]]:
     returns a float32 matrix. Asserts that every remaining column is numeric so
     that a newly added string column (e.g. a future LDAP attribute) fails loudly
     here instead of as an opaque ``could not convert string to float`` later.
+    Numeric columns without a family in the feature schema
+    (``ueba.features.schema``) raise a ValueError for the same reason.
 
     Args:
         df: A UEBA (user, day) or (user, pc, day) DataFrame.
@@ -126,6 +158,9 @@ def to_model_matrix(df: pd.DataFrame) -> tuple[np.ndarray, list[str]]:
     X = df.drop(columns=[c for c in config.NON_FEATURE_COLS if c in df.columns])
     non_numeric = X.select_dtypes(exclude="number").columns.tolist()
     assert not non_numeric, f"Non-numeric columns leaked into model matrix: {non_numeric}"
+    unknown = unregistered_feature_columns(X.columns)
+    if unknown:
+        raise ValueError(f"Feature columns missing from the dtype schema: {unknown}")
     return X.values.astype("float32"), X.columns.tolist()
 
 
@@ -140,8 +175,8 @@ def get_scores(newData_df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: DataFrame with corresponding anomaly score
     """
     import joblib
-    from tensorflow.keras.models import load_model
 
+    from ueba.models.dense import load_dense_model
     from ueba.models.isolation_forest import UEBAIsolationForest
 
     # Use the parameter, work on a copy
@@ -159,7 +194,7 @@ def get_scores(newData_df: pd.DataFrame) -> pd.DataFrame:
     live_scaled = scaler.transform(x_live)
 
     # Load encoder and generate embeddings in batch
-    encoder = load_model(ENCODER_PATH)
+    encoder = load_dense_model(ENCODER_PATH)
     embeddings = encoder.predict(live_scaled)
 
     # Load IF and generate anomaly scores
@@ -0,0 +1,426 @@
+"""Pure-NumPy inference for the Dense encoder and autoencoder.
+
+`Autoencoder._build_model` is a plain stack of Dense layers (ReLU hidden
+layers, linear latent and output layers) with Dropout, which is the identity
+at inference time. Scoring through Keras costs the TensorFlow import (seconds)
+plus milliseconds of `predict` overhead per call, which dominates single-row
+live scoring. `export_dense_model` writes the kernels, biases and activations
+of a trained model to one `.npz` next to its `.keras` file, and
+`NumpyDenseModel` replays the forward pass as float32 matmuls. Its `predict`
+takes the same arguments as Keras `Model.predict`, so it drops into every
+place that scores through a loaded model.
+
+`NumpyDenseModel.forward` and `autoencoder_forward` run the autoencoder
+once and return both the latent embeddings (the `latent_space` layer) and the
+reconstruction, for stages that used to predict through the autoencoder and
+then again through the encoder on the same rows.
+
+`export_dense_model(..., scaler=...)` optionally folds the StandardScaler
+into the first layer: (x - mean) / scale @ W + b equals x @ W' + b' with
+W' = W / scale[:, None] and b' = b - (mean / scale) @ W. The folded model
+takes the raw `to_model_matrix` output, so scoring skips the scaled copy of
+the input. Its outputs (the latent space and the scaled-space reconstruction)
+are unchanged up to float32 rounding. Folded weights are written next to
+the plain ones (`*_folded.npz`) and carry the mean and scale for consumers
+that still need scaled values (the reconstruction-error explainer).
+
+`load_dense_model` resolves a `.keras` path to the model to score with. It
+uses Keras when TensorFlow is importable and the exported weights otherwise.
+With `prefer_numpy=True` (the live scorer) it uses the exported weights
+whenever they exist.
+
+Export an existing model (needs TensorFlow):
+    python -m ueba.models.dense encoders/encoder_model_v6/encoder_model.keras [...]
+    python -m ueba.models.dense --fold-scaler encoders/encoder_model_v6/feature_scaler.pkl <model.keras> [...]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+DENSE_FORMAT_VERSION = 1
+DEFAULT_BATCH_SIZE = 4096
+LATENT_LAYER = "latent_space"
+
+_ACTIVATIONS = ("linear", "relu")
+# Layers that are the identity at inference time
+_PASSTHROUGH_LAYERS = ("InputLayer", "Dropout")
+
+
+def dense_weights_path(keras_path: str) -> str:
+    """Path of the exported weights of a `.keras` model (same stem, `.npz`)."""
+    return os.path.splitext(keras_path)[0] + ".npz"
+
+
+def folded_weights_path(keras_path: str) -> str:
+    """Path of the scaler-folded exported weights of a `.keras` model (`<stem>_folded.npz`)."""
+    return os.path.splitext(keras_path)[0] + "_folded.npz"
+
+
+def scaler_arrays(scaler) -> tuple[np.ndarray, np.ndarray]:
+    """float64 (mean, scale) of a fitted StandardScaler; zeros / ones for a disabled step."""
+    n_features = int(scaler.n_features_in_) if hasattr(scaler, "n_features_in_") else len(scaler.mean_)
+    mean = scaler.mean_ if getattr(scaler, "with_mean", True) else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, "with_std", True) else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+class ArrayScaler:
+    """
+    StandardScaler transform from stored mean and scale arrays (a scoring bundle's,
+    or `scaler_arrays` of a fitted scaler).
+    """
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray) -> None:
+        """
+        Initializes the scaler.
+
+        Args:
+            mean: Per-feature mean (zeros for a scaler fit with with_mean=False)
+            scale: Per-feature scale (ones for a scaler fit with with_std=False)
+
+        Returns:
+            None:
+        """
+        self.mean_ = mean
+        self.scale_ = scale
+        # sklearn casts both to the input dtype before subtracting / dividing
+        self._mean32 = np.asarray(mean, dtype=np.float32)
+        self._scale32 = np.asarray(scale, dtype=np.float32)
+
+
+    @classmethod
+    def from_standard_scaler(cls, scaler) -> "ArrayScaler":
+        """The transform of a fitted StandardScaler (see `scaler_arrays`)."""
+        return cls(*scaler_arrays(scaler))
+
+
+    def transform(self, x: np.ndarray) -> np.ndarray:
+        """(x - mean) / scale on a float32 copy of x, with the same float32 rounding as sklearn."""
+        x = np.array(x, dtype=np.float32)
+        x -= self._mean32
+        x /= self._scale32
+        return x
+
+
+def fold_scaler(kernel: np.ndarray, bias: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Folds a standardization step into a Dense layer.
+
+    Args:
+        kernel: (in, out) first-layer kernel
+        bias: (out,) first-layer bias
+        mean: (in,) scaler mean
+        scale: (in,) scaler scale
+
+    Returns:
+        tuple: float32 (kernel, bias) such that x @ kernel + bias == ((x - mean) / scale) @ W + b
+    """
+    kernel64 = np.asarray(kernel, dtype=np.float64)
+    folded_kernel = kernel64 / scale[:, None]
+    folded_bias = np.asarray(bias, dtype=np.float64) - (mean / scale) @ kernel64
+    return folded_kernel.astype(np.float32), folded_bias.astype(np.float32)
+
+
+def _activation_name(layer) -> str:
+    activation = layer.get_config().get("activation", "linear")
+    if isinstance(activation, dict):  # serialized activation object
+        activation = activation.get("config", {}).get("name", activation.get("class_name"))
+    return str(activation).lower()
+
+
+def export_dense_model(model, path: str, scaler=None) -> str:
+    """
+    Writes the Dense layers of a Keras model to a single `.npz`.
+
+    Input and Dropout layers are skipped (both are the identity at inference time).
+
+    Args:
+        model: A trained Keras model made of Dense layers (e.g. `Autoencoder.encoder`)
+        path: Destination `.npz` path
+        scaler: Optional fitted StandardScaler to fold into the first layer; the
+            exported model then takes unscaled input
+
+    Returns:
+        str: The written path
+
+    Raises:
+        ValueError: If the model holds a layer or activation the NumPy forward pass does not implement
+    """
+    arrays = {}
+    names, activations = [], []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in _PASSTHROUGH_LAYERS:
+            continue
+        if kind != "Dense":
+            raise ValueError(f"Cannot export layer '{layer.name}' of type {kind}; only Dense layers are supported")
+        activation = _activation_name(layer)
+        if activation not in _ACTIVATIONS:
+            raise ValueError(f"Cannot export layer '{layer.name}' with activation '{activation}'")
+
+        weights = layer.get_weights()
+        kernel = np.asarray(weights[0], dtype=np.float32)
+        bias = np.asarray(weights[1], dtype=np.float32) if len(weights) > 1 else np.zeros(kernel.shape[1], np.float32)
+        arrays[f"kernel_{len(names)}"] = kernel
+        arrays[f"bias_{len(names)}"] = bias
+        names.append(layer.name)
+        activations.append(activation)
+
+    if not names:
+        raise ValueError(f"Model '{model.name}' has no Dense layers to export")
+    if scaler is not None:
+        mean, scale = scaler_arrays(scaler)
+        if len(mean) != arrays["kernel_0"].shape[0]:
+            raise ValueError(f"Scaler has {len(mean)} features but the first layer takes {arrays['kernel_0'].shape[0]}")
+        arrays["kernel_0"], arrays["bias_0"] = fold_scaler(arrays["kernel_0"], arrays["bias_0"], mean, scale)
+        arrays["input_mean"], arrays["input_scale"] = mean, scale
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(
+        path,
+        format_version=np.int64(DENSE_FORMAT_VERSION),
+        names=np.array(names),
+        activations=np.array(activations),
+        **arrays,
+    )
+    return path
+
+
+class NumpyDenseModel:
+    """
+    Forward pass of an exported Dense stack: float32 `x @ kernel + bias` per layer
+    with ReLU or linear activations.
+    """
+
+    def __init__(
+        self,
+        kernels: list,
+        biases: list,
+        activations: list,
+        names: list | None=None,
+        input_mean: np.ndarray | None=None,
+        input_scale: np.ndarray | None=None
+    ) -> None:
+        """
+        Initializes the model from its layer weights.
+
+        Args:
+            kernels: (in, out) weight matrices, one per layer, in forward order
+            biases: (out,) bias vectors, one per layer
+            activations: "relu" or "linear", one per layer
+            names: Optional layer names (e.g. to locate the latent layer)
+            input_mean: Mean of the scaler folded into the first layer, if any
+            input_scale: Scale of the scaler folded into the first layer, if any
+
+        Returns:
+            None:
+        """
+        if not (len(kernels) == len(biases) == len(activations)) or not kernels:
+            raise ValueError("kernels, biases and activations must be non-empty and of equal length")
+        for i, (kernel, bias) in enumerate(zip(kernels, biases)):
+            if kernel.shape[1] != len(bias) or (i and kernel.shape[0] != kernels[i - 1].shape[1]):
+                raise ValueError(f"Layer {i} weights do not chain: kernel {kernel.shape}, bias {bias.shape}")
+        unknown = set(activations) - set(_ACTIVATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported activations: {sorted(unknown)}")
+
+        self.kernels = [np.ascontiguousarray(k, dtype=np.float32) for k in kernels]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+        self.names = list(names) if names is not None else [f"dense_{i}" for i in range(len(kernels))]
+        if (input_mean is None) != (input_scale is None):
+            raise ValueError("input_mean and input_scale must be given together")
+        self.input_mean = input_mean
+        self.input_scale = input_scale
+
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyDenseModel":
+        """
+        Loads weights written by `export_dense_model`.
+
+        Args:
+            path: The exported `.npz` file
+
+        Returns:
+            NumpyDenseModel: The loaded model
+        """
+        with np.load(path) as data:
+            version = int(data["format_version"])
+            if version != DENSE_FORMAT_VERSION:
+                raise ValueError(f"{path} has dense format version {version}, expected {DENSE_FORMAT_VERSION}")
+            names = [str(name) for name in data["names"]]
+            return cls(
+                kernels=[data[f"kernel_{i}"] for i in range(len(names))],
+                biases=[data[f"bias_{i}"] for i in range(len(names))],
+                activations=[str(act) for act in data["activations"]],
+                names=names,
+                input_mean=data["input_mean"] if "input_mean" in data else None,
+                input_scale=data["input_scale"] if "input_scale" in data else None,
+            )
+
+
+    @property
+    def input_dim(self) -> int:
+        return self.kernels[0].shape[0]
+
+
+    @property
+    def output_dim(self) -> int:
+        return self.kernels[-1].shape[1]
+
+
+    @property
+    def scaler_folded(self) -> bool:
+        """Whether the first layer standardizes its input (the model takes unscaled features)."""
+        return self.input_mean is not None
+
+
+    def _forward(self, x: np.ndarray, taps: tuple=()) -> list[np.ndarray]:
+        """Forward pass; returns the activations after each layer index in taps, then the output."""
+        tapped = []
+        for i, (kernel, bias, activation) in enumerate(zip(self.kernels, self.biases, self.activations)):
+            x = x @ kernel
+            x += bias
+            if activation == "relu":
+                np.maximum(x, 0.0, out=x)
+            if i in taps:
+                tapped.append(x)
+        return [*tapped, x]
+
+
+    def _run(self, x: np.ndarray, batch_size: int | None, taps: tuple=()) -> list[np.ndarray]:
+        """Runs `_forward` over row batches of x, bounding the intermediate activations."""
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != self.input_dim:
+            raise ValueError(f"Expected input of shape (n, {self.input_dim}), got {x.shape}")
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        if len(x) <= batch_size:
+            return self._forward(x, taps)
+
+        widths = [self.kernels[i].shape[1] for i in taps] + [self.output_dim]
+        outs = [np.empty((len(x), width), dtype=np.float32) for width in widths]
+        for start in range(0, len(x), batch_size):
+            for out, batch in zip(outs, self._forward(x[start:start + batch_size], taps)):
+                out[start:start + batch_size] = batch
+        return outs
+
+
+    def predict(self, x: np.ndarray, batch_size: int | None=DEFAULT_BATCH_SIZE, verbose=0) -> np.ndarray:
+        """
+        Runs the forward pass (Keras `predict` signature; `verbose` is ignored).
+
+        Args:
+            x: (n_samples, input_dim) feature matrix
+            batch_size: Rows per matmul batch, bounding the intermediate activations
+
+        Returns:
+            np.ndarray: float32 (n_samples, output_dim) outputs
+        """
+        return self._run(x, batch_size)[0]
+
+
+    def forward(self, x: np.ndarray, batch_size: int | None=DEFAULT_BATCH_SIZE) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Runs the autoencoder once and returns its latent embeddings and reconstruction.
+
+        Args:
+            x: (n_samples, input_dim) feature matrix
+            batch_size: Rows per matmul batch
+
+        Returns:
+            tuple: (float32 latent embeddings, float32 reconstruction)
+        """
+        if LATENT_LAYER not in self.names:
+            raise ValueError(f"Model has no '{LATENT_LAYER}' layer; layers: {self.names}")
+        latent, reconstruction = self._run(x, batch_size, taps=(self.names.index(LATENT_LAYER),))
+        return latent, reconstruction
+
+
+def autoencoder_forward(model, x: np.ndarray, batch_size: int=DEFAULT_BATCH_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Latent embeddings and reconstruction of x from a single pass through an autoencoder.
+
+    Args:
+        model: The autoencoder, as a Keras model or a NumpyDenseModel (see `load_dense_model`)
+        x: The scaled feature matrix
+        batch_size: Batch size for the forward pass
+
+    Returns:
+        tuple: (latent embeddings, reconstruction)
+    """
+    if isinstance(model, NumpyDenseModel):
+        return model.forward(x, batch_size=batch_size)
+
+    from tensorflow.keras import models
+
+    # Same layers, two outputs: the encoder half runs once for both
+    dual = models.Model(model.inputs, [model.get_layer(LATENT_LAYER).output, model.outputs[0]])
+    latent, reconstruction = dual.predict(x, batch_size=batch_size, verbose=0)
+    return latent, reconstruction
+
+
+def load_folded_dense_model(keras_path: str) -> NumpyDenseModel | None:
+    """The scaler-folded exported weights of a `.keras` model, or None when none were exported."""
+    path = folded_weights_path(keras_path)
+    return NumpyDenseModel.load(path) if os.path.exists(path) else None
+
+
+def load_dense_model(keras_path: str, prefer_numpy: bool=False):
+    """
+    Loads the model stored at a `.keras` path for inference.
+
+    Args:
+        keras_path: Path of the `.keras` model; its exported weights sit next to it
+        prefer_numpy: Use the exported weights whenever they exist, even with TensorFlow installed
+
+    Returns:
+        A Keras model or a NumpyDenseModel; both expose `predict(x, batch_size=..., verbose=0)`
+
+    Raises:
+        FileNotFoundError: If TensorFlow is unavailable and the model has no exported weights
+    """
+    npz_path = dense_weights_path(keras_path)
+    if prefer_numpy and os.path.exists(npz_path):
+        return NumpyDenseModel.load(npz_path)
+    try:
+        from tensorflow.keras.models import load_model
+    except ImportError:
+        if os.path.exists(npz_path):
+            return NumpyDenseModel.load(npz_path)
+        raise FileNotFoundError(
+            f"TensorFlow is not installed and {keras_path} has no exported weights at {npz_path}. "
+            "Export them with `python -m ueba.models.dense` where TensorFlow is available."
+        ) from None
+    return load_model(keras_path, compile=False)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export Dense Keras models to NumPy .npz weights")
+    parser.add_argument("models", nargs="+", help=".keras model files; each .npz is written beside its model")
+    parser.add_argument(
+        "--fold-scaler",
+        default=None,
+        help="feature_scaler.pkl to fold into the first layer; writes <stem>_folded.npz instead",
+    )
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+
+    scaler = None
+    if args.fold_scaler:
+        import joblib
+        scaler = joblib.load(args.fold_scaler)
+
+    for keras_path in args.models:
+        out_path = folded_weights_path(keras_path) if scaler is not None else dense_weights_path(keras_path)
+        path = export_dense_model(load_model(keras_path, compile=False), out_path, scaler=scaler)
+        print(f"Exported {keras_path} -> {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,11 +3,13 @@ python -m ueba.pipeline — headless, reproducible ML pipeline.
 
 Stages (in dependency order):
 
+    ingest            raw CERT CSVs -> day-partitioned Parquet (once)
     preprocess        raw CERT logs -> v{V} feature datasets + splits
     train-ae          autoencoder + scaler + feature contract + clean AE baseline
     train-if          isolation forest + anomaly scores + clean IF baseline
     explain           reconstruction-error table  (--split train|test_stream)
     calibrate         clean baselines + band-keyed calibration_thresholds.json
+    build-bundle      memory-mapped scoring bundle for the live scorer
     build-alerts      alert tables + cases        (--split main|calib|test)
     build-dashboard   slim serving parquet for Streamlit Cloud
     all               run everything above in order, stop at first failure
@@ -49,10 +51,68 @@ def _build_parser() -> argparse.ArgumentParser:
     # Create subparsers
     sub = parser.add_subparsers(dest="stage", required=True)
 
-    sub.add_parser("preprocess", help="raw CERT logs -> feature datasets and splits")
+    p = sub.add_parser("ingest", help="convert raw CERT CSVs to partitioned Parquet")
+    p.add_argument(
+        "--force",
+        action="store_true",
+        help="re-ingest sources whose CSV is unchanged since the last ingest",
+    )
+
+    p = sub.add_parser("preprocess", help="raw CERT logs -> feature datasets and splits")
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes for Layer A channel extraction (1 = serial)",
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="append only the days after the last processed day to Layer A/B and the test stream",
+    )
+    p.add_argument(
+        "--distinct",
+        choices=["exact", "hll"],
+        default="exact",
+        help="unique_* counts: exact, or HyperLogLog estimates with constant memory per group",
+    )
+    p.add_argument(
+        "--prefetch",
+        type=int,
+        default=2,
+        help="decoded log chunks read ahead of aggregation by a background thread (0 = off)",
+    )
+    p.add_argument(
+        "--prefetch-max-mb",
+        type=int,
+        default=None,
+        help="cap on the memory held by prefetched chunks, per extractor",
+    )
+    p.add_argument(
+        "--partial-budget-mb",
+        type=int,
+        default=None,
+        help="spill merged per-chunk partials to disk above this size, per extractor",
+    )
+    p.add_argument(
+        "--no-checkpoints",
+        action="store_true",
+        help="re-extract every Layer A channel instead of reusing unchanged channel checkpoints",
+    )
+    p.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="build Layer B in N user-hash shards to bound memory (1 = in one piece)",
+    )
 
     p = sub.add_parser("train-ae", help="train the autoencoder")
     p.add_argument("--epochs", type=int, default=100)
+    p.add_argument(
+        "--fold-scaler",
+        action="store_true",
+        help="also export the networks with the scaler folded into their first layer (scoring skips the scaled copy)",
+    )
 
     sub.add_parser("train-if", help="train the isolation forest")
 
@@ -66,6 +126,8 @@ def _build_parser() -> argparse.ArgumentParser:
         help="derive thresholds from the existing baseline .npy files without re-scoring"
     )
 
+    sub.add_parser("build-bundle", help="pack the live scoring artifacts into a memory-mapped bundle")
+
     p = sub.add_parser("build-alerts", help="build alert tables and cases")
     p.add_argument("--split", choices=["main", "calib", "test"], default="main")
     p.add_argument(
@@ -97,20 +159,24 @@ def _stage_modules() -> dict:
     # Lazily import so "UEBA_MODEL_VERSION" is set before ueba.config loads
     from ueba.pipeline.stages import (
         build_alerts,
+        build_bundle,
         build_dashboard,
         calibrate,
         explain,
+        ingest,
         preprocess,
         train_ae,
         train_if,
     )
 
     return {
+        "ingest": ingest,
         "preprocess": preprocess,
         "train-ae": train_ae,
         "train-if": train_if,
         "explain": explain,
         "calibrate": calibrate,
+        "build-bundle": build_bundle,
         "build-alerts": build_alerts,
         "build-dashboard": build_dashboard,
     }
@@ -126,12 +192,14 @@ def _run_status() -> int:
 
     # Build a list of file paths each stage should produce
     checks: list[tuple[str, list[str]]] = [
+        ("ingest", modules["ingest"].produces()),
         ("preprocess", modules["preprocess"].produces()),
         ("train-ae", modules["train-ae"].produces()),
         ("train-if", modules["train-if"].produces()),
         ("explain --split train", modules["explain"].produces("train")),
         ("explain --split test_stream", modules["explain"].produces("test_stream")),
         ("calibrate", modules["calibrate"].produces()),
+        ("build-bundle", modules["build-bundle"].produces()),
         ("build-alerts --split main", modules["build-alerts"].produces("main")),
         ("build-alerts --split calib", modules["build-alerts"].produces("calib")),
         ("build-alerts --split test", modules["build-alerts"].produces("test")),
@@ -143,7 +211,7 @@ def _run_status() -> int:
         print(f"  {stage}")
         for path in paths:
             if os.path.exists(path):
-                size = os.path.getsize(path)
+                size = manifest._artifact_bytes(path)
                 print(f"    [ok]      {os.path.relpath(path, config.BASE_DIR)}  ({size / 1e6:,.1f} MB)")
             else:
                 missing_total += 1
@@ -167,11 +235,15 @@ def _run_status() -> int:
 def _run_all(args) -> int:
     modules = _stage_modules()
     plan = [
-        ("preprocess", {}),
-        ("train-ae", {"epochs": 100}),
+        ("ingest", {"force": False}),
+        ("preprocess", {"workers": 1, "incremental": False, "distinct": "exact",
+                        "prefetch": 2, "prefetch_max_mb": None, "partial_budget_mb": None,
+                        "no_checkpoints": False, "shards": 1}),
+        ("train-ae", {"epochs": 100, "fold_scaler": False}),
         ("train-if", {}),
         ("explain", {"split": "train"}),
         ("calibrate", {"thresholds_only": False}),
+        ("build-bundle", {}),
         ("build-alerts", {"split": "main", "allow_missing": False}),
         ("explain", {"split": "test_stream"}),
         ("build-alerts", {"split": "test", "allow_missing": False}),
@@ -36,7 +36,24 @@ def require(artifacts: list[tuple[str, str]], allow_missing: bool = False) -> li
     return [p for p, _ in missing]
 
 
+def _artifact_files(path: str) -> list[str]:
+    """The files of an artifact: the path itself, or every file under a dataset directory."""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def _artifact_bytes(path: str) -> int:
+    return sum(os.path.getsize(f) for f in _artifact_files(path))
+
+
 def _sha1_head(path: str, n_bytes: int = 1024 * 1024) -> str:
+    if os.path.isdir(path):
+        # Directory datasets change by adding / rewriting parts: hash the part listing
+        listing = [f"{os.path.relpath(f, path)}:{os.path.getsize(f)}" for f in _artifact_files(path)]
+        return hashlib.sha1("\n".join(listing).encode()).hexdigest()[:12]
     with open(path, "rb") as fh:
         return hashlib.sha1(fh.read(n_bytes)).hexdigest()[:12]
 
@@ -71,7 +88,7 @@ def record(stage: str, paths: list[str]) -> None:
         rel = os.path.relpath(path, config.BASE_DIR)
         data["artifacts"][rel] = {
             "stage": stage,
-            "bytes": os.path.getsize(path),
+            "bytes": _artifact_bytes(path),
             "sha1_head": _sha1_head(path),
             "git_commit": commit,
             "model_version": config.MODEL_VERSION,
@@ -90,9 +107,9 @@ def validate_recorded() -> list[str]:
         path = os.path.join(config.BASE_DIR, rel)
         if not os.path.exists(path):
             problems.append(f"{rel}: recorded by '{meta['stage']}' but no longer on disk")
-        elif os.path.getsize(path) != meta["bytes"]:
+        elif _artifact_bytes(path) != meta["bytes"]:
             problems.append(
                 f"{rel}: size changed since recorded by '{meta['stage']}' "
-                f"({meta['bytes']:,} -> {os.path.getsize(path):,} bytes)"
+                f"({meta['bytes']:,} -> {_artifact_bytes(path):,} bytes)"
             )
     return problems
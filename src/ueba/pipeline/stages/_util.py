@@ -3,6 +3,8 @@
 import numpy as np
 import pandas as pd
 
+from ueba.features.schema import enforce_schema
+
 
 def jsonable(obj):
     """Coerce numpy/pandas containers into JSON-serializable structures."""
@@ -26,7 +28,9 @@ def jsonable(obj):
 def load_split_frame(path: str) -> pd.DataFrame:
     """Load a (user, day) split parquet/csv with the pipeline's normalization:
     day normalized to midnight, user stripped+lowercased, baseline_complete
-    gate applied (mirrors the notebooks' alignment requirements)."""
+    gate applied (mirrors the notebooks' alignment requirements). Feature
+    columns are cast to the compact schema dtypes, so splits written before
+    the schema existed load at the same width as new ones."""
     if path.endswith(".parquet"):
         df = pd.read_parquet(path)
     else:
@@ -34,4 +38,19 @@ def load_split_frame(path: str) -> pd.DataFrame:
     df["day"] = pd.to_datetime(df["day"]).dt.normalize()
     df["user"] = df["user"].str.strip().str.lower()
     df = df[df["baseline_complete"]].reset_index(drop=True)
-    return df
+    return enforce_schema(df)
+
+
+def autoencoder_inputs(matrix: np.ndarray, scaler, stage: str) -> tuple:
+    """The autoencoder to score with, its input matrix and the scaler the explainer
+    must apply itself. With scaler-folded weights (`train-ae --fold-scaler`) the raw
+    matrix goes straight into the model and no scaled copy is made; otherwise the
+    matrix is scaled here and the explainer gets no scaler."""
+    from ueba import config
+    from ueba.models.dense import load_dense_model, load_folded_dense_model
+
+    folded = load_folded_dense_model(config.AE_PATH)
+    if folded is not None:
+        print(f"[{stage}] Using scaler-folded autoencoder weights on the unscaled matrix")
+        return folded, matrix, scaler
+    return load_dense_model(config.AE_PATH), scaler.transform(matrix), None
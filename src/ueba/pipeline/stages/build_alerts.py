@@ -8,10 +8,11 @@ three scored populations:
     --split calib  calibration-eval period, recon errors + IF scores computed
                    inline (alert_table_{V}_calib.parquet, cases)
     --split test   held-out test stream; REQUIRES the test reconstruction
-                   table from `explain --split test_stream` and fails loudly
-                   if it is absent instead of silently skipping
-                   (CLEANUP_REPORT gap 3); IF scores computed inline and also
-                   persisted as test_anomaly_scores.npy for the notebook path
+                   table and embeddings from `explain --split test_stream`
+                   and fails loudly if they are absent instead of silently
+                   skipping (CLEANUP_REPORT gap 3); IF scores computed from
+                   those embeddings and also persisted as
+                   test_anomaly_scores.npy for the notebook path
 
 All splits band through the calibrated thresholds + clean baselines produced
 by the `calibrate` stage.
@@ -42,15 +43,13 @@ def requires(split: str = "main") -> list[tuple[str, str]]:
             (config.UEBA_CALIB_EVAL_PATH, "preprocess"),
             (config.SCALER_PATH, "train-ae"),
             (config.AE_PATH, "train-ae"),
-            (config.ENCODER_PATH, "train-ae"),
             (config.IF_PATH, "train-if"),
         ]
     if split == "test":
         return common + [
             (config.RECON_TEST_TABLE_PATH, "explain --split test_stream"),
+            (config.RECON_TEST_EMBEDDINGS_PATH, "explain --split test_stream"),
             (config.TEST_STREAM_PATH, "preprocess"),
-            (config.SCALER_PATH, "train-ae"),
-            (config.ENCODER_PATH, "train-ae"),
             (config.IF_PATH, "train-if"),
         ]
     raise ValueError(f"Unknown split: {split}")
@@ -100,6 +99,19 @@ def _merge_aligned(recon_table, score_table, what: str):
     return merged
 
 
+def _embeddings_for(df, embedding_table):
+    """The latent_* columns of embedding_table, in the (user, day) row order of df."""
+    latent_cols = [c for c in embedding_table.columns if c.startswith("latent_")]
+    aligned = df[["user", "day"]].merge(embedding_table, on=["user", "day"], how="left", validate="one_to_one")
+    missing = int(aligned[latent_cols[0]].isna().sum()) if latent_cols else len(df)
+    if missing:
+        raise ValueError(
+            f"{missing:,} of {len(df):,} rows have no stored embedding; "
+            "re-run `explain --split test_stream` against the current test stream"
+        )
+    return aligned[latent_cols].to_numpy(dtype="float32")
+
+
 def run(args) -> None:
     import numpy as np
     import pandas as pd
@@ -126,33 +138,33 @@ def run(args) -> None:
 
     elif split == "calib":
         import joblib
-        from tensorflow.keras.models import load_model
 
         from ueba.alerts.explainer import ReconstructionErrorExplainer
         from ueba.models.data_prep import to_model_matrix
+        from ueba.models.dense import autoencoder_forward
         from ueba.models.isolation_forest import UEBAIsolationForest
+        from ueba.pipeline.stages._util import autoencoder_inputs
 
         print("[build-alerts] Scoring the calibration-eval slice inline ...")
         calib_eval_df = load_split_frame(config.UEBA_CALIB_EVAL_PATH)
         x, feature_cols = to_model_matrix(calib_eval_df)
         scaler = joblib.load(config.SCALER_PATH)
-        x_scaled = scaler.transform(x)
+        ae_model, x_model, input_scaler = autoencoder_inputs(x, scaler, STAGE)
 
-        ae_model = load_model(config.AE_PATH, compile=False)
+        embeddings, reconstruction = autoencoder_forward(ae_model, x_model, batch_size=4096)
         recon_table = ReconstructionErrorExplainer(feature_names=feature_cols).explain_to_df(
-            x_scaled, ae_model,
+            x_model, ae_model,
             metadata=calib_eval_df[["user", "day"]],
             include_feat_err=False,
             include_contributions=True,
+            reconstruction=reconstruction,
+            scaler=input_scaler,
         )
 
-        enc_model = load_model(config.ENCODER_PATH, compile=False)
         iforest = UEBAIsolationForest()
         iforest.load(config.IF_PATH)
         score_table = _context_table(calib_eval_df)
-        score_table["if_anomaly_score"] = iforest.anomaly_score(
-            enc_model.predict(x_scaled, batch_size=4096)
-        )
+        score_table["if_anomaly_score"] = iforest.anomaly_score(embeddings)
         aggregated = _merge_aligned(recon_table, score_table, "calibration")
 
         alert_df = builder.build_alert_df(aggregated, w1=0.5, w2=0.5)
@@ -161,23 +173,18 @@ def run(args) -> None:
         save_table(cases_df, config.CALIB_CASES_PARQUET)
 
     elif split == "test":
-        import joblib
-        from tensorflow.keras.models import load_model
-
-        from ueba.models.data_prep import to_model_matrix
         from ueba.models.isolation_forest import UEBAIsolationForest
 
-        print("[build-alerts] Loading test reconstruction table; scoring test stream through IF ...")
+        print("[build-alerts] Loading test reconstruction table + embeddings; scoring test stream through IF ...")
         recon_table = pd.read_parquet(config.RECON_TEST_TABLE_PATH)
         test_df = load_split_frame(config.TEST_STREAM_PATH)
-        x, _ = to_model_matrix(test_df)
-        scaler = joblib.load(config.SCALER_PATH)
-        x_scaled = scaler.transform(x)
+        # explain --split test_stream wrote the embeddings from the same pass as the
+        # reconstruction table; align them to the test stream order by (user, day)
+        embeddings = _embeddings_for(test_df, pd.read_parquet(config.RECON_TEST_EMBEDDINGS_PATH))
 
-        enc_model = load_model(config.ENCODER_PATH, compile=False)
         iforest = UEBAIsolationForest()
         iforest.load(config.IF_PATH)
-        test_scores = iforest.anomaly_score(enc_model.predict(x_scaled, batch_size=4096))
+        test_scores = iforest.anomaly_score(embeddings)
         np.save(config.TEST_IF_SCORES_PATH, test_scores)
 
         score_table = _context_table(test_df)
@@ -0,0 +1,84 @@
+"""Stage: build-bundle — memory-mapped scoring bundle for the live scorer.
+
+Packs the scaler, the feature contract, the exported encoder weights, the
+compiled Isolation Forest, the sorted clean IF baseline and the calibrated IF
+thresholds into one versioned directory of `.npy` files plus bundle.json
+(ueba.serving.scoring_bundle). `live_simulation` opens it with
+`np.load(mmap_mode="r")` instead of unpickling each artifact, so a scorer
+starts in well under a second and scorer processes share the array pages.
+Re-run it after any of train-ae, train-if or calibrate. When train-ae was run
+with --fold-scaler the bundle carries the folded encoder, and the live scorer
+feeds it unscaled rows.
+"""
+
+import json
+import os
+
+from ueba import config
+from ueba.pipeline import manifest
+
+STAGE = "build-bundle"
+
+
+def _sources() -> dict[str, str]:
+    enc, ifo = config.SAVE_ENCODER_PATH, config.SAVE_IFOREST_PATH
+    return {
+        "scaler": config.SCALER_PATH,
+        "feature_cols": os.path.join(enc, "feature_cols.json"),
+        "encoder": _encoder_path(),
+        "forest": os.path.join(ifo, "iforest_model.npz"),
+        "baseline": config.IF_BASELINE_PATH,
+        "thresholds": config.CALIBRATION_THRESHOLD_PATH,
+    }
+
+
+def _encoder_path() -> str:
+    from ueba.models.dense import folded_weights_path
+
+    folded = folded_weights_path(os.path.join(config.SAVE_ENCODER_PATH, "encoder_model.keras"))
+    return folded if os.path.exists(folded) else os.path.join(config.SAVE_ENCODER_PATH, "encoder_model.npz")
+
+
+def requires() -> list[tuple[str, str]]:
+    producers = {
+        "scaler": "train-ae", "feature_cols": "train-ae", "encoder": "train-ae",
+        "forest": "train-if", "baseline": "calibrate", "thresholds": "calibrate",
+    }
+    return [(path, producers[key]) for key, path in _sources().items()]
+
+
+def produces() -> list[str]:
+    return [os.path.join(config.SCORING_BUNDLE_DIR, "bundle.json")]
+
+
+def run(args) -> None:
+    import joblib
+    import numpy as np
+
+    from ueba.models.compiled_forest import CompiledIsolationForest
+    from ueba.models.dense import NumpyDenseModel
+    from ueba.serving.scoring_bundle import write_scoring_bundle
+
+    manifest.require(requires())
+    sources = _sources()
+
+    with open(sources["feature_cols"]) as f:
+        feature_cols = json.load(f)
+    with open(sources["thresholds"]) as f:
+        thresholds = json.load(f)["if"]
+
+    bundle_dir = write_scoring_bundle(
+        config.SCORING_BUNDLE_DIR,
+        scaler=joblib.load(sources["scaler"]),
+        feature_cols=feature_cols,
+        encoder=NumpyDenseModel.load(sources["encoder"]),
+        forest=CompiledIsolationForest.load(sources["forest"]),
+        baseline_scores=np.load(sources["baseline"]),
+        thresholds=thresholds,
+        model_version=config.MODEL_VERSION,
+        sources=list(sources.values()),
+    )
+    size = sum(os.path.getsize(os.path.join(bundle_dir, name)) for name in os.listdir(bundle_dir))
+    print(f"[build-bundle] {len(feature_cols)} features, {size / 1e6:,.1f} MB -> {bundle_dir}")
+
+    manifest.record(STAGE, produces())
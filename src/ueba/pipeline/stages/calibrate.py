@@ -36,7 +36,6 @@ def requires(thresholds_only: bool = False) -> list[tuple[str, str]]:
         (config.UEBA_CALIBRATION_PATH, "preprocess"),
         (config.SCALER_PATH, "train-ae"),
         (config.AE_PATH, "train-ae"),
-        (config.ENCODER_PATH, "train-ae"),
         (config.IF_PATH, "train-if"),
         (config.INSIDERS_PATH, "external: CERT answers/insiders.csv"),
     ]
@@ -70,10 +69,12 @@ def run(args) -> None:
     else:
         import joblib
         import pandas as pd
-        from tensorflow.keras.models import load_model
 
+        from ueba.alerts.explainer import ReconstructionErrorExplainer
         from ueba.models.data_prep import get_insiders, to_model_matrix
+        from ueba.models.dense import autoencoder_forward
         from ueba.models.isolation_forest import UEBAIsolationForest
+        from ueba.pipeline.stages._util import autoencoder_inputs
 
         print("[calibrate] Scoring the insider-free calibration slice through AE + IF ...")
         calib_df = pd.read_parquet(config.UEBA_CALIBRATION_PATH)
@@ -86,17 +87,17 @@ def run(args) -> None:
         print(f"[calibrate] Calibration rows after insider exclusion: {len(calib_clean):,} / {len(calib_df):,}")
 
         scaler = joblib.load(config.SCALER_PATH)
-        ae_model = load_model(config.AE_PATH, compile=False)
-        enc_model = load_model(config.ENCODER_PATH, compile=False)
         iforest = UEBAIsolationForest()
         iforest.load(config.IF_PATH)
 
-        x_calib, _ = to_model_matrix(calib_clean)
-        x_calib_scaled = scaler.transform(x_calib)
+        x_calib, feature_cols = to_model_matrix(calib_clean)
+        ae_model, x_model, input_scaler = autoencoder_inputs(x_calib, scaler, STAGE)
 
-        ae_reconstructed = ae_model.predict(x_calib_scaled, batch_size=4096)
-        ae_calib_errors = np.sum(np.square(x_calib_scaled - ae_reconstructed.astype("float32")), axis=1)
-        calib_embeddings = enc_model.predict(x_calib_scaled, batch_size=4096)
+        # One pass through the autoencoder yields both the reconstruction and the latent embeddings
+        calib_embeddings, ae_reconstructed = autoencoder_forward(ae_model, x_model, batch_size=4096)
+        ae_calib_errors = ReconstructionErrorExplainer(feature_names=feature_cols).compute_reconstruction_error(
+            x_model, ae_reconstructed, scaler=input_scaler
+        )
         if_calib_scores = iforest.anomaly_score(calib_embeddings)
 
         os.makedirs(os.path.dirname(config.AE_BASELINE_PATH), exist_ok=True)
@@ -6,6 +6,10 @@ root cause of CLEANUP_REPORT gap 3) is one command:
 
     python -m ueba.pipeline explain --split train
     python -m ueba.pipeline explain --split test_stream
+
+The test-stream run also stores the latent embeddings from the same forward
+pass, keyed by (user, day), so `build-alerts --split test` scores them through
+the IF without encoding the stream a second time.
 """
 
 import os
@@ -23,6 +27,9 @@ _SPLIT_OUTPUT = {
     "train": lambda: config.RECON_TABLE_PATH,
     "test_stream": lambda: config.RECON_TEST_TABLE_PATH,
 }
+_SPLIT_EMBEDDINGS = {
+    "test_stream": lambda: config.RECON_TEST_EMBEDDINGS_PATH,
+}
 
 
 def requires(split: str = "train") -> list[tuple[str, str]]:
@@ -34,16 +41,20 @@ def requires(split: str = "train") -> list[tuple[str, str]]:
 
 
 def produces(split: str = "train") -> list[str]:
-    return [_SPLIT_OUTPUT[split]()]
+    out = [_SPLIT_OUTPUT[split]()]
+    if split in _SPLIT_EMBEDDINGS:
+        out.append(_SPLIT_EMBEDDINGS[split]())
+    return out
 
 
 def run(args) -> None:
     import joblib
-    from tensorflow.keras.models import load_model
+    import pandas as pd
 
     from ueba.alerts.explainer import ReconstructionErrorExplainer, build_feature_groups
     from ueba.models.data_prep import to_model_matrix
-    from ueba.pipeline.stages._util import load_split_frame
+    from ueba.models.dense import autoencoder_forward
+    from ueba.pipeline.stages._util import autoencoder_inputs, load_split_frame
 
     split = args.split
     manifest.require(requires(split))
@@ -57,18 +68,20 @@ def run(args) -> None:
 
     scaler = joblib.load(config.SCALER_PATH)
     matrix, feature_names = to_model_matrix(df)
-    scaled = scaler.transform(matrix)
 
     print("[explain] Loading autoencoder and decomposing reconstruction error ...")
-    ae = load_model(config.AE_PATH, compile=False)
+    ae, x_model, input_scaler = autoencoder_inputs(matrix, scaler, STAGE)
+    embeddings, reconstruction = autoencoder_forward(ae, x_model, batch_size=4096)
     explainer = ReconstructionErrorExplainer(
         feature_names=feature_names,
         feature_groups=build_feature_groups(feature_names),
     )
     recon_table = explainer.explain_to_df(
-        scaled, ae,
+        x_model, ae,
         metadata=df[["user", "day"]],
         include_feat_err=False,
+        reconstruction=reconstruction,
+        scaler=input_scaler,
     )
 
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
@@ -79,4 +92,12 @@ def run(args) -> None:
     out.to_parquet(out_path, index=False)
     print(f"[explain] {len(out):,} rows -> {out_path}")
 
+    if split in _SPLIT_EMBEDDINGS:
+        emb_path = _SPLIT_EMBEDDINGS[split]()
+        emb = pd.DataFrame(embeddings.astype("float32"), columns=[f"latent_{i}" for i in range(embeddings.shape[1])])
+        emb.insert(0, "day", df["day"].to_numpy())
+        emb.insert(0, "user", df["user"].to_numpy())
+        emb.to_parquet(emb_path, index=False)
+        print(f"[explain] {len(emb):,} embeddings -> {emb_path}")
+
     manifest.record(STAGE, produces(split))
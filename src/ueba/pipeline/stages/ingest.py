@@ -0,0 +1,44 @@
+"""Stage: ingest — raw CERT CSVs -> day-partitioned Parquet datasets.
+
+Converts each CERT activity log once (ueba.features.ingest) so preprocess
+reads dictionary-encoded row groups instead of re-parsing the CSVs on every
+run. Sources whose CSV is unchanged since the last ingest are skipped, and
+sources whose CSV has only grown get just the new events appended, unless
+--force is given; preprocess falls back to the CSV for any source without a
+current ingest.
+"""
+
+import os
+
+from ueba import config
+from ueba.pipeline import manifest
+
+STAGE = "ingest"
+
+
+def requires() -> list[tuple[str, str]]:
+    from ueba.features.ingest import INGEST_SOURCES
+
+    if not config.CERT_PATH:
+        raise manifest.MissingArtifactError(
+            "CERT_PATH is not set. Point it at the raw CERT dataset in paths.local.py."
+        )
+    return [
+        (os.path.join(config.CERT_PATH, f"{source}.csv"), "external: raw CERT dataset")
+        for source in INGEST_SOURCES
+    ]
+
+
+def produces() -> list[str]:
+    from ueba.features.ingest import INGEST_SOURCES, ingest_meta_path
+
+    return [ingest_meta_path(config.INGEST_DIR, source) for source in INGEST_SOURCES]
+
+
+def run(args) -> None:
+    from ueba.features.ingest import ingest_cert_logs
+
+    manifest.require(requires())
+    print(f"[ingest] Converting CERT logs from {config.CERT_PATH} to {config.INGEST_DIR} ...")
+    ingest_cert_logs(config.CERT_PATH, config.INGEST_DIR, force=args.force)
+    manifest.record(STAGE, produces())
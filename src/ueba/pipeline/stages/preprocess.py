@@ -6,6 +6,22 @@ set, the chronological 80/10/10 train/calibration/test_stream splits, and the
 insider-free calibration variant. Also generates peer_baselines_{V}.parquet
 (department x day feature means) for the dashboard's Investigation tab —
 previously produced ad hoc and absent from the repo.
+
+Layer A, Layer B and the splits are dataset directories of Parquet parts
+(ueba.features.parquet_dataset). `--incremental` instead extends the
+existing Layer A/B with only the events after the last processed day
+(ueba.features.incremental) and adds the new days to Layer A, Layer B and the
+test stream as one new part each; the train/calibration splits are left
+untouched. It first appends what the raw CSVs gained to the `ingest` datasets
+and then reads only the day partitions after that day, so its cost follows the
+new events.
+
+A full run checkpoints each Layer A channel under safepoint/channels/, so a
+re-run re-extracts only the channels whose raw log, schedules, parameters or
+extractor code changed (`--no-checkpoints` re-extracts everything).
+`--shards N` builds Layer B per user-hash shard (ueba.features.layer_b_shards)
+and keeps the shards on disk: Layer B, the splits, the peer baselines and the
+incremental state are written one shard at a time.
 """
 
 import os
@@ -37,82 +53,248 @@ def produces() -> list[str]:
         config.TEST_STREAM_PATH,
         config.USER_WORK_HOURS_PATH,
         config.PEER_BASELINES_PATH,
+        os.path.join(config.INCREMENTAL_STATE_DIR, "state.json"),
     ]
 
 
-def _build_peer_baselines(train_df) -> "pd.DataFrame":  # noqa: F821 — pandas imported in run()
-    """(department, day, <feature> means) table for peer-comparison charts."""
-    import pandas as pd
+def _incremental_produces() -> list[str]:
+    return [
+        config.UEBA_A_PATH,
+        config.UEBA_B_PATH,
+        config.TEST_STREAM_PATH,
+        os.path.join(config.INCREMENTAL_STATE_DIR, "state.json"),
+    ]
+
 
+def _peer_baseline_totals(train_df) -> tuple:
+    """Per-(department, day) feature sums and non-null counts of one part of the training split."""
     numeric_cols = train_df.select_dtypes(include="number").columns
     feature_cols = [c for c in numeric_cols if c not in config.NON_FEATURE_COLS]
-    out = (
-        train_df.groupby(["department", "day"], observed=True)[feature_cols]
-        .mean()
-        .reset_index()
-    )
+    grouped = train_df.groupby(["department", "day"], observed=True)[feature_cols]
+    return grouped.sum(), grouped.count()
+
+
+def _build_peer_baselines(totals: list) -> "pd.DataFrame":  # noqa: F821 — pandas imported in run()
+    """(department, day, <feature> means) table for peer-comparison charts, from the
+    `_peer_baseline_totals` of every part of the training split."""
+    import numpy as np
+    import pandas as pd
+
+    sums = pd.concat([part_sums for part_sums, _ in totals]).groupby(level=[0, 1]).sum()
+    counts = pd.concat([part_counts for _, part_counts in totals]).groupby(level=[0, 1]).sum()
+    # A group whose feature is all NaN has a 0/0 mean: NaN, as groupby().mean() gives
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums.to_numpy(dtype=np.float64) / counts.reindex(sums.index).to_numpy()
+    out = pd.DataFrame(means, index=sums.index, columns=sums.columns).reset_index()
+    # groupby().mean() keeps float32 features at float32
+    float32_cols = [col for col, dtype in totals[0][0].dtypes.items() if dtype == np.float32]
+    out = out.astype(dict.fromkeys(float32_cols, np.float32))
     out["day"] = pd.to_datetime(out["day"]).dt.normalize()
     return out
 
 
+def _split_rows(layer_b_part) -> "pd.DataFrame":  # noqa: F821 — pandas imported in run()
+    """Layer B rows with the key normalization of `chronological_split`, in day order."""
+    import pandas as pd
+
+    return layer_b_part.assign(
+        user=layer_b_part["user"].str.strip().str.lower(),
+        day=pd.to_datetime(layer_b_part["day"]).dt.normalize(),
+    ).sort_values("day", kind="stable")
+
+
+def _megabytes(value: int | None) -> int | None:
+    """A --*-mb option in bytes (None = no limit)."""
+    return value * 2**20 if value else None
+
+
+def _run_incremental(args) -> None:
+    import pandas as pd
+
+    from ueba.features.incremental import IncrementalState, extend_layers
+    from ueba.features.parquet_dataset import append_part, drop_rows_after
+    from ueba.features.preprocessing import load_ldap
+    from ueba.pipeline.stages import ingest
+
+    manifest.require(requires() + [
+        (config.UEBA_A_PATH, "preprocess"),
+        (config.UEBA_B_PATH, "preprocess"),
+        (config.TEST_STREAM_PATH, "preprocess"),
+        (config.USER_WORK_HOURS_PATH, "preprocess"),
+        (os.path.join(config.INCREMENTAL_STATE_DIR, "state.json"), "preprocess"),
+    ])
+
+    state = IncrementalState.load(config.INCREMENTAL_STATE_DIR)
+    watermark = state.watermark
+    print(f"[preprocess] Incremental build after {watermark:%Y-%m-%d} (workers={args.workers}) ...")
+    # Parts of an earlier run that died before saving its state hold rows past the watermark
+    for path in (config.UEBA_A_PATH, config.UEBA_B_PATH, config.TEST_STREAM_PATH):
+        if drop_rows_after(path, watermark):
+            print(f"[preprocess] Dropped rows after {watermark:%Y-%m-%d} left in {path} by an interrupted run")
+    new_a, new_b, state = extend_layers(
+        cert_path=config.CERT_PATH,
+        state=state,
+        user_work_hours=pd.read_parquet(config.USER_WORK_HOURS_PATH),
+        work_hours=(9, 17),
+        ldap_df=load_ldap(config.CERT_PATH),
+        peer_col=config.PEER_GROUP_KEY,
+        workers=args.workers,
+        ingest_dir=config.INGEST_DIR,
+        distinct=args.distinct,
+        prefetch=args.prefetch,
+        prefetch_max_bytes=_megabytes(args.prefetch_max_mb),
+        partial_memory_budget=_megabytes(args.partial_budget_mb),
+    )
+    # extend_layers appended the new events to the ingest
+    manifest.record(ingest.STAGE, ingest.produces())
+    if new_b.empty:
+        print("[preprocess] Datasets are already up to date.")
+        return
+
+    new_a = new_a[new_a["day"] > watermark]
+    new_b = new_b[new_b["day"] > watermark]
+    part = f"{new_b['day'].min():%Y%m%d}-{new_b['day'].max():%Y%m%d}"
+    append_part(config.UEBA_A_PATH, new_a, part)
+    append_part(config.UEBA_B_PATH, new_b, part)
+    append_part(config.TEST_STREAM_PATH, new_b, part)
+    # Saved last: until the watermark moves, a re-run drops and rebuilds these parts
+    state.save(config.INCREMENTAL_STATE_DIR)
+    print(f"[preprocess] Appended {len(new_b):,} Layer B rows; watermark now {state.watermark:%Y-%m-%d}.")
+    manifest.record(STAGE, _incremental_produces())
+
+
 def run(args) -> None:
+    if getattr(args, "incremental", False):
+        _run_incremental(args)
+        return
+
+    from functools import partial
+
+    import numpy as np
+    import pandas as pd
 
+    from ueba.features.incremental import IncrementalState
+    from ueba.features.parquet_dataset import DatasetWriter, write_dataset
     from ueba.features.preprocessing import (
         build_layer_a,
         build_layer_b,
-        chronological_split,
+        build_pc_history,
+        get_layer_b_features,
         load_ldap,
-        save_dataset,
         save_nunique_frames,
+        split_cutoff_day,
     )
+    from ueba.features.rolling_state import RollingFeatureState
     from ueba.models.data_prep import get_insiders
 
     manifest.require(requires())
-    mv = config.MODEL_VERSION
     out_dir = config.DATASET_DIR
     os.makedirs(out_dir, exist_ok=True)
 
-    print(f"[preprocess] Building Layer A from {config.CERT_PATH} ...")
+    print(f"[preprocess] Building Layer A from {config.CERT_PATH} (workers={args.workers}) ...")
     layer_a_dataset, nunique_frames = build_layer_a(
         cert_path=config.CERT_PATH,
         work_hours=(9, 17),
         return_nunique_frames=True,
         compute_schedules=True,
         save_schedule_to=config.USER_WORK_HOURS_PATH,
+        workers=args.workers,
+        ingest_dir=config.INGEST_DIR,
+        distinct=args.distinct,
+        prefetch=args.prefetch,
+        prefetch_max_bytes=_megabytes(args.prefetch_max_mb),
+        partial_memory_budget=_megabytes(args.partial_budget_mb),
+        checkpoint_dir=None if args.no_checkpoints else config.CHANNEL_CHECKPOINT_DIR,
     )
-    save_dataset(layer_a_dataset, f"ueba_dataset_{mv}a.parquet", out_dir)
+    write_dataset(config.UEBA_A_PATH, [layer_a_dataset])
     save_nunique_frames(nunique_frames, config.SAFEPOINT_DIR)
+    # The only Layer A state the incremental build carries
+    pc_history = build_pc_history(layer_a_dataset)
 
-    print("[preprocess] Building Layer B ...")
     ldap_df = load_ldap(config.CERT_PATH)
-    layer_b_dataset = build_layer_b(
-        layer_a_df=layer_a_dataset,
-        rolling_window=5,
-        nunique_frames=nunique_frames,
-        ldap_df=ldap_df,
-        peer_col=config.PEER_GROUP_KEY,
-    )
-    save_dataset(layer_b_dataset, f"ueba_dataset_{mv}b.parquet", out_dir)
+    if args.shards > 1:
+        from ueba.features.layer_b_shards import build_partitioned_layer_b, iter_layer_b_shards, partition_layer_a
 
-    print("[preprocess] Creating chronological splits ...")
-    train_df, test_df = chronological_split(df=layer_b_dataset, split_ratio=0.9)
-    test_df.to_parquet(config.TEST_STREAM_PATH, index=False)
+        print(f"[preprocess] Building Layer B in {args.shards} user shards (workers={args.workers}) ...")
+        shard_dirs, nunique_value_cols = partition_layer_a(
+            layer_a_df=layer_a_dataset,
+            shard_dir=config.LAYER_B_SHARD_DIR,
+            n_shards=args.shards,
+            nunique_frames=nunique_frames,
+        )
+        # Layer A and the identity frames are on disk from here on
+        del layer_a_dataset, nunique_frames
+        shard_paths = build_partitioned_layer_b(
+            shard_dirs=shard_dirs,
+            nunique_value_cols=nunique_value_cols,
+            rolling_window=5,
+            ldap_df=ldap_df,
+            peer_col=config.PEER_GROUP_KEY,
+            workers=args.workers,
+        )
+        # Every later step reads the shards back one at a time
+        layer_b_parts = partial(iter_layer_b_shards, shard_paths)
+    else:
+        print("[preprocess] Building Layer B ...")
+        layer_b_dataset = build_layer_b(
+            layer_a_df=layer_a_dataset,
+            rolling_window=5,
+            nunique_frames=nunique_frames,
+            ldap_df=ldap_df,
+            peer_col=config.PEER_GROUP_KEY,
+        )
+        del layer_a_dataset, nunique_frames
 
-    train_df, calib_df = chronological_split(df=train_df, split_ratio=8 / 9)
+        def layer_b_parts(columns=None):
+            yield layer_b_dataset if columns is None else layer_b_dataset[columns]
+
+    write_dataset(config.UEBA_B_PATH, layer_b_parts())
+
+    print("[preprocess] Creating chronological splits ...")
+    # The two chronological_split cutoffs (90% train+calibration, then 8/9 of that for train)
+    days = np.unique(np.concatenate([
+        np.asarray(pd.to_datetime(part["day"]).dt.normalize().unique()) for part in layer_b_parts(["day"])
+    ]))
+    test_cutoff = split_cutoff_day(days, 0.9)
+    calib_cutoff = split_cutoff_day(days[days <= np.datetime64(test_cutoff)], 8 / 9)
     insiders_df = get_insiders(path=config.INSIDERS_PATH, version=config.CERT_VERSION)
     insider_ids = set(insiders_df["user"].unique())
-    calib_clean_df = calib_df[~calib_df["user"].isin(insider_ids)].copy()
 
-    calib_clean_df.to_parquet(config.UEBA_CALIBRATION_PATH, index=False)
-    calib_df.to_parquet(config.UEBA_CALIB_EVAL_PATH, index=False)
-    train_df.to_parquet(config.UEBA_PATH, index=False)
+    writers = {
+        "train": DatasetWriter(config.UEBA_PATH),
+        "calib_clean": DatasetWriter(config.UEBA_CALIBRATION_PATH),
+        "calib": DatasetWriter(config.UEBA_CALIB_EVAL_PATH),
+        "test": DatasetWriter(config.TEST_STREAM_PATH),
+    }
+    peer_totals = []
+    for part in layer_b_parts():
+        part = _split_rows(part)
+        train_df = part[part["day"] <= calib_cutoff]
+        calib_df = part[(part["day"] > calib_cutoff) & (part["day"] <= test_cutoff)]
+        writers["train"].write(train_df)
+        writers["calib_clean"].write(calib_df[~calib_df["user"].isin(insider_ids)])
+        writers["calib"].write(calib_df)
+        writers["test"].write(part[part["day"] > test_cutoff])
+        peer_totals.append(_peer_baseline_totals(train_df))
+    for writer in writers.values():
+        writer.close()
 
     print("[preprocess] Building peer baselines ...")
-    peer = _build_peer_baselines(train_df)
+    peer = _build_peer_baselines(peer_totals)
     peer.to_parquet(config.PEER_BASELINES_PATH, index=False)
 
+    # Rolling state from the stored (un-normalized) user ids, one part at a time
+    rolling = None
+    for part in layer_b_parts():
+        if rolling is None:
+            rolling = RollingFeatureState(get_layer_b_features(part), rolling_window=5)
+        rolling.add_history(part)
+    IncrementalState(watermark=pd.Timestamp(days.max()), pc_history=pc_history, rolling=rolling).save(
+        config.INCREMENTAL_STATE_DIR
+    )
+
     print(
-        f"[preprocess] Train: {len(train_df):,}  Calibration(clean): {len(calib_clean_df):,}  "
-        f"CalibrationEval: {len(calib_df):,}  TestStream: {len(test_df):,}"
+        f"[preprocess] Train: {writers['train'].rows:,}  Calibration(clean): {writers['calib_clean'].rows:,}  "
+        f"CalibrationEval: {writers['calib'].rows:,}  TestStream: {writers['test'].rows:,}"
     )
     manifest.record(STAGE, produces())
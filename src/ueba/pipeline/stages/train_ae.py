@@ -6,6 +6,10 @@ hidden 256/128/64, early stopping), persist model + scaler + feature-column
 contract + embeddings + the clean AE baseline, and evaluate on the held-out
 calibration eval slice. Evaluation metrics are additionally written as
 machine-readable metrics_ae.json beside the PNGs (CLEANUP_REPORT gap 6).
+
+--fold-scaler additionally exports both networks with the scaler folded into
+their first layer (*_folded.npz); explain, calibrate and build-alerts then feed
+the unscaled matrix straight into the autoencoder.
 """
 
 import json
@@ -32,6 +36,8 @@ def produces() -> list[str]:
     return [
         os.path.join(save, "autoencoder_model.keras"),
         os.path.join(save, "encoder_model.keras"),
+        os.path.join(save, "autoencoder_model.npz"),
+        os.path.join(save, "encoder_model.npz"),
         os.path.join(save, "feature_scaler.pkl"),
         os.path.join(save, "feature_cols.json"),
         os.path.join(save, "normal_embeddings.npy"),
@@ -56,6 +62,7 @@ def run(args) -> None:
         prepare_ae_training_data,
         to_model_matrix,
     )
+    from ueba.models.dense import export_dense_model, folded_weights_path
 
     manifest.require(requires())
     save_path = config.SAVE_ENCODER_PATH
@@ -102,13 +109,24 @@ def run(args) -> None:
     print("[train-ae] Persisting model, scaler, contract, embeddings ...")
     ae.autoencoder.save(os.path.join(save_path, "autoencoder_model.keras"))
     ae.encoder.save(os.path.join(save_path, "encoder_model.keras"))
+    export_dense_model(ae.autoencoder, os.path.join(save_path, "autoencoder_model.npz"))
+    export_dense_model(ae.encoder, os.path.join(save_path, "encoder_model.npz"))
     joblib.dump(scaler, os.path.join(save_path, "feature_scaler.pkl"))
+    folded_paths = []
+    for model, name in ((ae.autoencoder, "autoencoder_model"), (ae.encoder, "encoder_model")):
+        folded_path = folded_weights_path(os.path.join(save_path, f"{name}.keras"))
+        if args.fold_scaler:
+            folded_paths.append(export_dense_model(model, folded_path, scaler=scaler))
+        elif os.path.exists(folded_path):
+            os.remove(folded_path)  # folded weights of a previous model must not outlive it
     with open(os.path.join(save_path, "feature_cols.json"), "w") as f:
         json.dump(feature_cols, f, indent=2)
 
-    x_train_normal, _ = to_model_matrix(train_normal)
-    normal_embeddings = ae.encode(scaler.transform(x_train_normal))
+    # train_normal is train_df without the insider rows, in the same order, so its
+    # embeddings are a row subset of the full train embeddings
     full_train_embeddings = ae.encode(x_train_scaled)
+    normal_embeddings = full_train_embeddings[~insider_mask.to_numpy()]
+    assert len(normal_embeddings) == len(train_normal)
     np.save(os.path.join(save_path, "normal_embeddings.npy"), normal_embeddings)
     np.save(os.path.join(save_path, "full_train_embeddings.npy"), full_train_embeddings)
 
@@ -151,4 +169,4 @@ def run(args) -> None:
         json.dump(jsonable(metrics), f, indent=2)
     print(f"[train-ae] Metrics written to {metrics_path}")
 
-    manifest.record(STAGE, produces())
+    manifest.record(STAGE, produces() + folded_paths)
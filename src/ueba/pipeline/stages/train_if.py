@@ -40,6 +40,7 @@ def produces() -> list[str]:
     save = config.SAVE_IFOREST_PATH
     return [
         os.path.join(save, "iforest_model.pkl"),
+        os.path.join(save, "iforest_model.npz"),
         os.path.join(save, "anomaly_scores.npy"),
         os.path.join(save, "anomaly_labels.npy"),
         config.IF_BASELINE_PATH,
@@ -51,9 +52,10 @@ def run(args) -> None:
     import joblib
     import numpy as np
     import pandas as pd
-    from tensorflow.keras.models import load_model
 
+    from ueba.models.compiled_forest import export_isolation_forest
     from ueba.models.data_prep import build_insider_mask, get_insiders, to_model_matrix
+    from ueba.models.dense import load_dense_model
     from ueba.models.isolation_forest import UEBAIsolationForest
 
     manifest.require(requires())
@@ -75,12 +77,13 @@ def run(args) -> None:
     print(f"[train-if] Anomalies flagged: {(predictions == -1).sum():,} ({(predictions == -1).mean() * 100:.2f}%)")
 
     iforest.save(os.path.join(save_path, "iforest_model.pkl"))
+    export_isolation_forest(iforest.model, os.path.join(save_path, "iforest_model.npz"))
     np.save(os.path.join(save_path, "anomaly_scores.npy"), scores)
     np.save(os.path.join(save_path, "anomaly_labels.npy"), predictions)
 
     print("[train-if] Building clean IF baseline from the insider-free calibration slice ...")
     scaler = joblib.load(config.SCALER_PATH)
-    encoder_model = load_model(config.ENCODER_PATH, compile=False)
+    encoder_model = load_dense_model(config.ENCODER_PATH)
     calib_clean_df = pd.read_parquet(config.UEBA_CALIBRATION_PATH)
     x_calib_clean, _ = to_model_matrix(calib_clean_df)
     calib_clean_embeddings = encoder_model.predict(scaler.transform(x_calib_clean), batch_size=256)
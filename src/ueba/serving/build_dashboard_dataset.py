@@ -96,7 +96,7 @@ ALERT_WANT = KEYS + SCORE_COLS
 
 
 def _read_cols(path: str, wanted: list[str]) -> pd.DataFrame:
-    present = set(pq.read_schema(path).names)
+    present = set(pq.ParquetDataset(path).schema.names)  # a file or a dataset directory of parts
     use = [c for c in wanted if c in present]
     missing = [c for c in wanted if c not in present]
     if missing:
@@ -9,7 +9,9 @@ Usage:
     python live_simulation.py [--interval 0.5] [--input <csv_path>] [--port 8765]
 
 Models are loaded ONCE at startup and reused for every row, which eliminates the
-per-row disk-read overhead present in the old two-file design.
+per-row disk-read overhead present in the old two-file design. When the scoring
+bundle from `python -m ueba.pipeline build-bundle` exists, every component is
+memory-mapped from it instead of unpickled, and startup takes well under a second.
 """
 
 import argparse
@@ -36,6 +38,7 @@ IF_PATH                     = config.LIVE_IF_PATH
 IF_SCORES_PATH              = config.LIVE_IF_SCORES_PATH
 IF_BASELINE_PATH            = config.LIVE_IF_BASELINE_PATH
 CALIBRATION_THRESHOLD_PATH  = config.LIVE_CALIBRATION_THRESHOLD_PATH
+SCORING_BUNDLE_DIR          = config.LIVE_SCORING_BUNDLE_DIR
 # Ordered model feature columns persisted alongside the scaler at training time
 # (see Autoencoder.ipynb). This is the authoritative train/serve column contract.
 FEATURE_COLS_PATH           = os.path.join(os.path.dirname(SCALER_PATH), "feature_cols.json")
@@ -86,6 +89,7 @@ class LiveScorer:
         feature_cols: list[str] | None = None,
         absolute_thresholds: dict | None = None,
         user_work_hours="auto",
+        bundle="auto",
     ) -> None:
         """Load (or accept injected) scoring components.
 
@@ -94,10 +98,37 @@ class LiveScorer:
         or model files. `user_work_hours="auto"` loads the per-user schedule
         table when present (used only to WARN about cold-start users whose
         off-hours features were built with the population fallback — it does
-        not alter scores); pass None to disable.
+        not alter scores); pass None to disable. `bundle="auto"` opens the
+        memory-mapped scoring bundle when present and takes every component
+        not injected from it, unless one of its source artifacts changed after it
+        was built (then the individual artifacts are loaded instead). A bundle
+        directory path or an opened bundle uses that bundle and raises a
+        ValueError when it is stale; pass None to load the individual artifacts.
         """
+        auto = isinstance(bundle, str) and bundle == "auto"
+        if isinstance(bundle, str):
+            bundle_dir = SCORING_BUNDLE_DIR if auto else bundle
+            bundle = None
+            if not auto or os.path.exists(os.path.join(bundle_dir, "bundle.json")):
+                from ueba.serving.scoring_bundle import ScoringBundle
+                bundle = ScoringBundle.open(bundle_dir)
+                print(f"[live_simulation] Opened scoring bundle v{bundle.model_version}: {bundle_dir}", flush=True)
+        if bundle is not None:
+            _stale = bundle.stale_sources()
+            if _stale and not auto:
+                raise ValueError(
+                    f"Scoring bundle is out of date; {', '.join(_stale)} changed after it was built. Re-run build-bundle."
+                )
+            if _stale:
+                for _path in _stale:
+                    print(f"[live_simulation] WARNING: {_path} changed after the bundle was built.", flush=True)
+                print("[live_simulation] Loading the individual artifacts instead — re-run build-bundle.", flush=True)
+                bundle = None
+
         if scaler is not None:
             self.scaler = scaler
+        elif bundle is not None:
+            self.scaler = bundle.scaler
         else:
             print("[live_simulation] Loading scaler …", flush=True)
             self.scaler = joblib.load(SCALER_PATH)
@@ -107,7 +138,9 @@ class LiveScorer:
         # (numeric selection) when the artifact is absent.
         self.feature_cols: list[str] | None = feature_cols
         if self.feature_cols is None:
-            if os.path.exists(FEATURE_COLS_PATH):
+            if bundle is not None:
+                self.feature_cols = bundle.feature_cols
+            elif os.path.exists(FEATURE_COLS_PATH):
                 with open(FEATURE_COLS_PATH) as _f:
                     self.feature_cols = json.load(_f)
                 print(f"[live_simulation] Loaded {len(self.feature_cols)} feature columns from feature_cols.json", flush=True)
@@ -116,24 +149,35 @@ class LiveScorer:
 
         if encoder is not None:
             self.encoder = encoder
+        elif bundle is not None:
+            self.encoder = bundle.encoder
         else:
             print("[live_simulation] Loading encoder …", flush=True)
-            from tensorflow.keras.models import load_model  # deferred → faster cold import
-            self.encoder = load_model(ENCODER_PATH, compile=False)
+            # Exported NumPy weights when present: no TensorFlow import, no per-call predict overhead
+            from ueba.models.dense import NumpyDenseModel, load_dense_model
+            self.encoder = load_dense_model(ENCODER_PATH, prefer_numpy=True)
+            _engine = "NumPy" if isinstance(self.encoder, NumpyDenseModel) else "Keras"
+            print(f"[live_simulation] Encoder running on {_engine}.", flush=True)
 
         if iforest is not None:
             self.iforest = iforest
+        elif bundle is not None:
+            self.iforest = bundle.iforest
         else:
             print("[live_simulation] Loading isolation forest …", flush=True)
-            from ueba.models.isolation_forest import UEBAIsolationForest
-            self.iforest = UEBAIsolationForest()
-            self.iforest.load(IF_PATH)
+            # Exported node arrays when present: one vectorized descent per row instead of 200 tree.apply calls
+            from ueba.models.compiled_forest import CompiledIsolationForest, load_isolation_forest
+            self.iforest = load_isolation_forest(IF_PATH, prefer_compiled=True)
+            _engine = "compiled arrays" if isinstance(self.iforest, CompiledIsolationForest) else "sklearn"
+            print(f"[live_simulation] Isolation forest running on {_engine}.", flush=True)
 
         # Reference score distribution for percentile ranking (sorted once at
         # load so per-row ranking is a binary search via risk_bands).
         # Prefer the clean calibration baseline; fall back to full training scores.
         if ref_scores is not None:
             self.ref_scores: np.ndarray = np.sort(np.asarray(ref_scores))
+        elif bundle is not None:
+            self.ref_scores = bundle.ref_scores  # sorted when the bundle was built
         else:
             print("[live_simulation] Loading reference score distribution …", flush=True)
             _ref_path = IF_BASELINE_PATH if os.path.exists(IF_BASELINE_PATH) else IF_SCORES_PATH
@@ -147,7 +191,9 @@ class LiveScorer:
         # Calibrated absolute IF thresholds if available; fall back to percentile cutoffs.
         self._if_absolute_thresholds: dict | None = absolute_thresholds
         if self._if_absolute_thresholds is None:
-            if os.path.exists(CALIBRATION_THRESHOLD_PATH):
+            if bundle is not None and bundle.thresholds is not None:
+                self._if_absolute_thresholds = bundle.thresholds
+            elif os.path.exists(CALIBRATION_THRESHOLD_PATH):
                 with open(CALIBRATION_THRESHOLD_PATH) as _f:
                     _cal = json.load(_f)
                 self._if_absolute_thresholds = _cal.get("if")
@@ -208,9 +254,14 @@ class LiveScorer:
             feat_df = row_df.drop(columns=drop_cols)
 
         t0 = time.perf_counter()
-        scaled    = self.scaler.transform(feat_df.values.astype("float32"))
+        features  = feat_df.values.astype("float32")
+        # An encoder exported with --fold-scaler applies the scaler in its first layer
+        scaled    = features if getattr(self.encoder, "scaler_folded", False) else self.scaler.transform(features)
         embedding = self.encoder.predict(scaled, verbose=0)
-        raw_score = float(self.iforest.anomaly_score(embedding)[0])
+        if hasattr(self.iforest, "score_row"):
+            raw_score = self.iforest.score_row(embedding)
+        else:
+            raw_score = float(self.iforest.anomaly_score(embedding)[0])
         elapsed_ms = (time.perf_counter() - t0) * 1000
 
         # Global percentile (fraction of reference scores strictly below this score)
@@ -297,11 +348,14 @@ async def _run_simulation(
     if os.path.exists(PAUSE_FLAG):
         os.remove(PAUSE_FLAG)
 
-    # Preserve source order: stream rows exactly as they appear in the file.
+    # Stream in day order; rows of a day keep their file order. A sharded preprocess
+    # writes the test stream as one part per user shard, each in day order.
     if input_path.endswith(".parquet"):
         test_df = pd.read_parquet(input_path)
     else:
         test_df = pd.read_csv(input_path, index_col=0)
+    if "day" in test_df.columns:
+        test_df = test_df.iloc[np.argsort(pd.to_datetime(test_df["day"]).to_numpy(), kind="stable")]
 
     total   = len(test_df)
     print(f"[live_simulation] Streaming {total:,} rows from {os.path.basename(input_path)}", flush=True)
@@ -0,0 +1,229 @@
+"""Memory-mapped scoring bundle for the live scorer.
+
+A cold `LiveScorer` used to unpickle the scaler, load the encoder, unpickle
+the 200-tree sklearn forest and then load and sort the reference scores; every
+scorer process the dashboard spawns paid for all of it again. The `build-bundle`
+stage writes everything the live path needs into one versioned directory:
+
+- bundle.json: format version, model version, feature columns, calibrated IF
+  thresholds, encoder layer names / activations, forest scalars, and the
+  size / mtime of each source artifact
+- one `.npy` per array: scaler mean and scale, encoder kernels and biases
+  (plus the folded scaler's mean and scale when the encoder takes unscaled
+  input), the compiled forest's node arrays and the pre-sorted reference scores
+
+`ScoringBundle.open` maps every array with `np.load(mmap_mode="r")` (an `.npz`
+cannot be memory-mapped), so opening a bundle reads a few kilobytes of JSON and
+scorer processes share the array pages through the OS page cache. The arrays
+are stored in the dtypes `NumpyDenseModel` and `CompiledIsolationForest` use,
+so wrapping them does not copy.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from ueba.models.compiled_forest import CompiledIsolationForest
+from ueba.models.dense import ArrayScaler, NumpyDenseModel
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_MANIFEST = "bundle.json"
+
+# bundle_dir is a symlink to <bundle_dir>.v<time_ns> (see `write_scoring_bundle`)
+_VERSION_SEPARATOR = ".v"
+
+_FOREST_ARRAYS = ("feature", "threshold", "left", "right", "missing_left", "leaf_value", "roots")
+_FOREST_DTYPES = {
+    "feature": np.intp, "threshold": np.float64, "left": np.intp, "right": np.intp,
+    "missing_left": np.bool_, "leaf_value": np.float64, "roots": np.intp,
+}
+
+
+def _source_stamp(path: str) -> dict:
+    stat = os.stat(path)
+    return {"bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_scoring_bundle(
+    bundle_dir: str,
+    scaler,
+    feature_cols: list[str],
+    encoder: NumpyDenseModel,
+    forest: CompiledIsolationForest,
+    baseline_scores: np.ndarray,
+    thresholds: dict | None,
+    model_version: str,
+    sources: list[str] | None=None
+) -> str:
+    """
+    Writes a scoring bundle, replacing any previous bundle at the same path.
+
+    The arrays and manifest go to a new versioned sibling directory, and bundle_dir
+    is a symlink that is atomically swapped to it once it is complete, so a scorer
+    opening bundle_dir always finds either the previous or the new bundle, never a
+    half-written or missing one. The previous version is kept until the next write,
+    for scorers that resolved the link just before the swap.
+
+    Args:
+        bundle_dir: Destination directory
+        scaler: A fitted StandardScaler (or ArrayScaler)
+        feature_cols: The ordered model feature columns (the train/serve contract)
+        encoder: The exported encoder (folded or not; see `export_dense_model`)
+        forest: The compiled Isolation Forest
+        baseline_scores: Reference IF scores for percentile ranking (sorted on write)
+        thresholds: Calibrated band thresholds ({"LOW": ..., "CRITICAL": None}) or None
+        model_version: Model version the artifacts were trained under
+        sources: Artifact paths the bundle was built from; their size and mtime are
+            recorded so a scorer can tell when the bundle is older than its sources
+
+    Returns:
+        str: bundle_dir
+
+    Raises:
+        ValueError: If the components disagree on the number of features or latent dimensions
+    """
+    if not isinstance(scaler, ArrayScaler):
+        scaler = ArrayScaler.from_standard_scaler(scaler)
+    n_features = len(feature_cols)
+    if not (len(scaler.mean_) == len(scaler.scale_) == encoder.input_dim == n_features):
+        raise ValueError(
+            f"Scaler ({len(scaler.mean_)}), encoder ({encoder.input_dim}) and feature_cols ({n_features}) "
+            "must have the same number of features"
+        )
+    if encoder.output_dim != forest.n_features:
+        raise ValueError(f"Encoder emits {encoder.output_dim} dimensions but the forest expects {forest.n_features}")
+
+    arrays = {
+        "scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64),
+        "baseline_sorted": np.sort(np.asarray(baseline_scores, dtype=np.float64)),
+    }
+    for i, (kernel, bias) in enumerate(zip(encoder.kernels, encoder.biases)):
+        arrays[f"encoder_kernel_{i}"] = np.ascontiguousarray(kernel, dtype=np.float32)
+        arrays[f"encoder_bias_{i}"] = np.ascontiguousarray(bias, dtype=np.float32)
+    if encoder.scaler_folded:
+        arrays["encoder_input_mean"] = np.asarray(encoder.input_mean, dtype=np.float64)
+        arrays["encoder_input_scale"] = np.asarray(encoder.input_scale, dtype=np.float64)
+    for name in _FOREST_ARRAYS:
+        arrays[f"forest_{name}"] = np.ascontiguousarray(getattr(forest, name), dtype=_FOREST_DTYPES[name])
+
+    meta = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model_version": str(model_version),
+        "feature_cols": list(feature_cols),
+        "thresholds": thresholds,
+        "encoder": {"names": list(encoder.names), "activations": list(encoder.activations)},
+        "forest": {"max_depth": forest.max_depth, "denominator": forest.denominator, "n_features": forest.n_features},
+        "arrays": sorted(arrays),
+        "sources": {os.path.abspath(path): _source_stamp(path) for path in sources or []},
+    }
+
+    bundle_dir = os.path.abspath(bundle_dir)
+    version_dir = f"{bundle_dir}{_VERSION_SEPARATOR}{time.time_ns()}"
+    os.makedirs(version_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(version_dir, f"{name}.npy"), array)
+    with open(os.path.join(version_dir, BUNDLE_MANIFEST), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    previous_dir = os.path.realpath(bundle_dir) if os.path.islink(bundle_dir) else None
+    if os.path.isdir(bundle_dir) and not os.path.islink(bundle_dir):
+        # A bundle written before the symlink layout: a one-off rename aside
+        shutil.rmtree(bundle_dir + ".old", ignore_errors=True)
+        os.replace(bundle_dir, bundle_dir + ".old")
+    link_tmp = bundle_dir + ".link.tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    # Relative target, so the bundle tree can be moved as a whole
+    os.symlink(os.path.basename(version_dir), link_tmp)
+    os.replace(link_tmp, bundle_dir)
+
+    # Open scorers keep reading the unlinked files of older versions
+    shutil.rmtree(bundle_dir + ".old", ignore_errors=True)
+    keep = {version_dir, previous_dir}
+    parent, prefix = os.path.split(bundle_dir + _VERSION_SEPARATOR)
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if name.startswith(prefix) and path not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+    return bundle_dir
+
+
+class ScoringBundle:
+    """
+    The live scoring components, backed by memory-mapped arrays.
+
+    Attributes:
+        scaler: ArrayScaler
+        encoder: NumpyDenseModel
+        iforest: CompiledIsolationForest
+        ref_scores: Sorted reference IF scores
+        feature_cols: Ordered model feature columns
+        thresholds: Calibrated IF band thresholds, or None
+    """
+
+    def __init__(self, bundle_dir: str, meta: dict, arrays: dict) -> None:
+        self.bundle_dir = bundle_dir
+        self.meta = meta
+        self.model_version = meta["model_version"]
+        self.feature_cols = meta["feature_cols"]
+        self.thresholds = meta["thresholds"]
+
+        self.scaler = ArrayScaler(arrays["scaler_mean"], arrays["scaler_scale"])
+        n_layers = len(meta["encoder"]["names"])
+        self.encoder = NumpyDenseModel(
+            kernels=[arrays[f"encoder_kernel_{i}"] for i in range(n_layers)],
+            biases=[arrays[f"encoder_bias_{i}"] for i in range(n_layers)],
+            activations=meta["encoder"]["activations"],
+            names=meta["encoder"]["names"],
+            input_mean=arrays.get("encoder_input_mean"),
+            input_scale=arrays.get("encoder_input_scale"),
+        )
+        self.iforest = CompiledIsolationForest(
+            **{name: arrays[f"forest_{name}"] for name in _FOREST_ARRAYS},
+            **meta["forest"],
+        )
+        self.ref_scores = arrays["baseline_sorted"]
+
+
+    @classmethod
+    def open(cls, bundle_dir: str, mmap_mode: str | None="r") -> "ScoringBundle":
+        """
+        Opens a bundle written by `write_scoring_bundle`.
+
+        Args:
+            bundle_dir: The bundle directory
+            mmap_mode: Passed to `np.load`; None reads the arrays into memory
+
+        Returns:
+            ScoringBundle: The opened bundle
+
+        Raises:
+            FileNotFoundError: If bundle_dir holds no bundle
+            ValueError: If the bundle was written in another format version
+        """
+        # Resolved once, so the manifest and arrays come from the same version even
+        # if a new bundle is swapped in meanwhile
+        bundle_dir = os.path.realpath(bundle_dir)
+        manifest_path = os.path.join(bundle_dir, BUNDLE_MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No scoring bundle at {bundle_dir}; build it with `python -m ueba.pipeline build-bundle`")
+        with open(manifest_path) as f:
+            meta = json.load(f)
+        version = meta.get("format_version")
+        if version != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"{bundle_dir} has bundle format version {version}, expected {BUNDLE_FORMAT_VERSION}")
+        arrays = {name: np.load(os.path.join(bundle_dir, f"{name}.npy"), mmap_mode=mmap_mode) for name in meta["arrays"]}
+        return cls(bundle_dir, meta, arrays)
+
+
+    def stale_sources(self) -> list[str]:
+        """Source artifacts that are missing or have changed since the bundle was built."""
+        stale = []
+        for path, stamp in self.meta.get("sources", {}).items():
+            if not os.path.exists(path) or _source_stamp(path) != stamp:
+                stale.append(path)
+        return stale
@@ -15,8 +15,10 @@ dataset/model repo IDs from config.MODEL_VERSION at read time.
 import argparse
 import glob as _glob
 import os
+import posixpath
 import sys
 import time
+from collections.abc import Iterable
 
 import requests
 from huggingface_hub import HfApi, configure_http_backend
@@ -25,6 +27,7 @@ from urllib3.util.retry import Retry
 
 from ueba import config
 from ueba.config import HF_ORG as _HF_ORG
+from ueba.features.parquet_dataset import PART_PREFIX, dataset_parts
 
 BASE_DIR = config.BASE_DIR
 
@@ -75,6 +78,33 @@ def _resolve_token(token_arg: str | None) -> str:
     )
 
 
+def _expand_dataset_dirs(manifest: list[tuple[str, str, bool, str]]) -> list[tuple[str, str, bool, str]]:
+    """Replace each dataset-directory entry (Layer A/B, splits, test stream) with one entry
+    per part file, uploaded as `<name>.parquet/part-*.parquet`."""
+    expanded = []
+    for local, remote, required, dest in manifest:
+        if os.path.isdir(local):
+            expanded.extend(
+                (part, f"{remote}/{os.path.basename(part)}", required, dest) for part in dataset_parts(local)
+            )
+        else:
+            expanded.append((local, remote, required, dest))
+    return expanded
+
+
+def _stale_remote_files(remote_files: Iterable[str], manifest: list[tuple[str, str, bool, str]]) -> list[str]:
+    """Remote files a dataset-directory upload supersedes: the single file an earlier
+    upload wrote under the directory's name, and parts the local dataset no longer has."""
+    uploaded = {remote for _, remote, _, _ in manifest}
+    dataset_dirs = {
+        posixpath.dirname(remote) for remote in uploaded if posixpath.basename(remote).startswith(PART_PREFIX)
+    }
+    return sorted(
+        f for f in remote_files
+        if f in dataset_dirs or (posixpath.dirname(f) in dataset_dirs and f not in uploaded)
+    )
+
+
 def _build_manifest(V: str) -> list[tuple[str, str, bool, str]]:
     """Return list of (local_abs_path, path_in_repo, required, dest) tuples."""
     enc_dir = f"encoder_model_{V}"
@@ -91,7 +121,7 @@ def _build_manifest(V: str) -> list[tuple[str, str, bool, str]]:
         for f in sorted(_glob.glob(os.path.join(_details_dir, "*.parquet")))
     ]
 
-    return [
+    return _expand_dataset_dirs([
         # ── Dataset repo ────────────────────────────────────────────────────
         # Dashboard serving layer — required, this is the only file load_data() reads
         (os.path.join(ds_dir, f"ueba_dataset_{V}_dashboard.parquet"),
@@ -121,6 +151,8 @@ def _build_manifest(V: str) -> list[tuple[str, str, bool, str]]:
         # Encoder artifacts
         (config.ENCODER_PATH,
          f"{enc_dir}/encoder_model.keras",              False, _MODEL),
+        (os.path.join(BASE_DIR, "encoders", enc_dir, "encoder_model.npz"),
+         f"{enc_dir}/encoder_model.npz",                False, _MODEL),
         (config.SCALER_PATH,
          f"{enc_dir}/feature_scaler.pkl",               False, _MODEL),
         (os.path.join(BASE_DIR, "encoders", enc_dir, "feature_cols.json"),
@@ -133,11 +165,13 @@ def _build_manifest(V: str) -> list[tuple[str, str, bool, str]]:
         # Isolation Forest artifacts
         (config.IF_PATH,
          f"{if_dir}/iforest_model.pkl",                 False, _MODEL),
+        (os.path.join(BASE_DIR, "isolation_forests", if_dir, "iforest_model.npz"),
+         f"{if_dir}/iforest_model.npz",                 False, _MODEL),
         (config.IF_BASELINE_PATH,
          f"{if_dir}/if_baseline_clean.npy",             False, _MODEL),
         (config.IF_SCORES_PATH,
          f"{if_dir}/anomaly_scores.npy",                False, _MODEL),
-    ]
+    ])
 
 
 def _print_manifest(
@@ -249,6 +283,13 @@ def _run(args: argparse.Namespace) -> None:
     api = HfApi(token=token)
     uploaded_ds = uploaded_model = 0
 
+    # Dataset directories replace what an earlier upload left under their names
+    present = [entry for entry in manifest if entry[3] == _DATASET and os.path.exists(entry[0])]
+    for remote in _stale_remote_files(api.list_repo_files(dataset_repo, repo_type=_DATASET), present):
+        print(f"  deleting superseded {remote} from dataset repo …", end=" ", flush=True)
+        api.delete_file(remote, repo_id=dataset_repo, repo_type=_DATASET)
+        print("done")
+
     for local, remote, _, dest in manifest:
         if dest == _MODEL and args.skip_model_repo:
             continue
@@ -79,3 +79,77 @@ def insiders_csv(tmp_path) -> str:
         encoding="utf-8",
     )
     return str(path)
+
+
+CERT_USERS = ["ACM2278", "CDE1846", "MBG3183", "JPH1910", "XYZ0001", "HVB0002"]
+CERT_PCS = ["PC-1001", "PC-1002", "PC-2003", "PC-3004", "PC-4005"]
+CERT_URLS = [
+    "http://www.indeed.com/jobs?q=analyst",
+    "https://dropbox.com/upload/quarterly.zip",
+    "http://wikileaks.org/submit",
+    "http://www.example.com/" + "a" * 100,
+    "http://news.example.org/story/1",
+    "https://docs.google.com/document/d/1",
+    "intranet.dtaa.com/home",
+    "",
+]
+
+
+def _write_cert_tree(root, n_days: int = 45, seed: int = 11) -> str:
+    """Writes a miniature CERT r6.2-shaped tree (five activity logs + LDAP) under root."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(START_DAY, periods=n_days, freq="D")
+
+    def _events(n_per_day: int, extra) -> pd.DataFrame:
+        rows = []
+        for user_i, user in enumerate(CERT_USERS):
+            home_pc = CERT_PCS[user_i % len(CERT_PCS)]
+            for day in days:
+                for _ in range(rng.integers(0, n_per_day + 1)):
+                    pc = home_pc if rng.random() < 0.85 else CERT_PCS[rng.integers(len(CERT_PCS))]
+                    ts = day + pd.Timedelta(minutes=int(rng.integers(0, 24 * 60)))
+                    rows.append({"date": ts.strftime("%m/%d/%Y %H:%M:%S"), "user": user, "pc": pc, **extra(rng)})
+        df = pd.DataFrame(rows).sort_values("date", kind="stable")
+        df.insert(0, "id", [f"{{{i:08X}}}" for i in range(len(df))])
+        return df
+
+    _events(4, lambda r: {"activity": ["Logon", "Logoff"][r.integers(2)]}).to_csv(root / "logon.csv", index=False)
+    _events(6, lambda r: {
+        "filename": f"C:\\docs\\{r.integers(40)}.doc",
+        "activity": ["File Open", "File Write", "File Copy", "File Delete"][r.integers(4)],
+    }).to_csv(root / "file.csv", index=False)
+    _events(1, lambda r: {"activity": ["Connect", "Disconnect"][r.integers(2)]}).to_csv(root / "device.csv", index=False)
+    _events(5, lambda r: {
+        "to": f"user{r.integers(12)}@{['dtaa.com', 'gmail.com'][r.integers(2)]}",
+        "attachments": None if r.random() < 0.7 else "report.pdf",
+    }).to_csv(root / "email.csv", index=False)
+    _events(8, lambda r: {
+        "url": CERT_URLS[r.integers(len(CERT_URLS))],
+        "activity": ["WWW Visit", "WWW Download", "WWW Upload"][r.integers(3)],
+    }).to_csv(root / "http.csv", index=False)
+
+    ldap_dir = root / "LDAP"
+    ldap_dir.mkdir()
+    ldap = pd.DataFrame({
+        "employee_name": [f"Person {u}" for u in CERT_USERS],
+        "user_id": CERT_USERS,
+        "email": [f"{u}@dtaa.com" for u in CERT_USERS],
+        "role": ["Salesman", "ITAdmin", "Salesman", "Engineer", "Engineer", "Salesman"],
+        "projects": "",
+        "business_unit": 1,
+        "functional_unit": ["Sales", "IT", "Sales", "R&D", "R&D", "Sales"],
+        "department": ["Sales", "IT", "Sales", "Engineering", "Engineering", "Sales"],
+        "team": ["T1", "T2", "T1", "T3", "T3", "T1"],
+        "supervisor": ["Boss One", "", "Boss One", "Boss Two", "Boss Two", "Boss One"],
+    })
+    ldap.to_csv(ldap_dir / "2010-01.csv", index=False)
+    ldap.to_csv(ldap_dir / "2010-02.csv", index=False)
+    return str(root)
+
+
+@pytest.fixture
+def cert_tree(tmp_path) -> str:
+    """Path to a miniature synthetic CERT dataset (logs + LDAP snapshots)."""
+    root = tmp_path / "cert"
+    root.mkdir()
+    return _write_cert_tree(root)
@@ -0,0 +1,66 @@
+"""Tests for the array-backed Isolation Forest scorer (ueba.models.compiled_forest).
+
+The compiled scores are compared for exact equality with sklearn's
+`score_samples` on small fitted forests.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import IsolationForest  # noqa: E402
+
+from ueba.models.compiled_forest import (  # noqa: E402
+    CompiledIsolationForest,
+    export_isolation_forest,
+    forest_arrays_path,
+    load_isolation_forest,
+)
+
+
+def _embeddings(rng, n, missing=0.0):
+    x = rng.normal(size=(n, 6)).astype(np.float32)
+    x[:, 0] *= 10.0
+    x[rng.random(x.shape) < missing] = np.nan
+    return x
+
+
+@pytest.mark.parametrize("params", [{}, {"max_features": 0.5}, {"max_samples": 64}])
+def test_compiled_scores_match_sklearn_exactly(tmp_path, params):
+    rng = np.random.default_rng(0)
+    model = IsolationForest(n_estimators=25, random_state=42, **params).fit(_embeddings(rng, 2000, missing=0.02))
+    compiled = CompiledIsolationForest.load(export_isolation_forest(model, str(tmp_path / "iforest_model.npz")))
+    assert compiled.n_estimators == 25
+
+    x = _embeddings(rng, 3000, missing=0.05) * 1.5
+    expected = model.score_samples(x)
+    np.testing.assert_array_equal(compiled.score_samples(x), expected)
+    # Chunking only bounds memory
+    np.testing.assert_array_equal(compiled.anomaly_score(x, chunk_size=7), -expected)
+    assert [compiled.score_row(row) for row in x[:50]] == list(-expected[:50])
+
+
+def test_compiled_forest_rejects_mismatched_inputs(tmp_path):
+    model = IsolationForest(n_estimators=3, random_state=0).fit(_embeddings(np.random.default_rng(1), 100))
+    compiled = CompiledIsolationForest.load(export_isolation_forest(model, str(tmp_path / "f.npz")))
+    with pytest.raises(ValueError, match="shape"):
+        compiled.anomaly_score(np.zeros((4, 5), dtype=np.float32))
+    with pytest.raises(ValueError, match="not been fitted"):
+        export_isolation_forest(IsolationForest(), str(tmp_path / "unfitted.npz"))
+
+
+def test_load_isolation_forest_prefers_exported_arrays(tmp_path):
+    import joblib
+
+    model = IsolationForest(n_estimators=3, random_state=0).fit(_embeddings(np.random.default_rng(2), 100))
+    pkl_path = str(tmp_path / "iforest_model.pkl")
+    joblib.dump(model, pkl_path)
+    export_isolation_forest(model, forest_arrays_path(pkl_path))
+    assert isinstance(load_isolation_forest(pkl_path, prefer_compiled=True), CompiledIsolationForest)
+
+    pytest.importorskip("matplotlib")  # imported by ueba.models.isolation_forest
+    iforest = load_isolation_forest(pkl_path)
+    assert not isinstance(iforest, CompiledIsolationForest)
+    x = _embeddings(np.random.default_rng(3), 10)
+    np.testing.assert_array_equal(iforest.anomaly_score(x), CompiledIsolationForest.load(forest_arrays_path(pkl_path)).anomaly_score(x))
@@ -0,0 +1,196 @@
+"""Tests for the NumPy Dense inference engine (ueba.models.dense).
+
+Keras-shaped stub layers stand in for a trained model so the export and the
+forward pass are pinned without tensorflow; the Keras equivalence test runs
+only where tensorflow is installed.
+"""
+
+import sys
+
+import numpy as np
+import pytest
+
+from ueba.alerts.explainer import ReconstructionErrorExplainer
+from ueba.models.dense import (
+    LATENT_LAYER,
+    NumpyDenseModel,
+    autoencoder_forward,
+    dense_weights_path,
+    export_dense_model,
+    folded_weights_path,
+    load_dense_model,
+    load_folded_dense_model,
+)
+
+
+class InputLayer:
+    name = "ueba_input"
+
+
+class Dropout:
+    name = "dropout"
+
+
+class Dense:
+    def __init__(self, name, kernel, bias, activation):
+        self.name = name
+        self._weights = [kernel, bias]
+        self._activation = activation
+
+    def get_weights(self):
+        return self._weights
+
+    def get_config(self):
+        return {"activation": self._activation}
+
+
+class StubModel:
+    name = "stub"
+
+    def __init__(self, layers):
+        self.layers = layers
+
+
+class StubScaler:
+    with_mean = with_std = True
+
+    def __init__(self, mean, scale):
+        self.mean_, self.scale_ = mean, scale
+
+    def transform(self, x):
+        x = np.array(x, dtype=np.float32)
+        x -= self.mean_.astype(np.float32)
+        x /= self.scale_.astype(np.float32)
+        return x
+
+
+def _stub_autoencoder(rng, dims=(12, 8, 3, 8, 12)):
+    layers = [InputLayer()]
+    activations = ["relu", "linear", "relu", "linear"]
+    for i, (fan_in, fan_out) in enumerate(zip(dims[:-1], dims[1:])):
+        layers.append(Dense(f"dense_{i}", rng.normal(size=(fan_in, fan_out)).astype(np.float32),
+                            rng.normal(size=fan_out).astype(np.float32), activations[i]))
+        if activations[i] == "relu":
+            layers.append(Dropout())
+    return StubModel(layers)
+
+
+def _reference_forward(model, x):
+    for layer in model.layers:
+        if isinstance(layer, Dense):
+            kernel, bias = layer.get_weights()
+            x = x.astype(np.float64) @ kernel + bias
+            if layer.get_config()["activation"] == "relu":
+                x = np.maximum(x, 0.0)
+    return x
+
+
+def test_exported_model_matches_reference_forward(tmp_path):
+    rng = np.random.default_rng(0)
+    model = _stub_autoencoder(rng)
+    path = export_dense_model(model, str(tmp_path / "autoencoder_model.npz"))
+
+    loaded = NumpyDenseModel.load(path)
+    assert loaded.names == ["dense_0", "dense_1", "dense_2", "dense_3"]
+    assert (loaded.input_dim, loaded.output_dim) == (12, 12)
+
+    x = rng.normal(size=(1000, 12)).astype(np.float32)
+    out = loaded.predict(x, verbose=0)
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, _reference_forward(model, x), rtol=1e-4, atol=1e-4)
+    # Batching only bounds memory; single rows go through the same kernels
+    np.testing.assert_array_equal(loaded.predict(x, batch_size=7), out)
+    np.testing.assert_allclose(loaded.predict(x[:1]), out[:1], rtol=1e-6)
+
+
+def test_fused_forward_returns_latent_and_reconstruction(tmp_path):
+    rng = np.random.default_rng(3)
+    model = _stub_autoencoder(rng)
+    model.layers[3].name = LATENT_LAYER  # the linear bottleneck, as in Autoencoder._build_model
+    ae = NumpyDenseModel.load(export_dense_model(model, str(tmp_path / "autoencoder_model.npz")))
+    encoder = NumpyDenseModel(ae.kernels[:2], ae.biases[:2], ae.activations[:2])
+
+    x = rng.normal(size=(500, 12)).astype(np.float32)
+    for batch_size in (4096, 64):
+        latent, reconstruction = autoencoder_forward(ae, x, batch_size=batch_size)
+        assert latent.shape == (500, 3) and reconstruction.shape == (500, 12)
+        np.testing.assert_allclose(latent, encoder.predict(x), rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(reconstruction, ae.predict(x), rtol=1e-6, atol=1e-6)
+
+    # Explaining a precomputed reconstruction gives the same table without another pass
+    names = [f"f{i}" for i in range(12)]
+    explainer = ReconstructionErrorExplainer(feature_names=names)
+    table = explainer.explain_to_df(x, None, reconstruction=reconstruction)
+    expected = explainer.explain_to_df(x, ae)
+    np.testing.assert_allclose(table.to_numpy(), expected.to_numpy(), rtol=1e-6, atol=1e-6)
+    with pytest.raises(ValueError, match="shape"):
+        explainer.explain(x, None, reconstruction=reconstruction[:, :4])
+
+    with pytest.raises(ValueError, match=LATENT_LAYER):
+        encoder.forward(x)
+
+
+def test_folded_scaler_takes_unscaled_input(tmp_path):
+    rng = np.random.default_rng(4)
+    model = _stub_autoencoder(rng)
+    scaler = StubScaler(rng.normal(scale=50.0, size=12), rng.uniform(0.5, 30.0, size=12))
+    keras_path = str(tmp_path / "autoencoder_model.keras")
+    ae = NumpyDenseModel.load(export_dense_model(model, str(tmp_path / "autoencoder_model.npz")))
+    assert load_folded_dense_model(keras_path) is None
+    folded = NumpyDenseModel.load(export_dense_model(model, folded_weights_path(keras_path), scaler=scaler))
+    assert folded.scaler_folded and not ae.scaler_folded
+    assert isinstance(load_folded_dense_model(keras_path), NumpyDenseModel)
+
+    raw = (rng.normal(size=(2000, 12)) * scaler.scale_ + scaler.mean_).astype(np.float32)
+    scaled = scaler.transform(raw)
+    reconstruction = ae.predict(scaled)
+    # Folding reorders float32 rounding, so the outputs agree closely rather than bit for bit
+    np.testing.assert_allclose(folded.predict(raw), reconstruction, rtol=1e-4, atol=1e-3)
+
+    # Scaling inside the explainer's loop matches explaining the pre-scaled matrix
+    explainer = ReconstructionErrorExplainer(feature_names=[f"f{i}" for i in range(12)])
+    expected = explainer.explain_to_df(scaled, None, reconstruction=reconstruction)
+    table = explainer.explain_to_df(raw, None, reconstruction=reconstruction, scaler=scaler, batch_size=128)
+    np.testing.assert_array_equal(table.to_numpy(), expected.to_numpy())
+    np.testing.assert_array_equal(
+        explainer.compute_reconstruction_error(raw, reconstruction, scaler=scaler, batch_size=128),
+        expected["total_reconstruction_error"].to_numpy(),
+    )
+    from_folded = explainer.explain_to_df(raw, folded, scaler=scaler)
+    np.testing.assert_allclose(from_folded.to_numpy(), expected.to_numpy(), rtol=1e-3, atol=1e-3)
+
+    with pytest.raises(ValueError, match="features"):
+        export_dense_model(model, str(tmp_path / "bad.npz"), scaler=StubScaler(np.zeros(5), np.ones(5)))
+
+
+def test_export_rejects_unsupported_layers(tmp_path):
+    model = StubModel([Dense("d", np.ones((2, 2), np.float32), np.zeros(2, np.float32), "tanh")])
+    with pytest.raises(ValueError, match="tanh"):
+        export_dense_model(model, str(tmp_path / "m.npz"))
+
+
+def test_load_dense_model_prefers_exported_weights(tmp_path, monkeypatch):
+    keras_path = str(tmp_path / "encoder_model.keras")
+    export_dense_model(_stub_autoencoder(np.random.default_rng(1)), dense_weights_path(keras_path))
+    assert isinstance(load_dense_model(keras_path, prefer_numpy=True), NumpyDenseModel)
+
+    # Without tensorflow and without exported weights, the error names the missing export
+    monkeypatch.setitem(sys.modules, "tensorflow", None)
+    with pytest.raises(FileNotFoundError, match="exported weights"):
+        load_dense_model(str(tmp_path / "absent.keras"))
+    assert isinstance(load_dense_model(keras_path), NumpyDenseModel)
+
+
+def test_numpy_forward_matches_keras(tmp_path):
+    pytest.importorskip("tensorflow")
+    from ueba.models.autoencoder import Autoencoder
+
+    ae = Autoencoder(input_dim=20, latent_dim=4, hidden_dims=(16, 8))
+    x = np.random.default_rng(2).normal(size=(64, 20)).astype(np.float32)
+    for keras_model in (ae.autoencoder, ae.encoder):
+        numpy_model = NumpyDenseModel.load(export_dense_model(keras_model, str(tmp_path / f"{keras_model.name}.npz")))
+        np.testing.assert_allclose(numpy_model.predict(x), keras_model.predict(x, verbose=0), rtol=1e-5, atol=1e-5)
+
+    latent, reconstruction = ae.forward(x)
+    np.testing.assert_allclose(latent, ae.encoder.predict(x, verbose=0), rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(reconstruction, ae.autoencoder.predict(x, verbose=0), rtol=1e-5, atol=1e-5)
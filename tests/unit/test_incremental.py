@@ -0,0 +1,139 @@
+"""Tests for incremental Layer A/B builds (ueba.features.incremental)."""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ueba.features.incremental import IncrementalState, build_incremental_state, extend_layers
+from ueba.features.ingest import ingest_cert_logs
+from ueba.features.parquet_dataset import append_part, dataset_parts, drop_rows_after, write_dataset
+from ueba.features.preprocessing import (
+    build_layer_a,
+    build_layer_b,
+    compute_user_work_hours,
+    load_ldap,
+    load_raw_logs,
+    normalize_shared_columns,
+)
+
+WATERMARK = pd.Timestamp("2010-02-04")
+
+
+def _truncate_tree(cert_tree: str, dest, last_day: pd.Timestamp) -> str:
+    """Copies cert_tree keeping only events on or before last_day."""
+    shutil.copytree(os.path.join(cert_tree, "LDAP"), dest / "LDAP")
+    for source in ("logon", "file", "device", "email", "http"):
+        raw = pd.read_csv(os.path.join(cert_tree, f"{source}.csv"), keep_default_na=False)
+        day = pd.to_datetime(raw["date"], format="%m/%d/%Y %H:%M:%S").dt.floor("D")
+        raw[day <= last_day].to_csv(dest / f"{source}.csv", index=False)
+    return str(dest)
+
+
+def _full_build(cert_path: str, schedule: pd.DataFrame, ldap: pd.DataFrame):
+    layer_a, frames = build_layer_a(cert_path, return_nunique_frames=True, user_work_hours=schedule)
+    layer_b = build_layer_b(layer_a, nunique_frames=frames, ldap_df=ldap)
+    return layer_a, layer_b
+
+
+def _assert_rows_match(got: pd.DataFrame, expected: pd.DataFrame, keys: list) -> None:
+    assert list(got.columns) == list(expected.columns)
+    got = got.astype({"user": str}).sort_values(keys).reset_index(drop=True)
+    expected = expected.astype({"user": str}).sort_values(keys).reset_index(drop=True)
+    if "pc" in keys:
+        got["pc"], expected["pc"] = got["pc"].astype(str), expected["pc"].astype(str)
+    for col in expected.columns:
+        if col in keys:
+            assert (got[col].to_numpy() == expected[col].to_numpy()).all(), col
+        elif pd.api.types.is_numeric_dtype(expected[col]):
+            np.testing.assert_allclose(
+                got[col].to_numpy("float64"), expected[col].to_numpy("float64"), rtol=1e-5, atol=1e-6, err_msg=col,
+            )
+        else:
+            assert got[col].astype(str).tolist() == expected[col].astype(str).tolist(), col
+
+
+@pytest.fixture
+def builds(cert_tree, tmp_path):
+    ldap = load_ldap(cert_tree)
+    logon = normalize_shared_columns(load_raw_logs(cert_tree)["logon"])
+    schedule = compute_user_work_hours(logon)
+    full = _full_build(cert_tree, schedule, ldap)
+    prefix = _full_build(_truncate_tree(cert_tree, tmp_path / "prefix", WATERMARK), schedule, ldap)
+    return cert_tree, schedule, ldap, full, prefix
+
+
+def test_extension_matches_full_rebuild(builds, tmp_path):
+    cert_tree, schedule, ldap, (full_a, full_b), (prefix_a, prefix_b) = builds
+
+    state = build_incremental_state(prefix_a, prefix_b)
+    state.save(str(tmp_path / "state"))
+    state = IncrementalState.load(str(tmp_path / "state"))
+    new_a, new_b, advanced = extend_layers(cert_tree, state, schedule, ldap_df=ldap)
+
+    _assert_rows_match(new_a, full_a[full_a["day"] > WATERMARK], ["user", "pc", "day"])
+    _assert_rows_match(new_b, full_b[full_b["day"] > WATERMARK], ["user", "day"])
+    numeric = [col for col in full_b.columns if pd.api.types.is_numeric_dtype(full_b[col])]
+    assert new_b[numeric].dtypes.to_dict() == full_b[numeric].dtypes.to_dict()
+    assert advanced.watermark == full_b["day"].max()
+    assert advanced.rolling.n_seen.sum() == len(full_b)
+
+
+def test_extension_appends_only_the_new_events_to_the_ingest(builds, tmp_path, capsys):
+    cert_tree, schedule, ldap, (full_a, full_b), (prefix_a, prefix_b) = builds
+    # A tree whose CSVs hold the prefix days, ingested, then grown by the later days
+    grown = tmp_path / "grown"
+    shutil.copytree(os.path.join(cert_tree, "LDAP"), grown / "LDAP")
+    later = {}
+    for source in ("logon", "file", "device", "email", "http"):
+        with open(os.path.join(cert_tree, f"{source}.csv"), "rb") as f:
+            header, *lines = f.readlines()
+        is_later = [pd.Timestamp(line.split(b",")[1][:10].decode()) > WATERMARK for line in lines]
+        (grown / f"{source}.csv").write_bytes(header + b"".join(line for line, late in zip(lines, is_later) if not late))
+        later[source] = b"".join(line for line, late in zip(lines, is_later) if late)
+    ingest_dir = str(tmp_path / "ingest")
+    ingest_cert_logs(str(grown), ingest_dir)
+    for source, lines in later.items():
+        with open(grown / f"{source}.csv", "ab") as f:
+            f.write(lines)
+
+    capsys.readouterr()
+    state = build_incremental_state(prefix_a, prefix_b)
+    new_a, new_b, _ = extend_layers(str(grown), state, schedule, ldap_df=ldap, ingest_dir=ingest_dir)
+    out = capsys.readouterr().out
+    assert out.count(".csv: appended") == 5 and "Ingesting" not in out
+    assert out.count("reading ingested Parquet dataset") == 5
+    _assert_rows_match(new_a, full_a[full_a["day"] > WATERMARK], ["user", "pc", "day"])
+    _assert_rows_match(new_b, full_b[full_b["day"] > WATERMARK], ["user", "day"])
+
+
+def test_extension_past_last_day_is_a_noop(builds):
+    cert_tree, schedule, ldap, (full_a, full_b), _ = builds
+    state = build_incremental_state(full_a, full_b)
+
+    new_a, new_b, advanced = extend_layers(cert_tree, state, schedule, ldap_df=ldap)
+    assert new_a.empty and new_b.empty
+    assert advanced is state
+
+
+def test_appended_parts_are_dropped_until_the_watermark_moves(builds, tmp_path):
+    *_, (full_a, full_b), (prefix_a, prefix_b) = builds
+    path = str(tmp_path / "layer_b.parquet")
+    write_dataset(path, [prefix_b])
+    new_rows = full_b[full_b["day"] > WATERMARK]
+
+    # A run that dies before saving its state leaves its part behind; the retry drops it
+    append_part(path, new_rows.iloc[: len(new_rows) // 2], "20100205-20100207")
+    assert drop_rows_after(path, WATERMARK) == 1
+    append_part(path, new_rows, "20100205-20100210")
+    assert len(dataset_parts(path)) == 2
+    stored = pd.read_parquet(path)
+    _assert_rows_match(stored, pd.concat([prefix_b, new_rows]), ["user", "day"])
+    assert (stored.dtypes == prefix_b.dtypes).all()
+
+    # A part straddling the watermark is rewritten without the later rows
+    write_dataset(path, [full_b])
+    assert drop_rows_after(path, WATERMARK) == 1
+    assert pd.read_parquet(path)["day"].max() == WATERMARK
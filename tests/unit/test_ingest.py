@@ -0,0 +1,158 @@
+"""Tests for the columnar raw-log ingest (ueba.features.ingest)."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from ueba.constants import USECOLS_MAP
+from ueba.features.ingest import (
+    ingest_cert_logs,
+    is_ingest_appendable,
+    is_ingest_current,
+    iter_ingested_chunks,
+    read_ingest_meta,
+    read_ingested,
+)
+from ueba.features.prefetch import frame_nbytes, prefetch_chunks
+from ueba.features.preprocessing import build_layer_a, extract_http_features_chunked
+
+
+def test_ingest_preserves_rows_and_dictionary_columns(cert_tree, tmp_path):
+    datasets = ingest_cert_logs(cert_tree, str(tmp_path / "ingest"))
+    meta = read_ingest_meta(datasets["http"])
+    raw = pd.read_csv(os.path.join(cert_tree, "http.csv"))
+    assert meta["rows"] == len(raw)
+    assert any(name.startswith("day=") for name in os.listdir(datasets["http"]))
+
+    chunks = list(iter_ingested_chunks(datasets["http"], USECOLS_MAP["http"], chunksize=500))
+    assert sum(len(c) for c in chunks) == len(raw)
+    assert all(len(c) >= 500 for c in chunks[:-1])
+    first = chunks[0]
+    assert "timestamp" in first.columns and "date" not in first.columns
+    assert first["user"].dtype == "category"
+    assert str(first["timestamp"].dtype).startswith("datetime64")
+
+
+def test_unchanged_sources_are_skipped(cert_tree, tmp_path, capsys):
+    ingest_dir = str(tmp_path / "ingest")
+    ingest_cert_logs(cert_tree, ingest_dir)
+    capsys.readouterr()
+
+    ingest_cert_logs(cert_tree, ingest_dir)
+    assert capsys.readouterr().out.count("up to date, skipped") == 5
+
+
+def test_modified_csv_invalidates_ingest(cert_tree, tmp_path):
+    ingest_dir = str(tmp_path / "ingest")
+    ingest_cert_logs(cert_tree, ingest_dir, sources=("device",))
+    csv_path = os.path.join(cert_tree, "device.csv")
+    assert is_ingest_current(csv_path, os.path.join(ingest_dir, "device"), "device")
+
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("{X},01/05/2010 10:00:00,ACM2278,PC-1001,Connect\n")
+    assert not is_ingest_current(csv_path, os.path.join(ingest_dir, "device"), "device")
+
+
+def _hold_back_days_after(csv_path: str, last_day: pd.Timestamp) -> bytes:
+    """Rewrites a CERT CSV without its events after last_day and returns their lines."""
+    with open(csv_path, "rb") as f:
+        header, *lines = f.readlines()
+    later = [pd.Timestamp(line.split(b",")[1][:10].decode()) > last_day for line in lines]
+    with open(csv_path, "wb") as f:
+        f.write(header + b"".join(line for line, late in zip(lines, later) if not late))
+    return b"".join(line for line, late in zip(lines, later) if late)
+
+
+def test_grown_csv_is_appended_not_reingested(cert_tree, tmp_path, capsys):
+    ingest_dir = str(tmp_path / "ingest")
+    csv_path = os.path.join(cert_tree, "http.csv")
+    dataset_dir = os.path.join(ingest_dir, "http")
+    expected = pd.read_csv(csv_path)
+    later = _hold_back_days_after(csv_path, pd.Timestamp("2010-02-04"))
+    ingest_cert_logs(cert_tree, ingest_dir, sources=("http",))
+    first_files = {
+        os.path.join(root, name): os.stat(os.path.join(root, name)).st_mtime_ns
+        for root, _, names in os.walk(dataset_dir) for name in names if name.endswith(".parquet")
+    }
+
+    # A partial trailing line is left for the next run
+    cut = len(later) - 7
+    with open(csv_path, "ab") as f:
+        f.write(later[:cut])
+    assert not is_ingest_current(csv_path, dataset_dir, "http")
+    assert is_ingest_appendable(csv_path, dataset_dir, "http")
+    capsys.readouterr()
+    ingest_cert_logs(cert_tree, ingest_dir, sources=("http",))
+    assert "appended" in capsys.readouterr().out
+    with open(csv_path, "ab") as f:
+        f.write(later[cut:])
+    ingest_cert_logs(cert_tree, ingest_dir, sources=("http",))
+
+    meta = read_ingest_meta(dataset_dir)
+    assert meta["rows"] == len(expected) and meta["offset"] == os.path.getsize(csv_path)
+    assert meta["last_day"] == str(pd.to_datetime(expected["date"]).max().date())
+    # Earlier partitions are left as written; the new events only add files
+    assert all(os.stat(path).st_mtime_ns == mtime for path, mtime in first_files.items())
+    appended = read_ingested(dataset_dir, USECOLS_MAP["http"]).astype(str)
+    fresh = read_ingested(
+        ingest_cert_logs(cert_tree, str(tmp_path / "fresh"), sources=("http",))["http"], USECOLS_MAP["http"]
+    ).astype(str)
+    keys = list(fresh.columns)
+    pd.testing.assert_frame_equal(
+        appended.sort_values(keys).reset_index(drop=True), fresh.sort_values(keys).reset_index(drop=True),
+    )
+
+
+def test_rewritten_csv_is_reingested_in_full(cert_tree, tmp_path, capsys):
+    ingest_dir = str(tmp_path / "ingest")
+    csv_path = os.path.join(cert_tree, "device.csv")
+    ingest_cert_logs(cert_tree, ingest_dir, sources=("device",))
+
+    raw = pd.read_csv(csv_path)
+    raw.iloc[::-1].to_csv(csv_path, index=False)
+    assert not is_ingest_appendable(csv_path, os.path.join(ingest_dir, "device"), "device")
+    capsys.readouterr()
+    ingest_cert_logs(cert_tree, ingest_dir, sources=("device",))
+    assert "Ingesting device.csv" in capsys.readouterr().out
+    assert read_ingest_meta(os.path.join(ingest_dir, "device"))["rows"] == len(raw)
+
+
+def test_layer_a_from_ingest_matches_csv(cert_tree, tmp_path):
+    ingest_dir = str(tmp_path / "ingest")
+    ingest_cert_logs(cert_tree, ingest_dir)
+
+    from_csv, csv_frames = build_layer_a(cert_tree, return_nunique_frames=True)
+    from_parquet, pq_frames = build_layer_a(cert_tree, return_nunique_frames=True, ingest_dir=ingest_dir)
+
+    pd.testing.assert_frame_equal(from_parquet, from_csv)
+    for key, (frame, value_col) in csv_frames.items():
+        pq_frame, _ = pq_frames[key]
+        keys = ["user", "day", value_col]
+        expected = frame.astype(str).sort_values(keys).reset_index(drop=True)
+        got = pq_frame.astype(str).sort_values(keys).reset_index(drop=True)
+        pd.testing.assert_frame_equal(got, expected)
+
+
+def test_prefetched_chunks_keep_order_memory_cap_and_errors(cert_tree):
+    chunks = [pd.DataFrame({"x": range(i, i + 100)}) for i in range(0, 1000, 100)]
+    budget = frame_nbytes(chunks[0]) * 2
+    for depth, max_bytes in ((0, None), (1, None), (3, None), (4, budget), (2, 1)):
+        got = list(prefetch_chunks(iter(chunks), depth=depth, max_bytes=max_bytes, prepare=lambda c: c * 2))
+        assert [c["x"].iloc[0] for c in got] == list(range(0, 2000, 200))
+
+    def failing():
+        yield chunks[0]
+        raise OSError("truncated log")
+
+    stream = prefetch_chunks(failing())
+    next(stream)
+    with pytest.raises(OSError, match="truncated"):
+        next(stream)
+    with pytest.raises(ValueError, match="depth"):
+        next(prefetch_chunks(iter(chunks), depth=-1))
+
+    http = os.path.join(cert_tree, "http.csv")
+    serial = extract_http_features_chunked(http, chunksize=97, prefetch=0)
+    prefetched = extract_http_features_chunked(http, chunksize=97, prefetch=2, prefetch_max_bytes=2**16)
+    pd.testing.assert_frame_equal(prefetched, serial)
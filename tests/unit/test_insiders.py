@@ -63,3 +63,20 @@ def test_prepare_ae_training_data_excludes_insiders(ueba_df, insider_windows):
     assert merged.empty
     # Fit/validation are a partition of the normal pool.
     assert len(train_fit) + len(train_val) == len(train_normal)
+
+
+def test_insider_mask_overlapping_windows_match_per_window_union(ueba_df):
+    # A long window nesting a shorter one, a disjoint window, and a window for an unknown user
+    windows = pd.DataFrame({
+        "user": ["user03", "user03", "user03", "nobody"],
+        "start_day": pd.to_datetime(["2010-01-02", "2010-01-05", "2010-01-20", "2010-01-01"]),
+        "end_day": pd.to_datetime(["2010-01-12", "2010-01-06", "2010-01-21", "2010-01-30"]),
+    })
+    shuffled = ueba_df.sample(frac=1.0, random_state=3)
+    expected = pd.Series(False, index=shuffled.index)
+    for _, row in windows.iterrows():
+        expected |= (shuffled["user"] == row["user"]) & shuffled["day"].between(row["start_day"], row["end_day"])
+
+    mask = build_insider_mask(shuffled, windows)
+    pd.testing.assert_series_equal(mask, expected)
+    assert mask.sum() == 13
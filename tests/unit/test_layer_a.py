@@ -0,0 +1,348 @@
+"""Tests for Layer A construction (ueba.features.preprocessing.build_layer_a)."""
+
+import importlib
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ueba.features.checkpoint import extraction_code_hash
+from ueba.features.preprocessing import (
+    DOMAIN_CLOUD_STORAGE,
+    DOMAIN_JOB_SITE,
+    LAYER_A_CHANNELS,
+    DomainDictionary,
+    HLLSketchSet,
+    HourlyHistogram,
+    IdentitySet,
+    PartialAggregator,
+    _compute_longest_run,
+    _longest_run_from_intervals,
+    _merge_run_intervals,
+    _run_intervals,
+    build_layer_a,
+    collapse_layer,
+    combine_partial_aggregations,
+    hash_identity_values,
+    load_nunique_frames,
+    normalize_urls,
+    save_nunique_frames,
+)
+
+
+@pytest.fixture
+def serial_layer_a(cert_tree):
+    return build_layer_a(cert_tree, return_nunique_frames=True)
+
+
+def test_layer_a_keys_are_unique(serial_layer_a):
+    layer_a, _ = serial_layer_a
+    assert not layer_a.duplicated(subset=["user", "pc", "day"]).any()
+    assert {"logon_count", "file_copy_count", "usb_insert_count", "emails_sent", "http_total_requests"} <= set(layer_a.columns)
+
+
+def test_nunique_frames_cover_identity_channels(serial_layer_a):
+    _, frames = serial_layer_a
+    assert set(frames) == {"unique_files_accessed", "unique_recipients", "unique_domains_visited"}
+    for _, (frame, value_col) in frames.items():
+        assert list(frame.columns) == ["user", "day", value_col]
+
+
+def test_parallel_extraction_matches_serial(cert_tree, serial_layer_a):
+    layer_a, frames = serial_layer_a
+    par_a, par_frames = build_layer_a(cert_tree, return_nunique_frames=True, workers=3)
+
+    pd.testing.assert_frame_equal(par_a, layer_a)
+    for key, (frame, value_col) in frames.items():
+        par_frame, par_col = par_frames[key]
+        assert par_col == value_col
+        pd.testing.assert_frame_equal(par_frame.reset_index(drop=True), frame.reset_index(drop=True))
+
+
+def test_schedules_disabled_uses_population_default(cert_tree):
+    layer_a = build_layer_a(cert_tree, compute_schedules=False)
+    assert len(layer_a) > 0
+
+
+def test_hourly_histogram_accumulates_across_chunks():
+    rng = np.random.default_rng(3)
+    events = pd.DataFrame({
+        "user": rng.choice(["A", "B", "C"], 500),
+        "pc": rng.choice(["PC-1", "PC-2"], 500),
+        "day": pd.Timestamp("2010-01-04") + pd.to_timedelta(rng.integers(0, 3, 500), unit="D"),
+    })
+    hour = pd.Series(rng.integers(0, 24, 500))
+    keys = ["user", "pc", "day"]
+
+    histogram = HourlyHistogram(keys)
+    for start in range(0, 500, 120):
+        histogram.update(events.iloc[start:start + 120], hour.iloc[start:start + 120])
+    got = histogram.to_frame(prefix="x").sort_values(keys).reset_index(drop=True)
+
+    # Long-form reference: entropy over the non-zero (group, hour) counts
+    counts = events.assign(hour=hour).groupby(keys + ["hour"]).size().rename("count").reset_index()
+    p = counts["count"] / counts.groupby(keys)["count"].transform("sum")
+    counts["plogp"] = p * np.log(p + 1e-10)
+    expected = counts.groupby(keys).agg(x_hourly_entropy=("plogp", "sum"), x_peak_hour_count=("count", "max")).reset_index()
+    expected["x_hourly_entropy"] *= -1
+
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+def test_hourly_histogram_skips_events_without_a_group():
+    events = pd.DataFrame({
+        "user": ["A", "A", None, "B"],
+        "pc": ["PC-1", "PC-1", "PC-1", "PC-2"],
+        "day": pd.Timestamp("2010-01-04"),
+    })
+    hour = pd.Series([9, 9, 3, 14])
+    histogram = HourlyHistogram(["user", "pc", "day"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        histogram.update(events, hour)
+    got = histogram.to_frame(prefix="x").set_index("user")
+    assert list(got.index) == ["A", "B"]
+    assert got.loc["A", "x_peak_hour_count"] == 2
+    assert got.loc["B", "x_peak_hour_count"] == 1
+
+
+def test_longest_run_known_sessions():
+    ts = pd.to_datetime([
+        "2010-01-04 08:00", "2010-01-04 08:20", "2010-01-04 08:45",  # 45 min run
+        "2010-01-04 10:00", "2010-01-04 10:10",                      # gap > 30 min: 10 min run
+        "2010-01-04 09:00",                                          # other pc: single event
+    ])
+    events = pd.DataFrame({"user": "A", "pc": ["PC-1"] * 5 + ["PC-2"], "day": ts.floor("D"), "timestamp": ts})
+    got = _compute_longest_run(events, ["user", "pc", "day"], prefix="x").set_index("pc")
+    assert got.loc["PC-1", "x_longest_active_run_minutes"] == 45.0
+    assert got.loc["PC-2", "x_longest_active_run_minutes"] == 0.0
+
+
+def test_longest_run_from_chunk_intervals_matches_events():
+    rng = np.random.default_rng(5)
+    n = 2000
+    ts = pd.Timestamp("2010-01-04") + pd.to_timedelta(rng.integers(0, 3 * 86400, n), unit="s")
+    events = pd.DataFrame({"user": rng.choice(["A", "B"], n), "pc": rng.choice(["PC-1", "PC-2"], n), "timestamp": ts})
+    events["day"] = events["timestamp"].dt.floor("D")
+    keys = ["user", "pc", "day"]
+
+    expected = _compute_longest_run(events, keys, prefix="x").sort_values(keys).reset_index(drop=True)
+    # Unsorted chunks: runs of one group straddle chunk boundaries in both directions
+    runs = [_run_intervals(events.iloc[i:i + 333], keys) for i in range(0, n, 333)]
+    got = _longest_run_from_intervals(runs, keys, prefix="x").sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, expected)
+
+
+
+def test_partial_aggregator_matches_single_combine(tmp_path):
+    rng = np.random.default_rng(11)
+    keys = ["user", "pc", "day"]
+    partials = [
+        pd.DataFrame({
+            "user": rng.choice(["A", "B", "C"], 40), "pc": rng.choice(["PC-1", "PC-2"], 40),
+            "day": pd.Timestamp("2010-01-04") + pd.to_timedelta(rng.integers(0, 4, 40), unit="D"),
+            "count": rng.integers(0, 5, 40),
+        }).groupby(keys, as_index=False, sort=False).sum()
+        for _ in range(37)
+    ]
+    expected = combine_partial_aggregations(partials, keys)
+    for fan_in, budget in ((2, None), (8, None), (3, 1024)):
+        aggregator = PartialAggregator(keys, fan_in=fan_in, memory_budget=budget, spill_dir=str(tmp_path))
+        for frame in partials:
+            aggregator.add(frame)
+        pd.testing.assert_frame_equal(aggregator.result(), expected)
+        assert aggregator.peak_bytes > 0 and (aggregator.n_spilled > 0) == (budget is not None)
+    assert not os.listdir(tmp_path)
+
+
+def test_merged_run_intervals_keep_longest_runs():
+    rng = np.random.default_rng(6)
+    n = 1500
+    ts = pd.Timestamp("2010-01-04") + pd.to_timedelta(rng.integers(0, 2 * 86400, n), unit="s")
+    events = pd.DataFrame({"user": rng.choice(["A", "B"], n), "pc": "PC-1", "timestamp": ts})
+    events["day"] = events["timestamp"].dt.floor("D")
+    keys = ["user", "pc", "day"]
+
+    runs = [_run_intervals(events.iloc[i:i + 100], keys) for i in range(0, n, 100)]
+    merged = PartialAggregator(keys, combine=lambda frames: _merge_run_intervals(frames, keys), fan_in=3)
+    for frame in runs:
+        merged.add(frame)
+    expected = _longest_run_from_intervals(runs, keys, prefix="x").sort_values(keys).reset_index(drop=True)
+    got = _longest_run_from_intervals([merged.result()], keys, prefix="x").sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, expected)
+@pytest.mark.parametrize("source, value_col", [("file", "filename"), ("email", "to"), ("http", "url")])
+def test_identity_hashes_do_not_collide(cert_tree, source, value_col):
+    values = pd.read_csv(os.path.join(cert_tree, f"{source}.csv"), usecols=[value_col])[value_col].dropna().drop_duplicates()
+    assert len(np.unique(hash_identity_values(values))) == len(values)
+
+
+def test_identity_set_matches_string_nunique():
+    rng = np.random.default_rng(9)
+    n = 3000
+    events = pd.DataFrame({
+        "user": rng.choice(["A", "B", "C"], n),
+        "pc": rng.choice(["PC-1", "PC-2"], n),
+        "day": pd.Timestamp("2010-01-04") + pd.to_timedelta(rng.integers(0, 4, n), unit="D"),
+        "to": rng.choice([f"r{i}@dtaa.com" for i in range(40)] + [None], n),
+    })
+    keys = ["user", "pc", "day"]
+    identities = IdentitySet(keys, "to", compact_every=3)
+    for start in range(0, n, 250):
+        identities.update(events.iloc[start:start + 250])
+
+    expected = events.groupby(keys)["to"].nunique().rename("n").reset_index()
+    got = identities.counts("n").sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, expected)
+
+    per_user_day = identities.identity_frame().groupby(["user", "day"])["to_hash"].nunique()
+    pd.testing.assert_series_equal(per_user_day, events.groupby(["user", "day"])["to"].nunique(), check_names=False)
+
+
+def test_identity_set_skips_rows_without_a_group():
+    events = pd.DataFrame({
+        "user": ["A", None, "A", "B"],
+        "pc": ["PC-1", "PC-1", "PC-1", "PC-2"],
+        "day": pd.Timestamp("2010-01-04"),
+        "to": ["x@dtaa.com", "y@dtaa.com", "z@dtaa.com", "x@dtaa.com"],
+    })
+    identities = IdentitySet(["user", "pc", "day"], "to")
+    identities.update(events)
+    got = identities.counts("n").set_index("user")["n"]
+    assert got.to_dict() == {"A": 2, "B": 1}
+
+
+def test_hll_sketches_track_exact_counts():
+    rng = np.random.default_rng(11)
+    n = 20000
+    events = pd.DataFrame({
+        "user": rng.choice(["A", "B"], n),
+        "pc": rng.choice(["PC-1", "PC-2"], n),
+        "day": pd.Timestamp("2010-01-04") + pd.to_timedelta(rng.integers(0, 2, n), unit="D"),
+        "url": rng.choice([f"site{i}.com" for i in range(2000)] + [None], n),
+    })
+    keys = ["user", "pc", "day"]
+    sketches = HLLSketchSet(keys, "url")
+    for start in range(0, n, 3000):
+        sketches.update(events.iloc[start:start + 3000])
+
+    expected = events.groupby(keys)["url"].nunique().to_numpy()
+    got = sketches.counts("n").sort_values(keys)["n"].to_numpy()
+    np.testing.assert_allclose(got, expected, rtol=0.2)
+
+    merged = sketches.identity_frame().set_index(["user", "day"])["url_hll"].sort_index()
+    exact = events.groupby(["user", "day"])["url"].nunique()
+    np.testing.assert_allclose(merged.to_numpy(), exact.to_numpy(), rtol=0.2)
+
+
+def test_hll_sketches_skip_rows_without_a_group():
+    events = pd.DataFrame({
+        "user": ["A", None, "A", "B"],
+        "pc": ["PC-1", "PC-1", "PC-1", "PC-2"],
+        "day": pd.Timestamp("2010-01-04"),
+        "url": ["a.com", "b.com", "c.com", "a.com"],
+    })
+    sketches = HLLSketchSet(["user", "pc", "day"], "url")
+    sketches.update(events)
+    got = sketches.counts("n").set_index("user")["n"]
+    assert got.to_dict() == {"A": 2, "B": 1}
+
+
+def test_hll_layer_a_collapses_with_estimates(cert_tree):
+    layer_a, frames = build_layer_a(cert_tree, return_nunique_frames=True, distinct="hll")
+    for _, (frame, value_col) in frames.items():
+        assert value_col.endswith("_hll") and frame[value_col].dtype == np.int64
+    layer_b = collapse_layer(layer_a, nunique_frames=frames)
+    assert not layer_b.duplicated(subset=["user", "day"]).any()
+    assert (layer_b["unique_domains_visited"] >= 0).all()
+
+    with pytest.raises(ValueError, match="distinct"):
+        build_layer_a(cert_tree, distinct="approx")
+
+
+def test_url_hosts_and_domain_codes(tmp_path):
+    urls = pd.Series([
+        " HTTPS://Indeed.com/jobs?q=x ", "http://www.dropbox.com", "news.example.org/a/b", None, "http://indeed.com/",
+    ])
+    length, hosts = normalize_urls(urls)
+    expected = urls.fillna("").str.strip().str.lower()
+    assert list(length) == list(expected.str.len())
+    assert hosts.to_pylist() == ["indeed.com", "www.dropbox.com", "news.example.org", "", "indeed.com"]
+
+    domains = DomainDictionary(["news.example.org"])
+    codes = domains.encode(hosts)
+    assert list(codes) == [1, 2, 0, 3, 1]
+    assert list(domains.flags[codes] & DOMAIN_JOB_SITE > 0) == [True, False, False, False, True]
+    assert list(domains.flags[codes] & DOMAIN_CLOUD_STORAGE > 0) == [False, True, False, False, False]
+    np.testing.assert_array_equal(domains.hashes[codes], hash_identity_values(pd.Series(hosts.to_pylist())))
+
+    domains.save(str(tmp_path / "domains.parquet"))
+    reloaded = DomainDictionary.load(str(tmp_path / "domains.parquet"))
+    np.testing.assert_array_equal(reloaded.encode(hosts), codes)
+    assert len(reloaded) == 4
+
+
+def test_nunique_safepoint_keeps_hashed_frames(serial_layer_a, tmp_path):
+    _, frames = serial_layer_a
+    save_nunique_frames(frames, str(tmp_path))
+    loaded = load_nunique_frames(str(tmp_path))
+    for key, (frame, value_col) in frames.items():
+        loaded_frame, loaded_col = loaded[key]
+        assert loaded_col == value_col and value_col.endswith("_hash")
+        assert loaded_frame[value_col].dtype == np.uint64
+        assert len(loaded_frame) == len(frame)
+
+
+def test_channel_checkpoints_reuse_unchanged_channels(cert_tree, serial_layer_a, tmp_path, capsys):
+    layer_a, frames = serial_layer_a
+    checkpoints = str(tmp_path / "channels")
+    build_layer_a(cert_tree, return_nunique_frames=True, checkpoint_dir=checkpoints)
+    assert sorted(os.listdir(checkpoints)) == sorted(LAYER_A_CHANNELS)
+
+    capsys.readouterr()
+    rerun_a, rerun_frames = build_layer_a(cert_tree, return_nunique_frames=True, checkpoint_dir=checkpoints)
+    assert capsys.readouterr().out.count("reusing checkpoint") == 5
+    pd.testing.assert_frame_equal(rerun_a, layer_a)
+    for key, (frame, value_col) in frames.items():
+        assert rerun_frames[key][1] == value_col
+        pd.testing.assert_frame_equal(rerun_frames[key][0], frame)
+
+    # A changed source or parameter re-extracts only the affected channels
+    with open(os.path.join(cert_tree, "http.csv"), "a", encoding="utf-8") as f:
+        f.write("{Z},01/05/2010 10:00:00,ACM2278,PC-1001,http://indeed.com/jobs,WWW Visit\n")
+    build_layer_a(cert_tree, return_nunique_frames=True, checkpoint_dir=checkpoints)
+    out = capsys.readouterr().out
+    assert out.count("reusing checkpoint") == 4 and "Extracting http features" in out
+    build_layer_a(cert_tree, return_nunique_frames=True, checkpoint_dir=checkpoints, distinct="hll")
+    assert capsys.readouterr().out.count("reusing checkpoint") == 2
+
+
+def test_extraction_code_hash_covers_shared_helpers(tmp_path, monkeypatch):
+    module_path = tmp_path / "toy_channels.py"
+
+    def load(helper_body, http_body, unused_body="x"):
+        module_path.write_text(
+            f"SCALE = 2\n\n\n"
+            f"def helper(x):\n    return {helper_body}\n\n\n"
+            f"def unused(x):\n    return {unused_body}\n\n\n"
+            f"def extract_logon(x):\n    return helper(x)\n\n\n"
+            f"def extract_http(x):\n    return {http_body}\n"
+        )
+        sys.modules.pop("toy_channels", None)
+        importlib.invalidate_caches()
+        module = importlib.import_module("toy_channels")
+        extractors = [module.extract_logon, module.extract_http]
+        return {f.__name__: extraction_code_hash(f) for f in extractors}
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    base = load("x + 1", "helper(x) * SCALE")
+    unused_edit = load("x + 1", "helper(x) * SCALE", unused_body="x * 1000")
+    assert unused_edit == base
+    http_edit = load("x + 1", "helper(x) * 30")
+    assert http_edit["extract_logon"] == base["extract_logon"]
+    assert http_edit["extract_http"] != base["extract_http"]
+    helper_edit = load("x + 10", "helper(x) * 30")
+    assert helper_edit["extract_logon"] != http_edit["extract_logon"]
+    assert helper_edit["extract_http"] != http_edit["extract_http"]
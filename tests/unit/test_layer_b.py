@@ -0,0 +1,208 @@
+"""Tests for the derived Layer B feature families (multi-horizon windows, peer z-scores), the sharded build
+(and the preprocess stage running on it) and the compact dtype schema."""
+
+import os
+import types
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ueba import config
+from ueba.features.incremental import IncrementalState
+from ueba.features.layer_b_shards import build_layer_b_sharded, read_layer_b_shards
+from ueba.features.preprocessing import (
+    _add_multihorizon_features,
+    apply_peer_group_enhancements,
+    build_layer_a,
+    build_layer_b,
+    load_ldap,
+)
+from ueba.features.rolling import causal_window_moments, user_segment_starts
+from ueba.features.schema import column_dtype, enforce_schema
+from ueba.pipeline.stages import preprocess
+
+FEATURES = ["logon_count", "http_total_requests"]
+
+
+def _reference(df: pd.DataFrame, ldap: pd.DataFrame, col: str) -> np.ndarray:
+    """Leave-one-out z-score computed row by row from the other cohort members."""
+    roles = df["user"].map(ldap.set_index("user")["role"]).fillna("Unknown")
+    out = np.zeros(len(df))
+    for i, (role, day) in enumerate(zip(roles, df["day"])):
+        others = df.loc[(roles == role) & (df["day"] == day) & (df.index != df.index[i]), col].dropna()
+        std = others.std() if len(others) > 1 else np.nan
+        out[i] = (df[col].iloc[i] - others.mean()) / std if std > 0 else 0.0
+    return np.clip(out, -10, 10)
+
+
+def test_window_moments_match_pandas_rolling():
+    rng = np.random.default_rng(6)
+    users = np.repeat(["A", "B", "C"], [120, 5, 80])
+    n = len(users)
+    values = np.column_stack([
+        rng.poisson(3, n).astype(float),
+        1e7 + rng.normal(0, 0.5, n),           # large offset, small spread
+        np.where(np.arange(n) % 60 < 45, 2.0, rng.poisson(2, n)),  # long constant runs
+    ])
+    values[rng.random(n) < 0.1, 0] = np.nan
+    values[rng.random(n) < 0.05, 2] = np.nan
+    shifted = pd.DataFrame(values).groupby(users).shift(1).groupby(users)
+    windows = [(30, 14), (5, 1)]
+
+    for cols, moments in causal_window_moments(values, user_segment_starts(pd.Series(users)), windows, block_cols=2):
+        for (window, min_periods), got in zip(windows, moments):
+            rolling = shifted.rolling(window, min_periods=min_periods)
+            expected = {
+                stat: getattr(rolling, stat)().reset_index(level=0, drop=True).sort_index().to_numpy()[:, cols]
+                for stat in ("mean", "std")
+            }
+            for stat in ("mean", "std"):
+                np.testing.assert_allclose(getattr(got, stat), expected[stat], rtol=1e-7, atol=1e-9, err_msg=f"{stat} {window}")
+            # Constant windows must come out with an exact zero std, not rounding noise
+            assert (got.std[expected["std"] == 0] == 0).all()
+
+
+def test_multihorizon_sums_match_grouped_rolling():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        "user": np.repeat(["A", "B", "C"], [50, 3, 40]),
+        "day": np.concatenate([pd.date_range("2010-01-04", periods=k) for k in (50, 3, 40)]),
+        "logon_count": rng.poisson(4, 93),
+        "http_total_requests": rng.gamma(2.0, 10.0, 93).astype("float32"),
+    }).sample(frac=1, random_state=0)
+    # Gaps inside a user's history are skipped by the rolling sums, not treated as zero
+    df.loc[df.index[::7], "http_total_requests"] = np.nan
+
+    got = _add_multihorizon_features(df, FEATURES)
+
+    for col in FEATURES:
+        shifted = got.groupby("user")[col].shift(1).groupby(got["user"])
+        for window in (7, 30):
+            expected = shifted.rolling(window, min_periods=1).sum().reset_index(level=0, drop=True)
+            np.testing.assert_allclose(got[f"{col}_{window}d_sum"], expected.astype("float32"), rtol=1e-6, err_msg=col)
+        assert got[f"{col}_1d_over_30d_ratio"].dtype == np.float32
+
+
+def test_peer_zscores_match_leave_one_out_reference():
+    rng = np.random.default_rng(4)
+    users = [f"U{i:03d}" for i in range(12)]
+    days = pd.date_range("2010-01-04", periods=3, freq="D")
+    df = pd.DataFrame([(u, d) for u in users for d in days], columns=["user", "day"])
+    df["logon_count"] = rng.poisson(4, len(df))
+    df["http_total_requests"] = rng.gamma(2.0, 10.0, len(df)).astype("float32")
+    df.loc[df["user"] == "U000", "http_total_requests"] = np.nan
+    # U011 has no LDAP record and forms the "Unknown" cohort on its own
+    ldap = pd.DataFrame({"user": users[:-1], "role": ["Engineer", "Salesman", "ITAdmin"] * 3 + ["Engineer", "Salesman"]})
+
+    got = apply_peer_group_enhancements(df, FEATURES, ldap)
+
+    assert list(got.columns) == list(df.columns) + [f"{col}_peer_zscore" for col in FEATURES]
+    for col in FEATURES:
+        present = df[col].notna().to_numpy()
+        expected = _reference(df, ldap, col)[present]
+        np.testing.assert_allclose(
+            got[f"{col}_peer_zscore"].to_numpy()[present], expected, rtol=1e-5, atol=1e-6, err_msg=col,
+        )
+
+
+def test_sharded_layer_b_matches_in_memory_build(cert_tree, tmp_path):
+    layer_a, frames = build_layer_a(cert_tree, return_nunique_frames=True)
+    ldap = load_ldap(cert_tree)
+    expected = build_layer_b(layer_a.copy(), nunique_frames=frames, ldap_df=ldap)
+
+    for n_shards, workers in ((3, 1), (2, 2)):
+        paths = build_layer_b_sharded(
+            layer_a, str(tmp_path / "shards"), n_shards, nunique_frames=frames, ldap_df=ldap, workers=workers,
+        )
+        assert 0 < len(paths) <= n_shards
+        shard_users = [set(pd.read_parquet(path, columns=["user"])["user"]) for path in paths]
+        assert sum(len(users) for users in shard_users) == len(set().union(*shard_users))
+        pd.testing.assert_frame_equal(read_layer_b_shards(paths), expected, check_exact=False, rtol=1e-9)
+
+
+def _run_preprocess_stage(cert_tree, insiders_csv, out, monkeypatch, shards: int) -> None:
+    for name, path in {
+        "CERT_PATH": cert_tree, "INSIDERS_PATH": insiders_csv, "CERT_VERSION": "4.2",
+        "BASE_DIR": str(out), "PIPELINE_MANIFEST_PATH": str(out / "manifest.json"), "DATASET_DIR": str(out),
+        "UEBA_A_PATH": str(out / "a.parquet"), "UEBA_B_PATH": str(out / "b.parquet"),
+        "UEBA_PATH": str(out / "train.parquet"), "UEBA_CALIBRATION_PATH": str(out / "calib.parquet"),
+        "UEBA_CALIB_EVAL_PATH": str(out / "calib_eval.parquet"), "TEST_STREAM_PATH": str(out / "test.parquet"),
+        "USER_WORK_HOURS_PATH": str(out / "work_hours.parquet"), "PEER_BASELINES_PATH": str(out / "peer.parquet"),
+        "INCREMENTAL_STATE_DIR": str(out / "state"), "SAFEPOINT_DIR": str(out / "safepoint"),
+        "LAYER_B_SHARD_DIR": str(out / "shards"), "INGEST_DIR": str(out / "ingest"),
+    }.items():
+        monkeypatch.setattr(config, name, path)
+    preprocess.run(types.SimpleNamespace(
+        incremental=False, workers=1, distinct="exact", prefetch=2, prefetch_max_mb=None,
+        partial_budget_mb=None, no_checkpoints=True, shards=shards,
+    ))
+
+
+def test_sharded_preprocess_stage_matches_in_memory_stage(cert_tree, insiders_csv, tmp_path, monkeypatch):
+    outputs = {}
+    for shards in (1, 3):
+        out = tmp_path / f"shards{shards}"
+        _run_preprocess_stage(cert_tree, insiders_csv, out, monkeypatch, shards)
+        outputs[shards] = out
+    one, sharded = outputs[1], outputs[3]
+    assert len(os.listdir(sharded / "test.parquet")) > 1
+
+    for name, keys in (("b", ["user", "day"]), ("train", ["user", "day"]), ("calib", ["user", "day"]),
+                       ("calib_eval", ["user", "day"]), ("test", ["user", "day"]), ("peer", ["department", "day"])):
+        got, expected = (
+            pd.read_parquet(out / f"{name}.parquet").astype({keys[0]: str}).sort_values(keys).reset_index(drop=True)
+            for out in (sharded, one)
+        )
+        pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-6, atol=1e-6)
+
+    got, expected = (IncrementalState.load(str(out / "state")) for out in (sharded, one))
+    assert got.watermark == expected.watermark
+    order = [expected.rolling.users.index(user) for user in got.rolling.users]
+    np.testing.assert_allclose(got.rolling.values, expected.rolling.values[order])
+    np.testing.assert_array_equal(got.rolling.n_seen, expected.rolling.n_seen[order])
+
+
+def test_peer_baselines_of_an_all_nan_feature_are_nan_without_warnings():
+    train = pd.DataFrame({
+        "department": ["A", "A", "B"],
+        "day": pd.Timestamp("2010-01-04"),
+        "logon_count": [1.0, 3.0, 2.0],
+        "http_total_requests": [np.nan, np.nan, 4.0],
+    })
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        peer = preprocess._build_peer_baselines([
+            preprocess._peer_baseline_totals(train.iloc[:2]), preprocess._peer_baseline_totals(train.iloc[2:]),
+        ]).set_index("department")
+    assert peer.loc["A", "logon_count"] == 2.0 and np.isnan(peer.loc["A", "http_total_requests"])
+    assert peer.loc["B", "http_total_requests"] == 4.0
+
+
+def test_layer_outputs_follow_the_dtype_schema(cert_tree):
+    layer_a, frames = build_layer_a(cert_tree, return_nunique_frames=True)
+    layer_b = build_layer_b(layer_a.copy(), nunique_frames=frames, ldap_df=load_ldap(cert_tree))
+
+    for df in (layer_a, layer_b):
+        features = [col for col in df.columns if col not in ("user", "pc", "day")]
+        schema = {col: column_dtype(col) for col in features if column_dtype(col) is not None}
+        assert {col: df[col].dtype for col in schema} == schema
+    assert layer_b["logon_count"].dtype == np.uint16
+    assert layer_b["cloud_upload_flag"].dtype == np.uint8
+    assert layer_b["logon_count_peer_zscore"].dtype == np.float32
+    assert layer_b["baseline_complete"].dtype == bool
+
+
+def test_enforce_schema_refuses_lossy_casts():
+    df = pd.DataFrame({"user": ["a", "b"], "logon_count": [3, 70_000], "logon_count_zscore": [0.5, -1.25]})
+    with pytest.raises(ValueError, match="logon_count"):
+        enforce_schema(df)
+    with pytest.raises(ValueError, match="fractional"):
+        enforce_schema(df.assign(logon_count=[1.5, 2.0]))
+
+    compact = enforce_schema(df.assign(logon_count=[3.0, 4.0]))
+    assert compact["logon_count"].tolist() == [3, 4]
+    assert compact.dtypes.to_dict() == {
+        "user": df["user"].dtype, "logon_count": np.uint16, "logon_count_zscore": np.float32,
+    }
@@ -24,6 +24,7 @@ def isolate_from_local_artifacts(tmp_path, monkeypatch):
     deterministically exercises the percentile fallback."""
     monkeypatch.setattr(live_simulation, "CALIBRATION_THRESHOLD_PATH", str(tmp_path / "absent.json"))
     monkeypatch.setattr(live_simulation, "FEATURE_COLS_PATH", str(tmp_path / "absent_cols.json"))
+    monkeypatch.setattr(live_simulation, "SCORING_BUNDLE_DIR", str(tmp_path / "absent_bundle"))
 
 
 class IdentityScaler:
@@ -124,3 +125,55 @@ def test_scheduled_user_not_warned(capsys):
     )
     make_scorer(50.0, user_work_hours=schedule).score_row(make_row())
     assert "no derived work-hour envelope" not in capsys.readouterr().out
+
+
+def test_scorer_takes_components_from_the_scoring_bundle(tmp_path):
+    from ueba.models.dense import ArrayScaler
+
+    class StubBundle:
+        scaler = ArrayScaler(np.zeros(4), np.full(4, 2.0))
+        encoder = StubEncoder()
+        iforest = StubForest(25.0)
+        ref_scores = np.arange(100, dtype="float64")
+        feature_cols = FEATURE_COLS
+        thresholds = {"LOW": 10.0, "MEDIUM": 20.0, "HIGH": 30.0, "CRITICAL": None}
+
+        def stale_sources(self):
+            return []
+
+    scorer = LiveScorer(user_work_hours=None, bundle=StubBundle())
+    assert scorer.feature_cols == FEATURE_COLS
+    payload = scorer.score_row(make_row())
+    assert payload["if_anomaly_score"] == 25.0
+    assert payload["if_risk_band"] == "HIGH"
+
+
+class StaleBundle:
+    feature_cols = ["stale_col"]
+
+    def stale_sources(self):
+        return ["/models/feature_scaler.pkl"]
+
+
+def test_stale_bundle_is_rejected_when_requested_explicitly():
+    with pytest.raises(ValueError, match="out of date"):
+        LiveScorer(user_work_hours=None, bundle=StaleBundle())
+
+
+def test_stale_bundle_falls_back_to_the_artifacts_in_auto_mode(tmp_path, monkeypatch, capsys):
+    from ueba.serving import scoring_bundle
+
+    bundle_dir = tmp_path / "bundle"
+    bundle_dir.mkdir()
+    (bundle_dir / "bundle.json").write_text("{}")
+    monkeypatch.setattr(live_simulation, "SCORING_BUNDLE_DIR", str(bundle_dir))
+    stale = StaleBundle()
+    stale.model_version = "6"
+    monkeypatch.setattr(scoring_bundle.ScoringBundle, "open", staticmethod(lambda path: stale))
+
+    scorer = LiveScorer(
+        scaler=IdentityScaler(), encoder=StubEncoder(), iforest=StubForest(25.0),
+        ref_scores=np.arange(100, dtype="float64"), user_work_hours=None,
+    )
+    assert scorer.feature_cols is None
+    assert "Loading the individual artifacts instead" in capsys.readouterr().out
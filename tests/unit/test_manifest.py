@@ -70,3 +70,15 @@ def test_validate_recorded_flags_deleted_and_resized(tmp_manifest):
     artifact.unlink()  # deleted
     problems = manifest.validate_recorded()
     assert len(problems) == 1 and "no longer on disk" in problems[0]
+
+
+def test_record_sums_the_parts_of_a_dataset_directory(tmp_manifest):
+    dataset = tmp_manifest / "layer_b.parquet"
+    dataset.mkdir()
+    (dataset / "part-00000.parquet").write_bytes(b"12345")
+    manifest.record("preprocess", [str(dataset)])
+    assert manifest.load()["artifacts"]["layer_b.parquet"]["bytes"] == 5
+
+    (dataset / "part-20100301-20100301.parquet").write_bytes(b"678")  # an incremental append
+    problems = manifest.validate_recorded()
+    assert len(problems) == 1 and "5 -> 8 bytes" in problems[0]
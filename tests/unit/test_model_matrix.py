@@ -31,3 +31,10 @@ def test_leaked_string_column_fails_loudly(ueba_df):
     df["future_ldap_attribute"] = "some-string"
     with pytest.raises(AssertionError, match="future_ldap_attribute"):
         to_model_matrix(df)
+
+
+def test_feature_column_outside_the_schema_fails_loudly(ueba_df):
+    df = ueba_df.copy()
+    df["unregistered_metric"] = 1.0
+    with pytest.raises(ValueError, match="unregistered_metric"):
+        to_model_matrix(df)
@@ -0,0 +1,92 @@
+"""Tests for the per-user rolling-statistics state (ueba.features.rolling_state)."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ueba.features.preprocessing import _add_multihorizon_features, apply_ueba_enhancements
+from ueba.features.rolling_state import RollingFeatureState
+
+FEATURES = ["logon_count", "file_copy_count", "http_total_requests"]
+BOOTSTRAP_DAYS = 60
+
+
+@pytest.fixture
+def history() -> pd.DataFrame:
+    """8 users x 130 days with integer counts, a float feature, constant runs and gaps."""
+    rng = np.random.default_rng(7)
+    days = pd.date_range("2010-01-01", periods=130, freq="D")
+    frames = []
+    for i in range(8):
+        user_days = days[rng.random(len(days)) > 0.15 * (i % 3)]
+        frame = pd.DataFrame({"user": f"U{i:03d}", "day": user_days})
+        frame["logon_count"] = rng.poisson(3 + i, len(frame))
+        frame["file_copy_count"] = np.where(np.arange(len(frame)) < 40, 2, rng.poisson(1, len(frame)))
+        frame["http_total_requests"] = rng.gamma(2.0, 10.0 * (i + 1), len(frame))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _batch(history: pd.DataFrame) -> pd.DataFrame:
+    # The risk flags at the end of apply_ueba_enhancements need one column per flag present
+    flag_inputs = ["usb_insert_count", "external_emails_sent", "http_upload_count", "non_primary_pc_usb_flag"]
+    df = _add_multihorizon_features(history.assign(**dict.fromkeys(flag_inputs, 0)), FEATURES)
+    return apply_ueba_enhancements(df, feature_cols=FEATURES)
+
+
+def test_replay_matches_batch_enhancements(history, tmp_path):
+    expected = _batch(history).set_index(["user", "day"])
+
+    split = history["day"].min() + pd.Timedelta(days=BOOTSTRAP_DAYS)
+    state = RollingFeatureState.from_layer_b(history[history["day"] < split], FEATURES)
+    state.save(str(tmp_path))
+    state = RollingFeatureState.load(str(tmp_path))
+
+    replayed = []
+    for _, day_rows in history[history["day"] >= split].groupby("day"):
+        derived = pd.concat([state.window_sums(day_rows), state.zscore(day_rows)], axis=1)
+        replayed.append(pd.concat([day_rows[["user", "day"]], derived], axis=1))
+        state.update(day_rows)
+    got = pd.concat(replayed).set_index(["user", "day"])
+
+    assert state.n_seen.sum() == len(history)
+    want = expected.loc[got.index, got.columns]
+    for col in got.columns:
+        np.testing.assert_allclose(
+            got[col].to_numpy("float64"), want[col].to_numpy("float64"), rtol=1e-5, atol=1e-6, err_msg=col,
+        )
+        assert got[col].dtype == want[col].dtype, col
+
+
+def test_unknown_user_gets_neutral_scores(history):
+    state = RollingFeatureState.from_layer_b(history, FEATURES)
+    day_rows = pd.DataFrame({"user": ["NEW0001"], "day": [pd.Timestamp("2010-06-01")], **{col: [5] for col in FEATURES}})
+
+    scores = state.zscore(day_rows)
+    assert not scores["baseline_complete"].iloc[0]
+    assert (scores.drop(columns="baseline_complete").to_numpy() == 0).all()
+    assert state.window_sums(day_rows).isna().all(axis=None)
+
+    state.update(day_rows)
+    assert state.users[-1] == "NEW0001" and state.n_seen[-1] == 1
+
+
+def test_duplicate_users_in_one_day_rejected(history):
+    state = RollingFeatureState(FEATURES)
+    day_rows = history.iloc[:2].assign(user="U000")
+    with pytest.raises(ValueError, match="one row per user"):
+        state.update(day_rows)
+
+
+def test_history_added_per_user_shard_matches_one_build(history):
+    whole = RollingFeatureState.from_layer_b(history, FEATURES)
+    state = RollingFeatureState(FEATURES)
+    shard = history["user"].isin(["U001", "U004", "U006"])
+    state.add_history(history[shard])
+    state.add_history(history[~shard])
+
+    order = [whole.users.index(user) for user in state.users]
+    np.testing.assert_array_equal(state.values, whole.values[order])
+    np.testing.assert_array_equal(state.n_seen, whole.n_seen[order])
+    with pytest.raises(ValueError, match="already hold a history"):
+        state.add_history(history[shard])
@@ -0,0 +1,103 @@
+"""Tests for the memory-mapped scoring bundle (ueba.serving.scoring_bundle).
+
+A bundle built from a small fitted scaler, encoder and forest must score rows
+exactly like the components it was built from, straight from mapped arrays.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import IsolationForest  # noqa: E402
+from sklearn.preprocessing import StandardScaler  # noqa: E402
+
+from ueba.models.compiled_forest import CompiledIsolationForest, export_isolation_forest  # noqa: E402
+from ueba.models.dense import NumpyDenseModel, fold_scaler, scaler_arrays  # noqa: E402
+from ueba.serving.scoring_bundle import ScoringBundle, write_scoring_bundle  # noqa: E402
+
+FEATURE_COLS = [f"feature_{i}" for i in range(10)]
+
+
+@pytest.fixture
+def components(tmp_path):
+    rng = np.random.default_rng(0)
+    x = rng.gamma(2.0, 3.0, size=(2000, len(FEATURE_COLS))).astype(np.float32)
+    scaler = StandardScaler().fit(x)
+    encoder = NumpyDenseModel(
+        kernels=[rng.normal(size=(10, 8)).astype(np.float32), rng.normal(size=(8, 4)).astype(np.float32)],
+        biases=[rng.normal(size=8).astype(np.float32), np.zeros(4, np.float32)],
+        activations=["relu", "linear"],
+        names=["dense", "latent_space"],
+    )
+    embeddings = encoder.predict(scaler.transform(x))
+    forest = IsolationForest(n_estimators=20, random_state=42).fit(embeddings)
+    compiled = CompiledIsolationForest.load(export_isolation_forest(forest, str(tmp_path / "iforest_model.npz")))
+    baseline = -forest.score_samples(embeddings)
+    return x, scaler, encoder, compiled, baseline
+
+
+def test_bundle_round_trip_scores_like_its_components(tmp_path, components):
+    x, scaler, encoder, compiled, baseline = components
+    thresholds = {"LOW": 0.45, "MEDIUM": 0.5, "HIGH": 0.55, "CRITICAL": None}
+    source = tmp_path / "feature_scaler.pkl"
+    source.write_bytes(b"scaler")
+    bundle_dir = write_scoring_bundle(
+        str(tmp_path / "scoring_bundle_6"), scaler, FEATURE_COLS, encoder, compiled,
+        baseline_scores=baseline, thresholds=thresholds, model_version="6", sources=[str(source)],
+    )
+
+    bundle = ScoringBundle.open(bundle_dir)
+    assert isinstance(bundle.ref_scores, np.memmap)
+    assert np.all(np.diff(bundle.ref_scores) >= 0)
+    assert bundle.feature_cols == FEATURE_COLS and bundle.thresholds == thresholds and bundle.model_version == "6"
+
+    scaled = bundle.scaler.transform(x)
+    np.testing.assert_array_equal(scaled, scaler.transform(x))
+    embeddings = bundle.encoder.predict(scaled)
+    np.testing.assert_array_equal(embeddings, encoder.predict(scaled))
+    np.testing.assert_array_equal(bundle.iforest.anomaly_score(embeddings), compiled.anomaly_score(embeddings))
+
+    assert bundle.stale_sources() == []
+    source.write_bytes(b"retrained scaler")
+    assert bundle.stale_sources() == [os.path.abspath(source)]
+
+
+def test_bundle_keeps_a_folded_encoder_folded(tmp_path, components):
+    x, scaler, encoder, compiled, baseline = components
+    mean, scale = scaler_arrays(scaler)
+    kernel_0, bias_0 = fold_scaler(encoder.kernels[0], encoder.biases[0], mean, scale)
+    folded = NumpyDenseModel(
+        [kernel_0, *encoder.kernels[1:]], [bias_0, *encoder.biases[1:]], encoder.activations, encoder.names,
+        input_mean=mean, input_scale=scale,
+    )
+    bundle = ScoringBundle.open(write_scoring_bundle(
+        str(tmp_path / "scoring_bundle_6"), scaler, FEATURE_COLS, folded, compiled, baseline, None, "6",
+    ))
+    assert bundle.encoder.scaler_folded
+    np.testing.assert_array_equal(bundle.encoder.input_scale, scale)
+    np.testing.assert_array_equal(bundle.encoder.predict(x), folded.predict(x))
+
+
+def test_rewriting_a_bundle_swaps_a_symlink(tmp_path, components):
+    _, scaler, encoder, compiled, baseline = components
+    bundle_dir = str(tmp_path / "bundles" / "b")
+    os.makedirs(os.path.dirname(bundle_dir))
+    versions = []
+    for model_version in ("6", "7", "8"):
+        write_scoring_bundle(bundle_dir, scaler, FEATURE_COLS, encoder, compiled, baseline, None, model_version)
+        assert os.path.islink(bundle_dir)
+        versions.append(os.path.realpath(bundle_dir))
+    assert ScoringBundle.open(bundle_dir).model_version == "8"
+    # The current and previous versions are kept, older ones removed
+    assert sorted(os.listdir(tmp_path / "bundles")) == sorted(["b"] + [os.path.basename(v) for v in versions[1:]])
+
+
+def test_bundle_rejects_mismatched_components(tmp_path, components):
+    _, scaler, encoder, compiled, baseline = components
+    with pytest.raises(ValueError, match="same number of features"):
+        write_scoring_bundle(str(tmp_path / "b"), scaler, FEATURE_COLS[:-1], encoder, compiled, baseline, None, "6")
+    with pytest.raises(FileNotFoundError, match="build-bundle"):
+        ScoringBundle.open(str(tmp_path / "absent"))
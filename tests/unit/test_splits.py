@@ -3,7 +3,7 @@
 import pandas as pd
 import pytest
 
-from ueba.features.preprocessing import chronological_split
+from ueba.features.preprocessing import chronological_split, split_cutoff_day
 
 
 def test_split_preserves_all_rows(ueba_df):
@@ -24,6 +24,12 @@ def test_split_ratio_drives_cutoff_day(ueba_df):
     assert test["day"].nunique() == 2
 
 
+def test_cutoff_day_is_the_last_training_day(ueba_df):
+    train, _ = chronological_split(df=ueba_df.copy(), split_ratio=0.9)
+    shuffled_days = ueba_df["day"].drop_duplicates().sample(frac=1.0, random_state=3)
+    assert split_cutoff_day(shuffled_days.to_numpy(), 0.9) == train["day"].max()
+
+
 def test_split_stable_under_unsorted_input(ueba_df):
     shuffled = ueba_df.sample(frac=1.0, random_state=7).reset_index(drop=True)
     train_a, test_a = chronological_split(df=ueba_df.copy(), split_ratio=0.8)
@@ -0,0 +1,36 @@
+"""Tests for the Hugging Face upload manifest (ueba.serving.upload_to_hf)."""
+
+import pytest
+
+upload_to_hf = pytest.importorskip("ueba.serving.upload_to_hf", exc_type=ImportError)
+
+
+def test_dataset_directory_upload_supersedes_older_remote_files(tmp_path):
+    dataset = tmp_path / "ueba_dataset_6b.parquet"
+    dataset.mkdir()
+    for name in ("part-00000.parquet", "part-00001.parquet"):
+        (dataset / name).write_bytes(b"x")
+    single = tmp_path / "user_work_hours.parquet"
+    single.write_bytes(b"x")
+
+    manifest = upload_to_hf._expand_dataset_dirs([
+        (str(dataset), "ueba_dataset_6b.parquet", False, "dataset"),
+        (str(single), "user_work_hours.parquet", False, "dataset"),
+    ])
+    assert [remote for _, remote, _, _ in manifest] == [
+        "ueba_dataset_6b.parquet/part-00000.parquet",
+        "ueba_dataset_6b.parquet/part-00001.parquet",
+        "user_work_hours.parquet",
+    ]
+
+    remote_files = [
+        "ueba_dataset_6b.parquet",                      # single file from an older upload
+        "ueba_dataset_6b.parquet/part-00001.parquet",
+        "ueba_dataset_6b.parquet/part-00002.parquet",   # part the local dataset no longer has
+        "user_work_hours.parquet",
+        "details/u1.parquet",
+    ]
+    assert upload_to_hf._stale_remote_files(remote_files, manifest) == [
+        "ueba_dataset_6b.parquet",
+        "ueba_dataset_6b.parquet/part-00002.parquet",
+    ]
@@ -1,9 +1,16 @@
-"""Tests for inference-time work-hour envelopes (ueba.features.work_hours)."""
+"""Tests for per-user work-hour envelopes: derivation (ueba.features.preprocessing) and inference-time flags (ueba.features.work_hours)."""
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from ueba.features.work_hours import apply_off_hours_flags, missing_users
+from ueba.features.preprocessing import (
+    compute_user_work_hours,
+    compute_user_work_hours_chunked,
+    load_raw_logs,
+    normalize_shared_columns,
+)
+from ueba.features.work_hours import WorkHourIndex, apply_off_hours_flags, missing_users
 
 
 @pytest.fixture
@@ -57,7 +64,52 @@ def test_missing_hour_and_timestamp_raises(schedule):
         apply_off_hours_flags(pd.DataFrame({"user": ["u"]}), schedule)
 
 
+def test_index_gathers_on_categorical_codes(schedule):
+    index = WorkHourIndex.from_table(schedule)
+    assert index.start.dtype == np.int8 and list(index.start) == [6, 9, 9]
+
+    # Unused and unknown categories, a missing user, and a category order unlike the table's
+    users = pd.Categorical(["ghost99", "early01", None, "early01"], categories=["zzz", "early01", "ghost99"])
+    events = pd.DataFrame({"user": users, "hour": [8, 5, 8, 10]})
+    assert list(index.off_hours(events["hour"], events["user"])) == [True, True, True, False]
+    assert WorkHourIndex.from_table(index) is index
+    assert list(apply_off_hours_flags(events, index)) == [True, True, True, False]
+
+
 def test_missing_users_reports_cold_start(schedule):
     # default02 has schedule_complete=False -> also cold-start
     assert missing_users(["early01", "default02", "ghost99"], schedule) == {"default02", "ghost99"}
     assert missing_users(["anyone"], None) == {"anyone"}
+
+
+def _logons(user: str, hours: list, n_days: int) -> pd.DataFrame:
+    days = pd.date_range("2010-01-04", periods=n_days, freq="D")
+    ts = [day + pd.Timedelta(hours=hours[i % len(hours)]) for i, day in enumerate(days)]
+    return pd.DataFrame({"user": user, "timestamp": ts, "activity": "Logon", "day": days})
+
+
+def test_envelope_derivation_and_fallbacks():
+    logon = pd.concat(
+        [
+            _logons("steady01", [7, 8, 12, 15, 16], 40),
+            _logons("fresh02", [7, 16], 10),   # below min_history
+            _logons("flat03", [10], 40),       # p10 == p90
+        ],
+        ignore_index=True,
+    )
+    logon["user"] = logon["user"].astype("category")
+    table = compute_user_work_hours(logon, min_history=30).set_index("user")
+
+    assert table.loc["steady01"].tolist() == [7, 16, True]
+    assert table.loc["fresh02"].tolist() == [9, 17, False]
+    assert table.loc["flat03"].tolist() == [9, 17, False]
+
+
+def test_chunked_histogram_matches_full_frame(cert_tree):
+    logon = normalize_shared_columns(load_raw_logs(cert_tree)["logon"])
+    for min_history in (5, 30):
+        full = compute_user_work_hours(logon, min_history=min_history)
+        chunked = compute_user_work_hours_chunked(f"{cert_tree}/logon.csv", min_history=min_history, chunksize=500)
+        full = full.sort_values("user").reset_index(drop=True)
+        chunked = chunked.sort_values("user").reset_index(drop=True)
+        pd.testing.assert_frame_equal(chunked, full)
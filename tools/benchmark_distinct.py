@@ -0,0 +1,89 @@
+"""Error / cost report for the HyperLogLog unique-count mode.
+
+Runs the chunked file, email and HTTP extractors twice over a CERT tree, once
+with exact distinct counts and once with `distinct="hll"`, and reports for
+each unique_* feature how far the estimates are from the exact counts at
+Layer A (user, pc, day) and Layer B (user, day) granularity, plus the
+extraction wall time of both modes.
+
+Usage (from project root):
+    python tools/benchmark_distinct.py [CERT_PATH] [--chunksize N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from ueba import config  # noqa: E402
+from ueba.features.preprocessing import (  # noqa: E402
+    LAYER_A_CHANNELS,
+    LAYER_A_IDENTITY_COLS,
+)
+
+KEYS = ["user", "pc", "day"]
+
+
+def _error_stats(exact: pd.Series, approx: pd.Series) -> dict:
+    exact = exact.to_numpy(np.float64)
+    approx = approx.to_numpy(np.float64)
+    rel = np.abs(approx - exact) / np.maximum(exact, 1)
+    return {
+        "rows": len(exact),
+        "exact_share": float(np.mean(approx == exact)) if len(exact) else 1.0,
+        "mean_rel_err": float(rel.mean()) if len(rel) else 0.0,
+        "p95_rel_err": float(np.percentile(rel, 95)) if len(rel) else 0.0,
+        "max_rel_err": float(rel.max()) if len(rel) else 0.0,
+        "max_exact": int(exact.max()) if len(exact) else 0,
+    }
+
+
+def _run(channel: str, cert_path: str, chunksize: int, distinct: str) -> tuple[pd.DataFrame, pd.DataFrame, float]:
+    start = time.perf_counter()
+    features, identity = LAYER_A_CHANNELS[channel](
+        os.path.join(cert_path, f"{channel}.csv"), chunksize=chunksize, return_identity_frame=True, distinct=distinct,
+    )
+    return features, identity, time.perf_counter() - start
+
+
+def benchmark(cert_path: str, chunksize: int) -> pd.DataFrame:
+    """Per (channel, granularity) error statistics of the HLL mode against the exact mode."""
+    rows = []
+    for channel, (output_col, value_col) in LAYER_A_IDENTITY_COLS.items():
+        exact_a, exact_ids, exact_s = _run(channel, cert_path, chunksize, "exact")
+        hll_a, hll_ids, hll_s = _run(channel, cert_path, chunksize, "hll")
+
+        layer_a = exact_a[KEYS + [output_col]].merge(hll_a[KEYS + [output_col]], on=KEYS, suffixes=("", "_hll"))
+        exact_b = exact_ids.groupby(["user", "day"], observed=True)[f"{value_col}_hash"].nunique().rename("exact")
+        layer_b = hll_ids.set_index(["user", "day"])[f"{value_col}_hll"].rename("hll").to_frame().join(exact_b)
+
+        for level, exact, approx in (
+            ("layer_a", layer_a[output_col], layer_a[f"{output_col}_hll"]),
+            ("layer_b", layer_b["exact"], layer_b["hll"]),
+        ):
+            rows.append({
+                "feature": output_col, "level": level, **_error_stats(exact, approx),
+                "exact_s": round(exact_s, 2), "hll_s": round(hll_s, 2),
+            })
+    return pd.DataFrame(rows)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cert_path", nargs="?", default=config.CERT_PATH)
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    args = parser.parse_args()
+
+    report = benchmark(args.cert_path, args.chunksize)
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
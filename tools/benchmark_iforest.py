@@ -0,0 +1,63 @@
+"""Timing / equality report for the compiled Isolation Forest scorer.
+
+Fits an sklearn IsolationForest with the pipeline's settings on synthetic
+latent embeddings, exports it, then times single-row and batch scoring
+through sklearn and through `CompiledIsolationForest` and checks that the
+scores are identical.
+
+Usage (from project root):
+    python tools/benchmark_iforest.py [--rows N] [--latent-dim N] [--trees N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from ueba.models.compiled_forest import CompiledIsolationForest, export_isolation_forest  # noqa: E402
+
+
+def _per_call_ms(func, arg, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func(arg)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--latent-dim", type=int, default=16)
+    parser.add_argument("--trees", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    train = rng.normal(size=(100_000, args.latent_dim)).astype(np.float32)
+    model = IsolationForest(n_estimators=args.trees, random_state=42).fit(train)
+    with tempfile.TemporaryDirectory() as tmp:
+        compiled = CompiledIsolationForest.load(export_isolation_forest(model, os.path.join(tmp, "iforest_model.npz")))
+
+    row = rng.normal(size=(1, args.latent_dim)).astype(np.float32)
+    print(f"single row  sklearn: {_per_call_ms(model.score_samples, row, 100):7.2f} ms"
+          f"  compiled: {_per_call_ms(compiled.score_row, row, 1000):7.3f} ms")
+
+    x = rng.normal(scale=1.5, size=(args.rows, args.latent_dim)).astype(np.float32)
+    start = time.perf_counter()
+    expected = model.score_samples(x)
+    sklearn_s = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = compiled.score_samples(x)
+    compiled_s = time.perf_counter() - start
+    identical = np.array_equal(scores, expected)
+    print(f"{args.rows:,} rows  sklearn: {sklearn_s:7.2f} s   compiled: {compiled_s:7.2f} s  identical: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
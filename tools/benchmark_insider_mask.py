@@ -0,0 +1,81 @@
+"""Timing / equality report for the vectorized insider-window mask.
+
+Builds a synthetic (user, day) frame and a set of insider windows (some of
+them overlapping on the same user), then times `build_insider_mask` against
+the per-window loop it replaced and checks that both masks are identical.
+
+Usage (from project root):
+    python tools/benchmark_insider_mask.py [--users N] [--days N] [--windows N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from ueba.models.data_prep import build_insider_mask  # noqa: E402
+
+
+def loop_insider_mask(df: pd.DataFrame, windows: pd.DataFrame) -> pd.Series:
+    """The original implementation: one full-length comparison per window."""
+    mask = pd.Series(False, index=df.index)
+    for _, row in windows.iterrows():
+        mask |= (
+            (df["user"] == row["user"]) &
+            (df["day"] >= row["start_day"]) &
+            (df["day"] <= row["end_day"])
+        )
+    return mask
+
+
+def synthetic_inputs(n_users: int, n_days: int, n_windows: int, seed: int=0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """A shuffled (user, day) frame and n_windows windows over a few hundred insider users."""
+    rng = np.random.default_rng(seed)
+    users = np.array([f"u{i:05d}" for i in range(n_users)])
+    days = pd.date_range("2010-01-01", periods=n_days, freq="D")
+    df = pd.DataFrame({"user": np.repeat(users, n_days), "day": np.tile(days, n_users)})
+    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+    # About two windows per insider, so some users get overlapping or nested windows
+    insiders = rng.choice(users, size=min(n_users, max(1, n_windows // 2)), replace=False)
+    start = rng.integers(0, n_days, n_windows)
+    windows = pd.DataFrame({
+        "user": rng.choice(insiders, size=n_windows),
+        "start_day": days[start],
+        "end_day": days[np.minimum(start + rng.integers(0, 60, n_windows), n_days - 1)],
+    })
+    return df, windows
+
+
+def _timed(func, *args) -> tuple[pd.Series, float]:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--days", type=int, default=550)
+    parser.add_argument("--windows", type=int, default=400)
+    args = parser.parse_args()
+
+    df, windows = synthetic_inputs(args.users, args.days, args.windows)
+    print(f"{len(df):,} rows, {len(windows)} windows over {windows['user'].nunique()} users")
+
+    expected, loop_s = _timed(loop_insider_mask, df, windows)
+    mask, vectorized_s = _timed(build_insider_mask, df, windows)
+    identical = mask.equals(expected)
+    print(f"loop:       {loop_s:8.3f} s")
+    print(f"vectorized: {vectorized_s:8.3f} s  ({loop_s / vectorized_s:.0f}x)")
+    print(f"flagged rows: {int(mask.sum()):,}  identical: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())